@@ -1,9 +1,14 @@
 import streamlit as st
-<<<<<<< HEAD
-import pandas as pd
-import requests
-from PIL import Image
-from io import BytesIO
+import os
+import sys
+from array import array
+
+# Les modules partagés (client du catalogue, images) sont à la racine du projet
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from wine_client import get_client
+
+# Nombre de fiches matérialisées par page de résultats
+PAGE_SIZE = 20
 
 # =============================================
 # Configuration de base
@@ -13,128 +18,114 @@ st.set_page_config(page_title="BouteillIA", layout="wide")
 # =============================================
 # Fonctions utilitaires
 # =============================================
-def display_bio_badge():
-    """Affiche le badge bio"""
-    st.markdown('<span style="background-color: #4CAF50; color: white; padding: 5px 10px; border-radius: 15px;">Vin Bio</span>', unsafe_allow_html=True)
-
 def load_image(url):
     """Charge une image depuis une URL"""
+    # Import au premier appel : requests et Pillow ne retardent pas le premier affichage
+    from wine_images import fetch_image
     try:
-        if pd.isna(url) or url == 'nan':
-            return None
-            
-        # Nettoyer l'URL
-        url = url.strip()
-        if not url.startswith('http'):
-            url = 'https://www.vinatis.com/' + url
-            
-        # Télécharger l'image
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return Image.open(BytesIO(response.content))
-        else:
-            st.error(f"Erreur HTTP {response.status_code} pour l'URL: {url}")
-            return None
+        # Nettoyage de l'URL et téléchargement (module partagé wine_images)
+        image, status, _ = fetch_image(url)
+        if status is not None and status != 200:
+            st.error(f"Erreur HTTP {status} pour l'URL: {url}")
+        return image
     except Exception as e:
         st.error(f"Erreur lors du chargement de l'image: {str(e)}")
         return None
 
 # =============================================
-# Chargement des données
+# Accès au catalogue
 # =============================================
-@st.cache_data
-def load_data():
-    """Charge les données des vins"""
-    df = pd.read_csv('base_vin_final.csv')
-    df['bio'] = df['bio'].apply(lambda x: 1 if pd.notna(x) and 'Certifié Eurofeuille' in str(x) else 0)
-    
-    # Si la colonne visuel n'existe pas, on la crée avec une image par défaut
-    if 'visuel' not in df.columns:
-        df['visuel'] = "https://www.vinatis.com/1-detail_default/default-wine.png"
-    else:
-        # Corriger le format des URLs des images
-        df['visuel'] = df['visuel'].apply(lambda x: f"https://www.vinatis.com/{x}" if pd.notna(x) and not str(x).startswith('http') else x)
-    
-    # Convertir toutes les colonnes en string sauf prix
-    for col in df.columns:
-        if col != 'prix':  # Ne pas convertir la colonne prix
-            df[col] = df[col].astype(str)
-    
-    # S'assurer que la colonne prix est en float
-    df['prix'] = pd.to_numeric(df['prix'], errors='coerce')
-    
-    return df
+@st.cache_resource(show_spinner="Chargement du catalogue…")
+def load_client():
+    """Client du service (BOUTEILLIA_API_URL) ou catalogue embarqué, partagé par les sessions"""
+    return get_client()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def get_cards(version, ids):
+    """Fiches pré-rendues d'une liste d'ids, mises en cache par version des données"""
+    return client.cards(list(ids))
 
 # =============================================
 # Interface utilisateur
 # =============================================
-def display_wine_info(vin, show_recommendations=False):
-    """Affiche les informations d'un vin"""
+def display_wine_card(card):
+    """Affiche la fiche pré-rendue d'un vin (image + un seul bloc markdown)"""
     # Affichage de l'image
-    if pd.notna(vin['visuel']) and vin['visuel'] != 'nan':
-        image = load_image(vin['visuel'])
+    if card['visuel']:
+        image = load_image(card['visuel'])
         if image:
-            st.image(image, width=300, caption=vin['nom'])
+            st.image(image, width=300, caption=card['nom'])
         else:
             st.warning("Impossible de charger l'image")
     else:
         st.warning("Pas d'image disponible pour ce vin")
     
-    # Informations du vin
-    st.markdown(f"### {vin['nom']} - {vin['prix']}€")
-    st.write(f"**Pays:** {vin['pays']}")
-    st.write(f"**Région:** {vin['region']}")
-    st.write(f"**Couleur:** {vin['couleur']}")
-    st.write(f"**Degré d'alcool:** {vin['deg_alcool']}%")
-    
-    # Badge bio si applicable
-    if vin['bio'] == '1':
-        display_bio_badge()
-    
-    # Accords mets et vins
-    if pd.notna(vin['accords']) and vin['accords'] != 'nan':
-        accords = vin['accords'].replace('[', '').replace(']', '').replace("'", '')
-        st.write(f"**Accords mets et vins:** {accords}")
-    
-    # Description
-    if pd.notna(vin['desc']) and vin['desc'] != 'nan':
-        st.write(f"**Description:** {vin['desc']}")
-    
-    # Bouton pour afficher les recommandations
-    if not show_recommendations:
-        if st.button(f"Voir les recommandations pour {vin['nom']}", key=f"reco_{vin['nom']}"):
-            st.session_state.selected_wine = vin
-            st.session_state.show_recommendations = True
-            st.rerun()
+    # Informations du vin, badge bio compris
+    st.markdown(card['markdown'], unsafe_allow_html=True)
 
-def display_recommendations(selected_wine):
-    """Affiche les vins recommandés"""
+# Fragments : un clic à l'intérieur ne réexécute que le fragment (pas toute la page et ses images)
+@st.fragment
+def recommendation_panel(wine_id, nom):
+    """Affiche à la demande les vins recommandés sous la fiche d'un vin"""
+    if not st.toggle(f"Voir les recommandations pour {nom}", key=f"reco_open_{wine_id}"):
+        return
     st.markdown("### 🍷 Vins recommandés")
     
     # Créer une grille de 2 colonnes pour les recommandations
     col1, col2 = st.columns(2)
     
-    # Afficher les 4 vins recommandés
-    for i in range(1, 5):
-        reco_col = 'reco' + str(i)
-        if reco_col in df.columns and pd.notna(selected_wine[reco_col]):
-            # Trouver le vin recommandé dans le DataFrame
-            reco_wine = df[df['nom'] == selected_wine[reco_col]].iloc[0]
-            
-            # Alterner entre les colonnes
-            with col1 if i % 2 == 1 else col2:
-                st.markdown("---")
-                display_wine_info(reco_wine, show_recommendations=True)
+    # Afficher les vins recommandés (reco1..reco4), fournis par le service
+    reco_ids = tuple(client.recommend_ids(wine_id))
+    for i, reco_card in enumerate(get_cards(data_version, reco_ids), 1):
+        # Alterner entre les colonnes
+        with col1 if i % 2 == 1 else col2:
+            st.markdown("---")
+            display_wine_card(reco_card)
+
+@st.fragment
+def results_list(result_ids):
+    """Affiche une page de résultats ; changer de page ne réexécute que la liste"""
+    st.write(f"Nombre de vins trouvés : {len(result_ids)}")
     
-    # Bouton pour revenir aux résultats
-    if st.button("Retour aux résultats"):
-        st.session_state.show_recommendations = False
-        st.rerun()
+    # Seule la page visible est chargée depuis le catalogue partagé
+    n_pages = (len(result_ids) - 1) // PAGE_SIZE + 1
+    if n_pages > 1:
+        st.session_state.result_page = st.number_input(
+            f"Page (sur {n_pages})", min_value=1, max_value=n_pages,
+            value=st.session_state.get('result_page', 0) + 1
+        ) - 1
+    start = st.session_state.get('result_page', 0) * PAGE_SIZE
+    page_ids = tuple(int(i) for i in result_ids[start:start + PAGE_SIZE])
+    for card in get_cards(data_version, page_ids):
+        st.markdown("---")
+        display_wine_card(card)
+        recommendation_panel(card['id'], card['nom'])
 
 # =============================================
-# Chargement des données
+# Connexion au catalogue
 # =============================================
-df = load_data()
+# Chargé à la première page qui en a besoin : la navigation et l'accueil s'affichent avant
+client = None
+data_version = None
+
+def connect():
+    """Client figé sur une version du catalogue pour tout le rerun (rechargement en arrière-plan)"""
+    global client, data_version
+    if client is not None:
+        return client
+    client = load_client().snapshot()
+    data_version = client.data_version()
+    if data_version is None:
+        # Service démarré mais catalogue pas encore chargé (voir /ready)
+        st.info("Le catalogue est en cours de chargement, réessayez dans quelques secondes.")
+        st.stop()
+    # Les ids gardés en session sont des positions dans une version donnée du catalogue
+    if st.session_state.get('ids_version', data_version) != data_version:
+        for key in ['result_ids'] + [k for k in st.session_state if str(k).startswith('reco_open_')]:
+            st.session_state.pop(key, None)
+        st.toast("Le catalogue a été mis à jour : relancez votre recherche.")
+    st.session_state.ids_version = data_version
+    return client
 
 # =============================================
 # Navigation et pages
@@ -156,78 +147,112 @@ if page == "Accueil":
     - Voir les résultats de votre recherche
     """)
     
-    # Statistiques
-    col1, col2 = st.columns(2)
+    # Statistiques (agrégats précalculés par le service)
+    connect()
+    stats = client.stats()
+    aggregats = client.aggregates()
+    col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Nombre de vins", len(df))
+        st.metric("Nombre de vins", stats['n_wines'])
     with col2:
-        st.metric("Pays représentés", len(df['pays'].unique()))
+        st.metric("Pays représentés", stats['n_pays'])
+    with col3:
+        st.metric("Prix médian", f"{aggregats['prix']['quantiles']['p50']:.2f} €")
+    
+    import pandas as pd
+    histogramme = aggregats['prix']['histogram']
+    st.markdown("#### Répartition des prix (€)")
+    st.bar_chart(pd.Series(histogramme['counts'], index=histogramme['edges'][:-1], name="Vins"))
+    st.markdown("#### Vins par couleur et par pays")
+    st.dataframe(pd.DataFrame(aggregats['couleur_pays']).fillna(0).astype(int))
 
 # Page de recherche
 elif page == "Recherche":
     st.title("🍷 BouteillIA")
     st.header("Recherche de vins")
     
-    # Filtres de recherche
+    # Filtres de recherche (listes déjà triées par le service)
+    connect()
+    filtres = client.filters()
+    
+    # Nombre de vins par option pour les filtres en cours (valeurs des widgets dans la session)
+    facettes = client.facets({
+        'texte': st.session_state.get('f_texte'),
+        'pays': st.session_state.get('f_pays'),
+        'couleur': st.session_state.get('f_couleur'),
+        'bio': st.session_state.get('f_bio', False),
+        'prix_min': st.session_state.get('f_prix', (None, None))[0],
+        'prix_max': st.session_state.get('f_prix', (None, None))[1],
+        'accords': st.session_state.get('f_accords', []),
+    })
+    
+    def avec_compte(facette):
+        """Libellé d'option suivi du nombre de vins correspondants"""
+        comptes = facettes['facets'].get(facette, {})
+        return lambda v: v if v == "Tous" else f"{v} ({comptes.get(v, 0)})"
+    
     col1, col2 = st.columns(2)
     
     with col1:
-        # Nettoyer et trier les listes en gérant les NaN
-        pays_list = ["Tous"] + sorted([str(x) for x in df['pays'].dropna().unique()])
-        couleur_list = ["Tous"] + sorted([str(x) for x in df['couleur'].dropna().unique()])
-        nom_list = ["Tous"] + sorted([str(x) for x in df['nom'].dropna().unique()])
-        
-        recherche_nom = st.selectbox("Rechercher un vin par son nom", nom_list)
-        pays = st.selectbox("Pays", pays_list)
-        couleur = st.selectbox("Couleur du vin", couleur_list)
+        pays_list = ["Tous"] + filtres['pays']
+        couleur_list = ["Tous"] + filtres['couleur']
+
+        recherche_texte = st.text_input(
+            "Rechercher un vin",
+            placeholder="Nom, domaine, région, appellation…",
+            help="Recherche par mots, tolérante aux fautes de frappe",
+            key='f_texte'
+        )
+        pays = st.selectbox("Pays", pays_list, format_func=avec_compte('pays'), key='f_pays')
+        couleur = st.selectbox("Couleur du vin", couleur_list, format_func=avec_compte('couleur'), key='f_couleur')
         
         # Accords mets et vins
-        all_accords = []
-        for accords in df['accords'].dropna():
-            accords_list = accords.replace('[', '').replace(']', '').replace("'", '').split(', ')
-            all_accords.extend(accords_list)
-        
         selected_accords = st.multiselect(
             "Accords mets et vins",
-            options=sorted(list(set(all_accords))),
-            help="Sélectionnez un ou plusieurs accords mets et vins"
+            options=filtres['accords'],
+            format_func=avec_compte('accords'),
+            help="Sélectionnez un ou plusieurs accords mets et vins",
+            key='f_accords'
         )
         
-        bio = st.checkbox("Vins bio uniquement")
+        n_bio = facettes['facets'].get('bio', {}).get('1', 0)
+        bio = st.checkbox(f"Vins bio uniquement ({n_bio})", key='f_bio')
     
     # Slider de prix en pleine largeur
-    prix_min = float(df['prix'].min())
-    prix_max = float(df['prix'].max())
+    prix_min = filtres['prix_min']
+    prix_max = filtres['prix_max']
     prix_range = st.slider(
         "Prix (€)",
         min_value=prix_min,
         max_value=prix_max,
         value=(prix_min, prix_max),
         step=1.0,
-        help="Sélectionnez une fourchette de prix"
+        help="Sélectionnez une fourchette de prix",
+        key='f_prix'
     )
     prix_min, prix_max = prix_range
     
+    # Nombre de vins correspondants, mis à jour à chaque changement de filtre
+    if facettes['total']:
+        st.info(f"{facettes['total']} vins correspondent à ces critères")
+    else:
+        st.warning("Aucun vin ne correspond à ces critères")
+    
     # Recherche
     if st.button("Rechercher"):
-        resultats = df.copy()
-        
-        # Application des filtres
-        if recherche_nom != "Tous":
-            resultats = resultats[resultats['nom'].astype(str) == recherche_nom]
-        if pays != "Tous":
-            resultats = resultats[resultats['pays'].astype(str) == pays]
-        if couleur != "Tous":
-            resultats = resultats[resultats['couleur'].astype(str) == couleur]
-        if bio:
-            resultats = resultats[resultats['bio'] == 1]
-        resultats = resultats[(resultats['prix'] >= prix_min) & (resultats['prix'] <= prix_max)]
-        
-        if selected_accords:
-            mask = resultats['accords'].apply(lambda x: any(accord in str(x) for accord in selected_accords))
-            resultats = resultats[mask]
+        # Seuls les ids sont gardés en session ; les fiches sont relues page par page
+        recherche = client.search({
+            'texte': recherche_texte,
+            'pays': pays,
+            'couleur': couleur,
+            'bio': bio,
+            'prix_min': prix_min,
+            'prix_max': prix_max,
+            'accords': selected_accords,
+        }, limit=0)
         
-        st.session_state.resultats = resultats
+        st.session_state.result_ids = array('i', recherche['ids'])
+        st.session_state.result_page = 0
         st.session_state.page = "Résultats"
         st.rerun()
 
@@ -235,127 +260,14 @@ elif page == "Recherche":
 elif page == "Résultats":
     st.title("🍷 BouteillIA")
     st.header("Résultats de la recherche")
+    connect()
     
-    if 'resultats' in st.session_state and not st.session_state.resultats.empty:
-        resultats = st.session_state.resultats
-        
-        # Vérifier si on doit afficher les recommandations
-        if 'show_recommendations' in st.session_state and st.session_state.show_recommendations:
-            display_recommendations(st.session_state.selected_wine)
-        else:
-            st.write(f"Nombre de vins trouvés : {len(resultats)}")
-            
-            for _, vin in resultats.iterrows():
-                st.markdown("---")
-                display_wine_info(vin)
+    result_ids = st.session_state.get('result_ids')
+    if result_ids is not None and len(result_ids):
+        # Recommandations ouvertes sous chaque fiche (fragments)
+        results_list(result_ids)
     else:
         st.info("Aucun résultat à afficher. Veuillez effectuer une recherche.")
         if st.button("Retour à la recherche"):
             st.session_state.page = "Recherche"
             st.rerun()
-=======
-import base64
-
-# Configuration de la page
-st.set_page_config(
-    page_title="Projet Viticulture",
-    page_icon="🍷",
-    layout="wide"
-)
-
-# Fonction pour charger et afficher une image en base64
-def load_image(image_path):
-    with open(image_path, "rb") as image_file:
-        encoded_string = base64.b64encode(image_file.read()).decode()
-    return f"data:image/png;base64,{encoded_string}"
-
-# CSS personnalisé
-st.markdown("""
-<style>
-    /* Couleurs inspirées du vin */
-    :root {
-        --wine-red: #722F37;
-        --wine-burgundy: #4E1609;
-        --wine-gold: #C1A87D;
-        --wine-cream: #F2E8DC;
-    }
-    
-    .sidebar .sidebar-content {
-        background-color: var(--wine-burgundy);
-        color: var(--wine-cream);
-    }
-    
-    h1 {
-        color: var(--wine-red);
-        font-family: 'Playfair Display', serif;
-    }
-    
-    .main-text {
-        color: #333;
-        font-size: 18px;
-        line-height: 1.6;
-        margin: 20px 0;
-    }
-    
-    .logo-container {
-        text-align: center;
-        padding: 20px;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-# Menu latéral
-with st.sidebar:
-    st.title("🍷 Navigation")
-    page = st.radio(
-        "Choisissez une page",
-        ["Présentation et KPI", "Filtrage des vins", "Recommandation"]
-    )
-
-# Contenu principal de la page de présentation
-if page == "Présentation et KPI":
-    st.title("Bienvenue sur notre Projet Viticulture")
-    
-    # Emplacement pour le logo (à remplacer par votre propre logo)
-    st.markdown("""
-    <div class="logo-container">
-        <img src="chemin_vers_votre_logo.png" alt="Logo Viticulture" style="max-width: 300px;">
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("""
-    <div class="main-text">
-        <h2>Notre Projet</h2>
-        <p>
-        Bienvenue dans notre projet dédié à l'univers passionnant de la viticulture. 
-        Notre équipe a développé une plateforme innovante combinant expertise viticole 
-        et intelligence artificielle pour vous offrir une expérience unique de découverte 
-        et de recommandation de vins.
-        </p>
-        
-        <h2>Notre Équipe</h2>
-        <p>
-        Notre équipe est composée de passionnés de data science et d'œnologie, 
-        réunissant leurs compétences pour créer un outil intelligent de recommandation 
-        de vins. Nous utilisons des algorithmes de machine learning sophistiqués pour 
-        analyser les caractéristiques des vins et proposer des recommandations personnalisées.
-        </p>
-        
-        <h2>Fonctionnalités Principales</h2>
-        <ul>
-            <li>Exploration détaillée de notre base de données de vins</li>
-            <li>Système de filtrage avancé</li>
-            <li>Recommandations personnalisées basées sur l'intelligence artificielle</li>
-            <li>Visualisation interactive des données</li>
-        </ul>
-    </div>
-    """, unsafe_allow_html=True)
-
-elif page == "Filtrage des vins":
-    st.title("Filtrage des vins")
-    st.write("Cette section est en cours de développement...")
-
-elif page == "Recommandation":
-    st.title("Système de recommandation")
-    st.write("Cette section est en cours de développement...") 
->>>>>>> 52c8fa171986a345393bbb19d7d49ad5a4870e4a
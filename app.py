@@ -1,89 +1,168 @@
+from array import array
+
 import streamlit as st
-import pandas as pd
-import requests
-from PIL import Image
-from io import BytesIO
+from app_profiling import RerunProfiler, render_panel
+from wine_client import get_client
+
+# Nombre de fiches matérialisées par page de résultats
+PAGE_SIZE = 20
 
 st.set_page_config(page_title="BouteillIA", layout="wide")
 
-# --- Fonctions utilitaires ---
-def display_bio_badge():
-    st.markdown('<span style="background-color: #4CAF50; color: white; padding: 5px 10px; border-radius: 15px;">Vin Bio</span>', unsafe_allow_html=True)
+# Instrumentation optionnelle (BOUTEILLIA_PROFILE ; ?debug=1|cprofile|pyinstrument si BOUTEILLIA_PROFILE=url)
+profiler = RerunProfiler.from_env(st.query_params.get('debug'))
+profiler.start()
 
+# --- Fonctions utilitaires ---
 def load_image(url):
+    # requests, Pillow et pandas (normalisation des URLs) ne sont importés qu'à la première image
+    from wine_images import fetch_image
     try:
-        if pd.isna(url) or url == 'nan':
-            return None
-        url = url.strip()
-        if not url.startswith('http'):
-            url = 'https://www.vinatis.com/' + url
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            return Image.open(BytesIO(response.content))
-        else:
-            st.error(f"Erreur HTTP {response.status_code} pour l'URL: {url}")
-            return None
+        with profiler.stage('images'):
+            image, status, n_bytes = fetch_image(url)
+        profiler.incr('images.fetched')
+        profiler.incr('images.bytes', n_bytes)
+        if status is not None and status != 200:
+            profiler.incr('images.errors')
+            st.error(f"Erreur HTTP {status} pour l'URL: {url}")
+        return image
     except Exception as e:
+        profiler.incr('images.errors')
         st.error(f"Erreur lors du chargement de l'image: {str(e)}")
         return None
 
-# --- Chargement des données ---
-@st.cache_data
-def load_data():
-    df = pd.read_csv('base_vin_final.csv')
-    df['bio'] = df['bio'].apply(lambda x: 1 if pd.notna(x) and 'Certifié Eurofeuille' in str(x) else 0)
-    if 'visuel' not in df.columns:
-        df['visuel'] = "https://www.vinatis.com/1-detail_default/default-wine.png"
-    else:
-        df['visuel'] = df['visuel'].apply(lambda x: f"https://www.vinatis.com/{x}" if pd.notna(x) and not str(x).startswith('http') else x)
-    for col in df.columns:
-        if col != 'prix':
-            df[col] = df[col].astype(str)
-    df['prix'] = pd.to_numeric(df['prix'], errors='coerce')
-    return df
-
-def display_wine_info(vin, show_recommendations=False):
-    if pd.notna(vin['visuel']) and vin['visuel'] != 'nan':
-        image = load_image(vin['visuel'])
+# --- Accès au catalogue (service HTTP si BOUTEILLIA_API_URL est défini, sinon embarqué) ---
+@st.cache_resource(show_spinner="Chargement du catalogue…")
+def load_client():
+    profiler.cache_miss('client')
+    return get_client()
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_cards(version, ids):
+    profiler.cache_miss('cards')
+    return client.cards(list(ids))
+
+def get_cards(version, ids):
+    """Fiches pré-rendues d'une liste d'ids, mises en cache par version des données"""
+    profiler.cache_call('cards')
+    with profiler.stage('cards'):
+        return cached_cards(version, ids)
+
+def display_wine_card(card):
+    if card['visuel']:
+        image = load_image(card['visuel'])
         if image:
-            st.image(image, width=200, caption=vin['nom'])
+            st.image(image, width=200, caption=card['nom'])
         else:
             st.warning("Impossible de charger l'image")
     else:
         st.warning("Pas d'image disponible pour ce vin")
-    st.markdown(f"### {vin['nom']} - {vin['prix']}€")
-    st.write(f"**Pays:** {vin['pays']}")
-    st.write(f"**Région:** {vin['region']}")
-    st.write(f"**Couleur:** {vin['couleur']}")
-    st.write(f"**Degré d'alcool:** {vin['deg_alcool']}%")
-    if vin['bio'] == '1':
-        display_bio_badge()
-    if pd.notna(vin['accords']) and vin['accords'] != 'nan':
-        accords = vin['accords'].replace('[', '').replace(']', '').replace("'", '')
-        st.write(f"**Accords mets et vins:** {accords}")
-    if pd.notna(vin['desc']) and vin['desc'] != 'nan':
-        st.write(f"**Description:** {vin['desc']}")
-    if not show_recommendations:
-        if st.button(f"Voir les recommandations pour {vin['nom']}", key=f"reco_{vin['nom']}"):
-            st.session_state.selected_wine = vin
-            st.session_state.show_recommendations = True
-            st.rerun()
+    st.markdown(card['markdown'], unsafe_allow_html=True)
 
-def display_recommendations(selected_wine):
-    st.markdown("### 🍷 Vins recommandés")
-    col1, col2 = st.columns(2)
-    for i in range(1, 5):
-        reco_col = 'reco' + str(i)
-        if reco_col in df.columns and pd.notna(selected_wine[reco_col]):
-            reco_wine = df[df['nom'] == selected_wine[reco_col]].iloc[0]
+# Fragments : un clic à l'intérieur ne réexécute que le fragment, pas la barre latérale,
+# la connexion au catalogue ni les autres fiches (et leurs images) de la page
+@st.fragment
+def recommendation_panel(wine_id, nom, opened=False):
+    """Vins recommandés pour un vin, affichés à la demande sous sa fiche"""
+    with profiler.partial(f"Recommandations {wine_id}"):
+        key = f"reco_open_{wine_id}"
+        st.session_state.setdefault(key, opened)
+        if not st.toggle(f"Voir les recommandations pour {nom}", key=key):
+            return
+        st.markdown("### 🍷 Vins recommandés")
+        with profiler.stage('recommendations'):
+            reco_ids = tuple(client.recommend_ids(wine_id, collapse=st.session_state.get('regrouper', True)))
+        col1, col2 = st.columns(2)
+        for i, reco_card in enumerate(get_cards(data_version, reco_ids), 1):
             with col1 if i % 2 == 1 else col2:
                 st.markdown("---")
-                display_wine_info(reco_wine, show_recommendations=True)
+                display_wine_card(reco_card)
+
+@st.fragment
+def price_panel(wine_id, nom):
+    """Évolution du prix d'un vin d'une collecte à l'autre, affichée à la demande"""
+    with profiler.partial(f"Prix {wine_id}"):
+        if not st.toggle(f"Évolution du prix de {nom}", key=f"prix_open_{wine_id}"):
+            return
+        with profiler.stage('price_history'):
+            historique = client.price_history(wine_id)
+        points = historique['points']
+        if not points:
+            st.caption("Pas encore d'historique de prix pour ce vin.")
+            return
+        import pandas as pd
+        prix = pd.Series([p['prix'] for p in points], index=pd.to_datetime([p['date'] for p in points]),
+                         name="Prix (€)")
+        # Seuls les changements sont enregistrés : le dernier prix vaut jusqu'à la dernière collecte
+        if historique['last_crawl'] and historique['last_crawl'] != points[-1]['date']:
+            prix[pd.Timestamp(historique['last_crawl'])] = prix.iloc[-1]
+        st.line_chart(prix)
+        st.caption(f"{len(points) - 1} changements depuis le {points[0]['date'][:10]} · "
+                   f"actuellement {points[-1]['stock']}")
+
+@st.fragment
+def detail_card(wine_id):
+    """Fiche d'un vin choisi hors liste (vin surprise), recommandations ouvertes"""
+    card = get_cards(data_version, (int(wine_id),))[0]
+    display_wine_card(card)
+    recommendation_panel(card['id'], card['nom'], opened=True)
+    price_panel(card['id'], card['nom'])
     if st.button("Retour aux résultats"):
         st.session_state.show_recommendations = False
         st.rerun()
 
-df = load_data()
+@st.fragment
+def results_list(result_ids):
+    """Liste paginée des résultats : changer de page ne réexécute que la liste"""
+    with profiler.partial("Résultats (page)"):
+        total = st.session_state.get('result_total')
+        if st.session_state.get('regrouper') and total is not None and total != len(result_ids):
+            st.write(f"Nombre de vins trouvés : {len(result_ids)} cuvées ({total} fiches avant regroupement "
+                     f"des millésimes)")
+        else:
+            st.write(f"Nombre de vins trouvés : {len(result_ids)}")
+        n_pages = (len(result_ids) - 1) // PAGE_SIZE + 1
+        if n_pages > 1:
+            st.session_state.result_page = st.number_input(
+                f"Page (sur {n_pages})", min_value=1, max_value=n_pages,
+                value=st.session_state.get('result_page', 0) + 1
+            ) - 1
+        start = st.session_state.get('result_page', 0) * PAGE_SIZE
+        page_ids = tuple(int(i) for i in result_ids[start:start + PAGE_SIZE])
+        with profiler.stage('render'):
+            for card in get_cards(data_version, page_ids):
+                st.markdown("---")
+                display_wine_card(card)
+                recommendation_panel(card['id'], card['nom'])
+                price_panel(card['id'], card['nom'])
+
+# Le catalogue n'est chargé qu'à la première page qui en a besoin :
+# la barre latérale et le texte d'accueil s'affichent sans l'attendre
+client = None
+data_version = None
+
+def connect():
+    """Client figé sur une version du catalogue pour tout le rerun (rechargement en arrière-plan)"""
+    global client, data_version
+    if client is not None:
+        return client
+    profiler.cache_call('client')
+    with profiler.stage('client'):
+        client = load_client().snapshot()
+        data_version = client.data_version()
+    if data_version is None:
+        # Service démarré mais catalogue pas encore chargé (voir /ready)
+        st.info("Le catalogue est en cours de chargement, réessayez dans quelques secondes.")
+        render_panel(st, profiler.finish())
+        st.stop()
+    # Les ids gardés en session sont des positions dans une version donnée du catalogue
+    if st.session_state.get('ids_version', data_version) != data_version:
+        for key in ['result_ids', 'selected_wine_id', 'show_recommendations'] + \
+                [k for k in st.session_state if str(k).startswith(('reco_open_', 'prix_open_'))]:
+            st.session_state.pop(key, None)
+        st.toast("Le catalogue a été mis à jour : relancez votre recherche.")
+    st.session_state.ids_version = data_version
+    return client
 
 with st.sidebar:
     try:
@@ -103,14 +182,14 @@ with st.sidebar:
     st.markdown("---")
     if st.button("🍇 Vin surprise"):
         st.session_state['random_wine'] = True
-        random_wine = df.sample(n=1).iloc[0]
-        st.session_state.selected_wine = random_wine
+        st.session_state.selected_wine_id = connect().random_id()
         st.session_state.show_recommendations = True
         st.session_state.page = "Résultats"
         st.rerun()
     st.caption('"Le vin est la réponse de la terre au soleil." — Marguerite Duras')
 
 page = page.split(" ", 1)[1]
+profiler.page = page
 
 if page == "Accueil":
     st.markdown("""
@@ -130,80 +209,132 @@ if page == "Accueil":
     - Rechercher des vins selon vos critères
     - Voir les résultats de votre recherche
     """)
-    col1, col2 = st.columns(2)
+    connect()
+    with profiler.stage('aggregates'):
+        stats = client.stats()
+        aggregats = client.aggregates()
+    col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Nombre de vins", len(df))
+        st.metric("Nombre de vins", stats['n_wines'])
     with col2:
-        st.metric("Pays représentés", len(df['pays'].unique()))
+        st.metric("Pays représentés", stats['n_pays'])
+    with col3:
+        st.metric("Prix médian", f"{aggregats['prix']['quantiles']['p50']:.2f} €")
+    histogramme = aggregats['prix']['histogram']
+    import pandas as pd
+    st.markdown("#### Répartition des prix (€)")
+    st.bar_chart(pd.Series(histogramme['counts'], index=histogramme['edges'][:-1], name="Vins"))
+    st.markdown("#### Vins par couleur et par pays")
+    st.dataframe(pd.DataFrame(aggregats['couleur_pays']).fillna(0).astype(int))
 
 elif page == "Recherche":
     st.title("🍷 BouteillIA")
     st.header("Recherche de vins")
+    connect()
+    with profiler.stage('filters'):
+        filtres = client.filters()
+    # Nombre de vins par option pour les filtres en cours (valeurs des widgets dans la session)
+    with profiler.stage('facets'):
+        facettes = client.facets({
+            'texte': st.session_state.get('f_texte'),
+            'pays': st.session_state.get('f_pays'),
+            'couleur': st.session_state.get('f_couleur'),
+            'bio': st.session_state.get('f_bio', False),
+            'prix_min': st.session_state.get('f_prix', (None, None))[0],
+            'prix_max': st.session_state.get('f_prix', (None, None))[1],
+            'accords': st.session_state.get('f_accords', []),
+        })
+
+    def comptes(facette, selection):
+        """Nombres de vins à côté du widget : libellés et options restent fixes, sinon Streamlit
+        y voit un autre widget à chaque changement de compte et remet les autres filtres à zéro"""
+        par_valeur = facettes['facets'].get(facette, {})
+        valeurs = [v for v in selection if v != "Tous"] or \
+            sorted(par_valeur, key=par_valeur.get, reverse=True)[:5]
+        if valeurs:
+            st.caption(" · ".join(f"{v} : {par_valeur.get(v, 0)}" for v in valeurs))
+
     col1, col2 = st.columns(2)
     with col1:
-        pays_list = ["Tous"] + sorted([str(x) for x in df['pays'].dropna().unique()])
-        couleur_list = ["Tous"] + sorted([str(x) for x in df['couleur'].dropna().unique()])
-        nom_list = ["Tous"] + sorted([str(x) for x in df['nom'].dropna().unique()])
-        recherche_nom = st.selectbox("Rechercher un vin par son nom", nom_list)
-        pays = st.selectbox("Pays", pays_list)
-        couleur = st.selectbox("Couleur du vin", couleur_list)
-        all_accords = []
-        for accords in df['accords'].dropna():
-            accords_list = accords.replace('[', '').replace(']', '').replace("'", '').split(', ')
-            all_accords.extend(accords_list)
+        pays_list = ["Tous"] + filtres['pays']
+        couleur_list = ["Tous"] + filtres['couleur']
+        recherche_texte = st.text_input(
+            "Rechercher un vin",
+            placeholder="Nom, domaine, région, appellation…",
+            help="Recherche par mots, tolérante aux fautes de frappe",
+            key='f_texte'
+        )
+        pays = st.selectbox("Pays", pays_list, key='f_pays')
+        comptes('pays', [pays])
+        couleur = st.selectbox("Couleur du vin", couleur_list, key='f_couleur')
+        comptes('couleur', [couleur])
         selected_accords = st.multiselect(
             "Accords mets et vins",
-            options=sorted(list(set(all_accords))),
-            help="Sélectionnez un ou plusieurs accords mets et vins"
+            options=filtres['accords'],
+            help="Sélectionnez un ou plusieurs accords mets et vins",
+            key='f_accords'
+        )
+        comptes('accords', selected_accords)
+        bio = st.checkbox("Vins bio uniquement", key='f_bio')
+        st.caption(f"{facettes['facets'].get('bio', {}).get('1', 0)} vins bio")
+        regrouper = st.checkbox(
+            "Regrouper les millésimes",
+            value=True,
+            help="Une seule fiche par cuvée (millésimes et écritures du même vin)",
+            key='f_regrouper'
         )
-        bio = st.checkbox("Vins bio uniquement")
-    prix_min = float(df['prix'].min())
-    prix_max = float(df['prix'].max())
+    prix_min = filtres['prix_min']
+    prix_max = filtres['prix_max']
     prix_range = st.slider(
         "Prix (€)",
         min_value=prix_min,
         max_value=prix_max,
         value=(prix_min, prix_max),
         step=1.0,
-        help="Sélectionnez une fourchette de prix"
+        help="Sélectionnez une fourchette de prix",
+        key='f_prix'
     )
     prix_min, prix_max = prix_range
+    if facettes['total']:
+        # Le compte porte sur toutes les fiches ; regroupées, les cuvées en font moins
+        st.info(f"{facettes['total']} vins correspondent à ces critères"
+                + (" (avant regroupement des millésimes)" if regrouper else ""))
+    else:
+        st.warning("Aucun vin ne correspond à ces critères")
     if st.button("Rechercher"):
-        resultats = df.copy()
-        if recherche_nom != "Tous":
-            resultats = resultats[resultats['nom'].astype(str) == recherche_nom]
-        if pays != "Tous":
-            resultats = resultats[resultats['pays'].astype(str) == pays]
-        if couleur != "Tous":
-            resultats = resultats[resultats['couleur'].astype(str) == couleur]
-        if bio:
-            resultats = resultats[resultats['bio'] == 1]
-        resultats['prix'] = pd.to_numeric(resultats['prix'], errors='coerce')
-        resultats = resultats[(resultats['prix'] >= prix_min) & (resultats['prix'] <= prix_max)]
-        if selected_accords:
-            mask = resultats['accords'].apply(lambda x: any(accord in str(x) for accord in selected_accords))
-            resultats = resultats[mask]
-        st.session_state.resultats = resultats
+        # Seuls les ids sont gardés en session ; les fiches sont relues page par page
+        with profiler.stage('search'):
+            recherche = client.search({
+                'texte': recherche_texte,
+                'pays': pays,
+                'couleur': couleur,
+                'bio': bio,
+                'prix_min': prix_min,
+                'prix_max': prix_max,
+                'accords': selected_accords,
+            }, limit=0, collapse=regrouper)
+        st.session_state.result_ids = array('i', recherche['ids'])
+        # f_regrouper n'existe que sur cette page (Streamlit l'efface ailleurs) : le choix est recopié
+        st.session_state.regrouper = regrouper
+        st.session_state.result_total = facettes['total']
+        st.session_state.result_page = 0
         st.session_state.page = "Résultats"
         st.rerun()
 
 elif page == "Résultats":
     st.title("🍷 BouteillIA")
     st.header("Résultats de la recherche")
-    if st.session_state.get("show_recommendations", False) and st.session_state.get("selected_wine", None) is not None:
-        display_wine_info(st.session_state.selected_wine)
-        display_recommendations(st.session_state.selected_wine)
-    elif 'resultats' in st.session_state and not st.session_state.resultats.empty:
-        resultats = st.session_state.resultats
-        if 'show_recommendations' in st.session_state and st.session_state.show_recommendations:
-            display_recommendations(st.session_state.selected_wine)
-        else:
-            st.write(f"Nombre de vins trouvés : {len(resultats)}")
-            for _, vin in resultats.iterrows():
-                st.markdown("---")
-                display_wine_info(vin)
+    connect()
+    selected_wine_id = st.session_state.get("selected_wine_id")
+    result_ids = st.session_state.get('result_ids')
+    if st.session_state.get("show_recommendations", False) and selected_wine_id is not None:
+        detail_card(selected_wine_id)
+    elif result_ids is not None and len(result_ids):
+        results_list(result_ids)
     else:
         st.info("Aucun résultat à afficher. Veuillez effectuer une recherche.")
         if st.button("Retour à la recherche"):
             st.session_state.page = "Recherche"
             st.rerun()
+
+render_panel(st, profiler.finish())
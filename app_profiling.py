@@ -0,0 +1,192 @@
+"""Instrumentation optionnelle des reruns Streamlit de BouteillIA.
+
+Désactivée par défaut (aucun coût hormis un test par étape). S'active par la
+variable d'environnement BOUTEILLIA_PROFILE :
+    1              chronos par étape, téléchargements d'images, taux de succès des caches
+    cprofile       + capture cProfile du rerun (fichier .prof dans profiles/)
+    pyinstrument   + capture pyinstrument du rerun (si le paquet est installé)
+    url            rien par défaut, mais le paramètre d'URL ?debug=<mode> est écouté
+
+Le paramètre ?debug= n'est pris en compte qu'avec BOUTEILLIA_PROFILE=url : avec un mode
+fixé ou sans la variable, un visiteur ne peut pas choisir un profileur plus lourd que
+celui de l'exploitant, ni écrire de profils.
+
+Chaque rerun est ajouté en une ligne JSON à BOUTEILLIA_METRICS_FILE
+(bouteillia_metrics.jsonl par défaut) et résumé dans un panneau de la barre latérale.
+Les réexécutions partielles (fragments) ont leur propre ligne, avec scope='fragment'.
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+import uuid
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+
+METRICS_FILE = 'bouteillia_metrics.jsonl'
+PROFILE_DIR = 'profiles'
+MODES = ('1', 'cprofile', 'pyinstrument')
+# BOUTEILLIA_PROFILE=url : désactivé, sauf pour les sessions ouvertes avec ?debug=<mode>
+QUERY_OPT_IN = 'url'
+
+
+class RerunProfiler:
+    """Chronos, compteurs et profil d'un rerun de la page"""
+
+    def __init__(self, mode=None, metrics_file=METRICS_FILE, profile_dir=PROFILE_DIR):
+        self.mode = mode if mode in MODES else None
+        self.enabled = self.mode is not None
+        self.metrics_file = metrics_file
+        self.profile_dir = profile_dir
+        self.stages = defaultdict(float)
+        self.counters = Counter()
+        self.page = None
+        self.scope = 'app'
+        self.started = None
+        self.finished = False
+        self._profiler = None
+
+    @classmethod
+    def from_env(cls, query_value=None):
+        """Mode pris dans BOUTEILLIA_PROFILE, ou dans ?debug= seulement si BOUTEILLIA_PROFILE=url"""
+        configured = os.environ.get('BOUTEILLIA_PROFILE')
+        mode = configured if configured in MODES else None
+        if query_value and configured == QUERY_OPT_IN:
+            mode = query_value
+        return cls(mode, metrics_file=os.environ.get('BOUTEILLIA_METRICS_FILE', METRICS_FILE))
+
+    def start(self, page=None):
+        if not self.enabled:
+            return
+        self.page = page
+        self.started = time.perf_counter()
+        if self.mode == 'cprofile':
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.mode == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                self.counters['profile.pyinstrument_absent'] += 1
+            else:
+                self._profiler = Profiler()
+                self._profiler.start()
+
+    @contextmanager
+    def partial(self, page):
+        """Réexécution d'un fragment : enregistrée à part si le rerun complet est déjà clos.
+
+        Pendant un rerun complet, les étapes du fragment s'ajoutent simplement à ce rerun.
+        """
+        if not self.enabled or not self.finished:
+            yield
+            return
+        self.stages, self.counters = defaultdict(float), Counter()
+        self.finished = False
+        self.start(page)
+        self.scope = 'fragment'
+        try:
+            yield
+        finally:
+            self.finish()
+
+    def stage(self, name):
+        """Chronomètre une étape (les durées d'une même étape s'additionnent dans le rerun)"""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] += time.perf_counter() - start
+
+    def incr(self, name, n=1):
+        if self.enabled:
+            self.counters[name] += n
+
+    def cache_call(self, name):
+        """Un appel à une fonction en cache ; la fonction appelle cache_miss() quand elle s'exécute"""
+        self.incr(f"cache.{name}.calls")
+
+    def cache_miss(self, name):
+        self.incr(f"cache.{name}.misses")
+
+    def cache_rates(self):
+        rates = {}
+        for key, calls in self.counters.items():
+            if key.startswith('cache.') and key.endswith('.calls'):
+                name = key[len('cache.'):-len('.calls')]
+                misses = self.counters.get(f"cache.{name}.misses", 0)
+                rates[name] = {'calls': calls, 'misses': misses,
+                               'hit_rate': round(1 - misses / calls, 3) if calls else None}
+        return rates
+
+    def _stop_profiler(self):
+        """Arrête la capture et retourne (chemin du fichier, texte des fonctions les plus coûteuses)"""
+        if self._profiler is None:
+            return None, None
+        os.makedirs(self.profile_dir, exist_ok=True)
+        # L'horodatage à la seconde ne suffit pas : deux sessions (ou fragments) finissent dans la même seconde
+        stamp = f"{time.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:12]}"
+        if self.mode == 'cprofile':
+            self._profiler.disable()
+            path = os.path.join(self.profile_dir, f"rerun_{stamp}.prof")
+            self._profiler.dump_stats(path)
+            text = io.StringIO()
+            pstats.Stats(self._profiler, stream=text).sort_stats('cumulative').print_stats(15)
+            return path, text.getvalue()
+        self._profiler.stop()
+        path = os.path.join(self.profile_dir, f"rerun_{stamp}.html")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self._profiler.output_html())
+        return path, self._profiler.output_text(unicode=True)
+
+    def finish(self):
+        """Clôt le rerun : écrit la ligne JSON et retourne l'enregistrement (None si désactivé)"""
+        if not self.enabled or self.started is None:
+            return None
+        total = time.perf_counter() - self.started
+        self.finished = True
+        profile_path, profile_text = self._stop_profiler()
+        record = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'page': self.page,
+            'scope': self.scope,
+            'total_ms': round(total * 1000, 2),
+            'stages_ms': {name: round(s * 1000, 2) for name, s in sorted(self.stages.items(), key=lambda kv: -kv[1])},
+            'counters': {k: v for k, v in self.counters.items() if not k.startswith('cache.')},
+            'caches': self.cache_rates(),
+            'profile': profile_path,
+        }
+        try:
+            with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError:
+            pass
+        record['profile_text'] = profile_text
+        return record
+
+
+def render_panel(st, record):
+    """Panneau de debug dans la barre latérale pour l'enregistrement d'un rerun"""
+    if record is None:
+        return
+    with st.sidebar.expander(f"🛠 Rerun : {record['total_ms']:.0f} ms", expanded=False):
+        st.caption(f"Page {record['page']} — {record['ts']}")
+        if record['stages_ms']:
+            st.table({'étape': list(record['stages_ms']), 'ms': list(record['stages_ms'].values())})
+        images = record['counters']
+        st.write(f"Images : {images.get('images.fetched', 0)} téléchargées, "
+                 f"{images.get('images.bytes', 0) / 1024:.0f} Ko, {images.get('images.errors', 0)} erreurs")
+        for name, rate in record['caches'].items():
+            hit_rate = f"{rate['hit_rate']:.0%}" if rate['hit_rate'] is not None else '-'
+            st.write(f"Cache {name} : {hit_rate} de succès ({rate['calls']} appels)")
+        if record.get('profile_text'):
+            st.caption(f"Profil : {record['profile']}")
+            st.code(record['profile_text'][:5000])
@@ -0,0 +1,20 @@
+"""Outils partagés par les scripts de benchmark (chemin du projet, chronométrage)."""
+import os
+import sys
+import time
+
+# Les benchmarks importent les modules situés à la racine du projet
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def best_of(func, repeat=3):
+    """Exécute `func` plusieurs fois et retourne (meilleur temps en secondes, dernier résultat)"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
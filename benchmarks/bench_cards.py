@@ -0,0 +1,100 @@
+"""Rendu d'une page de 500 résultats : fiches reconstruites champ par champ ou fiches pré-rendues.
+
+Streamlit n'est pas nécessaire : les appels `st.*` sont remplacés par un compteur
+d'éléments émis, ce qui mesure le travail Python fait à chaque rerun et le nombre
+d'éléments envoyés au navigateur.
+
+Usage : python benchmarks/bench_cards.py --rows 100000 --page 500
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from _common import best_of
+from catalogue import Catalogue
+from synthetic_catalogue import write_catalogue
+from wine_cards import CardTable
+
+
+class EmitCounter:
+    """Compte les éléments qu'une page Streamlit enverrait au navigateur"""
+
+    def __init__(self):
+        self.elements = 0
+        self.chars = 0
+
+    def emit(self, text, **kwargs):
+        self.elements += 1
+        self.chars += len(text)
+
+    markdown = write = emit
+
+
+def has_value(value):
+    return value is not None and value != 'nan'
+
+
+def render_fields(st, vin):
+    """Ancienne display_wine_info (sans l'image) : nettoyage et un st.write par champ"""
+    st.markdown(f"### {vin['nom']} - {vin['prix']}€")
+    st.write(f"**Pays:** {vin['pays']}")
+    st.write(f"**Région:** {vin['region']}")
+    st.write(f"**Couleur:** {vin['couleur']}")
+    st.write(f"**Degré d'alcool:** {vin['deg_alcool']}%")
+    if vin['bio'] == '1':
+        st.markdown('<span>Vin Bio</span>', unsafe_allow_html=True)
+    if has_value(vin['accords']):
+        accords = vin['accords'].replace('[', '').replace(']', '').replace("'", '')
+        st.write(f"**Accords mets et vins:** {accords}")
+    if has_value(vin['desc']):
+        st.write(f"**Description:** {vin['desc']}")
+
+
+def render_old(catalogue, ids):
+    st = EmitCounter()
+    for vin in catalogue.rows(ids):
+        render_fields(st, vin)
+    return st
+
+
+def render_cards(catalogue, ids, cache):
+    st = EmitCounter()
+    key = (catalogue.version, tuple(int(i) for i in ids))
+    if key not in cache:  # st.cache_data dans l'application
+        cache[key] = catalogue.cards(ids)
+    for card in cache[key]:
+        st.markdown(card['markdown'], unsafe_allow_html=True)
+    return st
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--page', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(path, args.rows)
+        catalogue = Catalogue.from_csv(path)
+    build_s, table = best_of(lambda: CardTable(catalogue.df, catalogue.version), repeat=1)
+    print(f"Catalogue : {len(catalogue)} vins ; fiches pré-rendues en {build_s:.2f} s, "
+          f"{table.nbytes() / 2**20:.1f} Mo")
+
+    ids = np.random.default_rng(0).choice(len(catalogue), args.page, replace=False)
+    old_s, old = best_of(lambda: render_old(catalogue, ids), repeat=5)
+    cache = {}
+    cold_s, new = best_of(lambda: render_cards(catalogue, ids, {}), repeat=5)
+    render_cards(catalogue, ids, cache)
+    warm_s, _ = best_of(lambda: render_cards(catalogue, ids, cache), repeat=5)
+
+    print(f"Page de {args.page} vins :")
+    print(f"  champ par champ      {old_s * 1000:8.2f} ms, {old.elements} éléments émis")
+    print(f"  fiches (sans cache)  {cold_s * 1000:8.2f} ms, {new.elements} éléments émis")
+    print(f"  fiches (en cache)    {warm_s * 1000:8.2f} ms  (x{old_s / warm_s:.0f})")
+
+
+if __name__ == "__main__":
+    main()
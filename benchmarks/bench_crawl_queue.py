@@ -0,0 +1,152 @@
+"""File de travail partagée (crawl_queue) : débit cumulé de la collecte selon le nombre de workers.
+
+Les deux marchands synthétiques de bench_merchant_scraper (latence simulée, 3 % de 503)
+sont servis en local ; leurs listings sont poussés dans une file SQLite neuve, puis
+1, 2, 4, 8 processus workers (un téléchargement à la fois chacun, comme un navigateur
+par processus) la vident. On mesure :
+
+    - pages/s et fiches/s cumulés selon le nombre de workers, et l'absence de doublon
+      (chaque URL traitée une fois, autant de fiches qu'attendu) ;
+    - les mêmes workers derrière le service HTTP de la file (workers d'autres machines) ;
+    - la reprise : un worker tué (SIGKILL) en pleine collecte, ses baux expirent et ses
+      tâches sont reprises par les autres ;
+    - le coût de la file seule : prises + rendus par seconde, processus en concurrence.
+
+Usage : python benchmarks/bench_crawl_queue.py --pages 10 --latency-ms 30 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import _common  # noqa: F401  (modules du projet)
+from bench_merchant_scraper import PER_LISTING, MerchantStub, cave_pages, sources, vinatis_pages
+from crawl_queue import SqliteQueue, make_server, open_queue, run_worker, seed
+from fetcher import Fetcher
+
+
+def work(spec, vinatis_url, cave_url, lease_s, ready):
+    fetcher = Fetcher(concurrency=1, backoff_s=0.05)
+    # Démarrage commun : le lancement des processus (import de pandas) n'est pas compté
+    ready.wait()
+    try:
+        run_worker(open_queue(spec), sources(vinatis_url, cave_url), fetcher, lease_s=lease_s, poll_s=0.1)
+    finally:
+        fetcher.close()
+
+
+def crawl(spec, queue, vinatis_url, cave_url, pages, workers, lease_s=30.0, kill_after=None):
+    """Sème la file, lance `workers` processus et attend qu'ils aient fini ; retourne la durée"""
+    seed(queue, sources(vinatis_url, cave_url), pages)
+    context = multiprocessing.get_context('spawn')
+    ready = context.Barrier(workers + 1)
+    processes = [context.Process(target=work, args=(spec, vinatis_url, cave_url, lease_s, ready))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    ready.wait()
+    start = time.perf_counter()
+    if kill_after is not None:
+        time.sleep(kill_after)
+        processes[0].kill()
+    for process in processes:
+        process.join()
+    return time.perf_counter() - start
+
+
+def report(label, seconds, queue, expected, baseline=None):
+    stats = queue.stats()
+    records = list(queue.records())
+    keys = {(r['source'], r['url']) for r in records}
+    tasks = stats['done']
+    speedup = f"{baseline / seconds:>6.1f}x" if baseline else ''
+    print(f"{label:<26}{seconds:>8.2f} s{tasks:>6} pages{tasks / seconds:>8.1f} pages/s"
+          f"{len(records):>7} fiches{len(records) / seconds:>8.0f} fiches/s {speedup}")
+    problems = []
+    if len(records) != expected or len(keys) != len(records):
+        problems.append(f"{len(records)} fiches dont {len(keys)} distinctes, {expected} attendues")
+    if stats['pending'] or stats['leased'] or stats['failed']:
+        problems.append(f"{stats['pending']} en attente, {stats['leased']} à bail, {stats['failed']} en échec")
+    extra = {k: stats[k] for k in ('requeued', 'lost_leases') if stats.get(k)}
+    if problems or extra:
+        print(f"    {'; '.join(problems) or 'complet'} {extra or ''}")
+
+
+def queue_ops(path, worker):
+    queue = SqliteQueue(path)
+    while True:
+        tasks = queue.lease(worker, 1)
+        if not tasks:
+            return
+        queue.complete(worker, tasks[0].id, [])
+
+
+def bench_queue(directory, processes, n_tasks=4000):
+    """Prises + rendus par seconde, sans réseau : le plafond de la file SQLite"""
+    path = os.path.join(directory, f"ops-{processes}.sqlite")
+    queue = SqliteQueue(path)
+    queue.push(('bench', 'product', f"http://bench/{i}") for i in range(n_tasks))
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=queue_ops, args=(path, f"w{i}")) for i in range(processes)]
+    start = time.perf_counter()
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join()
+    seconds = time.perf_counter() - start
+    print(f"{processes:>3} processus {n_tasks / seconds:>10.0f} tâches/s (prise + rendu), "
+          f"{queue.stats()['done']} / {n_tasks} rendues")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--error-rate', type=float, default=0.03)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    expected = args.pages * (PER_LISTING['vinatis'] + PER_LISTING['cave'])
+    print(f"{args.pages} pages de listing par marchand, {args.pages * (2 + PER_LISTING['cave'])} pages, "
+          f"{expected} fiches attendues, latence {args.latency_ms:.0f} ms, {args.error_rate:.0%} de 503")
+    directory = tempfile.mkdtemp(prefix='bench-crawl-queue-')
+    try:
+        with MerchantStub(vinatis_pages, args.latency_ms, args.error_rate, seed=1) as vinatis, \
+                MerchantStub(cave_pages, args.latency_ms, args.error_rate, seed=2) as cave:
+            urls = (vinatis.base_url, cave.base_url)
+            baseline = None
+            for workers in args.workers:
+                path = os.path.join(directory, f"crawl-{workers}.sqlite")
+                queue = SqliteQueue(path)
+                seconds = crawl(path, queue, *urls, args.pages, workers)
+                baseline = baseline or seconds * args.workers[0]
+                report(f"{workers} worker(s), SQLite", seconds, queue, expected, baseline)
+
+            # Workers d'autres machines : la file derrière son service HTTP
+            workers = max(args.workers)
+            queue = SqliteQueue(os.path.join(directory, 'crawl-http.sqlite'))
+            server = make_server(queue, '127.0.0.1', 0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            seconds = crawl(f"http://127.0.0.1:{server.server_address[1]}", queue, *urls, args.pages, workers)
+            server.shutdown()
+            server.server_close()
+            report(f"{workers} worker(s), HTTP", seconds, queue, expected, baseline)
+
+            # Reprise : baux de 1 s, un worker tué après 1 s
+            path = os.path.join(directory, 'crawl-kill.sqlite')
+            queue = SqliteQueue(path)
+            seconds = crawl(path, queue, *urls, args.pages, 4, lease_s=1.0, kill_after=1.0)
+            report("4 workers, 1 tué", seconds, queue, expected)
+
+        print("File seule :")
+        for processes in (1, 2, 4, 8):
+            bench_queue(directory, processes)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Comptages « N vins correspondent » : refiltrage du DataFrame ou bitmaps de facettes.
+
+Mesure aussi la construction des agrégats (une fois par version des données) face
+aux calculs refaits à chaque affichage par les anciennes pages (nunique, min/max).
+
+Usage : python benchmarks/bench_facets.py --rows 100000
+"""
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from _common import best_of
+from catalogue import load_catalogue
+from facets import FacetIndex, build_aggregates, popcount
+from synthetic_catalogue import write_catalogue
+
+FILTERS = [
+    {'pays': 'France', 'couleur': 'Rouge'},
+    {'bio': True, 'prix_min': 10.0, 'prix_max': 25.0},
+    {'pays': 'Italie', 'accords': ('Fromage', 'Gibier')},
+]
+
+
+def refilter(df, pays=None, couleur=None, bio=False, prix_min=None, prix_max=None, accords=()):
+    """Ancienne chaîne de masques pandas de la page Recherche"""
+    mask = np.ones(len(df), dtype=bool)
+    if pays:
+        mask &= (df['pays'] == pays).to_numpy()
+    if couleur:
+        mask &= (df['couleur'] == couleur).to_numpy()
+    if bio:
+        mask &= (df['bio'] == '1').to_numpy()
+    if prix_min is not None:
+        mask &= (df['prix'] >= prix_min).to_numpy()
+    if prix_max is not None:
+        mask &= (df['prix'] <= prix_max).to_numpy()
+    if accords:
+        accords_mask = np.zeros(len(df), dtype=bool)
+        for accord in accords:
+            accords_mask |= df['accords'].str.contains(accord, regex=False).to_numpy()
+        mask &= accords_mask
+    return mask
+
+
+def refilter_facets(df, filters, values):
+    """Comptages par valeur de facette en refiltrant le DataFrame pour chaque option"""
+    counts = {}
+    for facet, options in values.items():
+        others = {k: v for k, v in filters.items() if k != facet}
+        counts[facet] = {}
+        for value in options:
+            option = {'bio': True} if facet == 'bio' else {facet: (value,) if facet == 'accords' else value}
+            counts[facet][value] = int(refilter(df, **others, **option).sum())
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(path, args.rows)
+        df = load_catalogue(path)
+    print(f"Catalogue : {len(df)} vins")
+
+    aggregates_s, _ = best_of(lambda: build_aggregates(df), repeat=1)
+    index_s, index = best_of(lambda: FacetIndex(df), repeat=1)
+    per_render_s, _ = best_of(lambda: (len(df['pays'].unique()), df['prix'].min(), df['prix'].max()))
+    print(f"Agrégats : {aggregates_s * 1000:.0f} ms, bitmaps : {index_s * 1000:.0f} ms "
+          f"({index.nbytes() / 2**20:.1f} Mo), une fois par version")
+    print(f"Anciennes pages : {per_render_s * 1000:.2f} ms à chaque affichage (nunique + min/max)\n")
+
+    values = {facet: list(bitmaps) for facet, bitmaps in index.bitmaps.items() if facet != 'bio'}
+    values['bio'] = ['1']
+    print(f"{'filtres':<52}{'total pandas':>14}{'total bitmaps':>15}{'facettes pandas':>17}{'facettes bitmaps':>18}")
+    for filters in FILTERS:
+        total_df_s, mask = best_of(lambda: refilter(df, **filters))
+        total_bm_s, total = best_of(lambda: popcount(index.combine(index.filter_bitmaps(**filters))))
+        assert total == int(mask.sum())
+        facets_df_s, _ = best_of(lambda: refilter_facets(df, filters, values), repeat=1)
+        facets_bm_s, _ = best_of(lambda: index.counts(index.filter_bitmaps(**filters)))
+        print(f"{str(filters):<52}{total_df_s * 1000:>12.2f}ms{total_bm_s * 1000:>13.2f}ms"
+              f"{facets_df_s * 1000:>15.1f}ms{facets_bm_s * 1000:>16.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
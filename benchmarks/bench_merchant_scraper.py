@@ -0,0 +1,199 @@
+"""Collecte multi-marchands (merchant_scraper) : débit du Fetcher partagé face à la boucle séquentielle.
+
+Deux marchands synthétiques sont servis en local, chacun sur son port (donc son hôte
+et son budget) avec une latence simulée et une part de réponses 503 :
+
+    - « vinatis » : pages de listing qui embarquent leurs produits en JSON
+      (product_elastic), comme vinatis.com ;
+    - « cave » : listings de liens et une page produit par vin, décrite en JSON-LD.
+
+Référence : une page après l'autre avec requests.get, sans session ni reprise, comme
+scrap_images_new.py (sans son time.sleep(1)). Puis merchant_scraper.scrape à plusieurs
+niveaux de concurrence (cache vide), la relecture du cache hors ligne, et le respect
+d'un budget de requêtes par minute.
+
+Usage : python benchmarks/bench_merchant_scraper.py --pages 20 --latency-ms 30 --concurrency 1 4 16
+"""
+import argparse
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import _common  # noqa: F401  (modules du projet)
+from fetcher import Fetcher, FetchCache
+from merchant_scraper import scrape
+from merchant_sources import JsonLdSource, VinatisSource
+
+PER_LISTING = {'vinatis': 48, 'cave': 24}
+
+
+def vinatis_page(page):
+    products = [{'id': page * 1000 + i, 'name': f"Château {page}-{i} 2019", 'manufacturer_name': f"Domaine {page}",
+                 'link': f"/{page * 1000 + i}-vin-{page}-{i}", 'out_of_stock': int(i % 10 == 0),
+                 'prices': {'price': f"{10 + i % 30},90"},
+                 'features': {'abv': '13,5 %', 'colour': 'Rouge', 'vintage': '2019', 'appellation': 'Bordeaux'}}
+                for i in range(PER_LISTING['vinatis'])]
+    return (f"<html><body><div>liste</div><script>var product_elastic = {json.dumps({'products': products})};"
+            f"</script></body></html>")
+
+
+def cave_listing(page):
+    links = ''.join(f'<li><a href="/produit/{page * 1000 + i}">Vin {i}</a></li>' for i in range(PER_LISTING['cave']))
+    return f'<html><body><a href="/vins?page={page + 1}">suivante</a><ul>{links}</ul></body></html>'
+
+
+def cave_product(product_id):
+    data = {'@context': 'https://schema.org', '@type': 'Product', 'sku': str(product_id),
+            'name': f"Domaine {product_id} Cuvée Prestige 2020", 'brand': {'@type': 'Brand', 'name': 'Domaine'},
+            'offers': {'@type': 'Offer', 'price': '18.50', 'priceCurrency': 'EUR',
+                       'availability': 'https://schema.org/InStock'},
+            'additionalProperty': [{'name': 'Couleur', 'value': 'Blanc'}, {'name': 'Millésime', 'value': '2020'}]}
+    return f'<html><head><script type="application/ld+json">{json.dumps(data)}</script></head><body></body></html>'
+
+
+class MerchantStub:
+    """Serveur local d'un marchand : latence simulée et une part de 503 (reprises du Fetcher)"""
+
+    def __init__(self, pages, latency_ms=30.0, error_rate=0.03, seed=0):
+        latency = latency_ms / 1000
+        rng = random.Random(seed)
+        lock = threading.Lock()
+        self.requests = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps écrits séparément : sans TCP_NODELAY, une connexion gardée ouverte
+            # attendrait l'ACK retardé du client (~40 ms) à chaque réponse
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                with lock:
+                    stub.requests += 1
+                    failed = rng.random() < error_rate
+                time.sleep(latency)
+                body, status = pages(self.path), 200
+                if failed:
+                    body, status = '', 503
+                elif body is None:
+                    body, status = 'introuvable', 404
+                data = body.encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def vinatis_pages(path):
+    match = re.fullmatch(r'/achat-vin\?page=(\d+)', path)
+    return vinatis_page(int(match.group(1))) if match else None
+
+
+def cave_pages(path):
+    listing = re.fullmatch(r'/vins\?page=(\d+)', path)
+    if listing:
+        return cave_listing(int(listing.group(1)))
+    product = re.fullmatch(r'/produit/(\d+)', path)
+    return cave_product(int(product.group(1))) if product else None
+
+
+def sequential(vinatis_url, cave_url, n_pages):
+    """Référence : une page après l'autre, sans session ni reprise (une 503 perd la page)"""
+    records = 0
+    for page in range(1, n_pages + 1):
+        text = requests.get(f"{vinatis_url}achat-vin?page={page}").text
+        match = re.search(r"var\s+product_elastic\s*=\s*({.*?});", text, re.DOTALL)
+        records += len(json.loads(match.group(1))['products']) if match else 0
+    for page in range(1, n_pages + 1):
+        for href in re.findall(r'href="(/produit/\d+)"', requests.get(f"{cave_url}vins?page={page}").text):
+            records += '"Product"' in requests.get(cave_url.rstrip('/') + href).text
+    return records
+
+
+def sources(vinatis_url, cave_url, per_minute=600_000):
+    # Budgets larges par défaut : c'est le débit du fetcher qui est mesuré
+    return [VinatisSource(vinatis_url, per_minute=per_minute, max_in_flight=64),
+            JsonLdSource('cave', cave_url, per_minute=per_minute, max_in_flight=64)]
+
+
+def report(label, seconds, stats):
+    records = sum(s['records'] for s in stats.values())
+    print(f"{label:<28}{seconds:>8.2f} s{records:>8} fiches{records / seconds:>10.0f} fiches/s")
+    for name, s in stats.items():
+        print(f"    {name:<10}{s['pages']:>6} pages {s['cache_hits']:>6} du cache {s['retries']:>4} reprises "
+              f"{s['failed']:>3} échecs {s['records']:>6} fiches {s['pages_per_s']:>8.1f} pages/s "
+              f"{s['records_per_s']:>8.1f} fiches/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=20)
+    parser.add_argument('--latency-ms', type=float, default=30.0)
+    parser.add_argument('--error-rate', type=float, default=0.03)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--rate', type=int, default=600, help="Budget (requêtes/minute) du test de rythme")
+    args = parser.parse_args()
+
+    expected = args.pages * (PER_LISTING['vinatis'] + PER_LISTING['cave'])
+    print(f"{args.pages} pages de listing par marchand, {expected} fiches attendues, "
+          f"latence {args.latency_ms:.0f} ms, {args.error_rate:.0%} de 503")
+    with MerchantStub(vinatis_pages, args.latency_ms, args.error_rate, seed=1) as vinatis, \
+            MerchantStub(cave_pages, args.latency_ms, args.error_rate, seed=2) as cave:
+        start = time.perf_counter()
+        records = sequential(vinatis.base_url, cave.base_url, args.pages)
+        seconds = time.perf_counter() - start
+        print(f"{'séquentiel (requests.get)':<28}{seconds:>8.2f} s{records:>8} fiches{records / seconds:>10.0f} fiches/s")
+
+        cache_dir = tempfile.mkdtemp(prefix='bench-scraper-')
+        try:
+            for concurrency in args.concurrency:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                fetcher = Fetcher(concurrency=concurrency, backoff_s=0.05, cache=FetchCache(cache_dir))
+                start = time.perf_counter()
+                df, stats = scrape(sources(vinatis.base_url, cave.base_url), fetcher, args.pages)
+                report(f"fetcher, concurrence {concurrency}", time.perf_counter() - start, stats)
+                fetcher.close()
+
+            fetcher = Fetcher(concurrency=4, cache=FetchCache(cache_dir), offline=True)
+            start = time.perf_counter()
+            df, stats = scrape(sources(vinatis.base_url, cave.base_url), fetcher, args.pages)
+            report("relecture du cache (hors ligne)", time.perf_counter() - start, stats)
+            fetcher.close()
+            print(f"    colonnes : {', '.join(df.columns)}")
+        finally:
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        # Budget d'un marchand : le débit plafonne à `rate` requêtes/minute, l'autre marchand n'est pas freiné
+        fetcher = Fetcher(concurrency=16, backoff_s=0.05)
+        limited = sources(vinatis.base_url, cave.base_url)
+        limited[1].per_minute = args.rate
+        start = time.perf_counter()
+        _, stats = scrape(limited, fetcher, max(1, args.pages // 4))
+        report(f"cave limitée à {args.rate}/min", time.perf_counter() - start, stats)
+        fetcher.close()
+
+
+if __name__ == "__main__":
+    main()
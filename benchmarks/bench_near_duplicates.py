@@ -0,0 +1,120 @@
+"""Quasi-doublons (near_duplicates) : débit MinHash/LSH, qualité des groupes, comparaison deux à deux.
+
+Le catalogue synthétique est réécrit pour contenir des cuvées vendues sur plusieurs
+millésimes et sous plusieurs écritures : nom du domaine en fin de nom ou non,
+accents retirés, majuscules, « Ch. » pour « Château », lettre doublée. La cuvée
+d'origine de chaque fiche sert de vérité : précision et rappel sont comptés sur les
+paires de fiches groupées. La comparaison exacte deux à deux (Jaccard des trigrammes)
+est chronométrée sur un échantillon et extrapolée à tout le catalogue.
+
+Usage : python benchmarks/bench_near_duplicates.py --rows 10000 1000000
+"""
+import argparse
+import itertools
+import time
+
+import numpy as np
+import pandas as pd
+
+import _common  # noqa: F401  (modules du projet)
+from near_duplicates import collapse, duplicate_groups, name_words, trigrams
+from synthetic_catalogue import CUVEES, make_catalogue
+
+SYLLABES = ['bel', 'vieu', 'mont', 'roc', 'la', 'fon', 'ta', 'gri', 'sol', 'ma', 'cal', 'vi', 'ran', 'dor',
+            'pe', 'lis', 'cour', 'nac', 'bru', 'ges', 'sa', 'lo', 'mer', 'tin']
+APPELLATIONS = ['Bordeaux Supérieur', 'Côtes du Rhône', 'Saint-Émilion', 'Pays d\'Oc', 'Chablis', 'Rioja',
+                'Languedoc', 'Muscadet', 'Minervois', 'Côtes de Provence']
+
+
+def variants(n_rows, seed=0):
+    """Catalogue synthétique dont les fiches sont des variantes de cuvées : (DataFrame, cuvée de chaque fiche)"""
+    rng = np.random.default_rng(seed)
+    df = make_catalogue(n_rows, seed)
+    n_cuvees = max(1, n_rows // 3)
+    n_domaines = max(1, n_cuvees // 4)
+    syllabes = np.array(SYLLABES, dtype=object)
+    domaines = pd.Series(syllabes[rng.integers(0, len(SYLLABES), n_domaines)] +
+                         syllabes[rng.integers(0, len(SYLLABES), n_domaines)] +
+                         syllabes[rng.integers(0, len(SYLLABES), n_domaines)]).str.capitalize()
+    domaines = 'Château ' + domaines + ' ' + pd.Series(np.arange(n_domaines)).map(lambda i: f"{i:x}".upper())
+    cuvee_domaine = rng.integers(0, n_domaines, n_cuvees)
+    cuvee_nom = np.array(CUVEES, dtype=object)[rng.integers(0, len(CUVEES), n_cuvees)]
+    cuvee_appellation = np.array(APPELLATIONS, dtype=object)[rng.integers(0, len(APPELLATIONS), n_domaines)]
+    cuvee = rng.integers(0, n_cuvees, n_rows)
+    # Deux cuvées du même domaine et du même nom sont la même cuvée
+    truth = pd.factorize(pd.Series(cuvee_domaine[cuvee]).astype(str) + '/' + cuvee_nom[cuvee])[0]
+    domaine = domaines.to_numpy()[cuvee_domaine[cuvee]]
+    producteur = pd.Series(domaine).str.replace('Château', 'Vignobles', regex=False)
+    nom = pd.Series(domaine + ' - ' + cuvee_nom[cuvee] + ' ' + df['millesime'].astype(str))
+    with_producer = rng.random(n_rows) < 0.5
+    nom[with_producer] = nom[with_producer] + ' - ' + producteur[with_producer]
+    for share, change in ((0.2, lambda s: s.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')),
+                          (0.1, lambda s: s.str.upper()),
+                          (0.1, lambda s: s.str.replace('Château', 'Ch.', regex=False)),
+                          (0.05, lambda s: s.str.replace(r'([aeiou])', r'\1\1', n=1, regex=True))):
+        rows = rng.random(n_rows) < share
+        nom[rows] = change(nom[rows])
+    df['nom'] = nom
+    df['producteur'] = producteur
+    df['appellation'] = cuvee_appellation[cuvee_domaine[cuvee]]
+    # Une cuvée a une couleur (le catalogue de base la tire par fiche)
+    df['couleur'] = df['couleur'].to_numpy()[rng.integers(0, n_rows, truth.max() + 1)][truth]
+    return df, truth
+
+
+def pair_scores(groups, truth):
+    """(précision, rappel) sur les paires de fiches groupées ensemble"""
+    def pairs(*labels):
+        _, counts = np.unique(np.stack(labels, axis=1), axis=0, return_counts=True)
+        return float((counts * (counts - 1) // 2).sum())
+
+    both, found, expected = pairs(groups, truth), pairs(groups), pairs(truth)
+    return both / max(found, 1), both / max(expected, 1)
+
+
+def pairwise_seconds(df, sample=1500):
+    """Comparaison exacte de toutes les paires d'un échantillon, extrapolée à tous les noms (s)"""
+    rows, codes, vocabulary = name_words(df.iloc[:sample].reset_index(drop=True))
+    word_sets = [set() for _ in vocabulary]
+    for word, code in zip(*trigrams(vocabulary)):
+        word_sets[word].add(int(code))
+    sets = [set() for _ in range(min(sample, len(df)))]
+    for row, code in zip(rows.tolist(), codes.tolist()):
+        sets[row] |= word_sets[code]
+    start = time.perf_counter()
+    for a, b in itertools.combinations(sets, 2):
+        len(a & b) / max(len(a | b), 1)
+    per_pair = (time.perf_counter() - start) / (len(sets) * (len(sets) - 1) / 2)
+    return per_pair * len(df) * (len(df) - 1) / 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df, truth = variants(n_rows)
+        timings = {}
+        start = time.perf_counter()
+        groups = duplicate_groups(df, timings=timings)
+        seconds = time.perf_counter() - start
+        precision, recall = pair_scores(groups, truth)
+        n_groups = len(np.unique(groups))
+        print(f"\n=== {n_rows} fiches, {len(np.unique(truth))} cuvées : {seconds:.2f} s "
+              f"({n_rows / seconds:,.0f} fiches/s), {timings['candidats']} paires candidates")
+        print("  " + ", ".join(f"{name} {value:.2f} s" for name, value in timings.items() if name != 'candidats'))
+        print(f"  groupes {n_groups}   précision {precision:.3f}   rappel {recall:.3f}")
+        names = df['nom']
+        print(f"  noms distincts {names.nunique()} -> entrées après regroupement "
+              f"{len(collapse(np.arange(n_rows), groups))}")
+        estimate = pairwise_seconds(df)
+        print(f"  comparaison deux à deux (Jaccard exact, extrapolée) : {estimate:,.0f} s")
+        print("  exemples :")
+        sizes = np.bincount(groups, minlength=n_rows)
+        for representative in np.flatnonzero(sizes >= 3)[:2]:
+            print("    " + " | ".join(names[groups == representative].head(4)))
+
+
+if __name__ == "__main__":
+    main()
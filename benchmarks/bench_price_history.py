@@ -0,0 +1,113 @@
+"""Historique des prix (price_history) : croissance du stockage et temps des requêtes sur 100 collectes.
+
+Chaque collecte simulée reprend les vins de la précédente avec quelques changements :
+prix modifiés (promotions puis retour au prix), ruptures de stock, vins retirés et
+nouveaux vins. Pour chaque taille de catalogue : temps d'ajout d'une collecte,
+taille de l'historique après 1, 10, 50 et 100 collectes face à la conservation d'un
+CSV complet par collecte, et temps des requêtes (ouverture à froid, historique d'un
+vin, baisses de prix depuis la collecte précédente ; la même question posée à deux
+CSV complets sert de référence).
+
+Usage : python benchmarks/bench_price_history.py --rows 10000 100000 --crawls 100
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import _common  # noqa: F401  (modules du projet)
+from price_history import PriceHistory
+
+
+def crawls(n_rows, n_crawls, seed=0, price_rate=0.03, stock_rate=0.01, churn_rate=0.003):
+    """Collectes successives simulées : DataFrames (id, prix, stock) et leur date"""
+    rng = np.random.default_rng(seed)
+    ids = np.arange(n_rows, dtype=np.int64) + 10_000
+    base = np.round(rng.lognormal(2.7, 0.6, n_rows), 2)
+    prix = base.copy()
+    stock = np.full(n_rows, 'En stock', dtype=object)
+    present = np.ones(n_rows, dtype=bool)
+    for crawl in range(n_crawls):
+        if crawl:
+            changed = rng.random(len(ids)) < price_rate
+            # Moitié de promotions, moitié de retours au prix de base
+            promo = changed & (rng.random(len(ids)) < 0.5)
+            prix[promo] = np.round(base[promo] * rng.uniform(0.7, 0.95, int(promo.sum())), 2)
+            prix[changed & ~promo] = base[changed & ~promo]
+            flips = rng.random(len(ids)) < stock_rate
+            stock[flips] = np.where(stock[flips] == 'En stock', 'Rupture de stock', 'En stock')
+            present ^= rng.random(len(ids)) < churn_rate
+            n_new = rng.binomial(n_rows, churn_rate)
+            ids = np.concatenate([ids, ids[-1] + 1 + np.arange(n_new)])
+            new_prix = np.round(rng.lognormal(2.7, 0.6, n_new), 2)
+            base, prix = np.concatenate([base, new_prix]), np.concatenate([prix, new_prix])
+            stock = np.concatenate([stock, np.full(n_new, 'En stock', dtype=object)])
+            present = np.concatenate([present, np.ones(n_new, dtype=bool)])
+        date = (pd.Timestamp('2026-01-01') + pd.Timedelta(days=7 * crawl)).strftime('%Y-%m-%dT%H:%M:%S')
+        yield date, pd.DataFrame({'id': ids[present], 'prix': prix[present], 'stock': stock[present]})
+
+
+def snapshot_drops(previous_path, current_path):
+    """Baisses de prix entre deux CSV complets (sans historique)"""
+    previous = pd.read_csv(previous_path, usecols=['id', 'prix'])
+    current = pd.read_csv(current_path, usecols=['id', 'prix'])
+    merged = current.merge(previous, on='id', suffixes=('', '_avant'))
+    return merged[merged['prix'] < merged['prix_avant']]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--crawls', type=int, default=100)
+    parser.add_argument('--queries', type=int, default=1000)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        print(f"\n=== {n_rows} vins, {args.crawls} collectes")
+        print(f"{'collectes':>10}{'lignes':>12}{'historique':>13}{'CSV complets':>15}{'ajout (ms)':>12}")
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = os.path.join(tmp, 'history')
+            history = PriceHistory(directory)
+            csv_bytes = 0
+            add_ms = []
+            paths = []
+            for crawl, (date, df) in enumerate(crawls(n_rows, args.crawls)):
+                start = time.perf_counter()
+                history.add_crawl(df, date)
+                add_ms.append((time.perf_counter() - start) * 1000)
+                # Référence : un CSV complet par collecte (seuls les deux derniers sont gardés sur disque)
+                path = os.path.join(tmp, f"crawl_{crawl % 2}.csv")
+                df.to_csv(path, index=False)
+                csv_bytes += os.path.getsize(path)
+                paths.append(path)
+                if crawl + 1 in (1, 10, 50, args.crawls):
+                    print(f"{crawl + 1:>10}{len(history):>12}{history.nbytes() / 2**20:>10.2f} Mo"
+                          f"{csv_bytes / 2**20:>12.1f} Mo{statistics.median(add_ms[-10:]):>12.1f}")
+
+            start = time.perf_counter()
+            cold = PriceHistory(directory)
+            open_ms = (time.perf_counter() - start) * 1000
+            rng = np.random.default_rng(1)
+            wine_ids = rng.choice(cold.refresh().wine_ids(), args.queries)
+            times = []
+            for wine_id in wine_ids:
+                start = time.perf_counter()
+                cold.history(int(wine_id))
+                times.append((time.perf_counter() - start) * 1000)
+            drops_ms, drops = _common.best_of(lambda: cold.price_drops())
+            all_ms, all_drops = _common.best_of(lambda: cold.price_drops(since=0))
+            csv_ms, csv_drops = _common.best_of(lambda: snapshot_drops(paths[-2], paths[-1]))
+            print(f"ouverture à froid (index trié)       {open_ms:8.1f} ms")
+            print(f"historique d'un vin        p50 {statistics.median(times):8.3f} ms   "
+                  f"p99 {statistics.quantiles(times, n=100)[98]:.3f} ms")
+            print(f"baisses depuis la collecte précédente {drops_ms * 1000:6.1f} ms   ({len(drops)} vins ; "
+                  f"deux CSV complets : {csv_ms * 1000:.0f} ms, {len(csv_drops)} vins)")
+            print(f"baisses depuis la première collecte   {all_ms * 1000:6.1f} ms   ({len(all_drops)} vins)")
+
+
+if __name__ == "__main__":
+    main()
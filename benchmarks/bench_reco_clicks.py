@@ -0,0 +1,102 @@
+"""Latence d'un clic sur « Voir les recommandations » : rerun complet ou fragment.
+
+    rerun complet  toute la page Résultats est réexécutée (barre latérale, connexion au
+                   catalogue, 20 fiches et leurs images) : le coût de chaque clic avant les
+                   fragments. Mesuré sur app.py avec streamlit.testing, qui ne rejoue que
+                   des reruns complets.
+    fragment       seul recommendation_panel est réexécuté : ids recommandés, 4 fiches et
+                   leurs images, mesurés avec les mêmes appels (LocalClient, fetch_image).
+
+Les visuels sont servis par un serveur local avec une latence simulée. En conditions
+réelles, ouvrir l'application avec ?debug=1 : chaque réexécution de fragment a sa
+ligne (scope 'fragment') dans bouteillia_metrics.jsonl.
+
+Usage : python benchmarks/bench_reco_clicks.py --rows 10000 --image-latency 30
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from array import array
+
+from _common import ROOT
+from catalogue import Catalogue
+from run_suite import ImageStub
+from synthetic_catalogue import make_catalogue
+from wine_client import LocalClient
+
+
+def median_ms(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def bench_full_rerun(workdir, result_ids, repeat):
+    """(ouverture, fermeture) du panneau du premier vin quand toute la page est réexécutée"""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError as e:
+        return None, f"streamlit absent ({e})"
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        app = AppTest.from_file(os.path.join(ROOT, 'app.py'), default_timeout=600).run()
+        app.session_state['result_ids'] = result_ids
+        app.sidebar.radio[0].set_value("📊 Résultats").run()
+        toggle_key = app.toggle[0].key
+
+        def click(value):
+            app.toggle(key=toggle_key).set_value(value).run()
+
+        opened = median_ms(lambda: click(True), 1)  # premier passage : caches des fiches
+        click(False)
+        opened, closed = [], []
+        for _ in range(repeat):
+            opened.append(median_ms(lambda: click(True), 1))
+            closed.append(median_ms(lambda: click(False), 1))
+        return (statistics.median(opened), statistics.median(closed)), None
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--image-latency', type=float, default=30.0, help="Latence simulée par image (ms)")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from wine_images import fetch_image
+
+    with ImageStub(args.image_latency) as stub, tempfile.TemporaryDirectory() as tmp:
+        df = make_catalogue(args.rows)
+        df['visuel'] = stub.base_url + df['visuel']
+        df.to_csv(os.path.join(tmp, 'base_vin_final.csv'), index=False)
+        client = LocalClient(Catalogue.from_csv(os.path.join(tmp, 'base_vin_final.csv')))
+        result_ids = array('i', client.search({'pays': 'France'}, limit=0)['ids'])
+        wine_id = result_ids[0]
+
+        def open_panel():
+            for card in client.cards(client.recommend_ids(wine_id)):
+                fetch_image(card['visuel'])
+
+        fragment_open = median_ms(open_panel, args.repeat)
+        full, skipped = bench_full_rerun(tmp, result_ids, args.repeat)
+
+    print(f"Catalogue : {args.rows} vins, images à {args.image_latency:.0f} ms, page de 20 résultats\n")
+    print(f"{'clic':<34}{'rerun complet':>15}{'fragment':>12}")
+    if full is None:
+        print(f"{'ouvrir les recommandations':<34}{'-':>15}{fragment_open:>10.0f}ms   ({skipped})")
+        return
+    print(f"{'ouvrir les recommandations':<34}{full[0]:>13.0f}ms{fragment_open:>10.0f}ms"
+          f"   x{full[0] / max(fragment_open, 1e-9):.1f}")
+    print(f"{'fermer les recommandations':<34}{full[1]:>13.0f}ms{'~0':>10}ms   (aucune image relue)")
+
+
+if __name__ == "__main__":
+    main()
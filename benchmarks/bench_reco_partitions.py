@@ -0,0 +1,123 @@
+"""Recommandations sous contraintes : index partitionné (reco_index) ou filtrage après coup.
+
+Trois façons de trouver les k vins les plus proches d'un vin qui respectent des
+contraintes (bio, même couleur, budget) :
+    - post-filtrage comme dans ML_sur_base_vin.ipynb : les n plus proches de tout le
+      catalogue (kneighbors), filtrés ensuite ; il manque des vins quand trop peu des
+      n voisins passent les contraintes ;
+    - post-filtrage exact : distances à tous les vins, masque des contraintes ;
+    - index partitionné : distances aux seules partitions concernées.
+Pour chacune : latence médiane, part des requêtes qui obtiennent k vins (ou tous les
+vins possibles) et rappel par rapport aux k plus proches exacts. Les masques des
+contraintes des deux post-filtrages sont calculés hors chronomètre.
+
+Usage : python benchmarks/bench_reco_partitions.py --rows 10000 100000 --neighbours 50
+"""
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+import _common  # noqa: F401  (modules du projet)
+from catalogue import feature_matrix, normalize_catalogue
+from facets import FacetIndex
+from reco_index import PartitionedIndex
+from synthetic_catalogue import make_catalogue
+
+SCENARIOS = {
+    'bio': lambda wine: {'bio': True},
+    'même couleur': lambda wine: {'couleur': wine['couleur']},
+    'budget <= 15 €': lambda wine: {'prix_max': 15.0},
+    'même couleur, bio, 10-20 €': lambda wine: {'couleur': wine['couleur'], 'bio': True,
+                                                'prix_min': 10.0, 'prix_max': 20.0},
+}
+
+
+def constraint_mask(df, couleur=None, bio=False, prix_min=None, prix_max=None):
+    mask = np.ones(len(df), dtype=bool)
+    if couleur:
+        mask &= (df['couleur'] == couleur).to_numpy()
+    if bio:
+        mask &= (df['bio'] == '1').to_numpy()
+    if prix_min is not None:
+        mask &= (df['prix'] >= prix_min).to_numpy()
+    if prix_max is not None:
+        mask &= (df['prix'] <= prix_max).to_numpy()
+    return mask
+
+
+def full_scan(features, norms, wine_id):
+    """Carrés des distances du vin à tous les vins (lui-même à l'infini)"""
+    query = features[wine_id]
+    distances = norms - 2 * (features @ query) + query @ query
+    distances[wine_id] = np.inf
+    return distances
+
+
+def post_filter(features, norms, wine_id, mask, k, neighbours):
+    """kneighbors(n_neighbors=neighbours) sur tout le catalogue puis filtre des contraintes"""
+    distances = full_scan(features, norms, wine_id)
+    top = np.argpartition(distances, neighbours)[:neighbours]
+    top = top[np.argsort(distances[top], kind='stable')]
+    return top[mask[top]][:k]
+
+
+def exact_filter(features, norms, wine_id, mask, k):
+    distances = full_scan(features, norms, wine_id)
+    distances[~mask] = np.inf
+    top = np.argpartition(distances, k)[:k]
+    top = top[np.argsort(distances[top], kind='stable')]
+    return top[np.isfinite(distances[top])]
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=4)
+    parser.add_argument('--neighbours', type=int, default=50, help="n_neighbors du post-filtrage du notebook")
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = normalize_catalogue(make_catalogue(n_rows))
+        features = feature_matrix(df)[1]
+        norms = np.einsum('ij,ij->i', features, features)
+        facets = FacetIndex(df)
+        start = time.perf_counter()
+        index = PartitionedIndex.from_facets(facets, features)
+        print(f"\n=== {n_rows} vins, {features.shape[1]} variables : index construit en "
+              f"{time.perf_counter() - start:.2f} s ({index.nbytes() / 2**20:.1f} Mo, "
+              f"{int((index.partition_sizes() > 0).sum())} partitions non vides)")
+        print(f"{'contraintes':<28}{'méthode':<22}{'p50 (ms)':>10}{'complètes':>11}{'rappel':>9}")
+
+        rng = np.random.default_rng(0)
+        wine_ids = rng.integers(0, n_rows, args.queries)
+        for scenario, make_constraints in SCENARIOS.items():
+            results = {f"post-filtrage (n={args.neighbours})": [], 'post-filtrage exact': [], 'partitionné': []}
+            for wine_id in wine_ids:
+                wine_id = int(wine_id)
+                constraints = make_constraints(df.iloc[wine_id])
+                mask = constraint_mask(df, **constraints)
+                mask[wine_id] = False
+                expected, exact_ms = timed(lambda: exact_filter(features, norms, wine_id, mask, args.k))
+                approx, approx_ms = timed(lambda: post_filter(features, norms, wine_id, mask, args.k,
+                                                              args.neighbours))
+                (found, _), index_ms = timed(lambda: index.nearest(wine_id, args.k, **constraints))
+                for (name, runs), ids, ms in zip(results.items(), (approx, expected, found),
+                                                 (approx_ms, exact_ms, index_ms)):
+                    recall = len(set(ids.tolist()) & set(expected.tolist())) / max(len(expected), 1)
+                    runs.append((ms, len(ids) >= min(args.k, len(expected)), recall))
+            for name, runs in results.items():
+                print(f"{scenario:<28}{name:<22}{statistics.median(r[0] for r in runs):>10.2f}"
+                      f"{sum(r[1] for r in runs) / len(runs):>11.0%}{statistics.mean(r[2] for r in runs):>9.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Rejeu d'un journal de recherches : sans cache ou avec le cache partagé de search_cache.
+
+Le journal synthétique imite l'usage de la page Recherche : la plupart des recherches
+viennent d'un petit nombre de combinaisons populaires (loi de Zipf), saisies de façons
+différentes (slider laissé sur toute la plage ou non, accords cochés dans un autre
+ordre, « Tous »), et une longue traîne de recherches uniques (bornes de prix au hasard,
+texte libre). Un journal réel peut être rejoué avec --log (un dict de filtres JSON par ligne).
+
+Usage : python benchmarks/bench_search_cache.py --rows 100000 --queries 20000 --sizes 64 256 1024
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+import _common  # noqa: F401  (modules du projet)
+from catalogue import Catalogue
+from search_cache import SearchCache
+from synthetic_catalogue import write_catalogue
+
+TEXTS = ['chateau', 'domaine reserve', 'grand cru', 'bordeaux', 'pinot', 'champagne brut', 'vieilles vignes']
+
+
+def synthetic_log(catalogue, n_queries, n_popular=300, tail=0.2, seed=0):
+    """Liste de dicts de filtres tels que la page Recherche les envoie"""
+    rng = random.Random(seed)
+    options = catalogue.filters()
+    lo, hi = options['prix_min'], options['prix_max']
+    bands = [(None, None), (None, 10.0), (10.0, 20.0), (20.0, 50.0), (50.0, None)]
+
+    def draw():
+        band = rng.choice(bands)
+        return {
+            'pays': rng.choice(["Tous"] * 3 + options['pays'][:8]),
+            'couleur': rng.choice(["Tous"] + options['couleur']),
+            'bio': rng.random() < 0.25,
+            'prix': band,
+            'accords': rng.sample(options['accords'], rng.choice([0, 0, 1, 2])),
+            'texte': rng.choice([None] * 6 + TEXTS),
+        }
+
+    def present(query):
+        """Une saisie de la requête : bornes absentes = slider sur toute la plage, accords dans le désordre"""
+        prix_min, prix_max = query['prix']
+        accords = list(query['accords'])
+        rng.shuffle(accords)
+        texte = query['texte']
+        if texte and rng.random() < 0.3:
+            texte = texte.title() + ' '
+        return {'pays': query['pays'], 'couleur': query['couleur'], 'bio': query['bio'],
+                'prix_min': lo if prix_min is None else prix_min, 'prix_max': hi if prix_max is None else prix_max,
+                'accords': accords, 'texte': texte}
+
+    popular = [draw() for _ in range(n_popular)]
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(n_popular)]
+    log = []
+    for _ in range(n_queries):
+        if rng.random() < tail:
+            query = draw()
+            a, b = sorted(rng.uniform(lo, hi) for _ in range(2))
+            query['prix'] = (float(round(a)), float(round(b)))
+        else:
+            query = rng.choices(popular, weights)[0]
+        log.append(present(query))
+    return log
+
+
+def replay(catalogue, log):
+    """Latences (ms) de chaque recherche du journal"""
+    times = []
+    for filters in log:
+        start = time.perf_counter()
+        catalogue.search(**filters)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=20_000)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 1024], help="Tailles de cache (entrées)")
+    parser.add_argument('--log', help="Journal réel à rejouer (JSONL de filtres)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(path, args.rows)
+        loaded = Catalogue.from_csv(path)
+    if args.log:
+        with open(args.log, encoding='utf-8') as f:
+            log = [json.loads(line) for line in f if line.strip()]
+    else:
+        log = synthetic_log(loaded, args.queries)
+    distinct = len({json.dumps(q, sort_keys=True) for q in log})
+    print(f"Catalogue : {args.rows} vins ; journal : {len(log)} recherches, {distinct} saisies distinctes\n")
+
+    print(f"{'cache':<14}{'total':>9}{'p50':>9}{'p99':>9}{'succès':>9}{'évictions':>11}{'mémoire':>10}")
+    runs = [('sans cache', None)] + [(f"{size} entrées", SearchCache(size)) for size in args.sizes]
+    for label, cache in runs:
+        loaded.search_cache = cache
+        times = replay(loaded, log)
+        p99 = statistics.quantiles(times, n=100)[98]
+        if cache is None:
+            print(f"{label:<14}{sum(times) / 1000:>8.2f}s{statistics.median(times):>7.2f}ms{p99:>7.2f}ms"
+                  f"{'-':>9}{'-':>11}{'-':>10}")
+            continue
+        stats = cache.stats()
+        print(f"{label:<14}{sum(times) / 1000:>8.2f}s{statistics.median(times):>7.2f}ms{p99:>7.2f}ms"
+              f"{stats['hit_rate']:>9.1%}{stats['evictions']:>11}{stats['bytes'] / 2**20:>7.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Mémoire gardée par session Streamlit pour une recherche : copie de DataFrame, fiches, ou ids.
+
+Compare, pour quelques recherches typiques sur un catalogue synthétique :
+- l'ancienne page (df filtré copié dans st.session_state.resultats + ligne du vin sélectionné) ;
+- la liste complète de fiches (dicts) renvoyée par /search ;
+- le tableau d'ids int32 gardé désormais en session (+ id du vin sélectionné).
+
+Usage : python benchmarks/bench_session_state.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+from _common import best_of
+from catalogue import Catalogue
+from synthetic_catalogue import write_catalogue
+
+SEARCHES = {
+    'tous les vins': {},
+    'France rouge': {'pays': 'France', 'couleur': 'Rouge'},
+    'bio < 20 €': {'bio': True, 'prix_max': 20.0},
+    'accords fromage/gibier': {'accords': ('Fromage', 'Gibier')},
+    'Italie blanc 10-30 €': {'pays': 'Italie', 'couleur': 'Blanc', 'prix_min': 10.0, 'prix_max': 30.0},
+}
+
+
+def deep_sizeof(obj, seen=None):
+    """Taille mémoire récursive d'objets Python (dicts, listes, chaînes)"""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_sizeof(v, seen) for v in obj)
+    return size
+
+
+def session_sizes(catalogue, ids):
+    """Octets gardés en session par chacune des trois approches pour un résultat"""
+    df = catalogue.df
+    # Ancienne page : df.copy() filtré (toutes les colonnes) + Series du vin sélectionné
+    old = df.iloc[ids].copy()
+    old_bytes = int(old.memory_usage(deep=True).sum())
+    if len(ids):
+        old_bytes += int(df.iloc[ids[0]].memory_usage(deep=True))
+    dicts_bytes = deep_sizeof(catalogue.rows(ids))
+    ids_bytes = np.asarray(ids, dtype=np.int32).nbytes + sys.getsizeof(0)
+    return old_bytes, dicts_bytes, ids_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(path, args.rows)
+        catalogue = Catalogue.from_csv(path)
+    print(f"Catalogue synthétique : {len(catalogue)} vins, {len(catalogue.df.columns)} colonnes\n")
+
+    print(f"{'recherche':<26}{'résultats':>10}{'df.copy()':>12}{'fiches':>12}{'ids':>10}{'page (ms)':>11}")
+    totals = np.zeros(3)
+    for label, filters in SEARCHES.items():
+        ids = catalogue.search(**filters)
+        sizes = session_sizes(catalogue, ids)
+        totals += sizes
+        # Coût à chaque rerun : relire les fiches de la page visible
+        page_s, _ = best_of(lambda: catalogue.rows(ids[:args.page_size]), repeat=5)
+        print(f"{label:<26}{len(ids):>10}" + ''.join(f"{s / 2**20:>10.2f}Mo" for s in sizes[:2])
+              + f"{sizes[2] / 2**10:>8.1f}Ko{page_s * 1000:>11.2f}")
+    print(f"\nTotal par session : df.copy() {totals[0] / 2**20:.1f} Mo, fiches {totals[1] / 2**20:.1f} Mo, "
+          f"ids {totals[2] / 2**10:.1f} Ko (÷{totals[0] / totals[2]:.0f} par rapport à df.copy())")
+
+
+if __name__ == "__main__":
+    main()
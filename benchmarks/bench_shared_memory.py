@@ -0,0 +1,117 @@
+"""Mémoire totale de N workers : une copie du catalogue par processus ou catalogue partagé.
+
+    copie     chaque worker lit le CSV et construit son Catalogue (une réplique de app.py aujourd'hui)
+    partage   un chargeur publie l'instantané (shared_catalogue.publish), chaque worker s'y rattache
+
+Chaque worker exécute ensuite le même mélange de requêtes (recherches, facettes, texte,
+fiches, recommandations), puis la mémoire est relevée dans /proc/<pid>/smaps_rollup :
+la RSS compte les pages partagées dans chaque processus, la PSS les répartit entre eux
+(la somme des PSS est la mémoire réellement occupée). Linux uniquement.
+
+Usage : python benchmarks/bench_shared_memory.py --rows 100000 --workers 1 4 8
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT
+from catalogue import Catalogue
+from shared_catalogue import publish, snapshot_bytes
+from synthetic_catalogue import write_catalogue
+
+WORKER = """
+import sys
+import numpy as np
+mode, target = sys.argv[1], sys.argv[2]
+if mode == 'copie':
+    from catalogue import Catalogue
+    catalogue = Catalogue.from_csv(target)
+elif mode == 'partage':
+    from shared_catalogue import SharedCatalogue
+    catalogue = SharedCatalogue.attach(target)
+else:
+    import catalogue
+    catalogue = None
+if catalogue is not None:
+    rng = np.random.default_rng(0)
+    for filters in ({}, {'pays': 'France', 'couleur': 'Rouge'}, {'bio': True, 'prix_max': 25.0},
+                    {'accords': ('Fromage', 'Gibier')}, {'texte': 'chateau reserve'}):
+        catalogue.search_payload(filters, 0, 20)
+        catalogue.facet_counts(**filters)
+    for i in rng.integers(0, len(catalogue), 200).tolist():
+        catalogue.cards([i] + catalogue.recommend(i))
+        catalogue.wine(i)
+print('pret', flush=True)
+sys.stdin.readline()
+"""
+
+
+def memory_kb(pid):
+    """Rss, Pss et pages privées (ko) d'un processus"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup", encoding='ascii') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if rest.strip().endswith('kB'):
+                values[name] = int(rest.split()[0])
+    return {'rss': values['Rss'], 'pss': values['Pss'],
+            'private': values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)}
+
+
+def run_workers(mode, target, n_workers):
+    """Lance `n_workers` workers, attend qu'ils aient servi leurs requêtes ; retourne (mémoires, secondes)"""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    workers = [subprocess.Popen([sys.executable, '-c', WORKER, mode, target], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, env=env, text=True) for _ in range(n_workers)]
+    try:
+        for worker in workers:
+            if worker.stdout.readline().strip() != 'pret':
+                # Typiquement tué faute de mémoire quand chaque worker a sa copie
+                return None, time.perf_counter() - start
+        ready_s = time.perf_counter() - start
+        memories = [memory_kb(worker.pid) for worker in workers]
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+    return memories, ready_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        sys.exit("/proc/<pid>/smaps_rollup introuvable : benchmark réservé à Linux")
+
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else None
+    with tempfile.TemporaryDirectory() as tmp, tempfile.TemporaryDirectory(dir=base) as shared_dir:
+        path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(path, args.rows)
+        start = time.perf_counter()
+        publish(Catalogue.from_csv(path), shared_dir)
+        print(f"Catalogue : {args.rows} vins ; instantané publié en {time.perf_counter() - start:.1f} s, "
+              f"{snapshot_bytes(shared_dir) / 2**20:.1f} Mo dans {shared_dir}")
+        (baseline,), _ = run_workers('imports', path, 1)
+        print(f"Interpréteur + numpy/pandas seuls : RSS {baseline['rss'] / 1024:.0f} Mo\n")
+
+        print(f"{'mode':<9}{'workers':>8}{'prêts en':>10}{'RSS totale':>13}{'PSS totale':>13}{'privé/worker':>14}")
+        for n_workers in args.workers:
+            for mode, target in (('copie', path), ('partage', shared_dir)):
+                memories, ready_s = run_workers(mode, target, n_workers)
+                if memories is None:
+                    print(f"{mode:<9}{n_workers:>8}  workers en échec après {ready_s:.0f} s (mémoire insuffisante ?)")
+                    continue
+                rss = sum(m['rss'] for m in memories) / 1024
+                pss = sum(m['pss'] for m in memories) / 1024
+                private = sum(m['private'] for m in memories) / 1024 / n_workers
+                print(f"{mode:<9}{n_workers:>8}{ready_s:>9.1f}s{rss:>10.0f} Mo{pss:>10.0f} Mo{private:>11.0f} Mo")
+
+
+if __name__ == "__main__":
+    main()
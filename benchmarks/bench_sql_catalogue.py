@@ -0,0 +1,113 @@
+"""Catalogue en mémoire (DataFrame + index numpy) ou base SQLite (sql_catalogue) : chargement, mémoire, requêtes.
+
+Pour chaque taille, la base SQLite est construite depuis le CSV, puis chaque backend
+est chargé dans un processus neuf qui mesure son temps d'ouverture, sa mémoire
+(RSS après chargement et pic) et la latence médiane des requêtes de l'application :
+recherches, comptages des facettes, page de fiches, recommandations. Le cache de
+recherche (search_cache) est désactivé pour comparer les requêtes elles-mêmes.
+
+Usage : python benchmarks/bench_sql_catalogue.py --rows 10000 1000000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT
+from sql_catalogue import build_database
+from synthetic_catalogue import write_catalogue
+
+WORKER = """
+import json, statistics, sys, time
+import numpy as np
+mode, path, repeat = sys.argv[1], sys.argv[2], int(sys.argv[3])
+start = time.perf_counter()
+if mode == 'memoire':
+    from catalogue import Catalogue
+    catalogue = Catalogue.from_csv(path)
+else:
+    from sql_catalogue import SqlCatalogue
+    catalogue = SqlCatalogue(path)
+catalogue.search_cache = None
+load_s = time.perf_counter() - start
+def status_kb(field):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field))
+rss = status_kb('VmRSS')
+rng = np.random.default_rng(0)
+page = rng.integers(0, len(catalogue), 20).tolist()
+wine_ids = rng.integers(0, len(catalogue), repeat).tolist()
+queries = {
+    'recherche France + Rouge': lambda: catalogue.search(pays='France', couleur='Rouge'),
+    'recherche bio 10-25 €': lambda: catalogue.search(bio=True, prix_min=10.0, prix_max=25.0),
+    'recherche accords': lambda: catalogue.search(accords=('Fromage', 'Gibier'), prix_max=20.0),
+    'recherche texte': lambda: catalogue.search(texte='chateau reserve', couleur='Rouge'),
+    'facettes (aucun filtre)': lambda: catalogue.facet_counts(),
+    'facettes France + Rouge': lambda: catalogue.facet_counts(pays='France', couleur='Rouge'),
+    'page de 20 fiches': lambda: catalogue.cards(page),
+}
+latencies = {}
+for name, query in queries.items():
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        query()
+        times.append((time.perf_counter() - t) * 1000)
+    latencies[name] = statistics.median(times)
+times = []
+for wine_id in wine_ids:
+    t = time.perf_counter()
+    catalogue.cards(catalogue.recommend(wine_id))
+    times.append((time.perf_counter() - t) * 1000)
+latencies['recommandations + fiches'] = statistics.median(times)
+# VmHWM et non ru_maxrss, qui garde le pic du processus parent à travers fork/exec
+peak = status_kb('VmHWM')
+print(json.dumps({'load_s': load_s, 'rss_mb': rss / 1024, 'peak_mb': peak / 1024, 'latencies': latencies}))
+"""
+
+
+def run_worker(mode, path, repeat):
+    run = subprocess.run([sys.executable, '-c', WORKER, mode, path, str(repeat)], capture_output=True, text=True,
+                         env=dict(os.environ, PYTHONPATH=ROOT))
+    if run.returncode != 0:
+        lines = run.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else f"code {run.returncode} (mémoire insuffisante ?)"}
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'base_vin.csv')
+            db_path = os.path.join(tmp, 'base_vin.sqlite')
+            write_catalogue(csv_path, n_rows)
+            start = time.perf_counter()
+            build_database(csv_path, db_path)
+            build_s = time.perf_counter() - start
+            print(f"\n=== {n_rows} vins : CSV {os.path.getsize(csv_path) / 2**20:.0f} Mo, base SQLite construite "
+                  f"en {build_s:.1f} s ({os.path.getsize(db_path) / 2**20:.0f} Mo)")
+            results = {'memoire': run_worker('memoire', csv_path, args.repeat),
+                       'sqlite': run_worker('sqlite', db_path, args.repeat)}
+
+        for mode, result in results.items():
+            if 'error' in result:
+                print(f"{mode:<9} échec : {result['error']}")
+            else:
+                print(f"{mode:<9} ouverture {result['load_s']:.2f} s, RSS {result['rss_mb']:.0f} Mo "
+                      f"(pic {result['peak_mb']:.0f} Mo)")
+        ok = {mode: r['latencies'] for mode, r in results.items() if 'error' not in r}
+        print(f"{'requête (médiane, ms)':<28}" + ''.join(f"{mode:>10}" for mode in ok))
+        for name in next(iter(ok.values()), {}):
+            print(f"{name:<28}" + ''.join(f"{latencies[name]:>10.2f}" for latencies in ok.values()))
+
+
+if __name__ == "__main__":
+    main()
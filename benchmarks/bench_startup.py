@@ -0,0 +1,154 @@
+"""Démarrage à froid : coût d'import des modules, disponibilité du service et premier rendu des pages.
+
+    imports       python -X importtime dans un processus neuf pour chaque module
+                  (cumul en ms, paquets lourds effectivement chargés)
+    service       lancement de wine_service.py : délai jusqu'à /health (port ouvert)
+                  puis jusqu'à /ready (catalogue chargé)
+    premier rendu exécution complète de app.py (page d'accueil) par streamlit.testing,
+                  à froid puis à chaud, avec le détail par étape de app_profiling
+
+Usage : python benchmarks/bench_startup.py --rows 100000
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from _common import ROOT
+from healthcheck import wait_ready
+from synthetic_catalogue import write_catalogue
+
+MODULES = ['app_profiling', 'wine_client', 'wine_images', 'catalogue', 'wine_service', 'streamlit']
+HEAVY = ('pandas', 'numpy', 'requests', 'PIL', 'pyarrow', 'streamlit')
+
+FIRST_RENDER = """
+import json, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+app = AppTest.from_file({app!r}, default_timeout=600)
+app.run()
+first = time.perf_counter()
+app.run()
+second = time.perf_counter()
+print(json.dumps({{'import_streamlit_ms': (imported - start) * 1000, 'first_run_ms': (first - imported) * 1000,
+                  'second_run_ms': (second - first) * 1000, 'errors': [str(e.value) for e in app.exception]}}))
+"""
+
+
+def child_env(**extra):
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get('PYTHONPATH', ''), **extra)
+    env.pop('BOUTEILLIA_API_URL', None)
+    return env
+
+
+def import_cost(module, repeat=3):
+    """(cumul d'import en ms, paquets lourds chargés) de `module` dans un interpréteur neuf, meilleur de `repeat`"""
+    best, heavy = None, []
+    for _ in range(repeat):
+        run = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                             env=child_env(), capture_output=True, text=True)
+        if run.returncode != 0:
+            return None, run.stderr.strip().splitlines()[-1]
+        cumulative, loaded = None, []
+        for line in run.stderr.splitlines():
+            if not line.startswith('import time:') or '|' not in line or 'self [us]' in line:
+                continue
+            _, cumul_us, name = line.split('|')
+            package = name.strip()
+            if package == module:
+                cumulative = int(cumul_us) / 1000
+            if package in HEAVY and package != module:
+                loaded.append(package)
+        if cumulative is not None and (best is None or cumulative < best):
+            best, heavy = cumulative, sorted(set(loaded))
+    return best, heavy
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bench_service(data_path):
+    """Délais (s) du lancement de wine_service.py jusqu'à /health puis jusqu'à /ready"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'wine_service.py'), '--port', str(port),
+                                '--data', data_path, '--reload-s', '0'], env=child_env(),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        health = wait_ready(f"http://127.0.0.1:{port}/health", timeout=120)
+        health = None if health is None else time.perf_counter() - start
+        ready = wait_ready(f"http://127.0.0.1:{port}/ready", timeout=600)
+        ready = None if ready is None else time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait()
+    return health, ready
+
+
+def bench_first_render(app_path, data_path, workdir):
+    """Premier et second rendu de la page d'accueil de `app_path`, catalogue embarqué"""
+    os.makedirs(workdir, exist_ok=True)
+    link = os.path.join(workdir, 'base_vin_final.csv')
+    if not os.path.exists(link):
+        os.symlink(data_path, link)
+    metrics = os.path.join(workdir, 'metrics.jsonl')
+    if os.path.exists(metrics):
+        os.remove(metrics)
+    start = time.perf_counter()
+    run = subprocess.run([sys.executable, '-c', FIRST_RENDER.format(app=app_path)], cwd=workdir,
+                         env=child_env(BOUTEILLIA_PROFILE='1', BOUTEILLIA_METRICS_FILE=metrics),
+                         capture_output=True, text=True)
+    wall = time.perf_counter() - start
+    if run.returncode != 0:
+        return {'skipped': run.stderr.strip().splitlines()[-1]}
+    result = json.loads(run.stdout.strip().splitlines()[-1])
+    result['process_to_first_render_s'] = round(wall - result['second_run_ms'] / 1000, 2)
+    if os.path.exists(metrics):
+        with open(metrics, encoding='utf-8') as f:
+            result['first_run_stages_ms'] = json.loads(f.readline())['stages_ms']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'module':<16}{'import (ms)':>12}  paquets lourds chargés")
+    for module in MODULES:
+        cumulative, heavy = import_cost(module, args.repeat)
+        if cumulative is None:
+            print(f"{module:<16}{'-':>12}  ({heavy})")
+        else:
+            print(f"{module:<16}{cumulative:>12.1f}  {', '.join(heavy) or '-'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = os.path.join(tmp, 'base_vin.csv')
+        write_catalogue(data_path, args.rows)
+        print(f"\nCatalogue : {args.rows} vins")
+        health, ready = bench_service(data_path)
+        print(f"Service : port ouvert (/health) en {health:.2f} s, catalogue prêt (/ready) en {ready:.2f} s")
+
+        for app in ('app.py', os.path.join('SITEVINS', 'app.py')):
+            result = bench_first_render(os.path.join(ROOT, app), data_path, os.path.join(tmp, 'rendu'))
+            if 'skipped' in result:
+                print(f"{app} : ignoré ({result['skipped']})")
+                continue
+            print(f"{app} : premier rendu {result['process_to_first_render_s']:.2f} s après le lancement "
+                  f"(import streamlit {result['import_streamlit_ms']:.0f} ms, script {result['first_run_ms']:.0f} ms), "
+                  f"rerun à chaud {result['second_run_ms']:.0f} ms")
+            if result.get('first_run_stages_ms'):
+                print(f"  étapes du premier rendu : {result['first_run_stages_ms']}")
+
+
+if __name__ == "__main__":
+    main()
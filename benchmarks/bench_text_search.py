@@ -0,0 +1,82 @@
+"""Construction et latence de l'index plein texte (text_search.TextIndex).
+
+Compare aussi l'ancienne recherche (égalité exacte sur `nom`) et un `str.contains`
+sur les mêmes colonnes, qui est ce qu'on écrirait sans index.
+
+Usage : python benchmarks/bench_text_search.py --data base_vin_final.csv
+        python benchmarks/bench_text_search.py --rows 100000   (catalogue synthétique)
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from _common import best_of
+from catalogue import load_catalogue
+from synthetic_catalogue import write_catalogue
+from text_search import FIELD_WEIGHTS, TextIndex, tokenize
+
+
+def sample_queries(df, n, seed=0):
+    """Requêtes réalistes : mots de noms existants, tronqués ou avec une faute de frappe"""
+    rng = np.random.default_rng(seed)
+    queries = []
+    for nom in df['nom'].iloc[rng.integers(0, len(df), n)]:
+        words = tokenize(nom)[:3]
+        kind = rng.integers(0, 3)
+        if kind == 1 and len(words[-1]) > 4:
+            words[-1] = words[-1][:-2]  # mot en cours de frappe
+        elif kind == 2 and len(words[0]) > 4:
+            i = int(rng.integers(1, len(words[0]) - 1))
+            words[0] = words[0][:i] + words[0][i + 1:]  # lettre oubliée
+        queries.append(' '.join(words))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--data', default=None, help="Base à indexer (sinon catalogue synthétique)")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--k', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.data and os.path.exists(args.data):
+        df = load_catalogue(args.data)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'base_vin.csv')
+            write_catalogue(path, args.rows)
+            df = load_catalogue(path)
+    print(f"Catalogue : {len(df)} vins")
+
+    build_s, index = best_of(lambda: TextIndex(df), repeat=1)
+    stats = index.stats()
+    print(f"Construction : {build_s:.2f} s, {stats['terms']} mots, {stats['postings']} entrées, "
+          f"{stats['bytes'] / 2**20:.1f} Mo")
+
+    queries = sample_queries(df, args.queries)
+    latencies = []
+    for q in queries:
+        start = time.perf_counter()
+        index.top_k(q, args.k)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    print(f"top_k({args.k}) sur {len(queries)} requêtes : p50 {np.percentile(latencies, 50):.2f} ms, "
+          f"p95 {np.percentile(latencies, 95):.2f} ms, max {latencies.max():.2f} ms")
+
+    # Référence sans index : égalité exacte (ancienne page) et str.contains sur chaque champ
+    fields = [f for f in FIELD_WEIGHTS if f in df.columns]
+    q = queries[0]
+    exact_s, _ = best_of(lambda: np.flatnonzero((df['nom'] == q).to_numpy()))
+    contains_s, _ = best_of(lambda: np.logical_or.reduce(
+        [df[f].str.contains(q, case=False, regex=False).to_numpy() for f in fields]))
+    print(f"Sans index : égalité sur nom {exact_s * 1000:.2f} ms, str.contains sur {len(fields)} champs "
+          f"{contains_s * 1000:.2f} ms (sans fautes ni classement)")
+    print(f"Exemple « {q} » : {list(df['nom'].iloc[index.top_k(q, 3)[0]])}")
+
+
+if __name__ == "__main__":
+    main()
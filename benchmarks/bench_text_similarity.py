@@ -0,0 +1,80 @@
+"""Similarité des textes (text_similarity) : construction, relecture mappée, latence des requêtes.
+
+Pour chaque taille de catalogue synthétique : temps de calcul des vecteurs TF-IDF et
+taille des tableaux, écriture puis relecture par np.load(mmap_mode='r'), latence d'une
+requête (k voisins d'un vin) seule puis mêlée à la distance des variables du modèle
+(Catalogue.similar), et débit des requêtes par blocs, extrapolé à tous les vins.
+
+Usage : python benchmarks/bench_text_similarity.py --rows 10000 100000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import numpy as np
+
+import _common  # noqa: F401  (modules du projet)
+from catalogue import Catalogue, normalize_catalogue
+from synthetic_catalogue import make_catalogue
+from text_similarity import TextVectors
+
+
+def latencies(func, ids):
+    """Médiane et 99e centile (ms) de func(i) sur les ids"""
+    times = []
+    for wine_id in ids:
+        start = time.perf_counter()
+        func(int(wine_id))
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times), statistics.quantiles(times, n=100)[98]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--batch', type=int, default=5000, help="Vins du lot traité par blocs")
+    parser.add_argument('--k', type=int, default=10)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = normalize_catalogue(make_catalogue(n_rows))
+        start = time.perf_counter()
+        vectors = TextVectors.build(df)
+        build_s = time.perf_counter() - start
+        print(f"\n=== {n_rows} vins : vecteurs calculés en {build_s:.2f} s, {len(vectors.data) / n_rows:.1f} termes "
+              f"non nuls par vin, {vectors.nbytes() / 2**20:.1f} Mo")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            target = os.path.join(tmp, 'version')
+            start = time.perf_counter()
+            vectors.save(target)
+            save_s = time.perf_counter() - start
+            start = time.perf_counter()
+            mapped = TextVectors.load(target)
+            load_s = time.perf_counter() - start
+            print(f"écriture {save_s * 1000:.0f} ms, relecture mappée {load_s * 1000:.1f} ms")
+
+            rng = np.random.default_rng(0)
+            ids = rng.integers(0, n_rows, args.queries)
+            p50, p99 = latencies(lambda i: mapped.top_k([i], args.k), ids)
+            print(f"{'requête texte seule':<36} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+            catalogue = Catalogue(df)
+            catalogue._text_vectors = mapped
+            catalogue.feature_vectors()
+            p50, p99 = latencies(lambda i: catalogue.similar(i, args.k), ids)
+            print(f"{'requête mêlée (Catalogue.similar)':<36} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms")
+
+            batch = rng.choice(n_rows, min(args.batch, n_rows), replace=False)
+            start = time.perf_counter()
+            mapped.top_k(batch, args.k)
+            batch_s = time.perf_counter() - start
+            rate = len(batch) / batch_s
+            print(f"{'par blocs':<36} {rate:7.0f} vins/s   tous les vins : {n_rows / rate:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
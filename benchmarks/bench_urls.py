@@ -0,0 +1,69 @@
+"""Compare la construction d'URLs vinatis par `apply` ligne à ligne et par vinatis_urls.
+
+build_image_urls est vectorisé (slugs `.str` sur les noms distincts). canonicalize_urls
+est une boucle Python sur canonicalize_url : on n'en attend pas de gain sur des chemins
+relatifs (même travail par URL que l'apply), seulement sur des URLs déjà absolues,
+rendues telles quelles. La base réelle compte environ 10 000 vins
+(vinatis_images_accessibles.csv), dont les visuels sont des URLs déjà absolues : c'est la
+taille et le cas qui comptent pour canonicalize_urls ; 1M lignes mesure le passage à l'échelle.
+
+Usage : python benchmarks/bench_urls.py --rows 10000 1000000
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from _common import best_of
+from vinatis_urls import build_image_urls, canonicalize_urls
+
+NOMS = ['Sunrose - Île de Beauté 2024', 'Château Margaux 2015', 'Cœur de Rosé', 'Villa des Anges - Réserve 2021']
+
+
+def make_frame(n_rows):
+    """Génère un DataFrame id/name/visuel proche de la sortie du scraper"""
+    rng = np.random.default_rng(0)
+    # Quelques milliers de noms distincts (cuvées x millésimes), comme dans la base réelle
+    cuvees = np.array([f"{nom} {annee}" for nom in NOMS for annee in range(1990, 2025)] +
+                      [f"{nom} - Cuvée {i}" for nom in NOMS for i in range(2000)], dtype=object)
+    names = cuvees[rng.integers(0, len(cuvees), n_rows)]
+    ids = rng.integers(1, 100_000, n_rows)
+    visuel = pd.Series(ids).astype(str) + '-thickbox_default/vin.jpg'
+    visuel[rng.random(n_rows) < 0.05] = np.nan
+    return pd.DataFrame({'id': ids, 'name': names, 'visuel': visuel})
+
+
+def apply_image_urls(df):
+    """Ancienne version de scrap_images_new.py"""
+    return df.apply(lambda row: f"https://www.vinatis.com/{row['id']}-detail_default/{row['name'].lower().replace(' ', '-')}.png", axis=1)
+
+
+def apply_prefix(df):
+    """Ancienne version de load_data dans app.py"""
+    return df['visuel'].apply(lambda x: f"https://www.vinatis.com/{x}" if pd.notna(x) and not str(x).startswith('http') else x)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        absolute = df.assign(visuel='https://www.vinatis.com/' + df['visuel'])
+        cases = [
+            ("URLs d'images", lambda: apply_image_urls(df), lambda: build_image_urls(df['id'], df['name'])),
+            ('Visuels relatifs', lambda: apply_prefix(df), lambda: canonicalize_urls(df['visuel'])),
+            ('Visuels absolus', lambda: apply_prefix(absolute), lambda: canonicalize_urls(absolute['visuel'])),
+        ]
+        print(f"{n_rows} lignes")
+        for label, old, new in cases:
+            t_old, _ = best_of(old, args.repeat)
+            t_new, _ = best_of(new, args.repeat)
+            print(f"  {label:<17} apply : {t_old * 1000:8.1f} ms | vinatis_urls : {t_new * 1000:8.1f} ms "
+                  f"| gain x{t_old / t_new:.1f}")
+
+
+if __name__ == "__main__":
+    main()
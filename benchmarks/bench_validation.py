@@ -0,0 +1,130 @@
+"""Validation des vins scrapés (validation.py) : débit vectorisé par blocs, face au nettoyage cellule par cellule.
+
+Le fichier aplati synthétique reprend les formats rencontrés dans les notebooks
+(« 12,90 € », « 13,5 % », « 75 cl », « non millésimé », listes "['A', 'B']" ou
+"A, B", descriptions HTML) et environ 1 % de lignes fautives (prix illisible, degré
+manquant, id en double, couleur inconnue, millésime hors bornes). Le nettoyage de
+référence applique les règles principales avec un `apply` Python par cellule, comme
+etape_2_travail_sur_base.ipynb ; les deux lisent le fichier et écrivent les lignes gardées.
+
+Usage : python benchmarks/bench_validation.py --rows 100000 --chunk-rows 10000 100000
+"""
+import argparse
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import _common  # noqa: F401  (modules du projet)
+from synthetic_catalogue import make_catalogue
+from validation import RAW_COLUMNS, validate_file
+
+
+def raw_records(n_rows, error_rate=0.01, seed=0):
+    """Fichier aplati (colonnes brutes, chaînes) aux formats hétérogènes, avec des lignes fautives"""
+    rng = np.random.default_rng(seed)
+    df = make_catalogue(n_rows, seed)
+    comma = rng.random(n_rows) < 0.3
+    prix = df['prix'].map('{:.2f}'.format)
+    prix = prix.where(~comma, prix.str.replace('.', ',', regex=False) + ' €')
+    deg = df['deg_alcool'].astype(str)
+    deg = deg.where(~comma, deg.str.replace('.', ',', regex=False) + ' %')
+    millesime = df['millesime'].astype(str).where(rng.random(n_rows) > 0.05, 'non millésimé')
+    accords = df['accords'].where(rng.random(n_rows) > 0.2, df['accords'].str.replace(r"[\[\]']", '', regex=True))
+    raw = pd.DataFrame({
+        'id': (np.arange(n_rows) + 1000).astype(str),
+        'name': df['nom'],
+        'description_short': '<p>' + df['desc'] + '</p>',
+        'accroche': df['accroche'],
+        'image': df['visuel'],
+        'manufacturer_name': df['producteur'],
+        'contenance': np.where(comma, '75 cl', '0.75'),
+        'features_abv': deg,
+        'features_country': df['pays'],
+        'features_region': df['region'],
+        'features_appellation': df['appellation'],
+        'features_full_grape_variety': df['cepages'],
+        'features_vintage': millesime,
+        'features_food_and_wine_matching': accords,
+        'features_taste': df['gout'],
+        'features_character': df['caractere'],
+        'features_colour': df['couleur'],
+        'features_service_temperature': df['temp_serv'],
+        'features_type': "['Vin']",
+        'features_bio': df['bio'].fillna('').map(lambda b: f"['{b}']" if b else ''),
+        'prices_price': prix,
+    })
+    errors = rng.choice(n_rows, int(n_rows * error_rate), replace=False)
+    for k, (column, value) in enumerate([('prices_price', 'sur demande'), ('features_abv', ''),
+                                         ('features_colour', 'Vert'), ('features_vintage', '1850')]):
+        raw.loc[errors[k::5], column] = value
+    raw.loc[errors[4::5], 'id'] = raw['id'].iloc[0]
+    return raw
+
+
+def _number(value, units):
+    match = re.match(r'^([-+]?\d+(?:[.,]\d+)?)\s*([^\d\s]*)$', value.strip())
+    if not match or match.group(2).lower() not in units:
+        return None
+    return float(match.group(1).replace(',', '.')) * units[match.group(2).lower()]
+
+
+def rowwise(df):
+    """Mêmes règles principales, une fonction Python par cellule (nettoyage du notebook)"""
+    df = df.rename(columns=RAW_COLUMNS)
+    prix = df['prix'].apply(lambda v: _number(v, {'': 1, '€': 1}) if v else None)
+    deg = df['deg_alcool'].apply(lambda v: _number(v, {'': 1, '%': 1}) if v else None)
+    df['contenance'] = df['contenance'].apply(lambda v: _number(v, {'': 1, 'cl': 0.01}) if v else None)
+    df['millesime'] = df['millesime'].apply(lambda v: v if v == 'non millésimé' or (v.isdigit() and
+                                                                                      1900 <= int(v) <= 2030) else None)
+    df['couleur'] = df['couleur'].apply(lambda v: v if v in ('Rouge', 'Blanc', 'Rosé') else None)
+    for column in ('desc', 'accroche'):
+        df[column] = df[column].apply(lambda t: re.sub(r'\s+', ' ', re.sub(r'<.*?>', '', t)).strip())
+    for column in ('accords', 'caractere', 'cepages', 'bio'):
+        df[column] = df[column].apply(
+            lambda v: str([a.strip() for a in v.strip('[]').replace("'", '').split(',') if a.strip()]) if v else None)
+    keep = prix.notna() & deg.notna() & ~df['id'].duplicated()
+    df['prix'], df['deg_alcool'] = prix, deg
+    return df[keep]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--chunk-rows', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'vins_flat.csv')
+        raw_records(args.rows).to_csv(path, index=False)
+        print(f"Fichier aplati : {args.rows} lignes, {os.path.getsize(path) / 2**20:.0f} Mo\n")
+
+        start = time.perf_counter()
+        kept = rowwise(pd.read_csv(path, dtype=str, keep_default_na=False))
+        kept.to_csv(os.path.join(tmp, 'apply.csv'), index=False)
+        seconds = time.perf_counter() - start
+        print(f"{'cellule par cellule (apply)':<32}{seconds:>7.2f} s{args.rows / seconds:>10.0f} lignes/s"
+              f"   gardées {len(kept)}")
+
+        for chunk_rows in args.chunk_rows:
+            report = validate_file(path, os.path.join(tmp, 'valides.csv'), os.path.join(tmp, 'rejets.csv'),
+                                   chunk_rows)
+            print(f"{f'vectorisé, blocs de {chunk_rows}':<32}{report['seconds']:>7.2f} s"
+                  f"{report['rows_per_s']:>10} lignes/s   gardées {report['rows']['accepted']}")
+
+        print("\nRejets par règle :")
+        for name, count in report['rejected_by_rule'].items():
+            print(f"  {name:<28}{count:>8}")
+        print("Valeurs vidées par règle :")
+        for name, count in report['nulled_by_rule'].items():
+            print(f"  {name:<28}{count:>8}")
+        rejects = pd.read_csv(os.path.join(tmp, 'rejets.csv'), dtype=str)
+        print(f"\nFichier de rejets : {len(rejects)} lignes, ex. ligne {rejects['ligne'].iloc[0]} : "
+              f"{rejects['motifs'].iloc[0]}")
+
+
+if __name__ == "__main__":
+    main()
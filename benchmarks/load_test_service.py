@@ -0,0 +1,113 @@
+"""Test de charge du service wine_service.py : requêtes/seconde et latences p50/p95.
+
+Usage :
+    python wine_service.py --port 8502 &
+    python benchmarks/load_test_service.py --url http://127.0.0.1:8502 --clients 16 --duration 20
+"""
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+
+def build_queries(conn, n_queries=200, seed=0):
+    """Mélange réaliste de requêtes construit à partir des valeurs de /filters et /stats"""
+    conn.request('GET', '/filters')
+    filtres = json.loads(conn.getresponse().read())
+    conn.request('GET', '/stats')
+    n_wines = json.loads(conn.getresponse().read())['n_wines']
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n_queries):
+        kind = rng.random()
+        if kind < 0.6:
+            params = {'pays': rng.choice(filtres['pays']), 'couleur': rng.choice(filtres['couleur']), 'limit': 20}
+            if rng.random() < 0.3:
+                params['bio'] = 1
+            if rng.random() < 0.5:
+                low = rng.choice([5, 10, 15, 20, 30])
+                params.update(prix_min=low, prix_max=low + 10)
+            if filtres['accords'] and rng.random() < 0.3:
+                params['accords'] = rng.choice(filtres['accords'])
+            queries.append('/search?' + urlencode(params))
+        elif kind < 0.85:
+            queries.append(f'/wine/{rng.randrange(n_wines)}')
+        else:
+            queries.append(f'/recommend/{rng.randrange(n_wines)}')
+    return queries
+
+
+def client_loop(host, port, queries, deadline, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+    while time.perf_counter() < deadline:
+        path = rng.choice(queries)
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors.append(path)
+        except (OSError, http.client.HTTPException):
+            errors.append(path)
+            conn.close()
+            conn = http.client.HTTPConnection(host, port, timeout=10)
+            continue
+        latencies.append(time.perf_counter() - start)
+    conn.close()
+
+
+def run(url, clients, duration, n_queries):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    queries = build_queries(http.client.HTTPConnection(host, port, timeout=10), n_queries)
+    latencies, errors = [], []
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=client_loop, args=(host, port, queries, deadline, latencies, errors, i))
+               for i in range(clients)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    lat_ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_s': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(lat_ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(lat_ms, 95)), 2),
+        'max_ms': round(float(lat_ms.max()), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8502')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--queries', type=int, default=200, help="Nombre de requêtes distinctes du mélange")
+    parser.add_argument('--output', help="Fichier JSON des résultats")
+    args = parser.parse_args()
+
+    results = []
+    for clients in args.clients:
+        result = run(args.url, clients, args.duration, args.queries)
+        results.append(result)
+        print(f"{clients:>3} clients : {result['requests_per_s']:>8} req/s | p50 {result['p50_ms']} ms | "
+              f"p95 {result['p95_ms']} ms | erreurs {result['errors']}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,262 @@
+"""Suite de benchmarks des chemins chauds de l'application, sans serveur Streamlit.
+
+Pour chaque taille de catalogue synthétique (schéma de base_vin_final.csv) :
+    load_data            lecture et normalisation du CSV (catalogue.load_catalogue)
+    catalogue_build      index dérivés (facettes, texte, fiches, agrégats)
+    accords_vocabulary   vocabulaire des accords (ancienne compréhension / explode vectorisé)
+    mask_chain           recherche par filtres (page Recherche), mélange de requêtes
+    facet_counts         comptages « N vins correspondent »
+    text_search          top-20 de la recherche plein texte
+    recommendations      reco1..reco4 d'un vin + fiches pré-rendues
+    cards_page           fiches d'une page de 20 résultats
+    load_image           wine_images.fetch_image contre un serveur d'images local
+
+Les résultats (médiane, p95, min en ms) sont écrits en JSON avec l'environnement
+(versions, commit) ; --compare signale les régressions entre deux fichiers.
+
+Usage : python benchmarks/run_suite.py --sizes 10000 100000 1000000
+        python benchmarks/run_suite.py --compare bench_suite_avant.json bench_suite_apres.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import struct
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from _common import ROOT
+from catalogue import Catalogue, load_catalogue, parse_accords
+from facets import explode_accords
+from synthetic_catalogue import write_catalogue
+from text_search import tokenize
+from vinatis_urls import BASE_URL
+
+QUERIES = [
+    {},
+    {'pays': 'France'},
+    {'pays': 'France', 'couleur': 'Rouge'},
+    {'couleur': 'Blanc', 'bio': True},
+    {'prix_min': 10.0, 'prix_max': 25.0},
+    {'accords': ('Fromage',)},
+    {'pays': 'Italie', 'accords': ('Fromage', 'Gibier'), 'prix_max': 40.0},
+    {'texte': 'chateau reserve', 'couleur': 'Rouge'},
+]
+
+
+def measure(func, repeat=5, warmup=1):
+    """Temps de `func` en millisecondes : médiane, p95 et min sur `repeat` exécutions"""
+    for _ in range(warmup):
+        func()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'median_ms': round(statistics.median(times), 3),
+        'p95_ms': round(float(np.percentile(times, 95)), 3),
+        'min_ms': round(min(times), 3),
+        'repeat': repeat,
+    }
+
+
+def make_png(width=150, height=200, seed=0):
+    """PNG RGB valide d'environ la taille d'un visuel vinatis, sans dépendance"""
+    rng = np.random.default_rng(seed)
+    # Dégradé + bruit : se compresse comme une photo (quelques dizaines de Ko)
+    pixels = (np.linspace(0, 255, width * 3, dtype=np.uint8)[None, :]
+              + rng.integers(0, 2, (height, width * 3), dtype=np.uint8))
+    raw = b''.join(b'\x00' + row.tobytes() for row in pixels)
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(raw, 6)) + chunk(b'IEND', b'')
+
+
+class ImageStub:
+    """Serveur HTTP local qui répond la même image à toute URL (latence réseau simulée)"""
+
+    def __init__(self, latency_ms=0.0):
+        body = make_png()
+        latency = latency_ms / 1000
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # En-têtes et corps partent en deux écritures : sans TCP_NODELAY, le corps attend
+            # l'accusé de réception retardé du client (~40 ms) et le banc mesure Nagle, pas fetch_image
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                if latency:
+                    time.sleep(latency)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self.image_bytes = len(body)
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def dataset(size, data_dir, seed=0):
+    """Chemin du catalogue synthétique de `size` lignes (généré une seule fois par graine)"""
+    os.makedirs(data_dir, exist_ok=True)
+    path = os.path.join(data_dir, f"base_vin_{size}_{seed}.csv")
+    if not os.path.exists(path):
+        print(f"  génération de {path}...", flush=True)
+        write_catalogue(path, size, seed)
+    return path
+
+
+def bench_images(catalogue, ids, latency_ms):
+    """Latence de fetch_image sur les visuels du catalogue, servis par ImageStub"""
+    try:
+        import requests
+        from wine_images import fetch_image
+    except ImportError as e:
+        return {'skipped': f"dépendance manquante : {e}"}
+    urls = [catalogue.card_table.images[i] for i in ids if catalogue.card_table.images[i]]
+    with ImageStub(latency_ms) as stub:
+        urls = [u.replace(BASE_URL, stub.base_url) for u in urls]
+        session = requests.Session()
+        state = {'i': 0, 'bytes': 0}
+
+        def fetch():
+            _, _, n = fetch_image(urls[state['i'] % len(urls)], session=session)
+            state['i'] += 1
+            state['bytes'] += n
+
+        result = measure(fetch, repeat=min(len(urls), 50))
+        result['bytes_per_image'] = stub.image_bytes
+        result['bytes_total'] = state['bytes']
+        result['stub_latency_ms'] = latency_ms
+    return result
+
+
+def run_size(size, args):
+    path = dataset(size, args.data_dir, args.seed)
+    # Les gros catalogues sont mesurés moins souvent
+    repeat = args.repeat if size <= 100_000 else max(1, args.repeat // 3)
+    rng = np.random.default_rng(args.seed)
+    results = {}
+
+    results['load_data'] = measure(lambda: load_catalogue(path), repeat=max(1, repeat // 2), warmup=0)
+    df = load_catalogue(path)
+    results['catalogue_build'] = measure(lambda: Catalogue(df, version='bench'), repeat=1, warmup=0)
+    catalogue = Catalogue(df, version='bench')
+
+    if size <= 100_000:
+        results['accords_vocabulary_legacy'] = measure(
+            lambda: sorted({a for v in df['accords'].dropna() for a in parse_accords(v)}), repeat=repeat)
+    results['accords_vocabulary'] = measure(lambda: sorted(explode_accords(df['accords']).unique()), repeat=repeat)
+
+    queries = iter(QUERIES * 1000)
+    results['mask_chain'] = measure(lambda: catalogue.search(**next(queries)), repeat=len(QUERIES) * repeat)
+    queries = iter(QUERIES * 1000)
+    results['facet_counts'] = measure(lambda: catalogue.facet_counts(**next(queries)), repeat=len(QUERIES) * repeat)
+
+    texts = iter([' '.join(tokenize(n)[:2]) for n in df['nom'].iloc[rng.integers(0, size, 200)]] * 10)
+    results['text_search'] = measure(lambda: catalogue.text_search(next(texts), 20), repeat=50)
+
+    wine_ids = iter(rng.integers(0, size, 1000).tolist())
+    results['recommendations'] = measure(lambda: catalogue.cards(catalogue.recommend(next(wine_ids))), repeat=100)
+    pages = iter([rng.choice(size, 20, replace=False) for _ in range(100)])
+    results['cards_page'] = measure(lambda: catalogue.cards(next(pages)), repeat=50)
+
+    results['load_image'] = bench_images(catalogue, rng.integers(0, size, 50), args.image_latency)
+    return results
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'commit': commit,
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def compare(before_path, after_path, threshold):
+    """Affiche les ratios de médianes entre deux exécutions ; retourne le nombre de régressions"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+    regressions = 0
+    print(f"{'taille':>9} {'benchmark':<26}{'avant (ms)':>12}{'après (ms)':>12}{'ratio':>8}")
+    for size, benches in after['results'].items():
+        for name, result in benches.items():
+            old = before['results'].get(size, {}).get(name, {})
+            if 'median_ms' not in result or 'median_ms' not in old:
+                continue
+            ratio = result['median_ms'] / max(old['median_ms'], 1e-9)
+            flag = '  <-- régression' if ratio > threshold else ''
+            regressions += ratio > threshold
+            print(f"{size:>9} {name:<26}{old['median_ms']:>12.3f}{result['median_ms']:>12.3f}{ratio:>8.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'bouteillia_bench'),
+                        help="Dossier des catalogues synthétiques (réutilisés d'une exécution à l'autre)")
+    parser.add_argument('--image-latency', type=float, default=0.0, help="Latence simulée du serveur d'images (ms)")
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--compare', nargs=2, metavar=('AVANT', 'APRES'))
+    parser.add_argument('--threshold', type=float, default=1.2, help="Ratio de médianes signalé comme régression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+
+    report = {'environment': environment(), 'results': {}}
+    for size in args.sizes:
+        print(f"Catalogue de {size} vins", flush=True)
+        report['results'][str(size)] = run_size(size, args)
+        for name, result in report['results'][str(size)].items():
+            summary = result.get('skipped') or f"médiane {result['median_ms']:.3f} ms, p95 {result['p95_ms']:.3f} ms"
+            print(f"  {name:<26}{summary}")
+    output = args.output or f"bench_suite_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Résultats écrits dans {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Générateur de catalogues synthétiques au schéma de base_vin_final.csv.
+
+Produit les colonnes brutes lues par catalogue.load_catalogue (nom, desc, accords
+au format "['A', 'B']", bio 'Certifié Eurofeuille', visuel relatif, reco1..reco4)
+ainsi que les colonnes one-hot et standardisées ajoutées par les notebooks.
+
+Usage : python benchmarks/synthetic_catalogue.py --rows 100000 --output base_vin_100k.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+PAYS = {
+    'France': ['Bordeaux', 'Bourgogne', 'Vallée du Rhône', 'Loire', 'Alsace', 'Languedoc-Roussillon', 'Champagne'],
+    'Italie': ['Toscane', 'Piémont', 'Sicile', 'Vénétie'],
+    'Espagne': ['Rioja', 'Ribera del Duero', 'Priorat'],
+    'Portugal': ['Douro', 'Alentejo'],
+    'Chili': ['Vallée Centrale'],
+    'Argentine': ['Mendoza'],
+    'Afrique du Sud': ['Stellenbosch'],
+    'États-Unis': ['Californie'],
+}
+COULEURS = ['Rouge', 'Blanc', 'Rosé']
+ACCORDS = ['Viande rouge', 'Viande blanche', 'Volaille', 'Gibier', 'Poisson', 'Fruits de mer', 'Fromage',
+           'Charcuterie', 'Dessert', 'Apéritif', 'Cuisine asiatique', 'Cuisine épicée', 'Barbecue', 'Légumes']
+CARACTERES = ['Fruité', 'Puissant', 'Élégant', 'Minéral', 'Boisé', 'Frais', 'Rond', 'Tannique', 'Épicé']
+CEPAGES = ['Merlot', 'Cabernet Sauvignon', 'Syrah', 'Grenache', 'Pinot Noir', 'Chardonnay', 'Sauvignon Blanc',
+           'Chenin Blanc', 'Riesling', 'Tempranillo', 'Sangiovese', 'Malbec', 'Viognier', 'Mourvèdre']
+MOTS = ['cassis', 'cerise', 'vanille', 'poivre', 'réglisse', 'agrumes', 'pêche', 'fleurs blanches', 'sous-bois',
+        'tabac', 'mûre', 'framboise', 'pierre à fusil', 'beurre', 'miel', 'épices douces', 'violette']
+CUVEES = ['Réserve', 'Grande Réserve', 'Tradition', 'Prestige', 'Les Vieilles Vignes', 'Cuvée Spéciale', 'Sélection']
+
+
+def _slug(value):
+    return (value.lower().replace(' ', '_').replace('-', '_').replace('é', 'e').replace('è', 'e')
+            .replace('ô', 'o').replace('ç', 'c').replace('à', 'a').replace("'", ''))
+
+
+def make_catalogue(n_rows, seed=0):
+    """Retourne un DataFrame de `n_rows` vins au schéma de base_vin_final.csv"""
+    rng = np.random.default_rng(seed)
+    pays_names = np.array(list(PAYS))
+    pays = pays_names[rng.choice(len(pays_names), n_rows, p=[0.55, 0.12, 0.1, 0.06, 0.05, 0.05, 0.04, 0.03])]
+    region = np.array([PAYS[p][i % len(PAYS[p])] for p, i in zip(pays, rng.integers(0, 7, n_rows))], dtype=object)
+    couleur = np.array(COULEURS)[rng.choice(3, n_rows, p=[0.55, 0.3, 0.15])]
+    millesime = rng.integers(2005, 2025, n_rows)
+    n_domaines = max(50, n_rows // 8)
+    domaine_ids = rng.integers(0, n_domaines, n_rows)
+    domaine = np.array([f"Domaine {i}" for i in range(n_domaines)], dtype=object)[domaine_ids]
+    cuvee = np.array(CUVEES, dtype=object)[rng.integers(0, len(CUVEES), n_rows)]
+    # Même cuvée sur plusieurs millésimes, comme dans la base réelle
+    nom = [f"{d.replace('Domaine', 'Château')} - {c} {m} - {d}" for d, c, m in zip(domaine, cuvee, millesime)]
+    nom = pd.Series(nom)
+    dup = nom.duplicated()
+    nom[dup] = nom[dup] + ' #' + pd.Series(np.flatnonzero(dup), index=nom[dup].index).astype(str)
+
+    n_accords = rng.integers(1, 5, n_rows)
+    accords_idx = [rng.choice(len(ACCORDS), k, replace=False) for k in n_accords]
+    accords = [str([ACCORDS[i] for i in idx]) for idx in accords_idx]
+    caractere = [str([CARACTERES[i] for i in rng.choice(len(CARACTERES), 2, replace=False)]) for _ in range(n_rows)]
+    cepages_idx = rng.integers(0, len(CEPAGES), (n_rows, 2))
+    words = np.array(MOTS, dtype=object)[rng.integers(0, len(MOTS), (n_rows, 3))]
+    desc = [f"Un vin {c.lower()} aux notes de {a}, {b} et {d}. Idéal avec {ACCORDS[acc[0]].lower()}."
+            for c, (a, b, d), acc in zip(couleur, words, accords_idx)]
+    prix = np.round(rng.lognormal(np.log(18), 0.6, n_rows), 2)
+    deg = np.round(rng.normal(13, 0.8, n_rows), 1)
+    bio = np.where(rng.random(n_rows) < 0.2, 'Certifié Eurofeuille', None)
+    ids = rng.choice(200_000, n_rows, replace=n_rows > 200_000) + 1000
+
+    df = pd.DataFrame({
+        'id': ids,
+        'nom': nom,
+        'desc': desc,
+        'accroche': [f"La cuvée {c} de {d}" for c, d in zip(cuvee, domaine)],
+        'visuel': [f"{i}-thickbox_default/{_slug(n)[:40]}.jpg" for i, n in zip(ids, nom)],
+        'producteur': domaine,
+        'contenance': 0.75,
+        'deg_alcool': deg,
+        'pays': pays,
+        'region': region,
+        'appellation': [f"AOC {r}" for r in region],
+        'cepages': [str([CEPAGES[a], CEPAGES[b]]) for a, b in cepages_idx],
+        'millesime': millesime,
+        'accords': accords,
+        'gout': np.where(couleur == 'Blanc', 'Sec', 'Rouge Charnu'),
+        'caractere': caractere,
+        'couleur': couleur,
+        'temp_serv': '16-18°C',
+        'type_produit': 'Vin',
+        'bio': bio,
+        'prix': prix,
+    })
+    # Colonnes one-hot et standardisées produites par etape_2_travail_sur_base.ipynb
+    one_hot = {}
+    for a in ACCORDS:
+        one_hot[f"accord_{_slug(a)}"] = df['accords'].str.contains(a, regex=False).astype('int8')
+    for c in CEPAGES:
+        one_hot[f"cepage_{_slug(c)}"] = df['cepages'].str.contains(c, regex=False).astype('int8')
+    for c in COULEURS:
+        one_hot[f"couleur_{_slug(c)}"] = (df['couleur'] == c).astype('int8')
+    for p in PAYS:
+        one_hot[f"pays_{_slug(p)}"] = (df['pays'] == p).astype('int8')
+    one_hot['prix_std'] = (prix - prix.mean()) / prix.std()
+    one_hot['degres_std'] = (deg - deg.mean()) / deg.std()
+    one_hot['bio_bool'] = pd.notna(bio).astype('int8')
+    df = pd.concat([df, pd.DataFrame(one_hot)], axis=1)
+    # Recommandations : vins de même couleur et pays, par nom
+    order = np.lexsort((prix, pays, couleur))
+    for k in range(1, 5):
+        neighbour = np.empty(n_rows, dtype=np.int64)
+        neighbour[order] = order[np.minimum(np.arange(n_rows) + k, n_rows - 1)]
+        df[f'reco{k}'] = nom.to_numpy()[neighbour]
+    return df
+
+
+def write_catalogue(path, n_rows, seed=0):
+    df = make_catalogue(n_rows, seed)
+    df.to_csv(path, index=False)
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Génère un catalogue synthétique au schéma de base_vin_final.csv")
+    parser.add_argument('--rows', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='base_vin_synthetique.csv')
+    args = parser.parse_args()
+    write_catalogue(args.output, args.rows, args.seed)
+    print(f"{args.rows} vins écrits dans {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""État de session du navigateur partagé entre les pages scrapées.
+
+Le bandeau cookies n'est cherché qu'une fois par driver : une fois accepté, les
+cookies de consentement sont sauvegardés sur disque et réinjectés à chaque
+redémarrage du driver, si bien que les pages suivantes ne paient plus rien. Tant
+que le clic n'a pas réussi, la recherche est refaite sur les pages suivantes, au
+plus MAX_ATTEMPTS fois.
+"""
+import json
+import logging
+import os
+import time
+
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+BASE_URL = "https://www.vinatis.com"
+COOKIES_FILE = 'vinatis_cookies.json'
+
+# Cookies posés par OneTrust une fois le bandeau fermé
+CONSENT_COOKIES = {'OptanonAlertBoxClosed', 'OptanonConsent'}
+
+# Un seul sélecteur CSS regroupant les variantes connues du bouton OneTrust
+ACCEPT_CSS = "#onetrust-accept-btn-handler, .ot-sdk-container .ot-sdk-row button"
+# Repli sur le texte du bouton, en une seule requête XPath (au lieu de lire .text de chaque <button>)
+ACCEPT_XPATH = ("//button[contains(., 'Tout accepter') or contains(., 'Accepter') "
+                "or contains(., 'accepter') or contains(., \"J'accepte\")]")
+# Pages sur lesquelles le bandeau est cherché (puis cliqué) avant d'abandonner pour ce driver
+MAX_ATTEMPTS = 3
+
+
+class CookieConsent:
+    """Gère le consentement cookies une fois par session et le persiste entre les drivers"""
+
+    def __init__(self, cookies_file=COOKIES_FILE, base_url=BASE_URL, timeout=10, metrics=None,
+                 max_attempts=MAX_ATTEMPTS):
+        self.cookies_file = cookies_file
+        self.base_url = base_url
+        self.timeout = timeout
+        self.metrics = metrics
+        self.max_attempts = max_attempts
+        self.driver = None
+        self.accepted = False
+        self.checked = False
+        self.attempts = 0
+        self.legacy_probe_s = None
+        self.skipped = 0
+
+    def attach(self, driver):
+        """Rattache un nouveau driver : son consentement reste à vérifier"""
+        self.driver = driver
+        self.accepted = False
+        self.checked = False
+        self.attempts = 0
+
+    def restore(self, driver):
+        """Réinjecte les cookies sauvegardés dans un nouveau driver (à appeler après un get sur le site)"""
+        self.attach(driver)
+        if not os.path.exists(self.cookies_file):
+            return False
+        with open(self.cookies_file, encoding='utf-8') as f:
+            cookies = json.load(f)
+        names = set()
+        for cookie in cookies:
+            cookie.pop('sameSite', None)
+            try:
+                driver.add_cookie(cookie)
+                names.add(cookie['name'])
+            except Exception as e:
+                logging.debug(f"Cookie {cookie.get('name')} non restauré : {e}")
+        self.accepted = bool(CONSENT_COOKIES & names)
+        self.checked = self.accepted
+        if self.accepted:
+            driver.refresh()
+            logging.info(f"Consentement cookies restauré depuis {self.cookies_file}")
+        return self.accepted
+
+    def save(self, driver):
+        """Sauvegarde les cookies courants pour les prochaines sessions"""
+        with open(self.cookies_file, 'w', encoding='utf-8') as f:
+            json.dump(driver.get_cookies(), f, ensure_ascii=False, indent=2)
+
+    def ensure(self, driver):
+        """Accepte le bandeau si besoin. Ne fait rien (aucun appel au driver) une fois le driver réglé."""
+        if driver is not self.driver:
+            self.attach(driver)
+        if self.checked:
+            self.skipped += 1
+            if self.legacy_probe_s is None and self.metrics is not None:
+                self.legacy_probe_s = self._legacy_probe(driver)
+            return self.accepted
+        self.attempts += 1
+        # Dernière tentative : le driver est réglé, bandeau accepté ou non
+        self.checked = self.attempts >= self.max_attempts
+        button = self._find_button(driver)
+        if button is None:
+            logging.info(f"Pas de bandeau cookies détecté (tentative {self.attempts}/{self.max_attempts})")
+            return False
+        try:
+            driver.execute_script("arguments[0].click();", button)
+        except Exception as e:
+            logging.warning(f"Clic sur le bandeau cookies impossible (tentative {self.attempts}/{self.max_attempts}) : {e}")
+            return False
+        self.accepted = self.checked = True
+        if self.metrics is not None:
+            self.metrics.incr('cookies.accepted')
+        # Laisse OneTrust poser ses cookies avant de les sauvegarder
+        time.sleep(1)
+        self.save(driver)
+        logging.info(f"Bandeau cookies accepté, cookies sauvegardés dans {self.cookies_file}")
+        return True
+
+    def _find_button(self, driver):
+        try:
+            return WebDriverWait(driver, self.timeout).until(
+                EC.element_to_be_clickable((By.CSS_SELECTOR, ACCEPT_CSS))
+            )
+        except Exception:
+            pass
+        buttons = driver.find_elements(By.XPATH, ACCEPT_XPATH)
+        return buttons[0] if buttons else None
+
+    def _legacy_probe(self, driver):
+        """Mesure une fois le coût de l'ancienne détection (lecture de .text de chaque <button>)"""
+        start = time.perf_counter()
+        try:
+            for btn in driver.find_elements("xpath", "//button"):
+                btn.text.strip().lower()
+        except Exception:
+            pass
+        return time.perf_counter() - start
+
+    def report(self):
+        """Estimation du temps économisé : pages sans détection x coût mesuré de l'ancienne détection"""
+        per_page = self.legacy_probe_s or 0.0
+        return {
+            'accepted': self.accepted,
+            'pages_skipped': self.skipped,
+            'legacy_probe_s_per_page': round(per_page, 4),
+            'saved_s_estimate': round(per_page * self.skipped, 2),
+        }
@@ -0,0 +1,460 @@
+"""Catalogue des vins : chargement, recherche et recommandations, sans dépendance à Streamlit.
+
+Ce module est partagé par le service HTTP (wine_service.py) et par le client
+embarqué (wine_client.LocalClient). Un vin est identifié par sa position
+(entier) dans le catalogue chargé.
+"""
+import logging
+import os
+import random
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from data_manifest import data_version, manifest_path, read_manifest
+from facets import FacetIndex, build_aggregates
+from near_duplicates import collapse, duplicate_groups
+from price_history import DEFAULT_DIR as DEFAULT_HISTORY_DIR
+from price_history import open_history
+from reco_index import PartitionedIndex
+from search_cache import SEARCH_CACHE, SearchCache, canonical_filters
+from text_search import TextIndex, tokenize
+from text_similarity import DEFAULT_ALPHA, DEFAULT_DIR, blend, load_or_build
+from vinatis_urls import DEFAULT_IMAGE, canonicalize_urls
+from wine_cards import CardTable
+
+CATALOGUE_FILE = 'base_vin_final.csv'
+# Vecteurs TF-IDF des textes, un sous-dossier par version des données (voir text_similarity)
+TEXT_VECTORS_DIR = os.environ.get('BOUTEILLIA_TEXT_VECTORS', DEFAULT_DIR)
+# Historique des prix d'une collecte à l'autre, indépendant de la version du catalogue
+PRICE_HISTORY_DIR = os.environ.get('BOUTEILLIA_PRICE_HISTORY', DEFAULT_HISTORY_DIR)
+
+# Colonnes utiles à l'affichage (la base contient aussi des centaines de colonnes one-hot)
+DISPLAY_COLUMNS = [
+    'nom', 'prix', 'pays', 'region', 'appellation', 'producteur', 'couleur', 'millesime',
+    'deg_alcool', 'bio', 'accords', 'desc', 'accroche', 'visuel',
+    'reco1', 'reco2', 'reco3', 'reco4',
+]
+RECO_COLUMNS = ['reco1', 'reco2', 'reco3', 'reco4']
+# Colonnes numériques qui ne sont pas des variables du modèle (comme dans ML_sur_base_vin.ipynb)
+NON_FEATURE_COLUMNS = ['id', 'prix', 'deg_alcool', 'contenance', 'millesime']
+
+
+def load_catalogue(path=CATALOGUE_FILE):
+    """Charge la base des vins et normalise les colonnes utilisées par l'application"""
+    return normalize_catalogue(pd.read_csv(path))
+
+
+def normalize_catalogue(df):
+    """Normalise un DataFrame lu depuis la base (ou un morceau de celle-ci, voir sql_catalogue)"""
+    df['bio'] = df['bio'].apply(lambda x: 1 if pd.notna(x) and 'Certifié Eurofeuille' in str(x) else 0)
+    if 'visuel' not in df.columns:
+        df['visuel'] = DEFAULT_IMAGE
+    else:
+        df['visuel'] = canonicalize_urls(df['visuel'])
+    for col in df.columns:
+        if col != 'prix':
+            df[col] = df[col].astype(str)
+    df['prix'] = pd.to_numeric(df['prix'], errors='coerce')
+    return df.reset_index(drop=True)
+
+
+def parse_accords(value):
+    """Transforme la chaîne "['Viande', 'Fromage']" en liste d'accords"""
+    if value is None or value == 'nan' or pd.isna(value):
+        return []
+    return [a for a in str(value).replace('[', '').replace(']', '').replace("'", '').split(', ') if a]
+
+
+def product_ids(df):
+    """Ids Vinatis des vins (clé de l'historique des prix), -1 si absent"""
+    if 'id' not in df.columns:
+        return np.full(len(df), -1, dtype=np.int64)
+    return pd.to_numeric(df['id'], errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+
+def feature_matrix(df, names=None):
+    """Variables numériques du modèle de recommandation (one-hot, *_std, bio_bool) : (noms, matrice float32)
+
+    Avec `names`, ce sont ces colonnes qui sont lues (morceaux successifs d'une même base, voir sql_catalogue).
+    """
+    if names is not None:
+        columns = [pd.to_numeric(df[col], errors='coerce').fillna(0).to_numpy(dtype=np.float32) for col in names]
+        return names, np.column_stack(columns) if columns else np.zeros((len(df), 0), dtype=np.float32)
+    names, columns = [], []
+    for col in df.columns:
+        if col in DISPLAY_COLUMNS or col in NON_FEATURE_COLUMNS:
+            continue
+        values = pd.to_numeric(df[col], errors='coerce')
+        # Colonne texte : des valeurs présentes ne sont pas des nombres
+        if values.isna().sum() != (df[col].isna() | (df[col] == 'nan')).sum():
+            continue
+        names.append(col)
+        columns.append(values.fillna(0).to_numpy(dtype=np.float32))
+    matrix = np.column_stack(columns) if columns else np.zeros((len(df), 0), dtype=np.float32)
+    return names, matrix
+
+
+class Catalogue:
+    """Catalogue en mémoire et structures dérivées (index par nom, listes de filtres)"""
+
+    # Moteur de recherche, dans la clé du cache partagé : un autre moteur ne trouve pas les mêmes vins
+    backend = 'memoire'
+
+    def __init__(self, df, version='memoire', search_cache=None):
+        self.df = df
+        self.version = version
+        # Sans version des données (catalogue construit en mémoire), pas de cache partagé
+        self.search_cache = search_cache
+        self.columns = [c for c in DISPLAY_COLUMNS if c in df.columns]
+        # Vue réduite aux colonnes d'affichage : une page de résultats ne copie pas les colonnes one-hot
+        self.display = df[self.columns]
+        self.n_rows = len(df)
+        self.reco_ids = self._resolve_recos(df)
+        self.product_ids = product_ids(df)
+        self.facets = FacetIndex(df)
+        self.aggregates = build_aggregates(df, version)
+        self.accords_vocabulary = list(self.facets.bitmaps.get('accords', {}))
+        self.text_index = TextIndex(df)
+        self.card_table = CardTable(df, version)
+
+    @classmethod
+    def from_csv(cls, path=CATALOGUE_FILE):
+        # Version lue avant le fichier : s'il change pendant la lecture, le prochain contrôle le rechargera
+        version = data_version(path)
+        return cls(load_catalogue(path), version=version, search_cache=SEARCH_CACHE)
+
+    @staticmethod
+    def _resolve_recos(df):
+        """Ids des vins nommés dans reco1..reco4 (-1 si absent), résolus une fois au chargement"""
+        # Position du premier vin portant chaque nom
+        names = df['nom']
+        name_to_id = pd.Series(np.flatnonzero(~names.duplicated()), index=names[~names.duplicated()])
+        columns = [c for c in RECO_COLUMNS if c in df.columns]
+        reco_ids = np.full((len(df), len(columns)), -1, dtype=np.int32)
+        for k, col in enumerate(columns):
+            reco_ids[:, k] = df[col].map(name_to_id).fillna(-1).to_numpy(dtype=np.int32)
+        return reco_ids
+
+    def __len__(self):
+        return self.n_rows
+
+    def stats(self):
+        """Chiffres affichés sur la page d'accueil"""
+        return {'n_wines': len(self), 'n_pays': len(self.aggregates['counts'].get('pays', {}))}
+
+    def filters(self):
+        """Valeurs proposées par les filtres de la page Recherche"""
+        counts = self.aggregates['counts']
+        return {
+            'pays': list(counts.get('pays', {})),
+            'couleur': list(counts.get('couleur', {})),
+            'accords': self.accords_vocabulary,
+            'prix_min': self.aggregates['prix']['min'],
+            'prix_max': self.aggregates['prix']['max'],
+        }
+
+    def _text_mask(self, nom=None, texte=None):
+        """Masque des filtres hors facettes (nom exact, recherche libre), None s'il n'y en a pas"""
+        mask = None
+        if nom and nom != "Tous":
+            mask = self._name_mask(nom)
+        # Texte sans aucun mot (ponctuation seule) : pas de filtre, comme un champ vide
+        if texte and tokenize(texte):
+            found = self.text_index.scores(texte) > 0
+            mask = found if mask is None else mask & found
+        return mask
+
+    def search(self, nom=None, pays=None, couleur=None, bio=False, prix_min=None, prix_max=None, accords=(),
+               texte=None):
+        """Retourne les ids (positions) des vins qui correspondent aux filtres.
+
+        Avec `texte`, seuls les vins trouvés par l'index plein texte sont gardés,
+        du plus au moins pertinent. Les résultats sont partagés entre sessions par
+        search_cache (tableau en lecture seule).
+        """
+        prix = self.aggregates['prix']
+        filters = canonical_filters({'nom': nom, 'pays': pays, 'couleur': couleur, 'bio': bio, 'prix_min': prix_min,
+                                     'prix_max': prix_max, 'accords': accords, 'texte': texte},
+                                    (prix['min'], prix['max']))
+        if self.search_cache is None:
+            return self._search(**filters)
+        return self.search_cache.get_or_compute(SearchCache.key(self.backend, self.version, filters),
+                                                lambda: self._search(**filters))
+
+    def _search(self, nom=None, pays=None, couleur=None, bio=False, prix_min=None, prix_max=None, accords=(),
+                texte=None):
+        mask = self.facets.mask(pays=pays, couleur=couleur, bio=bio, prix_min=prix_min, prix_max=prix_max,
+                                accords=accords)
+        if nom and nom != "Tous":
+            mask &= self._name_mask(nom)
+        if texte:
+            return self.text_index.rank(texte, candidates=np.flatnonzero(mask))
+        return np.flatnonzero(mask)
+
+    def _name_mask(self, nom):
+        return (self.df['nom'] == nom).to_numpy()
+
+    def facet_counts(self, nom=None, pays=None, couleur=None, bio=False, prix_min=None, prix_max=None,
+                     accords=(), texte=None):
+        """Nombre de vins correspondant aux filtres, et par valeur de chaque facette"""
+        active = self.facets.filter_bitmaps(pays=pays, couleur=couleur, bio=bio, prix_min=prix_min,
+                                            prix_max=prix_max, accords=accords)
+        text_mask = self._text_mask(nom, texte)
+        if text_mask is not None:
+            active['texte'] = self.facets.pack(text_mask)
+        return self.facets.counts(active)
+
+    def text_search(self, query, k=10):
+        """Top-k des vins pour une recherche libre (nom, région, appellation, domaine...)"""
+        return self.text_index.top_k(query, k)[0]
+
+    def rows(self, ids):
+        """Lignes d'affichage (dicts JSON-compatibles) pour une liste d'ids"""
+        ids = [int(i) for i in ids if 0 <= int(i) < len(self)]
+        rows = self.display.iloc[ids]
+        rows = rows.astype(object).where(rows.notna(), None)
+        records = rows.to_dict('records')
+        for wine_id, record in zip(ids, records):
+            record['id'] = wine_id
+        return records
+
+    def cards(self, ids):
+        """Fiches pré-rendues (markdown) pour une liste d'ids"""
+        return self.card_table.cards(ids)
+
+    def wine(self, wine_id):
+        rows = self.rows([wine_id])
+        return rows[0] if rows else None
+
+    def recommend(self, wine_id, collapse=False):
+        """Ids des vins listés dans reco1..reco4 pour le vin donné.
+
+        Avec `collapse`, un seul vin par groupe de quasi-doublons, et aucun du groupe du vin donné.
+        """
+        if not 0 <= wine_id < len(self):
+            return []
+        ids = [int(i) for i in self.reco_ids[wine_id] if i >= 0]
+        return self.collapse(ids, exclude=wine_id).tolist() if collapse else ids
+
+    def duplicate_groups(self):
+        """Représentant du groupe de quasi-doublons de chaque vin (voir near_duplicates), calculé à la première demande"""
+        groups = getattr(self, '_duplicate_groups', None)
+        if groups is None and self.df is not None and 'nom' in self.df.columns:
+            groups = self._duplicate_groups = duplicate_groups(self.df)
+        return groups
+
+    def collapse(self, ids, exclude=None):
+        """Ids réduits au premier vin de chaque groupe de quasi-doublons, sans le groupe du vin `exclude`"""
+        groups = self.duplicate_groups()
+        ids = collapse(ids, groups)
+        if exclude is not None and groups is not None and len(ids):
+            ids = ids[groups[ids] != groups[exclude]]
+        return ids
+
+    def reco_index(self):
+        """Index des variables du modèle partitionné par couleur, tranche de prix et bio, construit à la première demande"""
+        index = getattr(self, '_reco_index', None)
+        if index is None:
+            index = self._reco_index = PartitionedIndex.from_facets(self.facets, self.feature_vectors())
+        return index
+
+    def nearest(self, wine_id, k=4, couleur=None, bio=False, prix_min=None, prix_max=None):
+        """Ids des k vins les plus proches par les variables du modèle, parmi ceux qui respectent les contraintes.
+
+        Seules les partitions de l'index qui correspondent aux contraintes sont parcourues
+        (voir reco_index) ; sans variables du modèle, la liste est vide.
+        """
+        if not 0 <= wine_id < len(self):
+            return []
+        features = self.feature_vectors()
+        if features is None or not features.shape[1]:
+            return []
+        ids, _ = self.reco_index().nearest(wine_id, k, couleur, bio, prix_min, prix_max)
+        return ids.tolist()
+
+    def text_vectors(self):
+        """Vecteurs TF-IDF des textes, relus pour cette version des données ou calculés à la première demande"""
+        vectors = getattr(self, '_text_vectors', None)
+        if vectors is None:
+            # Catalogue construit en mémoire (sans version des données) : rien n'est écrit
+            version = None if self.version == 'memoire' else self.version
+            vectors = self._text_vectors = load_or_build(self.df, version, TEXT_VECTORS_DIR)
+        return vectors
+
+    def feature_vectors(self):
+        """Variables du modèle de recommandation (matrice float32), None si le catalogue ne les a pas"""
+        features = getattr(self, 'features', None)
+        if features is None and self.df is not None:
+            self.features = features = feature_matrix(self.df)[1]
+        return features
+
+    def similar(self, wine_id, k=4, alpha=DEFAULT_ALPHA, candidates=50):
+        """Ids des vins aux textes les plus proches (desc, accroche, caractere).
+
+        Les `candidates` plus proches par le texte sont reclassés par le score mêlé à la
+        distance des variables du modèle : alpha=1 pour le texte seul.
+        """
+        if not 0 <= wine_id < len(self):
+            return []
+        neighbours, scores = self.text_vectors().top_k([wine_id], max(k, candidates))
+        found = neighbours[0] >= 0
+        ids, scores = neighbours[0][found], scores[0][found]
+        features = self.feature_vectors()
+        if alpha < 1 and features is not None and features.shape[1]:
+            scores = blend(scores, np.linalg.norm(features[ids] - features[wine_id], axis=1), alpha)
+        return [int(i) for i in ids[np.argsort(-scores, kind='stable')[:k]]]
+
+    def product_id(self, wine_id):
+        """Id Vinatis d'un vin, None s'il est inconnu (ou si le catalogue ne le garde pas)"""
+        ids = getattr(self, 'product_ids', None)
+        if ids is None or not 0 <= wine_id < len(self) or ids[wine_id] < 0:
+            return None
+        return int(ids[wine_id])
+
+    def price_history(self, wine_id):
+        """Changements de prix et de disponibilité d'un vin d'une collecte à l'autre (voir price_history)"""
+        product_id = self.product_id(wine_id)
+        if product_id is None:
+            return None
+        return open_history(PRICE_HISTORY_DIR).history(product_id)
+
+    def random_id(self):
+        return random.randrange(len(self))
+
+    # --- Réponses JSON partagées par le service et le client embarqué ---
+
+    def search_payload(self, filters, offset=0, limit=None, collapse=False):
+        ids = self.search(**filters)
+        if collapse:
+            ids = self.collapse(ids)
+        page = ids[offset:None if limit is None else offset + limit]
+        return {'total': int(len(ids)), 'ids': ids.tolist(), 'wines': self.rows(page)}
+
+    def recommend_payload(self, wine_id, collapse=False):
+        ids = self.recommend(wine_id, collapse)
+        return {'id': wine_id, 'ids': ids, 'wines': self.rows(ids)}
+
+    def nearest_payload(self, wine_id, k=4, **constraints):
+        ids = self.nearest(wine_id, k, **constraints)
+        return {'id': wine_id, 'ids': ids, 'wines': self.rows(ids)}
+
+    def similar_payload(self, wine_id, k=4, alpha=DEFAULT_ALPHA):
+        ids = self.similar(wine_id, k, alpha)
+        return {'id': wine_id, 'ids': ids, 'wines': self.rows(ids)}
+
+    def price_history_payload(self, wine_id):
+        points = self.price_history(wine_id)
+        crawls = open_history(PRICE_HISTORY_DIR).crawls
+        if points is not None:
+            points = points.astype(object).where(points.notna(), None).to_dict('records')
+        return {'id': wine_id, 'product_id': self.product_id(wine_id), 'points': points or [],
+                'last_crawl': crawls[-1]['date'] if crawls else None}
+
+    def cards_payload(self, ids):
+        return {'version': self.version, 'cards': self.cards(ids)}
+
+
+class CatalogueStore:
+    """Catalogue courant, reconstruit en arrière-plan quand la version des données change.
+
+    Le nouveau catalogue (et tous ses index) est construit à côté de l'ancien puis
+    substitué en une seule affectation : les requêtes et reruns en cours gardent la
+    référence qu'ils ont prise, sans attendre ni voir un catalogue à moitié construit.
+
+    Avec preload=False, le premier chargement se fait aussi en arrière-plan (lancé
+    par start()) : get() retourne None tant que `ready` est faux.
+    """
+
+    def __init__(self, path=CATALOGUE_FILE, poll_s=30.0, preload=True):
+        self.path = path
+        self.poll_s = poll_s
+        self.current = self._load() if preload else None
+        self.reloads = 0
+        self.last_error = None
+        self.loading = False
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+        self._stale_checks = 0
+
+    def get(self):
+        return self.current
+
+    @property
+    def ready(self):
+        return self.current is not None
+
+    @property
+    def version(self):
+        return self.current.version if self.current is not None else None
+
+    def _disk_version(self):
+        return data_version(self.path)
+
+    def _load(self):
+        return Catalogue.from_csv(self.path)
+
+    def check(self, wait=False):
+        """Lance une reconstruction si la version sur disque a changé ; retourne True si lancée"""
+        try:
+            version = self._disk_version()
+        except (OSError, ValueError) as e:
+            self.last_error = str(e)
+            return False
+        if version == self.version:
+            self._stale_checks = 0
+            return False
+        # Fichier déjà remplacé mais manifeste pas encore écrit : on attend un contrôle
+        # (sinon on rechargerait deux fois, sur la version provisoire puis sur la vraie)
+        if os.path.exists(manifest_path(self.path)) and read_manifest(self.path) is None:
+            self._stale_checks += 1
+            if self._stale_checks < 2 and not wait:
+                return False
+        self._stale_checks = 0
+        with self._lock:
+            if self.loading:
+                return False
+            self.loading = True
+        thread = threading.Thread(target=self._reload, name='catalogue-reload', daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def _reload(self):
+        start = time.perf_counter()
+        try:
+            fresh = self._load()
+            old_version, self.current = self.version, fresh
+            self.reloads += old_version is not None
+            self.last_error = None
+            logging.info(f"Catalogue chargé : {old_version} -> {fresh.version} "
+                         f"({len(fresh)} vins, {time.perf_counter() - start:.1f} s)")
+        except Exception as e:
+            self.last_error = str(e)
+            logging.exception(f"Rechargement du catalogue {self.path} impossible")
+        finally:
+            self.loading = False
+
+    def start(self):
+        """Lance le premier chargement s'il reste à faire, puis surveille le manifeste toutes les `poll_s` secondes"""
+        if self.current is None:
+            self.check()
+        if self._watcher is None and self.poll_s:
+            self._watcher = threading.Thread(target=self._watch, name='catalogue-watch', daemon=True)
+            self._watcher.start()
+        return self
+
+    def _watch(self):
+        while not self._stop.wait(self.poll_s):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self):
+        return {'ready': self.ready, 'version': self.version, 'wines': len(self.current) if self.ready else 0,
+                'reloads': self.reloads, 'loading': self.loading, 'last_error': self.last_error}
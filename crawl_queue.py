@@ -0,0 +1,428 @@
+"""File de travail de la collecte, partagée par plusieurs processus et machines (baux, battements, reprise).
+
+Les URLs de listing et de fiches produits (une tâche = source, type, URL) sont
+poussées dans la file ; chaque worker prend des tâches à bail (`lease_s` secondes),
+prolonge ses baux tant qu'il y travaille (battement de cœur), puis rend le résultat :
+fiches collectées et nouvelles URLs à visiter, écrites dans la même transaction. Un
+bail expiré (worker arrêté, machine perdue) remet la tâche dans la file ; après
+`max_attempts` prises, elle est marquée en échec. Une URL n'est poussée qu'une fois.
+
+    SqliteQueue   fichier SQLite (journal WAL) : plusieurs processus d'une machine ;
+    serve()       la même file servie en HTTP/JSON ;
+    HttpQueue     client de ce service, même interface : workers sur d'autres machines.
+
+Le service n'écoute que la boucle locale par défaut. Ouvert aux autres machines
+(--host 0.0.0.0), il doit être protégé par un jeton partagé (--token ou
+BOUTEILLIA_QUEUE_TOKEN) : chaque requête porte l'en-tête Authorization: Bearer <jeton>.
+
+Toute autre base partagée (Redis, PostgreSQL...) s'ajoute en implémentant WorkQueue.
+Les workers (run_worker) téléchargent et analysent avec merchant_sources et le Fetcher.
+
+Usage :
+    python crawl_queue.py seed --queue crawl.sqlite --source vinatis --pages 150
+    BOUTEILLIA_QUEUE_TOKEN=... python crawl_queue.py serve --queue crawl.sqlite --host 0.0.0.0 --port 8510
+    BOUTEILLIA_QUEUE_TOKEN=... python crawl_queue.py work --queue http://machine-1:8510 --source vinatis
+    python crawl_queue.py stats --queue crawl.sqlite
+    python crawl_queue.py export --queue crawl.sqlite --output vins_marchands.csv
+"""
+import argparse
+import hmac
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+
+from merchant_sources import RECORD_COLUMNS, SOURCES, JsonLdSource, normalize_records
+
+DEFAULT_QUEUE = 'crawl_queue.sqlite'
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8510
+# Jeton partagé entre le service et ses workers (aucun par défaut)
+TOKEN = os.environ.get('BOUTEILLIA_QUEUE_TOKEN')
+LEASE_S = 60.0
+MAX_ATTEMPTS = 3
+PENDING, LEASED, DONE, FAILED = 0, 1, 2, 3
+STATE_NAMES = {PENDING: 'pending', LEASED: 'leased', DONE: 'done', FAILED: 'failed'}
+
+Task = namedtuple('Task', 'id source kind url attempts')
+
+
+class WorkQueue:
+    """Contrat d'une file de travail à baux ; `worker` identifie le processus (hôte:pid)"""
+
+    def push(self, tasks):
+        """Ajoute des tâches (source, type, url) ; les URLs déjà connues sont ignorées. Retourne le nombre ajouté"""
+        raise NotImplementedError
+
+    def lease(self, worker, n=1, lease_s=LEASE_S, sources=None):
+        """Jusqu'à `n` tâches à bail, des `sources` données (toutes par défaut) : liste de Task"""
+        raise NotImplementedError
+
+    def heartbeat(self, worker, task_ids, lease_s=LEASE_S):
+        """Prolonge les baux du worker ; retourne les ids qu'il détient encore"""
+        raise NotImplementedError
+
+    def complete(self, worker, task_id, records, links=()):
+        """Rend le résultat d'une tâche et pousse ses nouvelles tâches ; False si le bail a été perdu"""
+        raise NotImplementedError
+
+    def fail(self, worker, task_id, error):
+        """Remet la tâche dans la file (en échec après MAX_ATTEMPTS prises)"""
+        raise NotImplementedError
+
+    def stats(self):
+        raise NotImplementedError
+
+    def records(self):
+        """Fiches rendues par les tâches terminées (dicts aux colonnes RECORD_COLUMNS)"""
+        raise NotImplementedError
+
+
+class SqliteQueue(WorkQueue):
+    """File dans un fichier SQLite ; chaque écriture est une transaction IMMEDIATE (un écrivain à la fois)"""
+
+    def __init__(self, path=DEFAULT_QUEUE, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        # Une connexion par thread (battement de cœur, threads du service) et par processus
+        self._local = threading.local()
+        # executescript valide lui-même : le schéma est créé hors transaction (IF NOT EXISTS)
+        self._conn().executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id INTEGER PRIMARY KEY, source TEXT NOT NULL, kind TEXT NOT NULL, url TEXT NOT NULL,
+                state INTEGER NOT NULL DEFAULT 0, worker TEXT, lease_until REAL, attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT, UNIQUE (source, url));
+            CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, lease_until);
+            CREATE TABLE IF NOT EXISTS results (task_id INTEGER PRIMARY KEY, worker TEXT NOT NULL,
+                                                records TEXT NOT NULL, finished_at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=60, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    class _Transaction:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            # IMMEDIATE : le verrou d'écriture est pris tout de suite, pas de conflit lecture -> écriture
+            self.conn.execute("BEGIN IMMEDIATE")
+            return self.conn
+
+        def __exit__(self, exc_type, *exc):
+            self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+    def _write(self):
+        return self._Transaction(self._conn())
+
+    @staticmethod
+    def _count(conn, name, n):
+        if n:
+            conn.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET value = value + ?",
+                         (name, n, n))
+
+    def push(self, tasks):
+        with self._write() as conn:
+            return self._push(conn, tasks)
+
+    @staticmethod
+    def _push(conn, tasks):
+        before = conn.total_changes
+        conn.executemany("INSERT OR IGNORE INTO tasks (source, kind, url) VALUES (?, ?, ?)", list(tasks))
+        return conn.total_changes - before
+
+    def lease(self, worker, n=1, lease_s=LEASE_S, sources=None):
+        now = time.time()
+        where, params = "state = ?", [PENDING]
+        if sources is not None:
+            where += f" AND source IN ({', '.join('?' * len(sources))})"
+            params += list(sources)
+        with self._write() as conn:
+            # Baux expirés : la tâche revient dans la file, ou passe en échec si elle a épuisé ses prises
+            expired = conn.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                                   "worker = NULL, error = 'bail expiré' WHERE state = ? AND lease_until < ?",
+                                   (self.max_attempts, FAILED, PENDING, LEASED, now)).rowcount
+            self._count(conn, 'requeued', expired)
+            rows = conn.execute(f"SELECT id, source, kind, url, attempts FROM tasks WHERE {where} "
+                                "ORDER BY id LIMIT ?", params + [n]).fetchall()
+            conn.executemany("UPDATE tasks SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 "
+                             "WHERE id = ?", [(LEASED, worker, now + lease_s, row[0]) for row in rows])
+        return [Task(task_id, source, kind, url, attempts + 1) for task_id, source, kind, url, attempts in rows]
+
+    def heartbeat(self, worker, task_ids, lease_s=LEASE_S):
+        task_ids = [int(i) for i in task_ids]
+        if not task_ids:
+            return []
+        with self._write() as conn:
+            conn.execute(f"UPDATE tasks SET lease_until = ? WHERE state = ? AND worker = ? "
+                         f"AND id IN ({', '.join('?' * len(task_ids))})", [time.time() + lease_s, LEASED, worker] + task_ids)
+            held = conn.execute(f"SELECT id FROM tasks WHERE state = ? AND worker = ? "
+                                f"AND id IN ({', '.join('?' * len(task_ids))})", [LEASED, worker] + task_ids)
+            return [i for (i,) in held]
+
+    def complete(self, worker, task_id, records, links=()):
+        with self._write() as conn:
+            # Bail perdu (expiré puis repris par un autre worker) : le résultat est ignoré
+            if not conn.execute("UPDATE tasks SET state = ?, error = NULL WHERE id = ? AND state = ? AND worker = ?",
+                                (DONE, task_id, LEASED, worker)).rowcount:
+                self._count(conn, 'lost_leases', 1)
+                return False
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                         (task_id, worker, json.dumps(records, ensure_ascii=False), time.time()))
+            self._count(conn, 'discovered', self._push(conn, links))
+            return True
+
+    def fail(self, worker, task_id, error):
+        with self._write() as conn:
+            return bool(conn.execute("UPDATE tasks SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                                     "worker = NULL, error = ? WHERE id = ? AND state = ? AND worker = ?",
+                                     (self.max_attempts, FAILED, PENDING, str(error)[:500], task_id, LEASED,
+                                      worker)).rowcount)
+
+    def stats(self):
+        conn = self._conn()
+        stats = dict.fromkeys(STATE_NAMES.values(), 0)
+        stats['sources'] = {}
+        for source, state, n in conn.execute("SELECT source, state, COUNT(*) FROM tasks GROUP BY source, state"):
+            stats[STATE_NAMES[state]] += n
+            stats['sources'].setdefault(source, dict.fromkeys(STATE_NAMES.values(), 0))[STATE_NAMES[state]] = n
+        stats.update(conn.execute("SELECT name, value FROM counters").fetchall())
+        workers = conn.execute("SELECT worker, COUNT(*), MIN(finished_at), MAX(finished_at) FROM results "
+                               "GROUP BY worker").fetchall()
+        stats['workers'] = {w: {'tasks': n, 'first': first, 'last': last} for w, n, first, last in workers}
+        return stats
+
+    def records(self):
+        for (records,) in self._conn().execute("SELECT records FROM results ORDER BY task_id"):
+            yield from json.loads(records)
+
+
+class HttpQueue(WorkQueue):
+    """Client de serve() : même interface que SqliteQueue, pour des workers sur d'autres machines"""
+
+    def __init__(self, base_url, timeout=30, token=TOKEN):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        if token:
+            self.session.headers['Authorization'] = f"Bearer {token}"
+        self.timeout = timeout
+
+    def _call(self, method, **params):
+        response = self.session.post(f"{self.base_url}/{method}", json=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()['result']
+
+    def push(self, tasks):
+        return self._call('push', tasks=[list(t) for t in tasks])
+
+    def lease(self, worker, n=1, lease_s=LEASE_S, sources=None):
+        return [Task(*task) for task in self._call('lease', worker=worker, n=n, lease_s=lease_s,
+                                                   sources=None if sources is None else list(sources))]
+
+    def heartbeat(self, worker, task_ids, lease_s=LEASE_S):
+        return self._call('heartbeat', worker=worker, task_ids=list(task_ids), lease_s=lease_s)
+
+    def complete(self, worker, task_id, records, links=()):
+        return self._call('complete', worker=worker, task_id=task_id, records=records, links=[list(l) for l in links])
+
+    def fail(self, worker, task_id, error):
+        return self._call('fail', worker=worker, task_id=task_id, error=str(error))
+
+    def stats(self):
+        return self._call('stats')
+
+    def records(self):
+        return iter(self._call('records'))
+
+
+def make_server(queue, host=DEFAULT_HOST, port=DEFAULT_PORT, token=TOKEN):
+    """Service HTTP/JSON de `queue` : POST /<méthode>, arguments en JSON, réponse {'result': ...}
+
+    Avec `token`, une requête sans l'en-tête Authorization: Bearer <token> reçoit une erreur 401.
+    """
+    methods = {'push', 'lease', 'heartbeat', 'complete', 'fail', 'stats', 'records'}
+    expected = f"Bearer {token}".encode('utf-8') if token else None
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            name = self.path.strip('/')
+            # Corps lu dans tous les cas : la connexion (keep-alive) reste utilisable après un refus
+            payload = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            try:
+                if expected is not None and not hmac.compare_digest(
+                        self.headers.get('Authorization', '').encode('utf-8'), expected):
+                    raise PermissionError("jeton absent ou invalide")
+                params = json.loads(payload or b'{}')
+                if name not in methods:
+                    raise KeyError(f"méthode inconnue : {name}")
+                result = getattr(queue, name)(**params)
+                status, body = 200, {'result': list(result) if name == 'records' else result}
+            except PermissionError as e:
+                status, body = 401, {'error': str(e)}
+            except Exception as e:
+                status, body = 400, {'error': str(e)}
+            data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+
+def serve(queue, host=DEFAULT_HOST, port=DEFAULT_PORT, token=TOKEN):
+    """Sert `queue` jusqu'à l'arrêt du processus"""
+    if not token and host not in ('127.0.0.1', 'localhost', '::1'):
+        logging.warning(f"File servie sur {host} sans jeton : toute machine qui atteint ce port peut la vider")
+    server = make_server(queue, host, port, token)
+    logging.info(f"File {getattr(queue, 'path', queue)} servie sur {host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+
+
+def open_queue(spec, token=TOKEN):
+    """http(s)://... -> HttpQueue, sinon chemin d'un fichier SQLite"""
+    return HttpQueue(spec, token=token) if spec.startswith(('http://', 'https://')) else SqliteQueue(spec)
+
+
+def seed(queue, sources, max_pages):
+    """Pousse les pages de listing des sources ; retourne le nombre de tâches ajoutées"""
+    return queue.push([(source.name, 'listing', url) for source in sources for url in source.listing_urls(max_pages)])
+
+
+def run_worker(queue, sources, fetcher, worker=None, lease_s=LEASE_S, batch=None, poll_s=0.5):
+    """Prend des tâches jusqu'à ce que la file soit vide ; retourne le nombre de tâches rendues.
+
+    Autant de tâches sont prises à la fois que le Fetcher en télécharge en parallèle ;
+    un thread prolonge leurs baux tous les lease_s / 3.
+    """
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    by_name = {source.name: source for source in sources}
+    for source in sources:
+        fetcher.set_rate(source.host, source.per_minute)
+    batch = batch or fetcher.concurrency
+    held = set()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(lease_s / 3):
+            with lock:
+                ids = list(held)
+            try:
+                kept = set(queue.heartbeat(worker, ids, lease_s)) if ids else set()
+            except Exception as e:
+                # Service injoignable un instant, base verrouillée... : les baux courent encore, on réessaie
+                logging.warning(f"Battement de {worker} impossible ({len(ids)} baux) : {e}")
+                continue
+            with lock:
+                held.difference_update(set(ids) - kept)
+
+    threading.Thread(target=beat, name='heartbeat', daemon=True).start()
+    done = 0
+    try:
+        while True:
+            tasks = queue.lease(worker, batch, lease_s, sources=list(by_name))
+            if not tasks:
+                counts = [c for name, c in queue.stats()['sources'].items() if name in by_name]
+                # Plus rien à faire, ni en attente ni à bail chez un autre worker (qui pourrait pousser des URLs)
+                if not any(c['pending'] or c['leased'] for c in counts):
+                    return done
+                time.sleep(poll_s)
+                continue
+            with lock:
+                held.update(t.id for t in tasks)
+            futures = [(task, fetcher.submit(task.url, task.source)) for task in tasks]
+            for task, future in futures:
+                source, response = by_name[task.source], future.result()
+                try:
+                    if response.status != 200 or response.text is None:
+                        raise ValueError(f"HTTP {response.status}")
+                    if task.kind == 'listing':
+                        found, links = source.parse_listing(response.text, response.url)
+                    else:
+                        found, links = [r for r in [source.parse_product(response.text, response.url)] if r], []
+                except Exception as e:
+                    queue.fail(worker, task.id, e)
+                else:
+                    records = normalize_records(found, source.name).to_dict('records') if found else []
+                    done += queue.complete(worker, task.id, records, [(source.name, 'product', l) for l in links])
+                with lock:
+                    held.discard(task.id)
+    finally:
+        stop.set()
+
+
+def export(queue, output):
+    df = pd.DataFrame.from_records(list(queue.records()), columns=RECORD_COLUMNS)
+    df.to_csv(output, index=False)
+    return len(df)
+
+
+def main():
+    from fetcher import Fetcher
+
+    parser = argparse.ArgumentParser(description="File de travail partagée de la collecte")
+    parser.add_argument('command', choices=['seed', 'serve', 'work', 'stats', 'export'])
+    parser.add_argument('--queue', default=DEFAULT_QUEUE, help="Fichier SQLite ou URL du service (http://...)")
+    parser.add_argument('--source', action='append', default=[], choices=sorted(SOURCES))
+    parser.add_argument('--jsonld', nargs=2, action='append', default=[], metavar=('NOM', 'URL'))
+    parser.add_argument('--pages', type=int, default=150)
+    parser.add_argument('--concurrency', type=int, default=2)
+    parser.add_argument('--lease', type=float, default=LEASE_S)
+    parser.add_argument('--host', default=DEFAULT_HOST, help="Adresse d'écoute de serve (0.0.0.0 : toutes)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--token', default=TOKEN, help="Jeton partagé du service (défaut : BOUTEILLIA_QUEUE_TOKEN)")
+    parser.add_argument('--output', default='vins_marchands.csv')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    queue = open_queue(args.queue, args.token)
+    sources = [SOURCES[name]() for name in args.source] + [JsonLdSource(name, url) for name, url in args.jsonld]
+    if args.command in ('seed', 'work') and not sources:
+        parser.error("au moins une source (--source ou --jsonld)")
+    if args.command == 'seed':
+        logging.info(f"{seed(queue, sources, args.pages)} pages de listing ajoutées")
+    elif args.command == 'serve':
+        serve(queue, args.host, args.port, args.token)
+    elif args.command == 'work':
+        fetcher = Fetcher(concurrency=args.concurrency)
+        start = time.perf_counter()
+        try:
+            done = run_worker(queue, sources, fetcher, lease_s=args.lease)
+        finally:
+            fetcher.close()
+        seconds = time.perf_counter() - start
+        logging.info(f"{done} tâches en {seconds:.1f} s ({done / seconds:.1f} tâches/s)")
+    elif args.command == 'stats':
+        print(json.dumps(queue.stats(), ensure_ascii=False, indent=2))
+    else:
+        logging.info(f"{export(queue, args.output)} fiches -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
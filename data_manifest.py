@@ -0,0 +1,99 @@
+"""Manifeste des données du pipeline : empreinte du contenu et date de construction.
+
+Chaque fichier publié (ex. base_vin_final.csv) est accompagné d'un fichier
+<fichier>.manifest.json écrit après lui. La « version » qu'il contient sert de clé
+à tous les caches de l'application (catalogue, index, fiches, facettes) : quand le
+pipeline réécrit la base, la version change et les caches sont reconstruits.
+
+Usage (après un export depuis un notebook) : python data_manifest.py base_vin_final.csv
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+
+MANIFEST_SUFFIX = '.manifest.json'
+
+
+def manifest_path(data_path):
+    return data_path + MANIFEST_SUFFIX
+
+
+def content_hash(path, block_size=1 << 20):
+    """Empreinte BLAKE2b du fichier, lue par blocs"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_json_atomic(path, payload):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def write_manifest(data_path, rows=None, source=None):
+    """Calcule l'empreinte de `data_path` et écrit son manifeste (remplacement atomique)"""
+    stat = os.stat(data_path)
+    digest = content_hash(data_path)
+    manifest = {
+        'file': os.path.basename(data_path),
+        'version': digest[:16],
+        'content_hash': f"blake2b:{digest}",
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'rows': rows,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'source': source,
+    }
+    _write_json_atomic(manifest_path(data_path), manifest)
+    return manifest
+
+
+def read_manifest(data_path):
+    """Manifeste de `data_path`, ou None s'il manque ou ne correspond plus au fichier"""
+    try:
+        with open(manifest_path(data_path), encoding='utf-8') as f:
+            manifest = json.load(f)
+        stat = os.stat(data_path)
+    except (OSError, ValueError):
+        return None
+    # Fichier réécrit sans nouveau manifeste : le manifeste est périmé
+    if manifest.get('size') != stat.st_size or manifest.get('mtime_ns') != stat.st_mtime_ns:
+        return None
+    return manifest
+
+
+def data_version(data_path):
+    """Version des données : celle du manifeste, sinon taille + date de modification du fichier"""
+    manifest = read_manifest(data_path)
+    if manifest is not None:
+        return manifest['version']
+    stat = os.stat(data_path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def publish_csv(df, data_path, source=None, **to_csv_kwargs):
+    """Écrit un CSV de façon atomique puis son manifeste (les lecteurs ne voient jamais un fichier partiel)"""
+    tmp_path = f"{data_path}.tmp{os.getpid()}"
+    df.to_csv(tmp_path, **{'index': False, **to_csv_kwargs})
+    os.replace(tmp_path, data_path)
+    return write_manifest(data_path, rows=len(df), source=source)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Écrit le manifeste (empreinte, date) d'un fichier de données")
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--source', default=None, help="Étape du pipeline qui a produit le fichier")
+    args = parser.parse_args()
+    for path in args.files:
+        manifest = write_manifest(path, source=args.source)
+        print(f"{path} : version {manifest['version']} ({manifest['size']} octets)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""Facettes et agrégats du catalogue, calculés une fois par version des données.
+
+- AggregateCache : nombre de vins par valeur de chaque facette, quantiles et
+  histogramme des prix, tableau couleur x pays (page d'accueil, bornes du slider).
+- FacetIndex : un bitmap compressé (np.packbits) par valeur de facette. Le nombre de
+  vins qui correspondent aux filtres en cours s'obtient par ET binaire + comptage
+  des bits, sans refiltrer le DataFrame.
+
+Un accord choisi trouve aussi les vins dont un accord le contient (« Viande » trouve
+« Viande rouge »), comme l'ancienne recherche par sous-chaîne dans la liste du vin.
+"""
+import numpy as np
+import pandas as pd
+
+FACETS = ('pays', 'couleur', 'accords', 'bio')
+
+# Nombre de bits à 1 de chaque octet
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def popcount(packed):
+    return int(POPCOUNT[packed].sum(dtype=np.int64))
+
+
+def explode_accords(values):
+    """Accords de chaque ligne, à plat : Series indexée par position de ligne"""
+    cleaned = values.reset_index(drop=True).astype(str).str.replace(r"[\[\]']", '', regex=True)
+    accords = cleaned.where(cleaned != 'nan').str.split(', ').explode()
+    return accords[accords.notna() & (accords != '')]
+
+
+def contained_accords(labels):
+    """Couples (i, j) d'accords tels que labels[j] est contenu dans labels[i] (i, j compris), triés par i"""
+    return [(i, j) for i, label in enumerate(labels) for j, part in enumerate(labels) if part in label]
+
+
+def matching_accords(accords, labels):
+    """Accords de `labels` qui contiennent l'un des accords choisis (un accord hors vocabulaire compris)"""
+    return [label for label in labels if any(accord in label for accord in accords)]
+
+
+def expand_accords(rows, values):
+    """Ajoute à chaque vin les accords contenus dans les siens ; (positions, accords) sans doublon"""
+    codes, labels = pd.factorize(values)
+    if not len(labels):
+        return rows, values
+    containers, parts = np.array(contained_accords([str(label) for label in labels]), dtype=np.int64).T
+    lengths = np.bincount(containers, minlength=len(labels))
+    starts = np.cumsum(lengths) - lengths
+    counts = lengths[codes]
+    # Pour chaque couple (vin, accord), les accords contenus dans cet accord
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    expanded = parts[np.repeat(starts[codes], counts) + offsets]
+    # Lignes déjà dans l'ordre des vins : le tri stable (timsort) est presque linéaire
+    keys = np.sort(np.repeat(rows, counts) * len(labels) + expanded, kind='stable')
+    keys = keys[np.concatenate([[True], keys[1:] != keys[:-1]])]
+    return keys // len(labels), np.asarray(labels, dtype=object)[keys % len(labels)]
+
+
+def _facet_values(df, facet):
+    """(positions des lignes, valeurs) pour une facette, sans les valeurs manquantes"""
+    if facet == 'accords':
+        accords = explode_accords(df['accords'])
+        return expand_accords(accords.index.to_numpy(), accords.to_numpy(dtype=object))
+    values = df[facet].astype(str).reset_index(drop=True)
+    values = values[values != 'nan']
+    return values.index.to_numpy(), values.to_numpy(dtype=object)
+
+
+class FacetIndex:
+    """Bitmaps par valeur de facette, et comptages « N vins correspondent »"""
+
+    def __init__(self, df):
+        self.n_rows = len(df)
+        self.prix = df['prix'].to_numpy(dtype=float)
+        self.all = np.packbits(np.ones(self.n_rows, dtype=bool))
+        self.bitmaps = {}
+        for facet in FACETS:
+            if facet not in df.columns:
+                continue
+            rows, values = _facet_values(df, facet)
+            codes, uniques = pd.factorize(values)
+            order = np.argsort(codes, kind='stable')
+            bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+            bitmaps = {}
+            for k, value in enumerate(uniques):
+                mask = np.zeros(self.n_rows, dtype=bool)
+                mask[rows[order[bounds[k]:bounds[k + 1]]]] = True
+                bitmaps[str(value)] = np.packbits(mask)
+            self.bitmaps[facet] = dict(sorted(bitmaps.items()))
+
+    def to_arrays(self):
+        """(tableaux, métadonnées JSON) de l'index, pour un catalogue partagé entre processus"""
+        keys = [[facet, value] for facet, bitmaps in self.bitmaps.items() for value in bitmaps]
+        matrix = np.stack([self.bitmaps[f][v] for f, v in keys]) if keys else np.zeros((0, len(self.all)), np.uint8)
+        return {'prix': self.prix, 'all': self.all, 'bitmaps': matrix}, {'n_rows': self.n_rows, 'keys': keys}
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Index relu depuis to_arrays() ; les bitmaps sont des vues (sans copie) de la matrice"""
+        index = cls.__new__(cls)
+        index.n_rows = meta['n_rows']
+        index.prix = arrays['prix']
+        index.all = arrays['all']
+        index.bitmaps = {}
+        for k, (facet, value) in enumerate(meta['keys']):
+            index.bitmaps.setdefault(facet, {})[value] = arrays['bitmaps'][k]
+        return index
+
+    def pack(self, mask):
+        return np.packbits(mask)
+
+    def unpack(self, packed):
+        return np.unpackbits(packed, count=self.n_rows).astype(bool)
+
+    def filter_bitmaps(self, pays=None, couleur=None, bio=False, prix_min=None, prix_max=None, accords=()):
+        """Un bitmap par filtre actif (les accords sélectionnés sont combinés par OU)"""
+        active = {}
+        for facet, value in (('pays', pays), ('couleur', couleur)):
+            if value and value != "Tous":
+                active[facet] = self.bitmaps.get(facet, {}).get(value, np.zeros_like(self.all))
+        if bio:
+            active['bio'] = self.bitmaps.get('bio', {}).get('1', np.zeros_like(self.all))
+        if accords:
+            selected = np.zeros_like(self.all)
+            bitmaps = self.bitmaps.get('accords', {})
+            for label in matching_accords(accords, bitmaps):
+                selected |= bitmaps[label]
+            active['accords'] = selected
+        if prix_min is not None or prix_max is not None:
+            mask = np.ones(self.n_rows, dtype=bool)
+            if prix_min is not None:
+                mask &= self.prix >= prix_min
+            if prix_max is not None:
+                mask &= self.prix <= prix_max
+            active['prix'] = self.pack(mask)
+        return active
+
+    def combine(self, active, exclude=None):
+        packed = self.all.copy()
+        for name, bitmap in active.items():
+            if name != exclude:
+                packed &= bitmap
+        return packed
+
+    def mask(self, **filters):
+        """Masque booléen des vins qui passent les filtres de facettes"""
+        return self.unpack(self.combine(self.filter_bitmaps(**filters)))
+
+    def counts(self, active):
+        """Total et, pour chaque facette, le nombre de vins par valeur si on choisissait cette valeur.
+
+        Le comptage d'une facette ignore son propre filtre (les autres restent appliqués),
+        pour que les options non sélectionnées affichent aussi leur nombre de vins.
+        """
+        result = {'total': popcount(self.combine(active)), 'facets': {}}
+        for facet, bitmaps in self.bitmaps.items():
+            base = self.combine(active, exclude=facet)
+            result['facets'][facet] = {value: popcount(base & bitmap) for value, bitmap in bitmaps.items()}
+        return result
+
+    def nbytes(self):
+        return sum(b.nbytes for bitmaps in self.bitmaps.values() for b in bitmaps.values())
+
+
+def build_aggregates(df, version=None, bins=20):
+    """Agrégats affichés par l'application, calculés une seule fois par version des données"""
+    prix = df['prix'].dropna()
+    counts, edges = np.histogram(prix, bins=bins) if len(prix) else (np.array([]), np.array([]))
+    aggregates = {
+        'version': version,
+        'n_wines': len(df),
+        'counts': {},
+        'prix': {
+            'min': float(prix.min()) if len(prix) else 0.0,
+            'max': float(prix.max()) if len(prix) else 0.0,
+            'quantiles': {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, prix.quantile(QUANTILES))},
+            'histogram': {'edges': [round(float(e), 2) for e in edges], 'counts': counts.tolist()},
+        },
+    }
+    for facet in FACETS:
+        if facet in df.columns:
+            _, values = _facet_values(df, facet)
+            aggregates['counts'][facet] = pd.Series(values).value_counts().sort_index().to_dict()
+    if 'couleur' in df.columns and 'pays' in df.columns:
+        table = pd.crosstab(df['couleur'], df['pays'])
+        aggregates['couleur_pays'] = {c: {p: int(n) for p, n in row.items() if n} for c, row in table.iterrows()}
+    return aggregates
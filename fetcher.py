@@ -0,0 +1,170 @@
+"""Téléchargement partagé par les sources du scraping (merchant_sources) : pool, concurrence, rythme, cache, reprises.
+
+Chaque marchand ne fournit que ses URLs et ses analyseurs ; le réseau passe par un
+seul Fetcher :
+
+    - une session requests et son pool de connexions (keep-alive) pour tous les threads ;
+    - `concurrency` téléchargements en parallèle (ThreadPoolExecutor) ;
+    - un budget de requêtes par minute et par hôte (pacing.RateBudget) : un marchand
+      lent ou strict ne ralentit pas les autres ;
+    - reprises avec attente exponentielle sur erreur réseau, 429 et 5xx (Retry-After respecté) ;
+    - un cache sur disque, une réponse par URL (JSON lisible) : relancer une collecte
+      interrompue ne retélécharge rien, et un dossier de cache enregistré sert de jeu de
+      pages de référence (fixtures) rejoué hors ligne (`offline=True`).
+
+Les compteurs et latences vont dans un ScraperMetrics, préfixés par la source.
+"""
+import hashlib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from pacing import RateBudget
+from scraper_metrics import ScraperMetrics
+
+USER_AGENT = "Mozilla/5.0 (compatible; BouteillIA/1.0)"
+# Statuts repris après une attente (les autres erreurs HTTP sont définitives)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# `status` None : page absente (erreur réseau après les reprises, ou hors ligne sans fixture)
+Response = namedtuple('Response', 'url status text elapsed from_cache')
+
+
+class FetchCache:
+    """Réponses enregistrées par URL : <dossier>/<sha1[:2]>/<sha1>.json, écrites de façon atomique"""
+
+    def __init__(self, directory, ttl_s=None):
+        self.directory = directory
+        self.ttl_s = ttl_s
+
+    def _path(self, url):
+        digest = hashlib.sha1(url.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest[:2], f"{digest}.json")
+
+    def get(self, url):
+        """Réponse enregistrée pour `url`, None si absente ou plus vieille que ttl_s"""
+        path = self._path(url)
+        try:
+            if self.ttl_s is not None and time.time() - os.path.getmtime(path) > self.ttl_s:
+                return None
+            with open(path, encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return Response(url, entry['status'], entry['text'], 0.0, True)
+
+    def put(self, response):
+        path = self._path(response.url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'url': response.url, 'status': response.status, 'text': response.text,
+                       'fetched_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def __len__(self):
+        return sum(len(files) for _, _, files in os.walk(self.directory))
+
+
+class Fetcher:
+    """Télécharge des pages pour toutes les sources, dans un pool de threads partagé"""
+
+    def __init__(self, concurrency=8, per_minute=120, burst=4, retries=3, backoff_s=1.0, timeout=20,
+                 cache=None, offline=False, metrics=None, session=None):
+        self.concurrency = concurrency
+        self.per_minute = per_minute
+        self.burst = burst
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.timeout = timeout
+        self.cache = cache
+        self.offline = offline
+        self.metrics = metrics or ScraperMetrics()
+        self.session = session or self._session(concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='fetch')
+        self._budgets = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _session(concurrency):
+        session = requests.Session()
+        # Une connexion gardée ouverte par thread et par hôte ; les reprises sont faites ici, pas par urllib3
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=concurrency, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers['User-Agent'] = USER_AGENT
+        return session
+
+    def set_rate(self, host, per_minute, burst=None):
+        """Budget propre à un hôte (celui que déclare la source), à la place de `per_minute`"""
+        with self._lock:
+            self._budgets[host] = RateBudget(per_minute=per_minute, burst=burst or self.burst)
+
+    def _budget(self, host):
+        with self._lock:
+            budget = self._budgets.get(host)
+            if budget is None:
+                budget = self._budgets[host] = RateBudget(per_minute=self.per_minute, burst=self.burst)
+            return budget
+
+    def fetch(self, url, source='web'):
+        """Page `url` (cache, puis réseau au rythme de son hôte, avec reprises)"""
+        metrics = self.metrics
+        if self.cache is not None:
+            cached = self.cache.get(url)
+            if cached is not None:
+                metrics.incr(f'{source}.cache_hits')
+                metrics.incr(f'{source}.bytes', len(cached.text))
+                return cached
+        if self.offline:
+            metrics.incr(f'{source}.missing')
+            return Response(url, None, None, 0.0, False)
+        budget = self._budget(urlsplit(url).netloc)
+        start = time.perf_counter()
+        for attempt in range(self.retries + 1):
+            wait = budget.acquire()
+            if wait > 0:
+                time.sleep(wait)
+                metrics.observe(f'pace.{source}', wait)
+            retry_after = None
+            try:
+                with metrics.stage(f'fetch.{source}'):
+                    reply = self.session.get(url, timeout=self.timeout)
+                status, text = reply.status_code, reply.text
+                retry_after = reply.headers.get('Retry-After')
+            except requests.RequestException:
+                status, text = None, None
+                metrics.incr(f'{source}.network_errors')
+            if status is not None and status not in RETRY_STATUSES:
+                response = Response(url, status, text, time.perf_counter() - start, False)
+                metrics.incr(f'{source}.pages' if status == 200 else f'{source}.http_{status}')
+                metrics.incr(f'{source}.bytes', len(text))
+                if self.cache is not None and status in (200, 404):
+                    self.cache.put(response)
+                return response
+            if attempt < self.retries:
+                metrics.incr(f'{source}.retries')
+                delay = self.backoff_s * 2 ** attempt * random.uniform(0.8, 1.2)
+                if retry_after and retry_after.isdigit():
+                    delay = max(delay, float(retry_after))
+                time.sleep(delay)
+                metrics.observe(f'retry_wait.{source}', delay)
+        metrics.incr(f'{source}.failed')
+        return Response(url, status, None, time.perf_counter() - start, False)
+
+    def submit(self, url, source='web'):
+        """Téléchargement de `url` dans le pool partagé : Future de la Response"""
+        return self.executor.submit(self.fetch, url, source)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        self.session.close()
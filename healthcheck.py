@@ -0,0 +1,52 @@
+"""Sonde de disponibilité des services BouteillIA (bibliothèque standard uniquement).
+
+Attend qu'une URL réponde 200 : /ready du service des vins (catalogue chargé) ou
+/_stcore/health du serveur Streamlit. Code de sortie 0 si prêt, 1 sinon ; utilisable
+comme sonde de conteneur ou dans un script de démarrage.
+
+Usage : python healthcheck.py http://127.0.0.1:8502/ready --timeout 60
+        python healthcheck.py http://127.0.0.1:8501/_stcore/health
+"""
+import argparse
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+def probe(url, timeout=2.0):
+    """Code HTTP de `url`, ou None si le serveur ne répond pas"""
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return None
+
+
+def wait_ready(url, timeout=60.0, interval=0.05):
+    """Interroge `url` jusqu'à un 200 ; retourne le temps d'attente en secondes, ou None si dépassé"""
+    start = time.perf_counter()
+    while True:
+        if probe(url) == 200:
+            return time.perf_counter() - start
+        if time.perf_counter() - start > timeout:
+            return None
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attend qu'un service BouteillIA soit prêt")
+    parser.add_argument('url')
+    parser.add_argument('--timeout', type=float, default=0.0, help="Attente maximale en secondes (0 : un seul essai)")
+    args = parser.parse_args()
+    waited = wait_ready(args.url, args.timeout, interval=0.5)
+    if waited is None:
+        print(f"{args.url} : pas prêt (dernier statut {probe(args.url)})")
+        sys.exit(1)
+    print(f"{args.url} : prêt ({waited:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
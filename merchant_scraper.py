@@ -0,0 +1,142 @@
+"""Collecte multi-marchands : sources de merchant_sources sur le Fetcher partagé, statistiques par source.
+
+Les pages de listing de toutes les sources sont mises en file ; dès qu'un listing est
+analysé, ses fiches produits rejoignent la file de sa source (pas d'attente de la fin
+des listings). Chaque source a au plus `max_in_flight` téléchargements en cours dans le
+pool commun : un marchand au budget serré n'occupe pas les threads des autres.
+
+Le résultat a les colonnes RECORD_COLUMNS (+ date_collecte) ; les statistiques donnent,
+par source, pages téléchargées et relues du cache, reprises, échecs, fiches, octets et
+débit (pages/s, fiches/s).
+
+Usage :
+    python merchant_scraper.py --source vinatis --pages 150 --cache scraping_cache --output vins_marchands.csv
+    python merchant_scraper.py --jsonld cave https://cave.example/ --pages 20
+    python merchant_scraper.py --source vinatis --pages 3 --replay tests/fixtures/vinatis   (hors ligne, pages enregistrées)
+"""
+import argparse
+import json
+import logging
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import pandas as pd
+
+from fetcher import Fetcher, FetchCache
+from merchant_sources import RECORD_COLUMNS, SOURCES, JsonLdSource, normalize_records
+
+COUNTERS = ('pages', 'cache_hits', 'retries', 'failed', 'missing', 'network_errors', 'parse_errors', 'bytes')
+
+
+def scrape(sources, fetcher, max_pages=5, max_products=None):
+    """Collecte les sources en parallèle ; retourne (DataFrame des fiches, statistiques par source)"""
+    by_name = {source.name: source for source in sources}
+    queues = {source.name: deque(('listing', url) for url in source.listing_urls(max_pages)) for source in sources}
+    for source in sources:
+        fetcher.set_rate(source.host, source.per_minute)
+    records = {name: [] for name in by_name}
+    seen = {name: set() for name in by_name}
+    started = {name: time.perf_counter() for name in by_name}
+    finished = dict(started)
+    in_flight = {}
+    metrics = fetcher.metrics
+
+    def fill():
+        for name, queue in queues.items():
+            source = by_name[name]
+            running = sum(1 for n, _ in in_flight.values() if n == name)
+            while queue and running < source.max_in_flight:
+                kind, url = queue.popleft()
+                in_flight[fetcher.submit(url, name)] = (name, kind)
+                running += 1
+
+    fill()
+    while in_flight:
+        done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+        for future in done:
+            name, kind = in_flight.pop(future)
+            source, response = by_name[name], future.result()
+            finished[name] = time.perf_counter()
+            if response.status != 200 or response.text is None:
+                continue
+            try:
+                if kind == 'listing':
+                    found, links = source.parse_listing(response.text, response.url)
+                else:
+                    found, links = [r for r in [source.parse_product(response.text, response.url)] if r], []
+            except Exception as e:
+                metrics.incr(f'{name}.parse_errors')
+                logging.warning(f"{name} : page illisible {response.url} ({e})")
+                continue
+            room = None if max_products is None else max(0, max_products - len(records[name]))
+            records[name].extend(found[:room])
+            for link in links:
+                if link not in seen[name] and (max_products is None or len(seen[name]) < max_products):
+                    seen[name].add(link)
+                    queues[name].append(('product', link))
+        fill()
+
+    df = pd.concat([normalize_records(records[name], name) for name in by_name], ignore_index=True) \
+        if by_name else pd.DataFrame(columns=RECORD_COLUMNS)
+    df['date_collecte'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    counters = metrics.summary()['counters']
+    stats = {}
+    for name in by_name:
+        seconds = finished[name] - started[name]
+        entry = {counter: counters.get(f'{name}.{counter}', 0) for counter in COUNTERS}
+        pages = entry['pages'] + entry['cache_hits']
+        entry.update({'records': len(records[name]), 'seconds': round(seconds, 3),
+                      'pages_per_s': round(pages / seconds, 1) if seconds else 0.0,
+                      'records_per_s': round(len(records[name]) / seconds, 1) if seconds else 0.0})
+        stats[name] = entry
+    return df, stats
+
+
+def replay(source, fixtures_dir, max_pages=1):
+    """Rejoue une source sur des pages enregistrées (dossier de cache), sans réseau"""
+    fetcher = Fetcher(cache=FetchCache(fixtures_dir), offline=True)
+    try:
+        return scrape([source], fetcher, max_pages)
+    finally:
+        fetcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collecte des vins de plusieurs marchands")
+    parser.add_argument('--source', action='append', default=[], choices=sorted(SOURCES))
+    parser.add_argument('--jsonld', nargs=2, action='append', default=[], metavar=('NOM', 'URL'),
+                        help="Marchand générique aux fiches JSON-LD (listing URL + 'vins?page=N')")
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--max-products', type=int)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cache', help="Dossier de cache des pages (et d'enregistrement des fixtures)")
+    parser.add_argument('--ttl-hours', type=float, help="Âge maximal d'une page du cache")
+    parser.add_argument('--replay', help="Dossier de pages enregistrées, rejouées hors ligne")
+    parser.add_argument('--output', default='vins_marchands.csv')
+    parser.add_argument('--stats', default='scraping_sources.json')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sources = [SOURCES[name]() for name in args.source] + [JsonLdSource(name, url) for name, url in args.jsonld]
+    if not sources:
+        parser.error("au moins une source (--source ou --jsonld)")
+    directory = args.replay or args.cache
+    cache = FetchCache(directory, args.ttl_hours * 3600 if args.ttl_hours else None) if directory else None
+    fetcher = Fetcher(concurrency=args.concurrency, cache=cache, offline=bool(args.replay))
+    try:
+        df, stats = scrape(sources, fetcher, args.pages, args.max_products)
+    finally:
+        fetcher.close()
+    df.to_csv(args.output, index=False)
+    with open(args.stats, 'w', encoding='utf-8') as f:
+        json.dump(stats, f, ensure_ascii=False, indent=2)
+    for name, entry in stats.items():
+        logging.info(f"{name:<12} {entry['records']:>7} fiches  {entry['pages']:>5} pages  "
+                     f"{entry['cache_hits']:>5} du cache  {entry['retries']:>4} reprises  {entry['failed']:>3} échecs  "
+                     f"{entry['pages_per_s']:>6.1f} pages/s  {entry['records_per_s']:>7.1f} fiches/s")
+    logging.info(f"{len(df)} fiches -> {args.output} (statistiques : {args.stats})")
+
+
+if __name__ == "__main__":
+    main()
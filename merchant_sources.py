@@ -0,0 +1,193 @@
+"""Sources du scraping multi-marchands : chaque marchand ne fournit que ses URLs et ses analyseurs.
+
+Une source déclare :
+
+    listing_urls(max_pages)       URLs des pages de listing à télécharger ;
+    parse_listing(text, url)      (fiches lues sur le listing, URLs de fiches produits à télécharger) ;
+    parse_product(text, url)      fiche d'une page produit (ou None).
+
+Les fiches sont des dicts aux noms de colonnes de la base (RECORD_COLUMNS, ceux de
+validation.SCHEMA : nom, prix, producteur..., plus source, stock et url). Le fichier
+collecté passe par validation.py, qui lui applique MERCHANT_SCHEMA (id : référence du
+marchand, unique par source ; degré facultatif) et garde source et stock, puis par
+price_history.py, où chaque vin est identifié par (source, id). Le téléchargement
+(pool, concurrence, rythme, cache, reprises) est celui de fetcher.Fetcher, partagé par
+toutes les sources (voir merchant_scraper). Les analyseurs ne font pas de réseau : ils
+se testent sur des pages enregistrées (dossier de cache rejoué hors ligne).
+
+Sources fournies : VinatisSource (JSON product_elastic des pages de listing, comme
+scrap_images_new.py) et JsonLdSource, pour un marchand dont les fiches produits
+décrivent le vin en JSON-LD schema.org (Product / Offer), le cas le plus courant.
+"""
+import json
+import re
+from urllib.parse import urljoin, urlsplit
+
+import pandas as pd
+
+from validation import RAW_COLUMNS
+from vinatis_urls import BASE_URL as VINATIS_URL
+
+RECORD_COLUMNS = ['source', 'id', 'nom', 'prix', 'producteur', 'appellation', 'region', 'pays', 'couleur',
+                  'millesime', 'deg_alcool', 'contenance', 'desc', 'visuel', 'stock', 'url']
+IN_STOCK, OUT_OF_STOCK = 'En stock', 'Rupture de stock'
+
+
+class Source:
+    """Marchand : URLs à télécharger et analyse des pages ; le réseau est l'affaire du Fetcher"""
+
+    name = None
+    base_url = None
+    # Budget de requêtes par minute sur l'hôte du marchand, et téléchargements en cours au plus
+    per_minute = 60
+    max_in_flight = 4
+
+    def __init__(self, base_url=None, per_minute=None, max_in_flight=None):
+        self.base_url = base_url or self.base_url
+        self.per_minute = per_minute or self.per_minute
+        self.max_in_flight = max_in_flight or self.max_in_flight
+
+    @property
+    def host(self):
+        return urlsplit(self.base_url).netloc
+
+    def listing_urls(self, max_pages):
+        raise NotImplementedError
+
+    def parse_listing(self, text, url):
+        """(fiches complètes, URLs de fiches produits) d'une page de listing"""
+        raise NotImplementedError
+
+    def parse_product(self, text, url):
+        return None
+
+
+class VinatisSource(Source):
+    """vinatis.com : chaque page de listing embarque ses produits en JSON (variable product_elastic)"""
+
+    name = 'vinatis'
+    base_url = VINATIS_URL
+    per_minute = 30
+    max_in_flight = 2
+    PRODUCTS = re.compile(r"var\s+product_elastic\s*=\s*({.*?});", re.DOTALL)
+    TITLE = re.compile(r'<h1[^>]*class="[^"]*product-main-name[^"]*"[^>]*>(.*?)</h1>', re.DOTALL)
+    IMAGE = re.compile(r'<img[^>]*id="bigpic"[^>]*src="([^"]+)"|<img[^>]*src="([^"]+)"[^>]*id="bigpic"')
+
+    def listing_urls(self, max_pages):
+        return [urljoin(self.base_url, f"achat-vin?page={page}") for page in range(1, max_pages + 1)]
+
+    def parse_listing(self, text, url):
+        match = self.PRODUCTS.search(text)
+        if not match:
+            return [], []
+        products = json.loads(match.group(1)).get('products') or []
+        if not products:
+            return [], []
+        # Mêmes colonnes que le fichier aplati de etape_1 (features_abv, prices_price...)
+        df = pd.json_normalize(products, sep='_').rename(columns=RAW_COLUMNS)
+        if 'out_of_stock' in df.columns:
+            df['stock'] = df['out_of_stock'].map(lambda v: OUT_OF_STOCK if v in (True, 1, '1') else IN_STOCK)
+        links = [c for c in ('url', 'link') if c in df.columns]
+        df['url'] = df[links[0]].map(lambda href: urljoin(self.base_url, str(href))) if links else url
+        return df.reindex(columns=[c for c in RECORD_COLUMNS if c != 'source']).to_dict('records'), []
+
+    def parse_product(self, text, url):
+        """Fiche minimale d'une page produit (nom, visuel, id lu dans l'URL du visuel, comme get_product_info)"""
+        title = self.TITLE.search(text)
+        image = self.IMAGE.search(text)
+        image = (image.group(1) or image.group(2)) if image else None
+        product_id = re.search(r"/(\d+)-thickbox_", image) if image else None
+        if not title:
+            return None
+        return {'id': product_id.group(1) if product_id else None, 'nom': _strip_tags(title.group(1)),
+                'visuel': image, 'url': url}
+
+
+class JsonLdSource(Source):
+    """Marchand générique : listings paginés, fiches produits décrites en JSON-LD schema.org (Product)"""
+
+    SCRIPTS = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.DOTALL | re.I)
+    HREFS = re.compile(r'href=["\']([^"\'#]+)["\']')
+    # Propriétés additionnelles (additionalProperty) reconnues -> colonnes de la base
+    PROPERTIES = {'couleur': 'couleur', 'color': 'couleur', 'millesime': 'millesime', 'millésime': 'millesime',
+                  'vintage': 'millesime', 'appellation': 'appellation', 'region': 'region', 'région': 'region',
+                  'pays': 'pays', 'country': 'pays', 'degre': 'deg_alcool', 'degré': 'deg_alcool',
+                  'alcool': 'deg_alcool', 'contenance': 'contenance', 'volume': 'contenance'}
+
+    def __init__(self, name, base_url, listing_path='vins?page={page}', product_pattern=r'/produit/', **options):
+        super().__init__(base_url, **options)
+        self.name = name
+        self.listing_path = listing_path
+        self.product_pattern = re.compile(product_pattern)
+
+    def listing_urls(self, max_pages):
+        return [urljoin(self.base_url, self.listing_path.format(page=page)) for page in range(1, max_pages + 1)]
+
+    def parse_listing(self, text, url):
+        links = dict.fromkeys(urljoin(url, href) for href in self.HREFS.findall(text)
+                              if self.product_pattern.search(href))
+        return [], list(links)
+
+    def parse_product(self, text, url):
+        product = next((item for block in self.SCRIPTS.findall(text) for item in _json_ld_items(block)
+                        if 'Product' in _types(item)), None)
+        if product is None:
+            return None
+        offers = product.get('offers') or {}
+        offer = offers[0] if isinstance(offers, list) and offers else offers
+        brand = product.get('brand')
+        image = product.get('image')
+        record = {
+            'id': product.get('sku') or product.get('productID') or url,
+            'nom': product.get('name'),
+            'prix': offer.get('price') if isinstance(offer, dict) else None,
+            'producteur': brand.get('name') if isinstance(brand, dict) else brand,
+            'desc': product.get('description'),
+            'visuel': image[0] if isinstance(image, list) and image else image,
+            'stock': _availability(offer.get('availability') if isinstance(offer, dict) else None),
+            'url': urljoin(url, product['url']) if product.get('url') else url,
+        }
+        for prop in product.get('additionalProperty') or []:
+            column = self.PROPERTIES.get(str(prop.get('name', '')).strip().lower())
+            if column and record.get(column) is None:
+                record[column] = prop.get('value')
+        return record
+
+
+def _strip_tags(html):
+    return re.sub(r'\s+', ' ', re.sub(r'<[^>]*>', ' ', html)).strip()
+
+
+def _json_ld_items(block):
+    """Objets d'un bloc JSON-LD (objet seul, liste ou @graph) ; bloc illisible : aucun"""
+    try:
+        data = json.loads(block)
+    except ValueError:
+        return []
+    items = data if isinstance(data, list) else [data]
+    return [node for item in items if isinstance(item, dict) for node in item.get('@graph', [item])
+            if isinstance(node, dict)]
+
+
+def _types(item):
+    kind = item.get('@type', ())
+    return kind if isinstance(kind, list) else [kind]
+
+
+def _availability(value):
+    """schema.org/InStock, OutOfStock... -> texte de stock compris par price_history"""
+    if not value:
+        return None
+    return IN_STOCK if str(value).rsplit('/', 1)[-1] in ('InStock', 'LimitedAvailability', 'InStoreOnly') \
+        else OUT_OF_STOCK
+
+
+def normalize_records(records, source):
+    """Fiches d'une source en DataFrame aux colonnes RECORD_COLUMNS (valeurs absentes : None)"""
+    df = pd.DataFrame.from_records(records).reindex(columns=RECORD_COLUMNS)
+    df['source'] = source
+    return df.astype(object).where(df.notna(), None)
+
+
+# Sources connues par leur nom (ligne de commande de merchant_scraper)
+SOURCES = {'vinatis': VinatisSource}
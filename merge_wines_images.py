@@ -1,32 +1,180 @@
+import argparse
+import json
+import os
+import time
+
 import pandas as pd
 
-# Lecture des fichiers CSV
-print("Lecture des fichiers CSV...")
-wines_df = pd.read_csv('vins_vinatis_150_pages.csv')
-images_df = pd.read_csv('vinatis_images_accessibles.csv')
-
-# Affichage des informations sur les données
-print("\nInformations sur les données :")
-print(f"Nombre de vins dans le fichier principal : {len(wines_df)}")
-print(f"Nombre d'images disponibles : {len(images_df)}")
-
-# Fusion des données sur l'ID
-print("\nFusion des données...")
-merged_df = pd.merge(wines_df, images_df[['id', 'image_url']], on='id', how='left')
-
-# Statistiques sur la fusion
-total_wines = len(merged_df)
-wines_with_images = merged_df['image_url'].notna().sum()
-print(f"\nRésultats de la fusion :")
-print(f"Nombre total de vins : {total_wines}")
-print(f"Nombre de vins avec images : {wines_with_images}")
-print(f"Pourcentage de vins avec images : {(wines_with_images/total_wines)*100:.2f}%")
-
-# Sauvegarde du fichier fusionné
-output_file = 'vins_vinatis_complet.csv'
-merged_df.to_csv(output_file, index=False)
-print(f"\nFichier fusionné sauvegardé sous : {output_file}")
-
-# Affichage d'un exemple
-print("\nExemple de données fusionnées :")
-print(merged_df[['id', 'name', 'image_url']].head()) 
\ No newline at end of file
+from data_manifest import write_manifest
+from vinatis_urls import canonicalize_urls
+
+# Fichiers par défaut du pipeline
+WINES_FILE = 'vins_vinatis_150_pages.csv'
+IMAGES_FILE = 'vinatis_images_accessibles.csv'
+OUTPUT_FILE = 'vins_vinatis_complet.csv'
+REPORT_FILE = 'merge_report.json'
+
+# Colonnes utiles du fichier d'images et types compacts associés
+IMAGES_COLUMNS = ['id', 'image_url']
+IMAGES_DTYPES = {'id': 'string', 'image_url': 'string'}
+
+# Types explicites des colonnes connues du fichier des vins
+# (les colonnes non listées restent en 'string' pour éviter les types 'object' ;
+# contenance aussi : « 75 » et « 75 cl » sont recopiés tels quels dans le fichier fusionné)
+WINES_DTYPES = {
+    'id': 'string',
+    'name': 'string',
+    'manufacturer_name': 'category',
+    'features_country': 'category',
+    'features_region': 'category',
+    'features_colour': 'category',
+    'features_type': 'category',
+}
+
+
+def _normalize_ids(df):
+    """Convertit la colonne id en entier nullable et sépare les ids invalides (non numériques ou non entiers)"""
+    numbers = pd.to_numeric(df['id'].str.strip(), errors='coerce')
+    # « 12.5 » n'est pas un id : NA avant la conversion (qui échouerait sur une valeur non entière)
+    ids = numbers.where(numbers % 1 == 0).astype('Int64')
+    invalid = ids.isna()
+    df = df.loc[~invalid].copy()
+    df['id'] = ids[~invalid]
+    return df, int(invalid.sum())
+
+
+def _wines_dtypes(path, columns=None):
+    """Construit le dictionnaire de types pour les colonnes réellement lues"""
+    header = pd.read_csv(path, nrows=0).columns
+    wanted = [c for c in header if columns is None or c in columns or c == 'id']
+    return wanted, {c: WINES_DTYPES.get(c, 'string') for c in wanted}
+
+
+def load_images(path=IMAGES_FILE, keep='first'):
+    """Charge le fichier d'images (colonnes utiles uniquement) et résout les doublons d'id"""
+    images_df = pd.read_csv(path, usecols=IMAGES_COLUMNS, dtype=IMAGES_DTYPES)
+    images_df, invalid = _normalize_ids(images_df)
+    images_df['image_url'] = canonicalize_urls(images_df['image_url'])
+    # En cas de doublon, on privilégie les lignes qui ont une URL : elles sont placées du côté
+    # que garde `keep` (en tête pour 'first', en fin pour 'last')
+    images_df = images_df.sort_values('image_url', key=lambda s: s.notna() if keep == 'last' else s.isna(),
+                                      kind='stable')
+    duplicated = images_df['id'].duplicated(keep=keep)
+    images_df = images_df.loc[~duplicated].sort_index()
+    stats = {
+        'rows': int(len(images_df) + duplicated.sum() + invalid),
+        'invalid_ids': invalid,
+        'duplicate_ids': int(duplicated.sum()),
+    }
+    return images_df.set_index('id')['image_url'], stats
+
+
+def _join_chunk(wines_df, images, seen_ids, keep):
+    """Dédoublonne un bloc de vins puis lui associe les URLs d'images"""
+    wines_df, invalid = _normalize_ids(wines_df)
+    duplicated = wines_df['id'].duplicated(keep=keep)
+    if seen_ids is not None:
+        # Doublons avec les blocs précédents (mode par blocs, on garde la première occurrence)
+        already_seen = wines_df['id'].isin(seen_ids)
+        duplicated |= already_seen
+        seen_ids.update(wines_df.loc[~duplicated, 'id'].tolist())
+    wines_df = wines_df.loc[~duplicated]
+    wines_df = wines_df.assign(image_url=wines_df['id'].map(images))
+    matched = int(wines_df['image_url'].notna().sum())
+    stats = {
+        'rows': int(len(wines_df) + duplicated.sum() + invalid),
+        'invalid_ids': invalid,
+        'duplicate_ids': int(duplicated.sum()),
+        'matched': matched,
+        'unmatched': int(len(wines_df) - matched),
+    }
+    return wines_df, stats
+
+
+def merge_wines_images(wines_path=WINES_FILE, images_path=IMAGES_FILE, output_path=OUTPUT_FILE,
+                       columns=None, chunksize=None, keep='first'):
+    """Fusionne vins et images sur l'id et retourne un rapport d'intégrité.
+
+    Si `chunksize` est fourni, le fichier des vins est lu et écrit par blocs
+    (seul le fichier d'images, petit, est gardé en mémoire).
+    """
+    timings = {}
+    start = time.perf_counter()
+    images, images_stats = load_images(images_path, keep=keep)
+    timings['load_images'] = time.perf_counter() - start
+
+    usecols, dtypes = _wines_dtypes(wines_path, columns)
+    totals = {'rows': 0, 'invalid_ids': 0, 'duplicate_ids': 0, 'matched': 0, 'unmatched': 0}
+
+    start = time.perf_counter()
+    if chunksize:
+        if keep != 'first':
+            raise ValueError("Le mode par blocs ne supporte que keep='first'")
+        seen_ids = set()
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        reader = pd.read_csv(wines_path, usecols=usecols, dtype=dtypes, chunksize=chunksize)
+        for i, chunk in enumerate(reader):
+            merged_chunk, stats = _join_chunk(chunk, images, seen_ids, keep)
+            merged_chunk.to_csv(output_path, mode='a', header=(i == 0), index=False)
+            for key in totals:
+                totals[key] += stats[key]
+        timings['join_and_write'] = time.perf_counter() - start
+    else:
+        wines_df = pd.read_csv(wines_path, usecols=usecols, dtype=dtypes)
+        timings['load_wines'] = time.perf_counter() - start
+        start = time.perf_counter()
+        merged_df, totals = _join_chunk(wines_df, images, None, keep)
+        timings['join'] = time.perf_counter() - start
+        start = time.perf_counter()
+        merged_df.to_csv(output_path, index=False)
+        timings['write'] = time.perf_counter() - start
+
+    kept = totals['matched'] + totals['unmatched']
+    # Manifeste écrit après le fichier : les applications rechargent sur changement de version
+    manifest = write_manifest(output_path, rows=kept, source='merge_wines_images')
+    report = {
+        'wines_file': wines_path,
+        'images_file': images_path,
+        'output_file': output_path,
+        'output_version': manifest['version'],
+        'mode': 'chunked' if chunksize else 'in_memory',
+        'wines': totals,
+        'images': images_stats,
+        'coverage_pct': round(100 * totals['matched'] / kept, 2) if kept else 0.0,
+        'timings_s': {k: round(v, 4) for k, v in timings.items()},
+    }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fusion des vins et des URLs d'images sur l'id")
+    parser.add_argument('--wines', default=WINES_FILE)
+    parser.add_argument('--images', default=IMAGES_FILE)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--report', default=REPORT_FILE, help="Fichier JSON du rapport de fusion")
+    parser.add_argument('--columns', nargs='+', help="Colonnes du fichier des vins à conserver (id toujours inclus)")
+    parser.add_argument('--chunksize', type=int, help="Lecture par blocs de N lignes (mode hors mémoire)")
+    parser.add_argument('--keep', choices=['first', 'last'], default='first',
+                        help="Occurrence conservée en cas d'id dupliqué")
+    args = parser.parse_args()
+
+    print("Fusion des fichiers CSV...")
+    report = merge_wines_images(args.wines, args.images, args.output,
+                                columns=args.columns, chunksize=args.chunksize, keep=args.keep)
+
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    wines = report['wines']
+    print(f"\nRésultats de la fusion ({report['mode']}) :")
+    print(f"Vins lus : {wines['rows']} (ids invalides : {wines['invalid_ids']}, doublons : {wines['duplicate_ids']})")
+    print(f"Images lues : {report['images']['rows']} (doublons : {report['images']['duplicate_ids']})")
+    print(f"Vins avec images : {wines['matched']} / sans image : {wines['unmatched']}")
+    print(f"Pourcentage de vins avec images : {report['coverage_pct']:.2f}%")
+    print(f"\nFichier fusionné sauvegardé sous : {args.output}")
+    print(f"Rapport de fusion sauvegardé sous : {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Groupes de quasi-doublons du catalogue : une même cuvée sur plusieurs millésimes ou écritures.
+
+La base contient la même cuvée sous plusieurs fiches (« Villa des Anges - Réserve
+2021 - Jeff Carrel », « Villa des Anges Reserve 2019 »...) : elles occupent les
+cases reco1..reco4 et allongent les listes de résultats. Comparer tous les noms deux
+à deux est quadratique ; ici :
+
+    1. les noms sont découpés en mots minuscules sans accents (comme text_search) ;
+       les millésimes et les mots du domaine (colonne producteur) sont retirés, les
+       abréviations développées : il reste ce qui distingue la cuvée ;
+    2. chaque nom devient l'ensemble des trigrammes de caractères de ses mots, résumé
+       par une signature MinHash de NUM_PERM valeurs. Le minimum sur une union est le
+       minimum des minimums : la signature de chaque mot du vocabulaire est calculée
+       une fois, celle d'un nom est le minimum de celles de ses mots ;
+    3. LSH : la signature est coupée en BANDS bandes ; deux vins qui partagent une
+       bande entière sont candidats. Dans chaque seau, trié par les champs à
+       concorder, seuls les voisins sont comparés (pas de seau quadratique) ;
+    4. un candidat est gardé si la similarité estimée (part des valeurs égales des
+       signatures) atteint THRESHOLD et que domaine, appellation, couleur et contenance
+       concordent (ou manquent) : le rosé d'une cuvée ou son magnum restent à part ;
+    5. les groupes sont les composantes connexes, numérotées par leur plus petit id.
+
+Tout est vectorisé (numpy ; textes par les noyaux Arrow quand pyarrow est installé) :
+le temps croît linéairement avec le nombre de vins.
+
+Usage : python near_duplicates.py --data base_vin_final.csv --output groupes_doublons.csv
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from text_search import TOKEN_PATTERN
+from text_similarity import _ranges
+from vinatis_urls import fold_accents
+
+try:
+    import pyarrow as pa  # installé avec Streamlit
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+NUM_PERM = 64
+BANDS = 16
+# Similarité de Jaccard (estimée) minimale entre les trigrammes de deux noms du même groupe
+THRESHOLD = 0.8
+# Champs qui doivent concorder (quand ils sont connus) pour grouper deux vins
+MATCH_FIELDS = ('producteur', 'appellation', 'couleur', 'contenance')
+# Nombre premier de Mersenne 2^31 - 1 : hachages universels a * x + b mod P
+PRIME = (1 << 31) - 1
+# Abréviations courantes des noms de vins, développées avant la comparaison
+ABBREVIATIONS = {'ch': 'chateau', 'chat': 'chateau', 'dom': 'domaine', 'st': 'saint', 'ste': 'sainte',
+                 'cuv': 'cuvee'}
+VINTAGE = r'(?:19|20)\d{2}'
+
+
+def _fold(values):
+    """Minuscules sans accents, comme text_search (tableau Arrow, ou Series sans pyarrow)"""
+    values = values.astype(str).reset_index(drop=True)
+    values = values.where(values != 'nan')
+    if pa is None:
+        return fold_accents(values.str.lower())
+    text = pc.utf8_lower(pa.array(values, type=pa.string(), from_pandas=True))
+    text = pc.replace_substring(pc.replace_substring(text, 'œ', 'oe'), 'æ', 'ae')
+    return pc.replace_substring_regex(pc.utf8_normalize(text, 'NFKD'), r'[^\x00-\x7f]+', '')
+
+
+def _words(values):
+    """Mots de chaque ligne, à plat : (positions des lignes, codes, vocabulaire)"""
+    # Valeurs répétées (domaines, appellations) découpées une seule fois
+    value_codes, uniques = pd.factorize(values.astype(str))
+    text = _fold(pd.Series(uniques, dtype=object))
+    if pa is None:
+        tokens = text.str.findall(TOKEN_PATTERN).explode().dropna()
+        u_rows = tokens.index.to_numpy()
+        codes, vocabulary = pd.factorize(tokens.to_numpy(dtype=object))
+    else:
+        lists = pc.split_pattern_regex(text, r'[^a-z0-9]+')
+        words, u_rows = pc.list_flatten(lists), pc.list_parent_indices(lists)
+        keep = pc.not_equal(words, '')
+        encoded = pc.dictionary_encode(words.filter(keep))
+        u_rows = u_rows.filter(keep).to_numpy()
+        codes, vocabulary = encoded.indices.to_numpy(), encoded.dictionary.to_numpy(zero_copy_only=False)
+    # Mots des valeurs uniques recopiés pour chaque ligne
+    lengths = np.bincount(u_rows, minlength=len(uniques))
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    row_lengths = np.where(value_codes >= 0, lengths[value_codes], 0)
+    rows = np.repeat(np.arange(len(values)), row_lengths)
+    codes = np.asarray(codes, dtype=np.int64)[_ranges(offsets[value_codes[row_lengths > 0]],
+                                                      row_lengths[row_lengths > 0])]
+    return rows, codes, pd.Index(vocabulary).map(lambda w: ABBREVIATIONS.get(w, w))
+
+
+def name_words(df):
+    """Mots qui distinguent chaque cuvée : (positions des lignes, codes, vocabulaire)
+
+    Sans millésime ni mots du domaine ; un nom fait seulement de ces mots est gardé entier.
+    """
+    rows, codes, vocabulary = _words(df['nom'])
+    # Vocabulaire recodé après les abréviations (« ch » et « chateau » : même mot)
+    vocabulary, recode = np.unique(vocabulary.to_numpy(dtype=str), return_inverse=True)
+    codes = recode[codes]
+    keep = ~pd.Series(vocabulary).str.fullmatch(VINTAGE).to_numpy()[codes]
+    if 'producteur' in df.columns:
+        producers, uniques = pd.factorize(df['producteur'].astype(str))
+        p_rows, p_codes, p_vocabulary = _words(pd.Series(uniques, dtype=object))
+        # Mots de chaque domaine exprimés dans le vocabulaire des noms (-1 : absent des noms)
+        p_codes = pd.Index(vocabulary).get_indexer(p_vocabulary.to_numpy(dtype=str))[p_codes]
+        producer_keys = np.unique(p_rows[p_codes >= 0] * len(vocabulary) + p_codes[p_codes >= 0])
+        name_keys = producers[rows] * len(vocabulary) + codes
+        found = np.minimum(np.searchsorted(producer_keys, name_keys), max(len(producer_keys) - 1, 0))
+        generic = producer_keys[found] == name_keys if len(producer_keys) else np.zeros(len(rows), dtype=bool)
+        # Un nom dont il ne resterait rien garde ses mots du domaine
+        remaining = np.bincount(rows[keep & ~generic], minlength=len(df))
+        keep &= ~generic | (remaining[rows] == 0)
+    return rows[keep], codes[keep], vocabulary
+
+
+def trigrams(names):
+    """Trigrammes de caractères de chaque nom, à plat : (positions des lignes, codes sur 24 bits)"""
+    padded = ' ' + pd.Series(names, dtype=object).reset_index(drop=True).astype(str) + ' '
+    lengths = padded.str.len().to_numpy()
+    # Tous les noms dans un seul tableau d'octets (ASCII après _fold) : pas de boucle par nom
+    data = np.frombuffer(''.join(padded).encode('ascii', errors='replace'), dtype=np.uint8).astype(np.int64)
+    rows = np.repeat(np.arange(len(lengths)), lengths)
+    codes = (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+    inside = rows[:-2] == rows[2:]
+    return rows[:-2][inside], codes[inside]
+
+
+def _min_by_row(values, rows, n_rows):
+    """Minimum par ligne de valeurs triées par ligne (lignes sans valeur : uint32 max)"""
+    out = np.full(n_rows, np.iinfo(np.uint32).max, dtype=np.uint32)
+    present = np.bincount(rows, minlength=n_rows) > 0
+    starts = np.searchsorted(rows, np.arange(n_rows))
+    out[present] = np.minimum.reduceat(values, starts[present])
+    return out
+
+
+def minhash(rows, codes, vocabulary, n_rows, num_perm=NUM_PERM, seed=0):
+    """Signatures MinHash (vins x num_perm, uint32) des trigrammes des mots, et masque des noms non vides"""
+    t_rows, t_codes = trigrams(vocabulary)
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, PRIME, num_perm, dtype=np.int64)
+    b = rng.integers(0, PRIME, num_perm, dtype=np.int64)
+    # Ensemble de mots de chaque vin (trié par vin, sans répétition)
+    pairs = np.unique(rows * len(vocabulary) + codes)
+    rows, codes = pairs // len(vocabulary), pairs % len(vocabulary)
+    present = np.bincount(rows, minlength=n_rows) > 0
+    # Les millésimes d'une cuvée ont le même ensemble : une signature par ensemble distinct
+    weights = rng.integers(0, 2 ** 63, len(vocabulary), dtype=np.uint64)
+    set_keys = np.add.reduceat(weights[codes], np.searchsorted(rows, np.flatnonzero(present)))
+    _, first, set_of_row = np.unique(set_keys, return_index=True, return_inverse=True)
+    keep = np.isin(rows, np.flatnonzero(present)[first])
+    set_rows = np.zeros(n_rows, dtype=np.int64)
+    set_rows[present] = set_of_row
+    set_rows, set_codes = set_rows[rows[keep]], codes[keep]
+    order = np.argsort(set_rows, kind='stable')
+    set_rows, set_codes = set_rows[order], set_codes[order]
+    signatures = np.full((n_rows, num_perm), np.iinfo(np.uint32).max, dtype=np.uint32)
+    for k in range(num_perm):
+        # Signature de chaque mot du vocabulaire, puis minimum sur les mots de chaque ensemble
+        words = _min_by_row(((a[k] * t_codes + b[k]) % PRIME).astype(np.uint32), t_rows, len(vocabulary))
+        signatures[present, k] = _min_by_row(words[set_codes], set_rows, len(first))[set_of_row]
+    return signatures, present
+
+
+def field_codes(values):
+    """Code entier d'un champ (domaine, appellation, couleur...) après normalisation, -1 s'il manque"""
+    codes, uniques = pd.factorize(values.astype(str))
+    text = _fold(pd.Series(uniques, dtype=object))
+    if pa is None:
+        normalized = text.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    else:
+        normalized = pc.utf8_trim_whitespace(pc.replace_substring_regex(text, r'[^a-z0-9]+', ' ')).to_pandas()
+    norm_codes, _ = pd.factorize(normalized.replace('', None))
+    return np.where(codes >= 0, norm_codes[codes], -1).astype(np.int64)
+
+
+def candidate_pairs(signatures, present, sort_keys=(), bands=BANDS):
+    """Paires (u, v) de vins qui partagent une bande de signature, voisins dans leur seau"""
+    n_rows, num_perm = signatures.shape
+    width = num_perm // bands
+    ids = np.flatnonzero(present)
+    # Seaux triés par les champs à concorder (domaine, appellation...) : les vins qui peuvent être groupés y sont voisins.
+    # Le tri secondaire est fait une fois, chaque bande n'est ensuite triée (tri stable) que sur sa clé.
+    if sort_keys:
+        ids = ids[np.lexsort(tuple(k[ids] for k in reversed(sort_keys)))]
+    pairs = []
+    multipliers = np.random.default_rng(1).integers(1, 2 ** 61, width, dtype=np.uint64) | np.uint64(1)
+    for band in range(bands):
+        block = signatures[ids, band * width:(band + 1) * width].astype(np.uint64)
+        keys = (block * multipliers).sum(axis=1, dtype=np.uint64)
+        order = np.argsort(keys, kind='stable')
+        same = keys[order[1:]] == keys[order[:-1]]
+        pairs.append(np.stack([ids[order[:-1][same]], ids[order[1:][same]]], axis=1))
+    pairs = np.concatenate(pairs) if pairs else np.zeros((0, 2), dtype=np.int64)
+    pairs = np.sort(pairs, axis=1)
+    keys = np.unique(pairs[:, 0] * n_rows + pairs[:, 1])
+    return np.stack([keys // n_rows, keys % n_rows], axis=1)
+
+
+def connected_groups(n_rows, u, v):
+    """Plus petit id de la composante connexe de chaque vin (propagation des étiquettes et sauts de pointeurs)"""
+    labels = np.arange(n_rows)
+    while True:
+        low = np.minimum(labels[u], labels[v])
+        new = labels.copy()
+        np.minimum.at(new, u, low)
+        np.minimum.at(new, v, low)
+        new = new[new]
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def duplicate_groups(df, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, match_fields=MATCH_FIELDS,
+                     timings=None):
+    """Id du représentant (plus petit id) du groupe de chaque vin ; un vin sans quasi-doublon est seul.
+
+    `timings` (dict) reçoit la durée de chaque étape.
+    """
+    timings = {} if timings is None else timings
+    start = time.perf_counter()
+    rows, codes, vocabulary = name_words(df)
+    keys = [field_codes(df[field]) if field in df.columns else np.full(len(df), -1, np.int64)
+            for field in match_fields]
+    timings['normalisation'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    signatures, present = minhash(rows, codes, vocabulary, len(df), num_perm)
+    timings['minhash'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    pairs = candidate_pairs(signatures, present, keys, bands)
+    u, v = pairs[:, 0], pairs[:, 1]
+    timings['lsh'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    similar = (signatures[u] == signatures[v]).mean(axis=1) >= threshold
+    for codes in keys:
+        similar &= (codes[u] == codes[v]) | (codes[u] < 0) | (codes[v] < 0)
+    groups = connected_groups(len(df), u[similar], v[similar])
+    timings['groupes'] = time.perf_counter() - start
+    timings['candidats'] = len(u)
+    return groups
+
+
+def collapse(ids, groups):
+    """Garde, dans l'ordre donné, le premier vin de chaque groupe"""
+    ids = np.asarray(ids, dtype=np.int64)
+    if groups is None or not len(ids):
+        return ids
+    _, first = np.unique(groups[ids], return_index=True)
+    return ids[np.sort(first)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Groupes de quasi-doublons du catalogue (MinHash/LSH)")
+    parser.add_argument('--data', default='base_vin_final.csv')
+    parser.add_argument('--output', default='groupes_doublons.csv')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.data, usecols=lambda c: c in ('nom',) + MATCH_FIELDS, dtype=str)
+    timings = {}
+    start = time.perf_counter()
+    groups = duplicate_groups(df, args.threshold, timings=timings)
+    seconds = time.perf_counter() - start
+    sizes = np.bincount(groups, minlength=len(df))
+    grouped = sizes[groups] > 1
+    out = df.assign(groupe=groups, taille=sizes[groups])[grouped].sort_values(['groupe', 'nom'], kind='stable')
+    out.to_csv(args.output, index_label='id')
+    print(f"{len(df)} vins en {seconds:.2f} s ({len(df) / seconds:.0f} vins/s) : "
+          f"{int((sizes > 1).sum())} groupes de quasi-doublons, {int(grouped.sum())} vins concernés -> {args.output}")
+    for name, value in timings.items():
+        print(f"  {name:<14}{value:>10.3f}" if isinstance(value, float) else f"  {name:<14}{value:>10}")
+
+
+if __name__ == "__main__":
+    main()
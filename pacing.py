@@ -0,0 +1,135 @@
+"""Rythme adaptatif du scraping Selenium.
+
+Remplace les `time.sleep(random.uniform(...))` fixes par :
+- des attentes pilotées par l'état du DOM (document.readyState) et l'inactivité réseau
+  (nombre de ressources chargées stable pendant `idle_s`) ;
+- un délai de politesse calculé à partir de la latence observée du serveur
+  (moyenne glissante, à la manière d'AutoThrottle) ;
+- un budget global de requêtes par minute partagé entre tous les drivers.
+"""
+import random
+import threading
+import time
+
+# Nombre de ressources chargées et état du document, en un seul aller-retour avec le navigateur
+READY_SCRIPT = ("return [document.readyState, "
+                "performance.getEntriesByType('resource').length, "
+                "document.querySelector(arguments[0] || 'body') !== null];")
+
+# Temps de réponse du serveur pour la dernière navigation (requestStart -> responseStart)
+LATENCY_SCRIPT = ("const nav = performance.getEntriesByType('navigation')[0];"
+                  "return nav ? (nav.responseStart - nav.requestStart) / 1000 : null;")
+
+
+class RateBudget:
+    """Seau à jetons thread-safe : au plus `per_minute` requêtes par minute, rafales de `burst`"""
+
+    def __init__(self, per_minute=30, burst=3):
+        self.rate = per_minute / 60.0
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Réserve un jeton et retourne le temps d'attente nécessaire (en secondes)"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class AdaptivePacer:
+    """Décide combien attendre avant et après chaque page"""
+
+    def __init__(self, budget=None, min_delay=0.5, max_delay=10.0, target_concurrency=1.0,
+                 smoothing=0.3, jitter=0.2, poll_s=0.1, idle_s=0.5, metrics=None):
+        self.budget = budget or RateBudget()
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.target_concurrency = target_concurrency
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.poll_s = poll_s
+        self.idle_s = idle_s
+        self.metrics = metrics
+        self.latency = None
+        self.last_request = 0.0
+
+    @property
+    def delay(self):
+        """Délai de politesse courant : latence serveur lissée / concurrence cible, borné"""
+        if self.latency is None:
+            return self.min_delay
+        return min(self.max_delay, max(self.min_delay, self.latency / self.target_concurrency))
+
+    def observe_latency(self, seconds):
+        """Met à jour la moyenne glissante de la latence du serveur"""
+        if seconds is None or seconds < 0:
+            return
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency = self.smoothing * seconds + (1 - self.smoothing) * self.latency
+
+    def pace(self):
+        """Attend le temps nécessaire avant la prochaine requête (politesse + budget global)"""
+        since_last = time.monotonic() - self.last_request
+        wait = max(self.delay * random.uniform(1 - self.jitter, 1 + self.jitter) - since_last,
+                   self.budget.acquire())
+        if wait > 0:
+            self._sleep('pace', wait)
+        self.last_request = time.monotonic()
+
+    def fetch(self, driver, url):
+        """Navigue vers `url` en respectant le rythme, et enregistre la latence observée"""
+        self.pace()
+        start = time.perf_counter()
+        driver.get(url)
+        elapsed = time.perf_counter() - start
+        try:
+            latency = driver.execute_script(LATENCY_SCRIPT)
+        except Exception:
+            latency = None
+        self.observe_latency(latency if latency is not None else elapsed)
+        if self.metrics is not None:
+            self.metrics.observe('fetch', elapsed)
+
+    def wait_ready(self, driver, selector=None, timeout=20):
+        """Attend que le DOM soit prêt, que `selector` soit présent et que le réseau soit inactif.
+
+        Retourne True si la page est prête avant `timeout`, False sinon (la page est alors
+        traitée telle quelle, comme après l'ancien sleep fixe).
+        """
+        start = time.perf_counter()
+        deadline = start + timeout
+        last_count, stable_since = -1, None
+        ready = False
+        while time.perf_counter() < deadline:
+            try:
+                state, count, found = driver.execute_script(READY_SCRIPT, selector)
+            except Exception:
+                state, count, found = None, -1, False
+            now = time.perf_counter()
+            if count != last_count:
+                last_count, stable_since = count, now
+            if state == 'complete' and found and now - stable_since >= self.idle_s:
+                ready = True
+                break
+            time.sleep(self.poll_s)
+        if self.metrics is not None:
+            self.metrics.observe('wait', time.perf_counter() - start)
+            if not ready:
+                self.metrics.incr('wait.timeouts')
+        return ready
+
+    def backoff(self, attempt, base=2.0):
+        """Attente exponentielle avant une nouvelle tentative (1re : ~base s, puis x2)"""
+        self._sleep('retry_wait', min(self.max_delay * 3, base * 2 ** attempt) * random.uniform(0.8, 1.2))
+
+    def _sleep(self, stage, seconds):
+        time.sleep(seconds)
+        if self.metrics is not None:
+            self.metrics.observe(stage, seconds)
@@ -0,0 +1,387 @@
+"""Historique des prix et de la disponibilité des vins, d'une collecte à l'autre.
+
+Chaque collecte réécrit vinatis_data.csv / vins_vinatis_150_pages.csv : les baisses
+de prix et les ruptures de stock passées sont perdues. Ici chaque collecte est
+ajoutée à un historique en colonnes, sans réécrire ce qui est déjà écrit, et seuls
+les vins dont le prix ou la disponibilité a changé depuis la collecte précédente
+y sont écrits (encodage par différence) :
+
+    <dossier>/wine_id.i8     clé du vin (int64 : id Vinatis, ou clé de products.jsonl)
+    <dossier>/crawl.u4       numéro de la collecte (uint32)
+    <dossier>/prix.f4        prix (float32, NaN : prix absent)
+    <dossier>/stock.i1       disponibilité (int8, voir STOCK_LABELS)
+    <dossier>/crawls.jsonl   une ligne par collecte : date, lignes écrites, vins vus
+    <dossier>/products.jsonl clé des produits des autres marchands (source, référence)
+
+Un vin est identifié par sa source (colonne source de merchant_scraper, « vinatis »
+par défaut) et sa référence chez ce marchand. La clé d'un produit Vinatis est son id ;
+celle d'un produit d'un autre marchand (référence « VIN-A-75 », URL...) est attribuée
+à sa première collecte, à partir de MERCHANT_KEYS, et gardée dans products.jsonl.
+
+Un vin absent d'une collecte de sa source est noté « retiré » (avec son dernier prix) ;
+les vins des autres sources n'y changent pas. Les colonnes sont écrites avant la ligne
+de crawls.jsonl qui les valide : les lignes d'une collecte interrompue sont ignorées à
+la lecture et tronquées à la suivante.
+Un seul processus écrit ; les lecteurs (application, service) relisent les
+colonnes mappées en mémoire quand crawls.jsonl a grandi.
+
+Les requêtes passent par une clé triée id * MAX_CRAWLS + collecte : l'historique
+d'un vin est une plage contiguë, et son état à une collecte donnée une recherche
+dichotomique.
+
+Usage :
+    python price_history.py --add vins_valides.csv --dir price_history
+    python price_history.py --drops --dir price_history
+    python price_history.py --wine 176693 --dir price_history
+    python price_history.py --wine VIN-A-75 --source cave --dir price_history
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_DIR = 'price_history'
+CRAWLS_FILE = 'crawls.jsonl'
+PRODUCTS_FILE = 'products.jsonl'
+VINATIS = 'vinatis'
+COLUMNS = {'wine_id': np.int64, 'crawl': np.uint32, 'prix': np.float32, 'stock': np.int8}
+SUFFIXES = {'wine_id': 'i8', 'crawl': 'u4', 'prix': 'f4', 'stock': 'i1'}
+# Borne du nombre de collectes : la clé triée id * MAX_CRAWLS + collecte tient dans un int64
+MAX_CRAWLS = 2 ** 20
+# Clés des produits des autres marchands (au-delà des ids Vinatis), id * MAX_CRAWLS < 2^63
+MERCHANT_KEYS = 2 ** 40
+
+RETIRE, DISPONIBLE, EPUISE = 0, 1, 2
+STOCK_LABELS = {RETIRE: 'retiré', DISPONIBLE: 'disponible', EPUISE: 'épuisé'}
+# Texte de stock de la fiche produit qui indique une rupture
+OUT_OF_STOCK = r'(?i)rupture|épuisé|epuise|indisponible|plus disponible'
+
+
+def column_path(directory, name):
+    return os.path.join(directory, f"{name}.{SUFFIXES[name]}")
+
+
+def parse_prices(values):
+    """Prix numériques depuis une colonne déjà numérique ou du texte (« 12,90 € »)"""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.astype(float)
+    text = values.astype(str).str.replace(r'[\s\xa0€]|eur', '', regex=True, case=False)
+    return pd.to_numeric(text.str.replace(',', '.', regex=False), errors='coerce')
+
+
+def stock_codes(values):
+    """Code de disponibilité du texte de stock ; sans texte, un vin présent est disponible"""
+    out = values.astype(str).str.contains(OUT_OF_STOCK, regex=True, na=False)
+    return np.where(out.to_numpy(), EPUISE, DISPONIBLE).astype(np.int8)
+
+
+class _View:
+    """Colonnes validées par crawls.jsonl et clé triée, figées pour les requêtes en cours"""
+
+    def __init__(self, directory, crawls):
+        self.crawls = crawls
+        # Produits des autres marchands : ligne i de products.jsonl -> clé MERCHANT_KEYS + i
+        self.products, self.references, self.products_size = {}, [], 0
+        path = os.path.join(directory, PRODUCTS_FILE)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.endswith('\n'):
+                        break
+                    product = json.loads(line)
+                    self.products[(product['source'], product['id'])] = MERCHANT_KEYS + len(self.references)
+                    self.references.append((product['source'], product['id']))
+                    self.products_size += len(line.encode('utf-8'))
+        n_rows = crawls[-1]['rows'] if crawls else 0
+        self.columns = {}
+        for name, dtype in COLUMNS.items():
+            if n_rows:
+                self.columns[name] = np.memmap(column_path(directory, name), dtype=dtype, mode='r', shape=(n_rows,))
+            else:
+                self.columns[name] = np.zeros(0, dtype=dtype)
+        keys = self.columns['wine_id'] * MAX_CRAWLS + self.columns['crawl']
+        # Lignes écrites par collecte croissante : le tri stable garde l'ordre des collectes d'un vin
+        self.order = np.argsort(keys, kind='stable')
+        self.keys = keys[self.order]
+
+    def rows_at(self, wine_ids, crawl):
+        """Ligne (dans l'ordre d'écriture) de l'état de chaque vin à la collecte `crawl`, -1 s'il n'y était pas"""
+        wine_ids = np.asarray(wine_ids, dtype=np.int64)
+        positions = np.searchsorted(self.keys, wine_ids * MAX_CRAWLS + crawl, side='right') - 1
+        found = positions >= 0
+        found[found] = self.keys[positions[found]] // MAX_CRAWLS == wine_ids[found]
+        rows = np.full(len(wine_ids), -1, dtype=np.int64)
+        rows[found] = self.order[positions[found]]
+        return rows
+
+    def values(self, name, rows, missing):
+        """Valeurs de la colonne `name` aux lignes `rows` (`missing` pour -1)"""
+        column = self.columns[name]
+        values = np.full(len(rows), missing, dtype=column.dtype)
+        found = rows >= 0
+        values[found] = column[rows[found]]
+        return values
+
+    def wine_ids(self):
+        """Clés de tous les vins déjà vus, triées"""
+        ids = self.keys // MAX_CRAWLS
+        return ids[np.r_[True, ids[1:] != ids[:-1]]] if len(ids) else ids
+
+    def describe(self, keys):
+        """(sources, références) des clés : id Vinatis, ou référence du marchand"""
+        keys = np.asarray(keys, dtype=np.int64)
+        sources = np.full(len(keys), VINATIS, dtype=object)
+        references = keys.astype(object)
+        merchant = keys >= MERCHANT_KEYS
+        if merchant.any():
+            known = np.array(self.references + [(None, None)], dtype=object)[keys[merchant] - MERCHANT_KEYS]
+            sources[merchant], references[merchant] = known[:, 0], known[:, 1]
+        return sources, references
+
+    def from_sources(self, keys, sources):
+        """Masque des clés dont la source est dans `sources`"""
+        merchant = keys >= MERCHANT_KEYS
+        mask = ~merchant & (VINATIS in sources)
+        if merchant.any():
+            known = np.array([source in sources for source, _ in self.references] + [False])
+            mask[merchant] = known[np.minimum(keys[merchant] - MERCHANT_KEYS, len(self.references))]
+        return mask
+
+    def key(self, source, product_id):
+        """Clé d'un produit (None s'il n'a jamais été collecté)"""
+        direct = _direct_key(source, product_id)
+        return direct if direct is not None else self.products.get((source, str(product_id)))
+
+
+def _direct_key(source, product_id):
+    """Id Vinatis entier : sa propre clé ; None pour une autre référence"""
+    try:
+        value = float(product_id)
+    except (TypeError, ValueError):
+        return None
+    return int(value) if source == VINATIS and value.is_integer() and 0 < value < MERCHANT_KEYS else None
+
+
+class PriceHistory:
+    """Historique en colonnes, ajout seul, des prix et disponibilités par vin et par collecte"""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        self._crawls_size = None
+        self._view = _View(directory, [])
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """Relit les collectes si crawls.jsonl a changé ; retourne la vue courante"""
+        path = os.path.join(self.directory, CRAWLS_FILE)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if size == self._crawls_size:
+            return self._view
+        with self._lock:
+            if size != self._crawls_size:
+                crawls = []
+                if size:
+                    with open(path, encoding='utf-8') as f:
+                        crawls = [json.loads(line) for line in f if line.endswith('\n')]
+                # Vue construite à côté puis substituée : les requêtes en cours gardent l'ancienne
+                self._view = _View(self.directory, crawls)
+                self._crawls_size = size
+        return self._view
+
+    @property
+    def crawls(self):
+        return self.refresh().crawls
+
+    def __len__(self):
+        return len(self.refresh().keys)
+
+    def nbytes(self):
+        """Taille sur disque des colonnes et des journaux des collectes et des produits"""
+        return sum(os.path.getsize(p) for p in [column_path(self.directory, n) for n in COLUMNS] +
+                   [os.path.join(self.directory, name) for name in (CRAWLS_FILE, PRODUCTS_FILE)]
+                   if os.path.exists(p))
+
+    def _keys(self, view, df):
+        """Clé de chaque ligne (-1 : sans id) ; un produit d'un autre marchand vu pour la première fois
+        reçoit la sienne, écrite dans products.jsonl avant les colonnes qui l'utilisent"""
+        if 'source' in df.columns:
+            sources = df['source'].astype(object).where(df['source'].notna(), VINATIS).astype(str)
+        else:
+            sources = pd.Series(VINATIS, index=df.index)
+        numeric = pd.to_numeric(df['id'], errors='coerce')
+        direct = ((sources == VINATIS) & (numeric > 0) & (numeric < MERCHANT_KEYS) &
+                  (numeric == numeric.round())).to_numpy()
+        keys = np.full(len(df), -1, dtype=np.int64)
+        keys[direct] = numeric.to_numpy()[direct].astype(np.int64)
+        # Autres références (le plus souvent aucune : collecte Vinatis), en texte
+        ids = df['id'][~direct]
+        ids = ids.astype(object).where(ids.notna()).astype(str).str.strip()
+        ids = ids.mask(ids.isin(['', 'nan', 'None', '<NA>']))
+        other = np.flatnonzero(~direct)[ids.notna().to_numpy()]
+        references = list(zip(sources.to_numpy()[other], ids.dropna().to_numpy()))
+        new = [r for r in dict.fromkeys(references) if r not in view.products]
+        if new:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, PRODUCTS_FILE), 'ab') as f:
+                # Ligne incomplète d'une écriture interrompue : écrasée
+                f.truncate(view.products_size)
+                data = ''.join(json.dumps({'source': s, 'id': i}, ensure_ascii=False) + '\n' for s, i in new)
+                f.write(data.encode('utf-8'))
+                f.flush()
+                os.fsync(f.fileno())
+            view.products_size += len(data.encode('utf-8'))
+            for reference in new:
+                view.products[reference] = MERCHANT_KEYS + len(view.references)
+                view.references.append(reference)
+        keys[other] = [view.products[r] for r in references]
+        return keys, sorted(pd.unique(sources[keys >= 0]))
+
+    def add_crawl(self, df, date=None, source=None):
+        """Ajoute une collecte (colonnes id, prix, et éventuellement stock et source) ; retourne sa
+        ligne de crawls.jsonl. `source` : nom du fichier collecté, noté dans crawls.jsonl"""
+        view = self.refresh()
+        crawl = len(view.crawls)
+        if crawl >= MAX_CRAWLS:
+            raise ValueError(f"Historique plein ({MAX_CRAWLS} collectes)")
+        keys, merchants = self._keys(view, df)
+        seen = (keys >= 0) & ~pd.Series(keys).duplicated(keep='last').to_numpy()
+        ids = keys[seen]
+        prix = parse_prices(df['prix']).to_numpy()[seen].astype(np.float32)
+        stock = stock_codes(df['stock'])[seen] if 'stock' in df.columns else np.full(len(ids), DISPONIBLE, np.int8)
+
+        # Vins vus : écrits s'ils sont nouveaux ou si leur prix ou leur stock a changé
+        previous = view.rows_at(ids, crawl)
+        known = previous >= 0
+        old_prix = view.values('prix', previous, np.nan)
+        old_stock = view.values('stock', previous, -1)
+        same_prix = (old_prix == prix) | (np.isnan(old_prix) & np.isnan(prix))
+        changed = ~known | ~same_prix | (old_stock != stock)
+        # Vins des marchands collectés absents de cette collecte : retirés, avec leur dernier prix
+        all_ids = view.wine_ids()
+        last = view.rows_at(all_ids, crawl)
+        gone = np.isin(all_ids, ids, invert=True) & (view.values('stock', last, RETIRE) != RETIRE)
+        gone &= view.from_sources(all_ids, merchants)
+
+        new = {
+            'wine_id': np.concatenate([ids[changed], all_ids[gone]]),
+            'prix': np.concatenate([prix[changed], view.values('prix', last[gone], np.nan)]),
+            'stock': np.concatenate([stock[changed], np.full(int(gone.sum()), RETIRE, np.int8)]),
+        }
+        new['crawl'] = np.full(len(new['wine_id']), crawl, dtype=np.uint32)
+        n_rows = view.crawls[-1]['rows'] if view.crawls else 0
+        os.makedirs(self.directory, exist_ok=True)
+        for name, dtype in COLUMNS.items():
+            path = column_path(self.directory, name)
+            with open(path, 'ab') as f:
+                # Lignes d'une collecte interrompue (non validées par crawls.jsonl) : écrasées
+                f.truncate(n_rows * np.dtype(dtype).itemsize)
+                np.ascontiguousarray(new[name], dtype=dtype).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        entry = {
+            'crawl': crawl,
+            'date': date or time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'rows': n_rows + len(new['wine_id']),
+            'seen': len(ids),
+            'changed': int(changed.sum()),
+            'removed': int(gone.sum()),
+            'source': source,
+            'merchants': merchants,
+        }
+        with open(os.path.join(self.directory, CRAWLS_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.refresh()
+        return entry
+
+    def history(self, wine_id, source=VINATIS):
+        """Changements de prix et de disponibilité d'un vin (id Vinatis, ou référence chez `source`) :
+        DataFrame (date, collecte, prix, stock)"""
+        view = self.refresh()
+        key = view.key(source, wine_id)
+        start, end = np.searchsorted(view.keys, [key * MAX_CRAWLS, (key + 1) * MAX_CRAWLS]) if key is not None \
+            else (0, 0)
+        rows = view.order[start:end]
+        crawls = view.columns['crawl'][rows].astype(np.int64)
+        return pd.DataFrame({
+            'date': [view.crawls[c]['date'] for c in crawls],
+            'collecte': crawls,
+            # float32 -> centimes : 12.41 et non 12.40999984741211
+            'prix': view.columns['prix'][rows].astype(float).round(2),
+            'stock': [STOCK_LABELS[s] for s in view.columns['stock'][rows]],
+        })
+
+    def price_drops(self, since=None):
+        """Vins dont le prix a baissé depuis la collecte `since` (par défaut l'avant-dernière).
+
+        Seuls les vins écrits depuis cette collecte peuvent avoir changé : ils sont lus à
+        la fin des colonnes (ordre d'écriture), puis comparés à leur état d'alors.
+        """
+        view = self.refresh()
+        last = len(view.crawls) - 1
+        since = last - 1 if since is None else since
+        if last < 1 or since < 0 or since >= last:
+            return pd.DataFrame(columns=['source', 'wine_id', 'prix_avant', 'prix', 'baisse', 'stock'])
+        start = view.crawls[since]['rows']
+        ids = np.unique(view.columns['wine_id'][start:])
+        before, now = view.rows_at(ids, since), view.rows_at(ids, last)
+        known = before >= 0
+        ids, before, now = ids[known], before[known], now[known]
+        old = view.columns['prix'][before].astype(float).round(2)
+        new = view.columns['prix'][now].astype(float).round(2)
+        stock = view.columns['stock'][now]
+        dropped = (new < old) & (stock != RETIRE)
+        sources, references = view.describe(ids[dropped])
+        drops = pd.DataFrame({
+            'source': sources,
+            'wine_id': references,
+            'prix_avant': old[dropped],
+            'prix': new[dropped],
+            'baisse': 1 - new[dropped] / old[dropped],
+            'stock': [STOCK_LABELS[s] for s in stock[dropped]],
+        })
+        return drops.sort_values('baisse', ascending=False, kind='stable').reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=None)
+def open_history(directory=DEFAULT_DIR):
+    """Historique partagé par les threads du processus (service, sessions Streamlit)"""
+    return PriceHistory(directory)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historique des prix et de la disponibilité des vins")
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    parser.add_argument('--add', metavar='CSV', help="Ajoute une collecte (colonnes id, prix, stock)")
+    parser.add_argument('--date', help="Date de la collecte ajoutée (par défaut maintenant)")
+    parser.add_argument('--drops', action='store_true', help="Baisses de prix depuis la collecte précédente")
+    parser.add_argument('--wine', help="Historique d'un vin (id Vinatis, ou référence chez --source)")
+    parser.add_argument('--source', default=VINATIS, help="Marchand du vin de --wine")
+    args = parser.parse_args()
+
+    history = PriceHistory(args.dir)
+    if args.add:
+        df = pd.read_csv(args.add, usecols=lambda c: c in ('id', 'prix', 'prices_price', 'stock', 'source'),
+                         dtype=str)
+        entry = history.add_crawl(df.rename(columns={'prices_price': 'prix'}), args.date,
+                                  os.path.basename(args.add))
+        print(f"Collecte {entry['crawl']} : {entry['seen']} vins vus, {entry['changed']} changements, "
+              f"{entry['removed']} retirés ({history.nbytes() / 2**20:.1f} Mo au total)")
+    if args.drops:
+        drops = history.price_drops()
+        print(f"{len(drops)} baisses de prix depuis la collecte précédente")
+        print(drops.head(20).to_string(index=False))
+    if args.wine is not None:
+        print(history.history(args.wine, args.source).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
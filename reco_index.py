@@ -0,0 +1,125 @@
+"""Index de recommandation partitionné par couleur, tranche de prix et bio.
+
+Le notebook (ML_sur_base_vin.ipynb) cherche « le vin bio le plus proche » en appelant
+kneighbors sur tout df_num puis en filtrant : la recherche parcourt tous les vins et,
+si les n voisins demandés ne contiennent pas assez de vins bio, il en manque. Ici les
+vins sont rangés par partition (couleur, tranche de prix, bio) et leurs variables
+recopiées dans cet ordre : une partition est un bloc contigu de la matrice. Une
+recommandation sous contraintes (« même couleur », « dans mon budget », « bio ») ne
+calcule les distances que sur les partitions concernées, et les k plus proches vins
+qui respectent les contraintes sont toujours trouvés s'ils existent.
+
+Une borne de prix qui tombe au milieu d'une tranche est vérifiée vin par vin dans
+cette tranche seulement.
+"""
+import numpy as np
+
+# Bornes des tranches de prix (€) : < 10, 10-20, 20-50, >= 50 ; les vins sans prix ont leur tranche
+PRICE_BANDS = (10.0, 20.0, 50.0)
+
+
+class PartitionedIndex:
+    """Variables du modèle rangées par partition, distances euclidiennes exactes par bloc"""
+
+    def __init__(self, features, couleur_codes, couleurs, bio, prix, bands=PRICE_BANDS):
+        self.couleurs = list(couleurs)
+        self.bands = np.asarray(bands, dtype=float)
+        n_couleurs = len(self.couleurs) + 1  # dernière : couleur manquante
+        n_bands = len(self.bands) + 2  # dernière : prix manquant
+        band = np.where(np.isnan(prix), n_bands - 1, np.searchsorted(self.bands, prix, side='right'))
+        # Clé couleur > tranche > bio : les deux valeurs de bio d'une tranche sont voisines
+        keys = (couleur_codes * n_bands + band) * 2 + bio
+        self.shape = (n_couleurs, n_bands, 2)
+        self.order = np.argsort(keys, kind='stable')
+        self.offsets = np.searchsorted(keys[self.order], np.arange(n_couleurs * n_bands * 2 + 1))
+        self.features = np.ascontiguousarray(features[self.order], dtype=np.float32)
+        self.norms = np.einsum('ij,ij->i', self.features, self.features)
+        self.prix = np.asarray(prix, dtype=float)[self.order]
+        self.position = np.empty_like(self.order)
+        self.position[self.order] = np.arange(len(self.order))
+
+    @classmethod
+    def from_facets(cls, facets, features, bands=PRICE_BANDS):
+        """Index construit depuis les bitmaps de couleur et de bio d'un FacetIndex"""
+        couleurs = list(facets.bitmaps.get('couleur', {}))
+        codes = np.full(facets.n_rows, len(couleurs), dtype=np.int64)
+        for code, value in enumerate(couleurs):
+            codes[facets.unpack(facets.bitmaps['couleur'][value])] = code
+        bio_bitmap = facets.bitmaps.get('bio', {}).get('1')
+        bio = facets.unpack(bio_bitmap).astype(np.int64) if bio_bitmap is not None else np.zeros(facets.n_rows, np.int64)
+        return cls(features, codes, couleurs, bio, np.asarray(facets.prix, dtype=float), bands)
+
+    def __len__(self):
+        return len(self.order)
+
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.order, self.offsets, self.features, self.norms, self.prix, self.position))
+
+    def partition_sizes(self):
+        """Nombre de vins par partition, tableau couleur x tranche x bio"""
+        return np.diff(self.offsets).reshape(self.shape)
+
+    def _ranges(self, couleur=None, bio=False, prix_min=None, prix_max=None):
+        """Plages [début, fin) de la matrice rangée à parcourir, et si leurs prix sont à vérifier"""
+        n_couleurs, n_bands, _ = self.shape
+        if couleur and couleur != "Tous":
+            if couleur not in self.couleurs:
+                return []
+            couleur_codes = [self.couleurs.index(couleur)]
+        else:
+            couleur_codes = range(n_couleurs)
+        lows = np.concatenate([[-np.inf], self.bands])
+        highs = np.concatenate([self.bands, [np.inf]])
+        bands = []
+        for band, (low, high) in enumerate(zip(lows, highs)):
+            if (prix_min is not None and high <= prix_min) or (prix_max is not None and low > prix_max):
+                continue
+            partial = (prix_min is not None and low < prix_min) or (prix_max is not None and high > prix_max)
+            bands.append((band, partial))
+        if prix_min is None and prix_max is None:
+            bands.append((n_bands - 1, False))
+        ranges = []
+        for code in couleur_codes:
+            for band, partial in bands:
+                partition = (code * n_bands + band) * 2
+                start = self.offsets[partition + 1] if bio else self.offsets[partition]
+                end = self.offsets[partition + 2]
+                if start == end:
+                    continue
+                # Plages contiguës fusionnées (les tranches voisines d'une même couleur sans bio)
+                if ranges and ranges[-1][1] == start and ranges[-1][2] == partial:
+                    ranges[-1][1] = end
+                else:
+                    ranges.append([start, end, partial])
+        return ranges
+
+    def nearest(self, wine_id, k=4, couleur=None, bio=False, prix_min=None, prix_max=None):
+        """(ids, distances) des k vins les plus proches de `wine_id` (lui-même exclu) qui respectent les contraintes"""
+        query = self.features[self.position[wine_id]]
+        query_norm = float(query @ query)
+        positions, distances = [], []
+        for start, end, partial in self._ranges(couleur, bio, prix_min, prix_max):
+            block = self.features[start:end] @ query
+            block = self.norms[start:end] - 2 * block + query_norm
+            candidates = np.arange(start, end)
+            if partial:
+                prix = self.prix[start:end]
+                keep = np.ones(end - start, dtype=bool)
+                if prix_min is not None:
+                    keep &= prix >= prix_min
+                if prix_max is not None:
+                    keep &= prix <= prix_max
+                block, candidates = block[keep], candidates[keep]
+            # Seules les k plus proches de chaque plage sont gardées pour la sélection finale
+            if len(block) > k + 1:
+                top = np.argpartition(block, k)[:k + 1]
+                block, candidates = block[top], candidates[top]
+            positions.append(candidates)
+            distances.append(block)
+        if not positions:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        positions, distances = np.concatenate(positions), np.concatenate(distances)
+        own = positions != self.position[wine_id]
+        positions, distances = positions[own], distances[own]
+        top = np.argsort(distances, kind='stable')[:k]
+        return self.order[positions[top]].astype(np.int64), np.sqrt(np.maximum(distances[top], 0))
@@ -5,6 +5,7 @@ import json
 import pandas as pd
 from tqdm import tqdm
 import time
+from vinatis_urls import build_image_urls
 
 # Fonction pour scraper une page et retourner un DataFrame des vins
 def scrape_vinatis(page: int):
@@ -40,14 +41,14 @@ else:
 if not wines_df.empty:
     # On suppose que la colonne 'id' contient l'ID du vin
     if 'id' in wines_df.columns:
-        wines_df['image_url'] = wines_df.apply(lambda row: f"https://www.vinatis.com/{row['id']}-detail_default/{row['name'].lower().replace(' ', '-')}.png", axis=1)
+        id_col = ['id']
     else:
         # Recherche d'une colonne contenant 'id' dans le nom
         id_col = [col for col in wines_df.columns if 'id' in col]
-        if id_col:
-            wines_df['image_url'] = wines_df.apply(lambda row: f"https://www.vinatis.com/{row[id_col[0]]}-detail_default/{row['name'].lower().replace(' ', '-')}.png", axis=1)
-        else:
-            wines_df['image_url'] = None
+    if id_col:
+        wines_df['image_url'] = build_image_urls(wines_df[id_col[0]], wines_df['name'])
+    else:
+        wines_df['image_url'] = None
     # On garde les colonnes principales
     out_df = wines_df[['id', 'name', 'image_url']].dropna(subset=['image_url'])
     out_df.to_csv('vinatis_images_accessibles.csv', index=False)
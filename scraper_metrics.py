@@ -0,0 +1,172 @@
+"""Métriques et événements structurés pour les scrapers.
+
+- compteurs et histogrammes de latence par étape (fetch, cookies, wait, parse...)
+- dumps de debug échantillonnés (au lieu d'écrire le HTML de chaque page)
+- logging non bloquant : les handlers fichier/console tournent dans un thread
+  dédié alimenté par une file (QueueHandler / QueueListener)
+- résumé de fin de run indiquant où le temps a été passé
+"""
+import bisect
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+logger = logging.getLogger('scraper')
+
+# Bornes (en secondes) des classes de l'histogramme de latence
+LATENCY_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+
+def setup_logging(log_file='scraping.log', level=logging.INFO):
+    """Configure un logging asynchrone : les appels de log ne font que déposer dans une file.
+
+    Retourne le QueueListener, à arrêter en fin de run (`listener.stop()`) pour vider la file.
+    """
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [logging.FileHandler(log_file, encoding='utf-8'), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class LatencyHistogram:
+    """Histogramme à classes fixes : coût constant en mémoire quel que soit le nombre de mesures"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q):
+        """Quantile approché (borne supérieure de la classe qui contient le q-ième point)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_s': round(self.total, 3),
+            'mean_s': round(self.total / self.count, 4) if self.count else 0.0,
+            'p50_s': self.quantile(0.5),
+            'p95_s': self.quantile(0.95),
+            'max_s': round(self.max, 3),
+        }
+
+
+class ScraperMetrics:
+    """Collecte thread-safe des compteurs, latences et événements d'un run de scraping"""
+
+    def __init__(self, dump_dir='debug', dump_rate=0.02, max_dumps=20):
+        self.counters = Counter()
+        self.latencies = defaultdict(LatencyHistogram)
+        self.dump_dir = dump_dir
+        self.dump_rate = dump_rate
+        self.max_dumps = max_dumps
+        self.dumps = 0
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self.latencies[stage].observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        """Chronomètre une étape : `with metrics.stage('fetch'): driver.get(url)`"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.incr(f'{name}.errors')
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def event(self, name, level=logging.DEBUG, **fields):
+        """Événement structuré (une ligne JSON), sérialisé seulement si le niveau est actif"""
+        self.incr(f'events.{name}')
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({'event': name, **fields}, ensure_ascii=False, default=str))
+
+    def sample_dump(self, name, content, force=False):
+        """Écrit un dump de debug (HTML...) pour une fraction des appels seulement.
+
+        `force=True` garde le dump quel que soit l'échantillonnage (cas d'erreur), dans la
+        limite de `max_dumps` fichiers par run. `content` peut être une fonction
+        (`lambda: driver.page_source`), appelée seulement si le dump est gardé.
+        Retourne le chemin écrit ou None.
+        """
+        with self._lock:
+            if self.dumps >= self.max_dumps or not (force or random.random() < self.dump_rate):
+                return None
+            self.dumps += 1
+        if callable(content):
+            content = content()
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(self.dump_dir, f'{name}.html')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.incr('debug_dumps')
+        return path
+
+    def summary(self):
+        """Résumé du run : compteurs et latences par étape, avec la part du temps total"""
+        elapsed = time.perf_counter() - self.started
+        with self._lock:
+            stages = {name: hist.to_dict() for name, hist in self.latencies.items()}
+            counters = dict(self.counters)
+        for stats in stages.values():
+            stats['share_pct'] = round(100 * stats['total_s'] / elapsed, 1) if elapsed else 0.0
+        return {'elapsed_s': round(elapsed, 3), 'counters': counters, 'stages': stages}
+
+    def log_summary(self, path=None):
+        """Affiche le résumé dans le log et l'écrit éventuellement en JSON"""
+        summary = self.summary()
+        logger.info(f"Run terminé en {summary['elapsed_s']:.1f} s")
+        for name, stats in sorted(summary['stages'].items(), key=lambda kv: -kv[1]['total_s']):
+            logger.info(
+                f"  {name:<12} n={stats['count']:<6} total={stats['total_s']:>8.1f}s "
+                f"({stats['share_pct']:>5.1f}%) p50={stats['p50_s']}s p95={stats['p95_s']}s"
+            )
+        for name, value in sorted(summary['counters'].items()):
+            logger.info(f"  {name:<24} {value}")
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(summary, f, ensure_ascii=False, indent=2)
+        return summary
@@ -0,0 +1,138 @@
+"""Cache des résultats de recherche, commun à toutes les sessions d'un processus.
+
+Beaucoup d'utilisateurs lancent les mêmes recherches (« France, Rouge, bio, 10-20 € ») :
+le résultat d'une recherche ne dépend que des filtres et de la version des données, il
+est donc calculé une fois puis partagé. La clé est la forme canonique des filtres :
+
+    - « Tous », chaîne vide et False valent « pas de filtre » ;
+    - accords dédoublonnés et triés (ils sont combinés par OU, l'ordre est indifférent) ;
+    - bornes de prix arrondies au centime vers l'intérieur (les prix sont en centimes)
+      et ramenées dans la plage des prix du catalogue (le slider par défaut et une plage
+      plus large donnent la même clé) ;
+    - recherche libre réduite à ses mots (casse, accents et ponctuation ignorés) ;
+      sans aucun mot, elle vaut « pas de filtre ».
+
+La clé porte aussi le moteur du catalogue (mémoire ou SQLite) : pour une même
+recherche libre, ils ne trouvent pas toujours les mêmes vins.
+
+La valeur est le tableau des ids (int32, en lecture seule). Le cache est borné en
+nombre d'entrées et en octets ; les moins récemment utilisées sont évincées en premier,
+y compris celles d'une version remplacée par un rechargement.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from text_search import tokenize
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def _cents(value, rounding):
+    # Tolérance pour les flottants du slider (10.000000001 -> 10.00)
+    return rounding(round(float(value) * 100, 6)) / 100
+
+
+def canonical_filters(filters, prix_range=None):
+    """Filtres de Catalogue.search sous forme canonique ; `prix_range` = (min, max) des prix du catalogue"""
+    def choice(value):
+        return value if value and value != "Tous" else None
+
+    # Sans aucun mot (ponctuation, espaces) : pas de recherche libre, comme un champ vide
+    texte = filters.get('texte')
+    texte = ' '.join(tokenize(texte)) or None if texte else None
+    prix_min, prix_max = filters.get('prix_min'), filters.get('prix_max')
+    if prix_min is not None:
+        prix_min = _cents(prix_min, math.ceil)
+        if prix_range is not None and prix_min < prix_range[0]:
+            prix_min = prix_range[0]
+    if prix_max is not None:
+        prix_max = _cents(prix_max, math.floor)
+        if prix_range is not None and prix_max > prix_range[1]:
+            prix_max = prix_range[1]
+    return {
+        'nom': choice(filters.get('nom')),
+        'texte': texte,
+        'pays': choice(filters.get('pays')),
+        'couleur': choice(filters.get('couleur')),
+        'bio': bool(filters.get('bio')),
+        'prix_min': prix_min,
+        'prix_max': prix_max,
+        'accords': tuple(sorted(set(filters.get('accords') or ()))),
+    }
+
+
+class SearchCache:
+    """Cache LRU borné (entrées et octets) des ids trouvés, indexé par (moteur, version, filtres canoniques)"""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Partagé par les sessions Streamlit (un thread chacune) et les threads du service
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(backend, version, filters):
+        return (backend, version) + tuple(filters.values())
+
+    def get(self, key):
+        with self._lock:
+            ids = self.entries.get(key)
+            if ids is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return ids
+
+    def put(self, key, ids):
+        """Range `ids` (converti en int32 lecture seule) et retourne le tableau rangé"""
+        ids = np.array(ids, dtype=np.int32)
+        ids.setflags(write=False)
+        if not self.max_entries or ids.nbytes > self.max_bytes:
+            return ids
+        with self._lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self.entries[key] = ids
+            self.nbytes += ids.nbytes
+            while len(self.entries) > self.max_entries or self.nbytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return ids
+
+    def get_or_compute(self, key, compute):
+        """Ids en cache, ou calculés par `compute()` puis rangés.
+
+        Le calcul se fait hors du verrou : deux sessions qui ratent la même clé au
+        même moment la calculent chacune, sans se bloquer.
+        """
+        ids = self.get(key)
+        if ids is None:
+            ids = self.put(key, compute())
+        return ids
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'bytes': self.nbytes, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': round(self.hits / lookups, 4) if lookups else None}
+
+
+# Cache du processus, utilisé par les catalogues chargés depuis un fichier ou un instantané partagé
+SEARCH_CACHE = SearchCache(int(os.environ.get('BOUTEILLIA_SEARCH_CACHE', DEFAULT_MAX_ENTRIES)))
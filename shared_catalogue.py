@@ -0,0 +1,231 @@
+"""Catalogue partagé entre plusieurs processus (répliques de app.py, du service HTTP).
+
+Chaque réplique qui lit base_vin_final.csv garde sa propre copie du catalogue
+(DataFrame de chaînes et index). Ici, un seul processus chargeur construit le catalogue
+et publie ses tableaux typés dans un instantané : un fichier .npy par tableau et un
+meta.json, dans un dossier en mémoire partagée (/dev/shm). Les workers ouvrent les
+tableaux avec np.load(mmap_mode='r') : les pages physiques sont celles du système de
+fichiers, communes à tous les processus, sans copie ni lecture du CSV.
+
+    <dossier>/current.json          version publiée (remplacé de façon atomique)
+    <dossier>/<version>/*.npy       facettes, index texte, fiches, colonnes d'affichage, variables du modèle,
+                                    quasi-doublons, vecteurs TF-IDF des textes (similar)
+    <dossier>/<version>/meta.json   agrégats, vocabulaire, clés des facettes
+
+Usage :
+    python shared_catalogue.py --data base_vin_final.csv --watch 30
+    BOUTEILLIA_SHARED_DIR=/dev/shm/bouteillia streamlit run app.py
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from catalogue import CATALOGUE_FILE, Catalogue, CatalogueStore, feature_matrix
+from data_manifest import data_version
+from facets import FacetIndex
+from search_cache import SEARCH_CACHE
+from text_search import TextIndex
+from text_similarity import ARRAYS as TFIDF_ARRAYS
+from text_similarity import TextVectors
+from wine_cards import CardTable, StringColumn
+
+POINTER_FILE = 'current.json'
+META_FILE = 'meta.json'
+# Instantanés conservés : le courant et le précédent (workers pas encore rattachés)
+KEEP_SNAPSHOTS = 2
+
+
+def default_dir():
+    """Dossier en mémoire partagée (tmpfs) si disponible, sinon dossier temporaire"""
+    base = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    return os.path.join(base, 'bouteillia')
+
+
+def read_pointer(directory):
+    """Contenu de current.json : {'version', 'published_at'}"""
+    with open(os.path.join(directory, POINTER_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, ensure_ascii=False, default=lambda v: v.item() if hasattr(v, 'item') else str(v))
+    os.replace(tmp_path, path)
+
+
+def _load_arrays(snapshot_dir):
+    """Tableaux d'un instantané par groupe ({'facets': {'prix': ...}, ...}), mappés en lecture seule"""
+    groups = {}
+    for filename in os.listdir(snapshot_dir):
+        if filename.endswith('.npy'):
+            group, name = filename[:-len('.npy')].split('.', 1)
+            # Vue ndarray du memmap : aucune copie, pages partagées avec les autres processus
+            groups.setdefault(group, {})[name] = np.asarray(np.load(os.path.join(snapshot_dir, filename),
+                                                                    mmap_mode='r'))
+    return groups
+
+
+def publish(catalogue, directory=None, keep=KEEP_SNAPSHOTS):
+    """Écrit l'instantané de `catalogue` puis le désigne comme version courante ; retourne son dossier"""
+    directory = directory or default_dir()
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, catalogue.version)
+    if not os.path.isdir(target):
+        facet_arrays, facet_meta = catalogue.facets.to_arrays()
+        text_arrays, text_meta = catalogue.text_index.to_arrays()
+        feature_names, features = feature_matrix(catalogue.df)
+        vectors = catalogue.text_vectors()
+        groups = {'facets': facet_arrays, 'text': text_arrays, 'cards': catalogue.card_table.to_arrays(),
+                  'reco': {'ids': catalogue.reco_ids}, 'features': {'matrix': features},
+                  'product': {'ids': catalogue.product_ids},
+                  'tfidf': {name: getattr(vectors, name) for name in TFIDF_ARRAYS}}
+        if catalogue.duplicate_groups() is not None:
+            groups['duplicates'] = {'groups': catalogue.duplicate_groups()}
+        for column in catalogue.columns:
+            if column == 'prix':
+                groups['col_prix'] = {'values': catalogue.df['prix'].to_numpy(dtype=np.float64)}
+            else:
+                groups[f'col_{column}'] = StringColumn.from_values(catalogue.df[column]).to_arrays()
+        # Écrit à côté puis renommé : un worker ne voit jamais un instantané incomplet
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=directory)
+        for group, arrays in groups.items():
+            for name, array in arrays.items():
+                np.save(os.path.join(staging, f"{group}.{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        _write_json(os.path.join(staging, META_FILE), {
+            'version': catalogue.version, 'n_rows': len(catalogue), 'columns': catalogue.columns,
+            'aggregates': catalogue.aggregates, 'accords_vocabulary': catalogue.accords_vocabulary,
+            'facets': facet_meta, 'text': text_meta, 'features': feature_names,
+            'tfidf': {'n_docs': vectors.n_docs, 'n_features': vectors.n_features},
+        })
+        os.rename(staging, target)
+    _write_json(os.path.join(directory, POINTER_FILE),
+                {'version': catalogue.version, 'published_at': time.strftime('%Y-%m-%dT%H:%M:%S%z')})
+    _prune(directory, keep)
+    return target
+
+
+def _prune(directory, keep):
+    """Supprime les instantanés les plus anciens (les workers qui les ont mappés gardent leurs pages)"""
+    current = read_pointer(directory)['version']
+    snapshots = [e for e in os.scandir(directory) if e.is_dir() and not e.name.startswith('.')]
+    snapshots.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in snapshots[keep:]:
+        if entry.name != current:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def snapshot_bytes(directory):
+    """Taille de l'instantané courant sur disque (ou en mémoire partagée)"""
+    snapshot_dir = os.path.join(directory, read_pointer(directory)['version'])
+    return sum(e.stat().st_size for e in os.scandir(snapshot_dir))
+
+
+class SharedCatalogue(Catalogue):
+    """Catalogue relu depuis un instantané publié : mêmes méthodes, tableaux mappés en mémoire"""
+
+    def __init__(self, snapshot_dir):
+        with open(os.path.join(snapshot_dir, META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        groups = _load_arrays(snapshot_dir)
+        self.df = None
+        self.version = meta['version']
+        self.search_cache = SEARCH_CACHE
+        self.n_rows = meta['n_rows']
+        self.columns = meta['columns']
+        self.strings = {c: StringColumn.from_arrays(groups[f'col_{c}']) for c in self.columns if c != 'prix'}
+        self.prix = groups['col_prix']['values'] if 'prix' in self.columns else None
+        self.reco_ids = groups['reco']['ids']
+        # Instantanés publiés avant l'historique des prix : pas d'ids Vinatis
+        self.product_ids = groups.get('product', {}).get('ids')
+        self._duplicate_groups = groups.get('duplicates', {}).get('groups')
+        self.facets = FacetIndex.from_arrays(groups['facets'], meta['facets'])
+        self.aggregates = meta['aggregates']
+        self.accords_vocabulary = meta['accords_vocabulary']
+        self.text_index = TextIndex.from_arrays(groups['text'], meta['text'])
+        self.card_table = CardTable.from_arrays(groups['cards'], self.strings['nom'], self.version)
+        self.feature_names = meta['features']
+        self.features = groups['features']['matrix']
+        # Instantanés publiés avant les vecteurs texte : relus du dossier de text_similarity s'il les a
+        if 'tfidf' in groups:
+            self._text_vectors = TextVectors(groups['tfidf'], meta['tfidf']['n_docs'], meta['tfidf']['n_features'])
+
+    @classmethod
+    def attach(cls, directory=None):
+        """Se rattache à la version courante publiée dans `directory`"""
+        directory = directory or default_dir()
+        return cls(os.path.join(directory, read_pointer(directory)['version']))
+
+    def _name_mask(self, nom):
+        return self.strings['nom'].equals(nom)
+
+    def rows(self, ids):
+        """Lignes d'affichage décodées à la demande depuis les colonnes partagées"""
+        records = []
+        for wine_id in (int(i) for i in ids):
+            if not 0 <= wine_id < len(self):
+                continue
+            record = {}
+            for column in self.columns:
+                if column == 'prix':
+                    prix = float(self.prix[wine_id])
+                    record['prix'] = None if np.isnan(prix) else prix
+                else:
+                    record[column] = self.strings[column][wine_id]
+            record['id'] = wine_id
+            records.append(record)
+        return records
+
+
+class SharedCatalogueStore(CatalogueStore):
+    """CatalogueStore des workers : suit la version publiée par le chargeur et s'y rattache.
+
+    Se rattacher ne coûte que l'ouverture des fichiers et la relecture de meta.json ;
+    tant que rien n'est publié, get() retourne None (voir /ready).
+    """
+
+    def __init__(self, directory=None, poll_s=5.0, preload=True):
+        directory = directory or default_dir()
+        preload = preload and os.path.exists(os.path.join(directory, POINTER_FILE))
+        super().__init__(directory, poll_s, preload)
+
+    def _disk_version(self):
+        return read_pointer(self.path)['version']
+
+    def _load(self):
+        return SharedCatalogue.attach(self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publie le catalogue en mémoire partagée pour les workers")
+    parser.add_argument('--data', default=CATALOGUE_FILE)
+    parser.add_argument('--dir', default=None, help="Dossier des instantanés (défaut : /dev/shm/bouteillia)")
+    parser.add_argument('--watch', type=float, default=0.0,
+                        help="Republie toutes les N secondes si la version des données change (0 : une fois)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    directory = args.dir or default_dir()
+    published = None
+    while True:
+        if data_version(args.data) != published:
+            start = time.perf_counter()
+            catalogue = Catalogue.from_csv(args.data)
+            target = publish(catalogue, directory)
+            published = catalogue.version
+            del catalogue
+            logging.info(f"Catalogue {published} publié dans {target} "
+                         f"({snapshot_bytes(directory) / 2**20:.1f} Mo, {time.perf_counter() - start:.1f} s)")
+        if not args.watch:
+            break
+        time.sleep(args.watch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,513 @@
+"""Catalogue dans une base SQLite embarquée : recherche, facettes et recommandations en requêtes indexées.
+
+Le catalogue en mémoire (catalogue.Catalogue) garde tout le DataFrame et ses index
+dans chaque processus. Ici, le chargeur lit la base finale du pipeline par morceaux,
+sans les colonnes one-hot du modèle, et l'écrit dans un fichier SQLite ; les
+processus n'en gardent en mémoire que les pages utiles (cache de SQLite).
+
+    wines(id, nom, prix, pays, ..., markdown,   une ligne par vin : colonnes d'affichage, fiche pré-rendue
+          product_id)                           et id Vinatis (clé de l'historique des prix, -1 si absent)
+    wine_facets(id, pays, couleur, bio, prix)   colonnes filtrées, dans une table étroite (parcours rapides)
+    wine_accords(accord, wine_id)               table de jonction vin-accord (avec les accords contenus
+                                                dans ceux du vin : « Viande » pour « Viande rouge »)
+    recommendations(wine_id, rank, reco_id)     reco1..reco4 résolus en ids au chargement
+    duplicates(wine_id, group_id)               groupes de quasi-doublons (near_duplicates), calculés au chargement
+    wines_fts                                   index plein texte FTS5 (nom, producteur, appellation...)
+    meta(key, value)                            version des données, colonnes, agrégats (JSON)
+
+Les variables du modèle (colonnes one-hot) ne sont pas dans la base : le chargeur les
+écrit morceau par morceau dans <base>.<version>.features.npy, relu en mémoire mappée
+pour les recommandations par similarité (nearest). Il calcule aussi les vecteurs TF-IDF
+des textes (similar) dans le dossier de text_similarity, comme le catalogue en mémoire.
+
+Index : pays, couleur, bio, prix (et deux index couvrants pays/couleur pour les comptages
+par facette), nom, product_id ; la jonction est triée par (accord, wine_id) et indexée par vin.
+La recherche libre passe par FTS5 (BM25, dernier mot complété) : sans la tolérance
+aux fautes de frappe de text_search. Les valeurs sont gardées telles qu'écrites dans
+le CSV (« 2015 » et non « 2015.0 » pour un millésime d'une colonne incomplète).
+
+Usage :
+    python sql_catalogue.py --data base_vin_final.csv --db base_vin.sqlite
+    BOUTEILLIA_SQLITE=base_vin.sqlite streamlit run app.py
+"""
+import argparse
+import json
+import logging
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from catalogue import (CATALOGUE_FILE, DISPLAY_COLUMNS, NON_FEATURE_COLUMNS, RECO_COLUMNS, TEXT_VECTORS_DIR, Catalogue,
+                       CatalogueStore, feature_matrix, normalize_catalogue, product_ids)
+from data_manifest import data_version
+from facets import FACETS, QUANTILES, contained_accords, explode_accords, matching_accords
+from near_duplicates import MATCH_FIELDS, duplicate_groups
+from reco_index import PartitionedIndex
+from search_cache import SEARCH_CACHE, canonical_filters
+from text_search import FIELD_WEIGHTS, tokenize
+from text_similarity import TEXT_FIELDS, TermCounts, is_built, load_or_build
+from wine_cards import render_cards
+
+DEFAULT_DB = 'base_vin.sqlite'
+FACET_COLUMNS = ['pays', 'couleur', 'bio', 'prix']
+CHUNK_ROWS = 100_000
+
+
+def features_path(db_path, version):
+    """Fichier des variables du modèle de la version `version` de la base"""
+    return f"{db_path}.{version}.features.npy"
+
+
+def _write_features(raw_path, path, n_rows, n_features, block_rows=CHUNK_ROWS):
+    """Lignes float32 accumulées dans `raw_path` -> tableau .npy (n_rows, n_features), par blocs"""
+    out = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(n_rows, n_features))
+    if n_rows and n_features:
+        raw = np.memmap(raw_path, dtype=np.float32, mode='r', shape=(n_rows, n_features))
+        for start in range(0, n_rows, block_rows):
+            out[start:start + block_rows] = raw[start:start + block_rows]
+        del raw
+    out.flush()
+    del out
+
+
+def _prune_features(db_path, keep):
+    """Supprime les variables des versions remplacées (les processus qui les ont mappées gardent leurs pages)"""
+    for path in glob.glob(glob.escape(db_path) + '.*.features.npy'):
+        if path != keep:
+            os.remove(path)
+
+
+def _quote(column):
+    # « desc » est un mot réservé SQL
+    return f'"{column}"'
+
+
+def _schema(columns, facet_columns, text_fields):
+    def definitions(names):
+        return ', '.join(f"{_quote(c)} {'REAL' if c == 'prix' else 'TEXT'}" for c in names)
+
+    return f"""
+        CREATE TABLE wines (id INTEGER PRIMARY KEY, {definitions(columns)}, markdown TEXT, product_id INTEGER);
+        CREATE TABLE wine_facets (id INTEGER PRIMARY KEY, {definitions(facet_columns)});
+        CREATE TABLE wine_accords (accord TEXT NOT NULL, wine_id INTEGER NOT NULL,
+                                   PRIMARY KEY (accord, wine_id)) WITHOUT ROWID;
+        CREATE TABLE recommendations (wine_id INTEGER NOT NULL, rank INTEGER NOT NULL, reco_id INTEGER NOT NULL,
+                                      PRIMARY KEY (wine_id, rank)) WITHOUT ROWID;
+        CREATE TABLE duplicates (wine_id INTEGER PRIMARY KEY, group_id INTEGER NOT NULL);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+        CREATE VIRTUAL TABLE wines_fts USING fts5({', '.join(map(_quote, text_fields))}, content='',
+                                                  tokenize='unicode61 remove_diacritics 2');
+    """
+
+
+def _insert_chunk(conn, df, offset, columns, text_fields):
+    ids = np.arange(offset, offset + len(df)).tolist()
+    values = df[columns].astype(object).where(df[columns].notna(), None)
+    markdown = render_cards(df).tolist()
+    products = product_ids(df).tolist()
+    conn.executemany(f"INSERT INTO wines (id, {', '.join(map(_quote, columns))}, markdown, product_id) "
+                     f"VALUES ({', '.join('?' * (len(columns) + 3))})",
+                     ([i, *row, md, p] for i, row, md, p in zip(ids, values.itertuples(index=False), markdown, products)))
+    facet_columns = [c for c in FACET_COLUMNS if c in columns]
+    conn.executemany(f"INSERT INTO wine_facets (id, {', '.join(facet_columns)}) "
+                     f"VALUES ({', '.join('?' * (len(facet_columns) + 1))})",
+                     ([i, *row] for i, row in zip(ids, values[facet_columns].itertuples(index=False))))
+    if 'accords' in columns:
+        accords = explode_accords(df['accords'])
+        conn.executemany("INSERT OR IGNORE INTO wine_accords VALUES (?, ?)",
+                         zip(accords.tolist(), (accords.index.to_numpy() + offset).tolist()))
+    texts = df[text_fields].where(df[text_fields] != 'nan', '')
+    conn.executemany(f"INSERT INTO wines_fts (rowid, {', '.join(map(_quote, text_fields))}) "
+                     f"VALUES ({', '.join('?' * (len(text_fields) + 1))})",
+                     ([i, *row] for i, row in zip(ids, texts.itertuples(index=False))))
+
+
+def _expand_accords(conn):
+    """Chaque vin reçoit aussi les accords contenus dans les siens, comme facets.expand_accords"""
+    labels = [a for (a,) in conn.execute("SELECT DISTINCT accord FROM wine_accords ORDER BY accord")]
+    for i, j in contained_accords(labels):
+        if i != j:
+            conn.execute("INSERT OR IGNORE INTO wine_accords SELECT ?, wine_id FROM wine_accords WHERE accord = ?",
+                         (labels[j], labels[i]))
+
+
+def _resolve_recos(conn, columns):
+    """reco1..reco4 -> id du premier vin portant ce nom (comme Catalogue._resolve_recos)"""
+    conn.execute("CREATE TEMP TABLE first_id AS SELECT nom, MIN(id) AS id FROM wines GROUP BY nom")
+    conn.execute("CREATE INDEX temp.first_id_nom ON first_id (nom)")
+    for rank, column in enumerate(c for c in RECO_COLUMNS if c in columns):
+        conn.execute(f"INSERT INTO recommendations SELECT w.id, {rank}, f.id FROM wines w "
+                     f"JOIN first_id f ON f.nom = w.{_quote(column)}")
+
+
+def _duplicate_groups(conn, columns):
+    """Groupes de quasi-doublons, calculés sur les noms et les champs à concorder relus dans la base"""
+    fields = [c for c in ('nom',) + MATCH_FIELDS if c in columns]
+    if 'nom' not in fields:
+        return
+    df = pd.read_sql_query(f"SELECT {', '.join(map(_quote, fields))} FROM wines ORDER BY id", conn)
+    conn.executemany("INSERT INTO duplicates VALUES (?, ?)", enumerate(duplicate_groups(df).tolist()))
+
+
+def _aggregates(conn, columns, version, n_rows, bins=20):
+    """Mêmes agrégats que facets.build_aggregates, calculés par requêtes"""
+    rows = conn.execute("SELECT prix FROM wine_facets WHERE prix IS NOT NULL")
+    prix = np.fromiter((p for (p,) in rows), dtype=float)
+    counts, edges = np.histogram(prix, bins=bins) if len(prix) else (np.array([]), np.array([]))
+    quantiles = np.quantile(prix, QUANTILES) if len(prix) else [np.nan] * len(QUANTILES)
+    aggregates = {
+        'version': version,
+        'n_wines': n_rows,
+        'counts': {},
+        'prix': {
+            'min': float(prix.min()) if len(prix) else 0.0,
+            'max': float(prix.max()) if len(prix) else 0.0,
+            'quantiles': {f"p{int(q * 100)}": float(v) for q, v in zip(QUANTILES, quantiles)},
+            'histogram': {'edges': [round(float(e), 2) for e in edges], 'counts': counts.tolist()},
+        },
+    }
+    for facet in FACETS:
+        if facet not in columns:
+            continue
+        if facet == 'accords':
+            query = "SELECT accord, COUNT(*) FROM wine_accords GROUP BY accord ORDER BY accord"
+        else:
+            query = (f"SELECT {facet}, COUNT(*) FROM wine_facets WHERE {facet} != 'nan' "
+                     f"GROUP BY {facet} ORDER BY {facet}")
+        aggregates['counts'][facet] = dict(conn.execute(query).fetchall())
+    if 'couleur' in columns and 'pays' in columns:
+        couleur_pays = {}
+        for couleur, pays, n in conn.execute("SELECT couleur, pays, COUNT(*) FROM wine_facets "
+                                             "GROUP BY couleur, pays ORDER BY couleur, pays"):
+            couleur_pays.setdefault(couleur, {})[pays] = n
+        aggregates['couleur_pays'] = couleur_pays
+    return aggregates
+
+
+def build_database(data_path=CATALOGUE_FILE, db_path=DEFAULT_DB, chunk_rows=CHUNK_ROWS,
+                   text_vectors_dir=TEXT_VECTORS_DIR):
+    """Écrit la base SQLite du catalogue à côté de `db_path` puis la substitue ; retourne sa version
+
+    Les vecteurs texte de la version sont écrits dans `text_vectors_dir` s'ils n'y sont pas déjà.
+    """
+    version = data_version(data_path)
+    header = pd.read_csv(data_path, nrows=0).columns
+    usecols = [c for c in ['id'] + DISPLAY_COLUMNS + list(TEXT_FIELDS) if c in header]
+    model_columns = [c for c in header if c not in usecols and c not in NON_FEATURE_COLUMNS]
+    tmp_path = f"{db_path}.tmp{os.getpid()}"
+    raw_features = f"{tmp_path}.features"
+    target = features_path(db_path, version)
+    for path in (tmp_path, raw_features):
+        if os.path.exists(path):
+            os.remove(path)
+    conn = sqlite3.connect(tmp_path)
+    raw = open(raw_features, 'wb')
+    try:
+        # Fichier temporaire : pas de journal, il est jeté si le chargement échoue
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        columns = text_fields = feature_names = None
+        n_rows = 0
+        # Termes des textes hachés à chaque morceau : les textes ne sont pas gardés jusqu'à la fin
+        terms = None if is_built(version, text_vectors_dir) else TermCounts()
+        # Colonnes lues comme texte : un morceau ne doit pas deviner un autre type que le suivant
+        reader = pd.read_csv(data_path, usecols=usecols + model_columns, chunksize=chunk_rows,
+                             dtype={c: str for c in usecols if c != 'prix'})
+        for chunk in reader:
+            # Variables choisies sur le premier morceau, puis les mêmes colonnes pour les suivants
+            feature_names, features = feature_matrix(chunk[model_columns], feature_names)
+            raw.write(features.tobytes())
+            df = normalize_catalogue(chunk.drop(columns=model_columns))
+            if columns is None:
+                columns = [c for c in DISPLAY_COLUMNS if c in df.columns]
+                text_fields = [f for f in FIELD_WEIGHTS if f in columns]
+                conn.executescript(_schema(columns, [c for c in FACET_COLUMNS if c in columns], text_fields))
+            _insert_chunk(conn, df, n_rows, columns, text_fields)
+            if terms is not None:
+                terms.add(df[[f for f in TEXT_FIELDS if f in df.columns]])
+            n_rows += len(df)
+        # Index créés après le chargement (plus rapide qu'à chaque insertion)
+        facet_columns = [c for c in FACET_COLUMNS if c in columns]
+        for column in facet_columns:
+            conn.execute(f"CREATE INDEX facets_{column} ON wine_facets ({column})")
+        # Comptages par couleur pour un pays (et inversement) sans relire la table
+        if 'pays' in columns and 'couleur' in columns:
+            others = [c for c in facet_columns if c not in ('pays', 'couleur')]
+            conn.execute(f"CREATE INDEX facets_pays_couleur ON wine_facets ({', '.join(['pays', 'couleur'] + others)})")
+            conn.execute(f"CREATE INDEX facets_couleur_pays ON wine_facets ({', '.join(['couleur', 'pays'] + others)})")
+        if 'accords' in columns:
+            _expand_accords(conn)
+        conn.execute("CREATE INDEX accords_wine ON wine_accords (wine_id)")
+        conn.execute("CREATE INDEX wines_nom ON wines (nom)")
+        # Index étroit : les ids Vinatis se relisent sans parcourir les fiches
+        conn.execute("CREATE INDEX wines_product ON wines (product_id)")
+        _resolve_recos(conn, columns)
+        _duplicate_groups(conn, columns)
+        aggregates = _aggregates(conn, columns, version, n_rows)
+        meta = {'version': version, 'n_rows': n_rows, 'columns': columns, 'text_fields': text_fields,
+                'aggregates': aggregates, 'features': feature_names,
+                'features_file': os.path.basename(features_path(db_path, version))}
+        conn.executemany("INSERT INTO meta VALUES (?, ?)",
+                         [(k, json.dumps(v, ensure_ascii=False, default=lambda x: x.item())) for k, v in meta.items()])
+        conn.execute("ANALYZE")
+        conn.commit()
+        raw.close()
+        load_or_build(terms, version, text_vectors_dir)
+        del terms
+        # Variables en place avant la base qui les désigne
+        _write_features(raw_features, f"{target}.tmp{os.getpid()}", n_rows, len(feature_names))
+        os.replace(f"{target}.tmp{os.getpid()}", target)
+    except BaseException:
+        # Chargement interrompu : ni base ni variables à moitié écrites à côté de la base
+        conn.close()
+        for path in (tmp_path, f"{target}.tmp{os.getpid()}"):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    finally:
+        conn.close()
+        raw.close()
+        if os.path.exists(raw_features):
+            os.remove(raw_features)
+    # Les processus qui ont ouvert l'ancienne base continuent de la lire jusqu'à leur prochain contrôle
+    os.replace(tmp_path, db_path)
+    _prune_features(db_path, target)
+    return version
+
+
+def read_version(db_path):
+    """Version des données enregistrée dans la base"""
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+    except sqlite3.DatabaseError as e:
+        raise ValueError(f"Base {db_path} illisible : {e}") from e
+    finally:
+        conn.close()
+    if row is None:
+        raise ValueError(f"Base {db_path} sans version")
+    return json.loads(row[0])
+
+
+def fts_query(texte):
+    """Requête FTS5 équivalente à la recherche libre : un des mots, le dernier complété"""
+    tokens = tokenize(texte)
+    return ' OR '.join(f'"{t}"' + ('*' if i == len(tokens) - 1 else '') for i, t in enumerate(tokens))
+
+
+class SqlCatalogue(Catalogue):
+    """Catalogue interrogé dans la base SQLite : mêmes méthodes que Catalogue"""
+
+    # FTS5 sans tolérance aux fautes de frappe : résultats rangés à part dans le cache
+    backend = 'sqlite'
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.path = db_path
+        # Une connexion par thread (sessions Streamlit, threads du service)
+        self._local = threading.local()
+        meta = {k: json.loads(v) for k, v in self._conn().execute("SELECT key, value FROM meta")}
+        self.df = None
+        self.version = meta['version']
+        self.search_cache = SEARCH_CACHE
+        self.n_rows = meta['n_rows']
+        self.columns = meta['columns']
+        self.text_fields = meta['text_fields']
+        self.aggregates = meta['aggregates']
+        self.accords_vocabulary = list(self.aggregates['counts'].get('accords', {}))
+        self.product_ids = self._product_ids()
+        # Base écrite avant les variables du modèle (ou fichier supprimé) : pas de nearest
+        self.feature_names = meta.get('features')
+        path = os.path.join(os.path.dirname(os.path.abspath(db_path)), meta.get('features_file') or '')
+        self.features = np.asarray(np.load(path, mmap_mode='r')) if meta.get('features_file') and \
+            os.path.exists(path) else None
+
+    def _product_ids(self):
+        """Ids Vinatis par vin, lus dans l'index wines_product ; None pour une base écrite sans eux"""
+        try:
+            rows = self._conn().execute("SELECT id, product_id FROM wines INDEXED BY wines_product").fetchall()
+        except sqlite3.OperationalError:
+            return None
+        ids = np.full(self.n_rows, -1, dtype=np.int64)
+        if rows:
+            positions, values = np.array(rows, dtype=np.int64).T
+            ids[positions] = values
+        return ids
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            conn.execute("PRAGMA mmap_size = 268435456")
+            self._local.conn = conn
+        return conn
+
+    def _where(self, filters, exclude=None):
+        """(clause WHERE sur wine_facets f, paramètres) des filtres canoniques, sans le filtre `exclude`"""
+        clauses, params = [], []
+        for facet in ('pays', 'couleur'):
+            if filters.get(facet) and facet != exclude:
+                clauses.append(f"f.{facet} = ?")
+                params.append(filters[facet])
+        if filters.get('bio') and exclude != 'bio':
+            clauses.append("f.bio = '1'")
+        for bound, op in (('prix_min', '>='), ('prix_max', '<=')):
+            if filters.get(bound) is not None:
+                clauses.append(f"f.prix {op} ?")
+                params.append(filters[bound])
+        if filters.get('accords') and exclude != 'accords':
+            labels = matching_accords(filters['accords'], self.accords_vocabulary)
+            clauses.append(f"f.id IN (SELECT wine_id FROM wine_accords "
+                           f"WHERE accord IN ({', '.join('?' * len(labels))}))" if labels else "0")
+            params.extend(labels)
+        if filters.get('nom'):
+            clauses.append("f.id IN (SELECT id FROM wines WHERE nom = ?)")
+            params.append(filters['nom'])
+        # Texte sans aucun mot (ponctuation seule) : pas de filtre, comme un champ vide
+        if filters.get('texte') and fts_query(filters['texte']):
+            clauses.append("f.id IN (SELECT rowid FROM wines_fts WHERE wines_fts MATCH ?)")
+            params.append(fts_query(filters['texte']))
+        return ' AND '.join(clauses), params
+
+    def _search(self, texte=None, **filters):
+        where, params = self._where(filters)
+        if texte and fts_query(texte):
+            weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in self.text_fields)
+            query = (f"SELECT f.id FROM wines_fts JOIN wine_facets f ON f.id = wines_fts.rowid "
+                     f"WHERE wines_fts MATCH ? {'AND ' + where if where else ''} "
+                     f"ORDER BY bm25(wines_fts, {weights}), f.id")
+            params = [fts_query(texte)] + params
+        else:
+            query = f"SELECT f.id FROM wine_facets f {'WHERE ' + where if where else ''} ORDER BY f.id"
+        return np.fromiter((i for (i,) in self._conn().execute(query, params)), dtype=np.int64)
+
+    def facet_counts(self, **filters):
+        """Nombre de vins correspondant aux filtres, et par valeur de chaque facette (un GROUP BY par facette)"""
+        prix = self.aggregates['prix']
+        filters = canonical_filters(filters, (prix['min'], prix['max']))
+        conn = self._conn()
+        where, params = self._where(filters)
+        total = conn.execute(f"SELECT COUNT(*) FROM wine_facets f WHERE {where}", params).fetchone()[0] \
+            if where else len(self)
+        result = {'total': total, 'facets': {}}
+        for facet, values in self.aggregates['counts'].items():
+            where, params = self._where(filters, exclude=facet)
+            if not where:
+                # Aucun autre filtre : les comptages sont ceux des agrégats
+                result['facets'][facet] = dict(values)
+                continue
+            if facet == 'accords':
+                query = (f"SELECT a.accord, COUNT(*) FROM wine_accords a JOIN wine_facets f ON f.id = a.wine_id "
+                         f"WHERE {where} GROUP BY a.accord")
+            else:
+                query = f"SELECT f.{facet}, COUNT(*) FROM wine_facets f WHERE {where} GROUP BY f.{facet}"
+            counts = dict(conn.execute(query, params).fetchall())
+            result['facets'][facet] = {value: counts.get(value, 0) for value in values}
+        return result
+
+    def text_search(self, query, k=10):
+        if not fts_query(query):
+            return np.zeros(0, dtype=np.int64)
+        weights = ', '.join(str(FIELD_WEIGHTS[f]) for f in self.text_fields)
+        rows = self._conn().execute(f"SELECT rowid FROM wines_fts WHERE wines_fts MATCH ? "
+                                    f"ORDER BY bm25(wines_fts, {weights}), rowid LIMIT ?", (fts_query(query), k))
+        return np.fromiter((i for (i,) in rows), dtype=np.int64)
+
+    def _fetch(self, columns, ids):
+        """Lignes {id: tuple} des vins demandés (une seule requête, ids passés en JSON)"""
+        ids = [int(i) for i in ids]
+        rows = self._conn().execute(f"SELECT id, {columns} FROM wines WHERE id IN (SELECT value FROM json_each(?))",
+                                    (json.dumps(ids),))
+        return ids, {row[0]: row[1:] for row in rows}
+
+    def rows(self, ids):
+        ids, found = self._fetch(', '.join(map(_quote, self.columns)), ids)
+        records = []
+        for wine_id in ids:
+            if wine_id in found:
+                record = dict(zip(self.columns, found[wine_id]))
+                record['id'] = wine_id
+                records.append(record)
+        return records
+
+    def cards(self, ids):
+        ids, found = self._fetch("nom, visuel, bio, markdown", ids)
+        return [{'id': i, 'nom': found[i][0], 'visuel': found[i][1] if found[i][1] not in (None, '', 'nan') else None,
+                 'bio': found[i][2] == '1', 'markdown': found[i][3]} for i in ids if i in found]
+
+    def recommend(self, wine_id, collapse=False):
+        rows = self._conn().execute("SELECT reco_id FROM recommendations WHERE wine_id = ? ORDER BY rank",
+                                    (int(wine_id),))
+        ids = [i for (i,) in rows]
+        return self.collapse(ids, exclude=int(wine_id)).tolist() if collapse and ids else ids
+
+    def feature_vectors(self):
+        return self.features
+
+    def reco_index(self):
+        """Index partitionné construit depuis la table des facettes (couleur, bio, prix) et les variables mappées"""
+        index = getattr(self, '_reco_index', None)
+        if index is None:
+            available = [c for c in ('couleur', 'bio', 'prix') if c in self.columns]
+            df = pd.read_sql_query(f"SELECT {', '.join(['id'] + available)} FROM wine_facets ORDER BY id",
+                                   self._conn()).reindex(columns=['couleur', 'bio', 'prix'])
+            couleurs = list(self.aggregates['counts'].get('couleur', {}))
+            codes = pd.Categorical(df['couleur'], categories=couleurs).codes.astype(np.int64)
+            codes[codes < 0] = len(couleurs)
+            bio = (df['bio'] == '1').to_numpy(dtype=np.int64)
+            prix = pd.to_numeric(df['prix'], errors='coerce').to_numpy(dtype=float)
+            index = self._reco_index = PartitionedIndex(self.features, codes, couleurs, bio, prix)
+        return index
+
+    def nearest(self, wine_id, k=4, couleur=None, bio=False, prix_min=None, prix_max=None):
+        if self.features is None:
+            raise ValueError(f"Variables du modèle absentes de la base {self.path} "
+                             f"(la reconstruire : python sql_catalogue.py --db {self.path})")
+        return super().nearest(wine_id, k, couleur, bio, prix_min, prix_max)
+
+    def duplicate_groups(self):
+        groups = getattr(self, '_duplicate_groups', None)
+        if groups is None:
+            try:
+                rows = self._conn().execute("SELECT group_id FROM duplicates ORDER BY wine_id").fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            groups = self._duplicate_groups = np.fromiter((g for (g,) in rows), dtype=np.int64)
+        # Base écrite avant les quasi-doublons (ou sans la colonne nom) : pas de groupes
+        return groups if len(groups) == self.n_rows else None
+
+
+class SqlCatalogueStore(CatalogueStore):
+    """CatalogueStore sur la base SQLite : rouvre la base quand build_database en a substitué une nouvelle"""
+
+    def __init__(self, db_path=DEFAULT_DB, poll_s=30.0, preload=True):
+        super().__init__(db_path, poll_s, preload and os.path.exists(db_path))
+
+    def _disk_version(self):
+        return read_version(self.path)
+
+    def _load(self):
+        return SqlCatalogue(self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Charge la base des vins dans un fichier SQLite")
+    parser.add_argument('--data', default=CATALOGUE_FILE)
+    parser.add_argument('--db', default=DEFAULT_DB)
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--text-vectors', default=TEXT_VECTORS_DIR, help="Dossier des vecteurs texte (similar)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    version = build_database(args.data, args.db, args.chunk_rows, args.text_vectors)
+    logging.info(f"Base {args.db} écrite : version {version}, {os.path.getsize(args.db) / 2**20:.1f} Mo, "
+                 f"{time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Analyseurs des marchands rejoués hors ligne sur les pages enregistrées de tests/fixtures."""
+import os
+import sys
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from merchant_scraper import replay  # noqa: E402
+from merchant_sources import IN_STOCK, OUT_OF_STOCK, RECORD_COLUMNS, JsonLdSource, VinatisSource  # noqa: E402
+from validation import validate_file  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+def test_replay_vinatis():
+    df, stats = replay(VinatisSource(), os.path.join(FIXTURES, 'vinatis'))
+    assert list(df.columns) == RECORD_COLUMNS + ['date_collecte']
+    assert df['id'].tolist() == [67391, 71208]
+    assert df['source'].tolist() == ['vinatis', 'vinatis']
+    assert df['nom'].tolist() == ["Château Tour Saint-Christophe 2019", "Sancerre Les Baronnes 2022 - Henri Bourgeois"]
+    assert df['prix'].tolist() == ["32,90", "21,50"]
+    assert df['couleur'].tolist() == ['Rouge', 'Blanc']
+    assert df['stock'].tolist() == [IN_STOCK, OUT_OF_STOCK]
+    assert df['url'].tolist() == ["https://www.vinatis.com/67391-chateau-tour-saint-christophe-2019",
+                                  "https://www.vinatis.com/71208-sancerre-les-baronnes-2022-henri-bourgeois"]
+    assert stats['vinatis']['cache_hits'] == 1 and stats['vinatis']['missing'] == 0
+    assert stats['vinatis']['records'] == 2
+
+
+def test_replay_jsonld():
+    df, stats = replay(JsonLdSource('cave', 'https://cave.example/'), os.path.join(FIXTURES, 'cave'))
+    df = df.sort_values('nom', ignore_index=True)  # ordre d'arrivée des fiches
+    assert df['source'].tolist() == ['cave', 'cave']
+    assert df['nom'].tolist() == ['Chablis 1er Cru Montmains 2020', 'Crozes-Hermitage Les Meysonniers 2021']
+    # Pas de sku : l'URL de la fiche sert de référence
+    assert df['id'].tolist() == ['https://cave.example/produit/chablis-1er-cru-2020', 'CH-21-75']
+    assert df['producteur'].tolist() == ['Domaine Laroche', 'M. Chapoutier']
+    assert df['prix'].tolist() == [34, '19.90']
+    assert df['couleur'].tolist() == ['Blanc', 'Rouge']
+    assert df['millesime'].tolist() == [None, '2021']
+    assert df['deg_alcool'].tolist() == ['12,5 %', None]
+    assert df['contenance'].tolist() == [None, '75 cl']
+    assert df['stock'].tolist() == [OUT_OF_STOCK, IN_STOCK]
+    assert df['visuel'].tolist() == [None, 'https://cave.example/img/crozes-2021.jpg']
+    # Listing + deux fiches (le lien « #avis » n'est pas une seconde fiche)
+    assert stats['cave']['cache_hits'] == 3 and stats['cave']['missing'] == 0
+    assert stats['cave']['records'] == 2
+
+
+def test_replayed_records_pass_validation(tmp_path):
+    vinatis, _ = replay(VinatisSource(), os.path.join(FIXTURES, 'vinatis'))
+    cave, _ = replay(JsonLdSource('cave', 'https://cave.example/'), os.path.join(FIXTURES, 'cave'))
+    cave = cave.sort_values('nom')
+    collected, clean, rejects = tmp_path / 'vins_marchands.csv', tmp_path / 'propres.csv', tmp_path / 'rejets.csv'
+    pd.concat([vinatis, cave], ignore_index=True).to_csv(collected, index=False)
+    report = validate_file(collected, clean, rejects)
+    assert report['rows'] == {'rows': 4, 'accepted': 4, 'rejected': 0}, report['rejected_by_rule']
+    df = pd.read_csv(clean, dtype=str)
+    assert df['source'].tolist() == ['vinatis', 'vinatis', 'cave', 'cave']
+    assert df['id'].tolist() == ['67391', '71208', 'https://cave.example/produit/chablis-1er-cru-2020', 'CH-21-75']
+    assert df['stock'].tolist() == [IN_STOCK, OUT_OF_STOCK, OUT_OF_STOCK, IN_STOCK]
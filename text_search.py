@@ -0,0 +1,203 @@
+"""Index plein texte du catalogue : recherche par mots, tolérante aux fautes, classée BM25.
+
+Les champs texte (nom, desc, accroche, region, appellation, domaine) sont découpés
+en mots minuscules sans accents. L'index est construit une fois au chargement :
+- listes inversées (mot -> vins, fréquence pondérée par champ) en tableaux numpy ;
+- index de trigrammes sur le vocabulaire, pour retrouver « chateu » ou « bordaux » ;
+- vocabulaire trié, pour compléter le dernier mot tapé (« marg » -> « margaux »).
+"""
+import re
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from vinatis_urls import fold_accents
+
+# Poids de chaque champ dans la fréquence des mots (le nom compte plus que la description).
+# La base n'a pas de colonne « domaine » : c'est la colonne producteur.
+FIELD_WEIGHTS = {
+    'nom': 3.0,
+    'producteur': 2.0,
+    'appellation': 1.5,
+    'region': 1.5,
+    'accroche': 1.0,
+    'desc': 1.0,
+}
+
+TOKEN_PATTERN = r'[a-z0-9]+'
+
+
+def tokenize(text):
+    """Découpe une requête en mots minuscules sans accents (même traitement que l'index)"""
+    text = str(text).lower().replace('œ', 'oe').replace('æ', 'ae')
+    folded = unicodedata.normalize('NFKD', text).encode('ascii', errors='ignore').decode('ascii')
+    return re.findall(TOKEN_PATTERN, folded)
+
+
+def _tokens_by_row(values):
+    """Mots de chaque ligne d'une colonne texte, à plat : (positions des lignes, mots)"""
+    values = values.where(values != 'nan')
+    tokens = fold_accents(values.str.lower()).str.findall(TOKEN_PATTERN).explode().dropna()
+    return tokens.index.to_numpy(), tokens.to_numpy(dtype=object)
+
+
+def _trigrams(term):
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TextIndex:
+    """Index inversé BM25 + trigrammes, interrogé par top_k()"""
+
+    def __init__(self, df, fields=None, k1=1.2, b=0.75, chunksize=100_000):
+        fields = fields or FIELD_WEIGHTS
+        fields = {f: w for f, w in fields.items() if f in df.columns}
+        self.k1 = k1
+        self.b = b
+        self.n_docs = len(df)
+        vocabulary = {}
+        keys, weights = [], []
+        # Par paquets de lignes pour borner la mémoire des mots explosés
+        for start in range(0, self.n_docs, chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            for field, weight in fields.items():
+                rows, tokens = _tokens_by_row(chunk[field].reset_index(drop=True))
+                codes, uniques = pd.factorize(tokens)
+                global_ids = np.array([vocabulary.setdefault(t, len(vocabulary)) for t in uniques], dtype=np.int64)
+                keys.append(global_ids[codes] * self.n_docs + rows + start)
+                weights.append(np.full(len(rows), weight, dtype=np.float32))
+        keys = np.concatenate(keys) if keys else np.empty(0, dtype=np.int64)
+        weights = np.concatenate(weights) if weights else np.empty(0, dtype=np.float32)
+        # Une entrée par (mot, vin) avec la fréquence pondérée ; le tri par clé groupe par mot
+        postings, inverse = np.unique(keys, return_inverse=True)
+        tf = np.bincount(inverse, weights=weights).astype(np.float32)
+        terms = postings // max(self.n_docs, 1)
+        self.docs = (postings % max(self.n_docs, 1)).astype(np.int32)
+        self.tf = tf
+        self.indptr = np.searchsorted(terms, np.arange(len(vocabulary) + 1))
+        doc_freq = np.diff(self.indptr)
+        self.idf = np.log(1 + (self.n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        doc_len = np.bincount(self.docs, weights=tf, minlength=self.n_docs)
+        self.norm = (k1 * (1 - b + b * doc_len / max(doc_len.mean(), 1e-9))).astype(np.float32)
+        self.vocabulary = vocabulary
+        # Vocabulaire trié pour la complétion par préfixe
+        self.terms = np.array(list(vocabulary), dtype=object)
+        order = np.argsort(self.terms)
+        self.sorted_terms = self.terms[order].astype(str)
+        self.sorted_ids = order
+        self._build_trigrams()
+
+    def _build_trigrams(self):
+        """Index trigramme -> mots du vocabulaire (format CSR)"""
+        trigram_ids = {}
+        rows, cols = [], []
+        self.term_trigrams = np.zeros(len(self.terms), dtype=np.int32)
+        for term_id, term in enumerate(self.terms):
+            grams = _trigrams(term)
+            self.term_trigrams[term_id] = len(grams)
+            for g in grams:
+                rows.append(trigram_ids.setdefault(g, len(trigram_ids)))
+                cols.append(term_id)
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(rows, kind='stable')
+        self.trigram_ids = trigram_ids
+        self.trigram_terms = np.asarray(cols, dtype=np.int32)[order]
+        self.trigram_indptr = np.searchsorted(rows[order], np.arange(len(trigram_ids) + 1))
+
+    ARRAYS = ('docs', 'tf', 'indptr', 'idf', 'norm', 'sorted_terms', 'sorted_ids', 'term_trigrams',
+              'trigram_terms', 'trigram_indptr')
+
+    def to_arrays(self):
+        """(tableaux, métadonnées JSON) de l'index, pour un catalogue partagé entre processus"""
+        meta = {'k1': self.k1, 'b': self.b, 'n_docs': self.n_docs, 'terms': self.terms.tolist(),
+                'trigrams': list(self.trigram_ids)}
+        return {name: getattr(self, name) for name in self.ARRAYS}, meta
+
+    @classmethod
+    def from_arrays(cls, arrays, meta):
+        """Index relu depuis to_arrays() : seuls le vocabulaire et les trigrammes sont recréés en dicts"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.k1, index.b, index.n_docs = meta['k1'], meta['b'], meta['n_docs']
+        index.terms = np.array(meta['terms'], dtype=object)
+        index.vocabulary = {term: i for i, term in enumerate(meta['terms'])}
+        index.trigram_ids = {gram: i for i, gram in enumerate(meta['trigrams'])}
+        return index
+
+    def expand(self, token, prefix=False, min_similarity=0.45, max_terms=10):
+        """Mots du vocabulaire proches de `token` : [(id du mot, poids)]"""
+        matches = {}
+        term_id = self.vocabulary.get(token)
+        if term_id is not None:
+            matches[term_id] = 1.0
+        if prefix and len(token) >= 2:
+            lo = np.searchsorted(self.sorted_terms, token)
+            hi = np.searchsorted(self.sorted_terms, token + '\x7f')
+            for i in self.sorted_ids[lo:min(hi, lo + max_terms)]:
+                matches.setdefault(int(i), 0.9)
+        if term_id is None and len(token) >= 4:
+            grams = [self.trigram_ids[g] for g in _trigrams(token) if g in self.trigram_ids]
+            if grams:
+                candidates = np.concatenate([self.trigram_terms[self.trigram_indptr[g]:self.trigram_indptr[g + 1]]
+                                             for g in grams])
+                shared = np.bincount(candidates, minlength=len(self.terms))
+                hits = np.flatnonzero(shared)
+                # Similarité de Jaccard entre les ensembles de trigrammes
+                similarity = shared[hits] / (len(_trigrams(token)) + self.term_trigrams[hits] - shared[hits])
+                keep = similarity >= min_similarity
+                hits, similarity = hits[keep], similarity[keep]
+                for i in np.argsort(-similarity)[:max_terms]:
+                    matches.setdefault(int(hits[i]), float(similarity[i]) * 0.8)
+        return list(matches.items())
+
+    def scores(self, query, candidates=None):
+        """Score BM25 de chaque vin pour la requête (0 si aucun mot ne correspond)"""
+        tokens = tokenize(query)
+        total = np.zeros(self.n_docs, dtype=np.float32)
+        if not tokens:
+            return total
+        matched = np.zeros(self.n_docs, dtype=np.int16)
+        for position, token in enumerate(tokens):
+            # Le dernier mot est peut-être en cours de frappe : on le complète
+            expansions = self.expand(token, prefix=position == len(tokens) - 1)
+            token_scores = np.zeros(self.n_docs, dtype=np.float32)
+            for term_id, weight in expansions:
+                start, end = self.indptr[term_id], self.indptr[term_id + 1]
+                docs, tf = self.docs[start:end], self.tf[start:end]
+                bm25 = weight * self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.norm[docs])
+                token_scores[docs] = np.maximum(token_scores[docs], bm25)
+            total += token_scores
+            matched += token_scores > 0
+        # Les vins qui contiennent tous les mots passent devant ceux qui n'en ont qu'une partie
+        total *= (matched / len(tokens)) ** 2
+        if candidates is not None:
+            keep = np.zeros(self.n_docs, dtype=bool)
+            keep[candidates] = True
+            total[~keep] = 0
+        return total
+
+    def top_k(self, query, k=20, candidates=None):
+        """Retourne (ids, scores) des k vins les plus pertinents, par score décroissant"""
+        total = self.scores(query, candidates)
+        hits = np.flatnonzero(total > 0)
+        if k is not None and len(hits) > k:
+            hits = hits[np.argpartition(-total[hits], k - 1)[:k]]
+        order = np.argsort(-total[hits], kind='stable')
+        return hits[order], total[hits][order]
+
+    def rank(self, query, candidates=None):
+        """Tous les vins correspondant à la requête, du plus au moins pertinent.
+
+        Une requête sans aucun mot (ponctuation seule) ne filtre rien : tous les candidats, dans l'ordre.
+        """
+        if not tokenize(query):
+            return np.arange(self.n_docs) if candidates is None else np.asarray(candidates, dtype=np.int64)
+        return self.top_k(query, k=None, candidates=candidates)[0]
+
+    def stats(self):
+        return {'docs': self.n_docs, 'terms': len(self.terms), 'postings': int(len(self.docs)),
+                'trigrams': len(self.trigram_ids),
+                'bytes': int(self.docs.nbytes + self.tf.nbytes + self.indptr.nbytes + self.norm.nbytes
+                             + self.trigram_terms.nbytes + self.trigram_indptr.nbytes)}
@@ -0,0 +1,262 @@
+"""Similarité de contenu entre vins, à partir des textes (desc, accroche, caractere).
+
+Le modèle du notebook (ML_sur_base_vin.ipynb) ne compare que les variables one-hot et
+standardisées ; les notes de dégustation sont dans les textes. Chaque vin est ici un
+vecteur TF-IDF creux de ses mots et paires de mots consécutifs, hachés dans
+N_FEATURES colonnes (pas de vocabulaire à garder), pondérés par 1 + log(tf) et
+normalisés : le produit scalaire de deux vecteurs est leur similarité cosinus.
+
+Les vecteurs sont calculés une fois par version des données et écrits en .npy (lignes
+par vin et listes de vins par colonne) dans <dossier>/<version>/, relus ensuite avec
+np.load(mmap_mode='r'). Les k plus proches voisins d'un lot de vins se calculent par
+blocs : produit creux du bloc par la matrice, accumulé dans un tableau dense
+bloc x vins de taille bornée.
+
+Le score peut mêler la similarité des textes et la distance des variables du modèle :
+    score = alpha * cosinus + (1 - alpha) / (1 + distance euclidienne)
+
+Usage : python text_similarity.py --data base_vin_final.csv --dir text_vectors
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from text_search import _tokens_by_row
+
+TEXT_FIELDS = ('desc', 'accroche', 'caractere')
+N_FEATURES = 2 ** 20
+# Mots présents dans plus de la moitié des vins (« vin », « notes »...) : ignorés
+MAX_DF = 0.5
+DEFAULT_DIR = 'text_vectors'
+DEFAULT_ALPHA = 0.5
+# Taille maximale (cellules) du tableau dense d'un bloc de requêtes, et des produits développés
+BLOCK_CELLS = 2 ** 22
+BLOCK_PRODUCTS = 2 ** 24
+ARRAYS = ('indptr', 'indices', 'data', 'col_indptr', 'col_rows', 'col_data')
+
+
+def _ranges(starts, lengths):
+    """Concaténation de arange(s, s + l) pour chaque couple, sans boucle Python"""
+    total = int(lengths.sum())
+    offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return offsets + np.arange(total)
+
+
+def _hashed_terms(df, n_features):
+    """(lignes, colonnes hachées) des mots et paires de mots consécutifs de chaque champ"""
+    rows, cols = [], []
+    for field in TEXT_FIELDS:
+        if field not in df.columns:
+            continue
+        positions, words = _tokens_by_row(df[field].astype(str).reset_index(drop=True))
+        if not len(words):
+            continue
+        codes, uniques = pd.factorize(words)
+        hashes = np.array([zlib.crc32(w.encode()) for w in uniques], dtype=np.uint64)[codes]
+        rows.append(positions)
+        cols.append(hashes % n_features)
+        # Paires dans un même champ d'un même vin : hachage combiné des deux mots
+        same = positions[1:] == positions[:-1]
+        pairs = (hashes[:-1][same] * np.uint64(0x9E3779B1) + hashes[1:][same]) % np.uint64(2 ** 61 - 1)
+        rows.append(positions[1:][same])
+        cols.append(pairs % n_features)
+    if not rows:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64)
+    return np.concatenate(rows).astype(np.int64), np.concatenate(cols).astype(np.int64)
+
+
+class TermCounts:
+    """Termes des vins accumulés morceau par morceau (les textes ne sont pas gardés), puis TextVectors"""
+
+    def __init__(self, n_features=N_FEATURES):
+        self.n_features = n_features
+        self.n_docs = 0
+        self._keys, self._tf = [], []
+
+    def add(self, df):
+        """Ajoute les vins de `df`, numérotés à la suite des précédents"""
+        rows, cols = _hashed_terms(df, self.n_features)
+        # Clés triées par (vin, colonne) : l'ordre des lignes CSR, conservé d'un morceau au suivant
+        keys, tf = np.unique((rows + self.n_docs) * self.n_features + cols, return_counts=True)
+        self._keys.append(keys)
+        self._tf.append(tf.astype(np.int32))
+        self.n_docs += len(df)
+
+    def vectors(self, max_df=MAX_DF):
+        keys = np.concatenate(self._keys) if self._keys else np.zeros(0, np.int64)
+        tf = np.concatenate(self._tf) if self._tf else np.zeros(0, np.int32)
+        self._keys, self._tf = [], []
+        return TextVectors.from_counts(keys, tf, self.n_docs, self.n_features, max_df)
+
+
+class TextVectors:
+    """Matrice TF-IDF creuse des vins, en lignes (CSR) et en colonnes (listes de vins)"""
+
+    def __init__(self, arrays, n_docs, n_features):
+        self.n_docs = n_docs
+        self.n_features = n_features
+        for name in ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def build(cls, df, n_features=N_FEATURES, max_df=MAX_DF):
+        terms = TermCounts(n_features)
+        terms.add(df)
+        return terms.vectors(max_df)
+
+    @classmethod
+    def from_counts(cls, keys, tf, n_docs, n_features=N_FEATURES, max_df=MAX_DF):
+        """Vecteurs depuis les clés vin * n_features + colonne (triées) et leurs nombres d'occurrences"""
+        rows, cols = keys // n_features, keys % n_features
+        df_counts = np.bincount(cols, minlength=n_features)
+        # Un terme présent dans un seul vin ne rapproche aucun vin ; trop fréquent, il ne distingue rien
+        keep = (df_counts[cols] >= 2) & (df_counts[cols] <= max(2, max_df * n_docs))
+        rows, cols, tf = rows[keep], cols[keep], tf[keep]
+        idf = np.log((1 + n_docs) / (1 + df_counts)) + 1
+        data = (1 + np.log(tf)) * idf[cols]
+        norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=n_docs))
+        data = (data / np.where(norms > 0, norms, 1)[rows]).astype(np.float32)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=n_docs))]).astype(np.int64)
+        by_col = np.argsort(cols, kind='stable')
+        col_indptr = np.concatenate([[0], np.cumsum(np.bincount(cols, minlength=n_features))]).astype(np.int64)
+        arrays = {'indptr': indptr, 'indices': cols.astype(np.int32), 'data': data,
+                  'col_indptr': col_indptr, 'col_rows': rows[by_col].astype(np.int32), 'col_data': data[by_col]}
+        return cls(arrays, n_docs, n_features)
+
+    def save(self, directory):
+        """Écrit les tableaux dans `directory` (dossier à côté puis renommé : jamais lu à moitié écrit)"""
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=parent)
+        for name in ARRAYS:
+            np.save(os.path.join(staging, f"{name}.npy"), getattr(self, name), allow_pickle=False)
+        with open(os.path.join(staging, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({'n_docs': self.n_docs, 'n_features': self.n_features}, f)
+        try:
+            os.rename(staging, directory)
+        except OSError:
+            # Un autre processus a écrit la même version entre-temps
+            shutil.rmtree(staging, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory):
+        """Tableaux mappés en lecture seule (pages partagées entre processus)"""
+        with open(os.path.join(directory, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {name: np.asarray(np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r')) for name in ARRAYS}
+        return cls(arrays, meta['n_docs'], meta['n_features'])
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    def _block_scores(self, ids):
+        """Similarités (len(ids) x n_docs, dense) d'un bloc de vins avec tous les vins"""
+        starts = self.indptr[ids]
+        nnz = _ranges(starts, self.indptr[ids + 1] - starts)
+        owners = np.repeat(np.arange(len(ids)), self.indptr[ids + 1] - starts)
+        terms, weights = self.indices[nnz], self.data[nnz]
+        col_starts = self.col_indptr[terms]
+        lengths = self.col_indptr[terms + 1] - col_starts
+        postings = _ranges(col_starts, lengths)
+        keys = np.repeat(owners, lengths) * self.n_docs + self.col_rows[postings]
+        products = self.col_data[postings] * np.repeat(weights, lengths)
+        return np.bincount(keys, weights=products, minlength=len(ids) * self.n_docs).reshape(len(ids), self.n_docs)
+
+    def _blocks(self, ids):
+        """Découpe `ids` en blocs dont le tableau dense et les produits développés restent bornés"""
+        max_rows = max(1, BLOCK_CELLS // max(self.n_docs, 1))
+        # Nombre de produits de chaque vin : somme des longueurs des listes de vins de ses colonnes
+        lengths = self.indptr[ids + 1] - self.indptr[ids]
+        terms = self.indices[_ranges(self.indptr[ids], lengths)]
+        cost = np.bincount(np.repeat(np.arange(len(ids)), lengths), minlength=len(ids),
+                           weights=self.col_indptr[terms + 1] - self.col_indptr[terms])
+        start = 0
+        while start < len(ids):
+            end = start + 1
+            total = cost[start]
+            while end < len(ids) and end - start < max_rows and total + cost[end] <= BLOCK_PRODUCTS:
+                total += cost[end]
+                end += 1
+            yield start, end
+            start = end
+
+    def top_k(self, ids, k=10):
+        """(ids, scores) des k vins les plus proches de chaque vin de `ids` (lui-même exclu), -1 si moins de k"""
+        ids = np.asarray(ids, dtype=np.int64)
+        k = min(k, max(self.n_docs - 1, 0))
+        neighbours = np.full((len(ids), k), -1, dtype=np.int64)
+        scores = np.zeros((len(ids), k), dtype=np.float32)
+        if not k:
+            return neighbours, scores
+        for start, end in self._blocks(ids):
+            block = ids[start:end]
+            similarities = self._block_scores(block)
+            similarities[np.arange(len(block)), block] = -1
+            top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(similarities, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')
+            top, top_scores = np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+            found = top_scores > 0
+            neighbours[start:end] = np.where(found, top, -1)
+            scores[start:end] = np.where(found, top_scores, 0)
+        return neighbours, scores
+
+
+def blend(text_scores, distances, alpha=DEFAULT_ALPHA):
+    """Score mêlant similarité cosinus des textes (0..1) et distance des variables du modèle"""
+    return alpha * np.asarray(text_scores) + (1 - alpha) / (1 + np.asarray(distances))
+
+
+def is_built(version, directory=DEFAULT_DIR):
+    """Vecteurs de la version `version` déjà écrits dans `directory`"""
+    return version is not None and os.path.exists(os.path.join(directory, version, 'meta.json'))
+
+
+def _build(source):
+    return source.vectors() if isinstance(source, TermCounts) else TextVectors.build(source)
+
+
+def load_or_build(df, version, directory=DEFAULT_DIR):
+    """Vecteurs de la version `version` : relus s'ils sont déjà écrits, sinon calculés depuis `df` et écrits.
+
+    `df` est le DataFrame des textes, ou un TermCounts déjà rempli (chargement par morceaux).
+    Sans version des données (version None), ils sont calculés sans être écrits.
+    """
+    if version is None:
+        return _build(df)
+    target = os.path.join(directory, version)
+    if not is_built(version, directory):
+        if df is None:
+            raise ValueError(f"Vecteurs texte de la version {version} absents de {directory} "
+                             f"(python text_similarity.py --data ... --dir {directory})")
+        _build(df).save(target)
+    return TextVectors.load(target)
+
+
+def main():
+    from catalogue import CATALOGUE_FILE, load_catalogue
+    from data_manifest import data_version
+
+    parser = argparse.ArgumentParser(description="Calcule et écrit les vecteurs TF-IDF des textes des vins")
+    parser.add_argument('--data', default=CATALOGUE_FILE)
+    parser.add_argument('--dir', default=DEFAULT_DIR)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    start = time.perf_counter()
+    version = data_version(args.data)
+    vectors = load_or_build(load_catalogue(args.data), version, args.dir)
+    logging.info(f"Vecteurs texte {version} : {vectors.n_docs} vins, {len(vectors.data)} termes non nuls, "
+                 f"{vectors.nbytes() / 2**20:.1f} Mo, {time.perf_counter() - start:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
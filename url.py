@@ -1,10 +1,11 @@
 import pandas as pd
+from vinatis_urls import canonicalize_urls
 
 # Chargement du fichier CSV
 df = pd.read_csv("vinatis_data.csv")
 
 # Ajout du préfixe à la colonne 'image'
-df['image_url'] = "https://www.vinatis.com/" + df['image'].astype(str)
+df['image_url'] = canonicalize_urls(df['image'])
 
 # Affichage des 5 premières URLs générées
 print(df[['image', 'image_url']].head())
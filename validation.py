@@ -0,0 +1,394 @@
+"""Validation et normalisation des vins scrapés, avant le travail sur la base (etape_2).
+
+Le nettoyage de etape_2_travail_sur_base.ipynb enchaîne des `apply` colonne par
+colonne et des inspections à l'œil (print_unique_values) ; une ligne invalide, comme
+celle sans degré que ML_sur_base_vin.ipynb retire à cause de son degres_std NaN,
+n'est repérée qu'à la fin. Ici le schéma est déclaré une fois (SCHEMA) et chaque
+champ est analysé par opérations vectorisées sur les chaînes (pandas .str) :
+
+    - nombres : virgule décimale, séparateur de milliers, unité (« 13,5 % »,
+      « 12,90 € », « 75 cl ») ;
+    - millésime : année sur 4 chiffres ou « non millésimé » ;
+    - listes : "['A', 'B']" ou "A, B", réécrites au format "['A', 'B']" ;
+    - textes HTML (desc, accroche) : balises retirées, espaces réduits.
+
+Chaque règle non respectée est nommée « colonne:règle » (prix:format,
+deg_alcool:manquant, id:doublon...). Les règles des champs bloquants mettent la ligne
+en quarantaine dans le fichier de rejets, avec ses valeurs d'origine, son numéro de
+ligne et ses motifs ; pour les autres champs, la valeur est vidée et comptée. Le
+fichier est lu et écrit par blocs.
+
+Usage : python validation.py --input vins_vinatis_flat_complet.csv --output vins_valides.csv --rejects vins_rejetes.csv
+"""
+import argparse
+import json
+import os
+import time
+from collections import Counter
+
+import pandas as pd
+
+try:
+    import pyarrow as pa  # installé avec Streamlit
+    import pyarrow.csv as pa_csv
+    # Chaînes Arrow : les opérations .str (expressions régulières RE2) tournent en C, sans boucle Python
+    STRING_DTYPE = 'string[pyarrow]'
+except ImportError:
+    pa = None
+    STRING_DTYPE = 'string'
+
+# Fichiers par défaut du pipeline
+INPUT_FILE = 'vins_vinatis_flat_complet.csv'
+OUTPUT_FILE = 'vins_valides.csv'
+REJECTS_FILE = 'vins_rejetes.csv'
+REPORT_FILE = 'validation_report.json'
+CHUNK_ROWS = 100_000
+
+# Noms des colonnes du fichier aplati -> noms de la base (comme dans etape_2_travail_sur_base.ipynb)
+RAW_COLUMNS = {
+    'name': 'nom',
+    'description_short': 'desc',
+    'image': 'visuel',
+    'manufacturer_name': 'producteur',
+    'features_abv': 'deg_alcool',
+    'features_country': 'pays',
+    'features_region': 'region',
+    'features_appellation': 'appellation',
+    'features_full_grape_variety': 'cepages',
+    'features_vintage': 'millesime',
+    'features_food_and_wine_matching': 'accords',
+    'features_taste': 'gout',
+    'features_character': 'caractere',
+    'features_colour': 'couleur',
+    'features_service_temperature': 'temp_serv',
+    'features_type': 'type_produit',
+    'features_bio': 'bio',
+    'prices_price': 'prix',
+}
+
+NON_VINTAGE = 'non millésimé'
+NON_VINTAGES = [NON_VINTAGE, 'non millesime', 'nm', 'sans millésime']
+NUMBER = r'[-+]?\d+(?:[.,]\d+)?'
+# Séparateur de milliers (espace, insécable) entre deux groupes de chiffres : « 1 250,00 € »
+# (expressions compatibles avec re et RE2 : pas de lookbehind, pas de classes Unicode)
+THOUSANDS = r'\d[ \xa0]\d{3}(?:\D|$)'
+
+
+class Field:
+    """Règles d'une colonne : type attendu, présence, bornes, valeurs permises.
+
+    `reject` : une règle non respectée met la ligne en quarantaine ; sinon la valeur est vidée.
+    `units` : unités acceptées après un nombre et leur facteur (« cl » -> 0.01 pour des litres).
+    """
+
+    def __init__(self, kind, required=False, reject=False, minimum=None, maximum=None, choices=None,
+                 units=None, unique=False):
+        self.kind = kind
+        self.required = required
+        self.reject = reject or required
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+        self.units = units or {'': 1}
+        self.unique = unique
+
+
+SCHEMA = {
+    'id': Field('integer', required=True, minimum=1, unique=True),
+    'nom': Field('text', required=True),
+    'desc': Field('html'),
+    'accroche': Field('html'),
+    'visuel': Field('text'),
+    'producteur': Field('text'),
+    'contenance': Field('decimal', minimum=0.1, maximum=30, units={'': 1, 'l': 1, 'cl': 0.01, 'ml': 0.001}),
+    # Sans degré, degres_std est NaN et le modèle ne peut pas placer le vin
+    'deg_alcool': Field('decimal', required=True, minimum=0, maximum=25, units={'': 1, '%': 1, '°': 1}),
+    'pays': Field('text'),
+    'region': Field('text'),
+    'appellation': Field('text'),
+    'cepages': Field('list'),
+    'millesime': Field('vintage', minimum=1900, maximum=time.localtime().tm_year + 1),
+    'accords': Field('list'),
+    'gout': Field('text'),
+    'caractere': Field('list'),
+    'couleur': Field('category', choices=('Rouge', 'Blanc', 'Rosé', 'Orange', 'Ambré', 'Rubis')),
+    'temp_serv': Field('temperature', minimum=0, maximum=25),
+    'type_produit': Field('list'),
+    'bio': Field('list'),
+    'prix': Field('decimal', required=True, minimum=0.5, maximum=100_000, units={'': 1, '€': 1, 'eur': 1}),
+    # Repris tels quels pour price_history.py (disponibilité) et la collecte multi-marchands
+    'stock': Field('text'),
+    'source': Field('text'),
+    'url': Field('text'),
+}
+
+# Fichier de la collecte multi-marchands (colonne source, merchant_sources.RECORD_COLUMNS) : l'id est
+# la référence du marchand (« VIN-A-75 », URL), unique par source ; les pages JSON-LD donnent
+# rarement le degré, qui n'est plus bloquant
+MERCHANT_SCHEMA = dict(SCHEMA, id=Field('text', required=True, unique=True),
+                       deg_alcool=Field('decimal', minimum=0, maximum=25, units={'': 1, '%': 1, '°': 1}))
+
+
+def schema_for(columns):
+    """MERCHANT_SCHEMA pour un fichier de merchant_scraper (colonne source), SCHEMA sinon"""
+    return MERCHANT_SCHEMA if 'source' in columns else SCHEMA
+
+
+def _text(values):
+    """Chaînes sans espaces autour, NA pour les valeurs vides"""
+    values = values.astype(STRING_DTYPE).str.strip()
+    return values.mask(values.isin(['', 'nan', 'None']))
+
+
+def _flag(mask):
+    """Masque booléen numpy (les valeurs manquantes ne sont pas signalées)"""
+    return mask.fillna(False).astype(bool)
+
+
+def _to_float(text):
+    """Nombres d'un texte déjà validé (NA -> NaN) ; conversion Arrow, bien plus rapide que pd.to_numeric"""
+    return text.astype(float)
+
+
+def _decimal(values, units):
+    """(nombres, masque des valeurs présentes illisibles) ; unité convertie par son facteur"""
+    spaced = values.str.contains(THOUSANDS, regex=True)
+    if spaced.any():
+        values = values.where(~spaced, values.str.replace(r'[ \xa0]', '', regex=True))
+    valid = values.str.fullmatch(rf'{NUMBER}\s*[^\d\s]*')
+    valid = _flag(valid)
+    numbers = _to_float(values.str.replace(r'\s*[^\d\s]*$', '', regex=True).str.replace(',', '.', regex=False)
+                        .where(valid))
+    factors = values.str.replace(rf'^{NUMBER}\s*', '', regex=True).str.lower().map(units)
+    parsed = numbers * factors.astype(float)
+    return parsed.astype(float), values.notna() & parsed.isna()
+
+
+def _vintage(values):
+    """Année (texte sur 4 chiffres) ou NON_VINTAGE ; (valeurs, illisibles, années numériques)"""
+    non_vintage = values.str.lower().isin(NON_VINTAGES)
+    is_year = _flag(values.str.fullmatch(r'\d{4}(?:\.0)?'))
+    text = values.str.slice(0, 4).where(is_year)
+    years = _to_float(text)
+    bad = values.notna() & ~is_year & ~non_vintage
+    return text.mask(non_vintage, NON_VINTAGE), bad, years
+
+
+def _list(values):
+    """Listes "['A', 'B']" ou "A, B" réécrites "['A', 'B']" ; liste vide -> NA"""
+    bad = _flag(values.str.startswith('[') & ~values.str.endswith(']'))
+    items = values.str.replace(r"^\[\s*['\"]?", '', regex=True).str.replace(r"['\"]?\s*\]$", '', regex=True)
+    items = items.str.replace(r"['\"]?\s*,\s*['\"]?", "', '", regex=True).str.strip()
+    return "['" + items.mask(bad | _flag(items == '')) + "']", bad
+
+
+def _html(values):
+    """Texte sans balises et aux espaces réduits (clean_html_texte de etape_2, vectorisé)"""
+    text = values.str.replace(r'<[^>]*>', ' ', regex=True)
+    # Seuls les blancs multiples ou autres qu'une espace sont remplacés (bien moins de remplacements que \s+)
+    return _text(text.str.replace(r'\s\s+|[\t\n\r\f\v]', ' ', regex=True))
+
+
+def _temperature(values):
+    """« 8-10°C », « 10 °C », « 8 - 10 » -> « 8-10°C » ; (texte, illisibles, bornes basse et haute)"""
+    valid = _flag(values.str.fullmatch(r'\d+(?:\s*-\s*\d+)?\s*(?:°\s*C?|C)?'))
+    unit = r'\s*(?:°\s*C?|C)?$'
+    low = _to_float(values.str.replace(r'\s*(?:-.*)?(?:°\s*C?|C)?$', '', regex=True).where(valid))
+    high = values.str.replace(r'^\d+\s*-?\s*', '', regex=True).str.replace(unit, '', regex=True)
+    high = _to_float(high.where(valid & _flag(high != ''))).fillna(low)
+    bad = values.notna() & (~valid | (high < low))
+    text = values.str.replace(r'\s+', '', regex=True).str.replace(r'°?C?$', '', regex=True) + '°C'
+    return text.mask(bad | values.isna()), bad, low, high
+
+
+def validate_chunk(df, schema=SCHEMA, seen_ids=None):
+    """Analyse un bloc de lignes brutes (chaînes) selon `schema`.
+
+    Retourne (lignes valides normalisées, masque des lignes rejetées, motifs par ligne
+    rejetée, compteurs {colonne:règle: lignes}). `seen_ids` (ensemble) garde les ids
+    des blocs précédents pour la règle `unique` : seule la première ligne d'un id est gardée
+    (d'un id par source quand le fichier a une colonne source).
+    """
+    df = df.rename(columns=RAW_COLUMNS)
+    out = pd.DataFrame(index=df.index)
+    source = _text(df['source']).fillna('') + '\x1f' if 'source' in df.columns else None
+    keys = None
+    reject = pd.Series(False, index=df.index)
+    violations = {}
+
+    def flag(column, rule, mask, field):
+        mask = _flag(mask)
+        if mask.any():
+            violations[f"{column}:{rule}"] = (mask, field.reject)
+
+    for column, field in schema.items():
+        if column not in df.columns:
+            if field.required:
+                flag(column, 'manquant', pd.Series(True, index=df.index), field)
+            continue
+        values = _text(df[column])
+        low = high = None
+        if field.kind in ('integer', 'decimal'):
+            parsed, bad = _decimal(values, field.units)
+            if field.kind == 'integer':
+                bad |= parsed.notna() & (parsed != parsed.round())
+                parsed = parsed.mask(bad).astype('Int64')
+            low = high = parsed.astype(float)
+        elif field.kind == 'vintage':
+            parsed, bad, low = _vintage(values)
+            high = low
+        elif field.kind == 'temperature':
+            parsed, bad, low, high = _temperature(values)
+        elif field.kind == 'list':
+            parsed, bad = _list(values)
+        elif field.kind == 'html':
+            parsed, bad = _html(values), pd.Series(False, index=df.index)
+        else:
+            parsed, bad = values, pd.Series(False, index=df.index)
+        flag(column, 'format', bad, field)
+        invalid = bad.copy()
+        if low is not None and (field.minimum is not None or field.maximum is not None):
+            out_of_range = pd.Series(False, index=df.index)
+            if field.minimum is not None:
+                out_of_range |= low < field.minimum
+            if field.maximum is not None:
+                out_of_range |= high > field.maximum
+            flag(column, 'hors_bornes', out_of_range, field)
+            invalid |= out_of_range.fillna(False)
+        if field.choices is not None:
+            unknown = parsed.notna() & ~parsed.isin(field.choices)
+            flag(column, 'valeur_inconnue', unknown, field)
+            invalid |= unknown
+        if field.unique:
+            keys = parsed if source is None else (source + parsed.astype(STRING_DTYPE)).where(parsed.notna())
+            duplicated = keys.notna() & keys.duplicated()
+            if seen_ids is not None:
+                duplicated |= keys.isin(seen_ids)
+            flag(column, 'doublon', duplicated, field)
+            invalid |= duplicated
+        parsed = parsed.mask(invalid)
+        if field.required:
+            flag(column, 'manquant', parsed.isna() & ~invalid, field)
+        out[column] = parsed
+
+    reasons = pd.Series('', index=df.index)
+    counts = Counter()
+    for name, (mask, rejects) in violations.items():
+        counts[name] = int(mask.sum())
+        if rejects:
+            reject |= mask
+            reasons = reasons.where(~mask, reasons + ';' + name)
+    if seen_ids is not None and keys is not None:
+        # Toute ligne lue réserve son id, même rejetée : le résultat ne dépend pas de la taille des blocs
+        seen_ids.update(keys.dropna().tolist())
+    return out.loc[~reject], reject, reasons[reject].str.lstrip(';'), counts
+
+
+def _read_chunks(path, chunk_rows):
+    """Blocs de `chunk_rows` lignes brutes (chaînes, vides = ''), indexés par leur position dans le fichier"""
+    if pa is None:
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+        return
+    header = pd.read_csv(path, nrows=0).columns
+    reader = pa_csv.open_csv(path, convert_options=pa_csv.ConvertOptions(
+        column_types={c: pa.string() for c in header}, strings_can_be_null=False))
+    offset, pending, pending_rows = 0, [], 0
+    for batch in reader:
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        while pending_rows >= chunk_rows:
+            table = pa.Table.from_batches(pending)
+            chunk, rest = table.slice(0, chunk_rows), table.slice(chunk_rows)
+            pending, pending_rows = rest.to_batches(), rest.num_rows
+            yield _to_pandas(chunk, offset)
+            offset += chunk_rows
+    if pending_rows:
+        yield _to_pandas(pa.Table.from_batches(pending), offset)
+
+
+def _to_pandas(table, offset):
+    df = table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+    df.index = pd.RangeIndex(offset, offset + len(df))
+    return df
+
+
+def _append_csv(df, path, header):
+    """Ajoute un bloc au fichier CSV (écriture Arrow si disponible, bien plus rapide que to_csv)"""
+    if pa is None:
+        df.to_csv(path, mode='a', header=header, index=False)
+        return
+    with open(path, 'ab') as f:
+        pa_csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), f,
+                         pa_csv.WriteOptions(include_header=header))
+
+
+def validate_file(input_path=INPUT_FILE, output_path=OUTPUT_FILE, rejects_path=REJECTS_FILE,
+                  chunk_rows=CHUNK_ROWS, schema=None):
+    """Valide `input_path` par blocs, écrit les lignes valides et les rejets, et retourne le rapport
+
+    Sans `schema`, il est choisi d'après les colonnes du fichier (schema_for).
+    """
+    for path in (output_path, rejects_path):
+        if os.path.exists(path):
+            os.remove(path)
+    start = time.perf_counter()
+    rejected_by_rule, nulled_by_rule = Counter(), Counter()
+    seen_ids = set()
+    rows = accepted = 0
+    for i, chunk in enumerate(_read_chunks(input_path, chunk_rows)):
+        schema = schema or schema_for(chunk.columns)
+        valid, reject, reasons, counts = validate_chunk(chunk, schema, seen_ids)
+        _append_csv(valid, output_path, header=(i == 0))
+        quarantined = chunk.loc[reject]
+        # Numéro de la ligne dans le fichier (l'en-tête est la ligne 1)
+        quarantined.insert(0, 'ligne', quarantined.index + 2)
+        quarantined.insert(1, 'motifs', reasons.astype(STRING_DTYPE))
+        _append_csv(quarantined, rejects_path, header=(i == 0))
+        for name, count in counts.items():
+            field = schema.get(name.split(':', 1)[0])
+            rejects = field is None or field.reject
+            # Lignes rejetées par cette règle (une ligne peut en enfreindre plusieurs)
+            (rejected_by_rule if rejects else nulled_by_rule)[name] += count
+        rows += len(chunk)
+        accepted += len(valid)
+    seconds = time.perf_counter() - start
+    return {
+        'input_file': input_path,
+        'output_file': output_path,
+        'rejects_file': rejects_path,
+        'chunk_rows': chunk_rows,
+        'rows': {'rows': rows, 'accepted': accepted, 'rejected': rows - accepted},
+        'rejected_by_rule': dict(rejected_by_rule.most_common()),
+        'nulled_by_rule': dict(nulled_by_rule.most_common()),
+        'seconds': round(seconds, 3),
+        'rows_per_s': round(rows / seconds) if seconds else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validation et normalisation des vins scrapés (rejets motivés)")
+    parser.add_argument('--input', default=INPUT_FILE)
+    parser.add_argument('--output', default=OUTPUT_FILE)
+    parser.add_argument('--rejects', default=REJECTS_FILE)
+    parser.add_argument('--report', default=REPORT_FILE, help="Fichier JSON du rapport de validation")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    args = parser.parse_args()
+
+    report = validate_file(args.input, args.output, args.rejects, args.chunk_rows)
+    with open(args.report, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    rows = report['rows']
+    print(f"Lignes lues : {rows['rows']} ({report['rows_per_s']} lignes/s), valides : {rows['accepted']}, "
+          f"rejetées : {rows['rejected']}")
+    for title, counts in (("Rejets par règle", report['rejected_by_rule']),
+                          ("Valeurs vidées par règle", report['nulled_by_rule'])):
+        if counts:
+            print(f"\n{title} :")
+            for name, count in counts.items():
+                print(f"  {name:<28}{count:>8}")
+    print(f"\nLignes valides : {args.output} ; rejets : {args.rejects} ; rapport : {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,5 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException, StaleElementReferenceException
 import time
 import json
@@ -15,16 +13,24 @@ from fake_useragent import UserAgent
 from bs4 import BeautifulSoup
 from tqdm import tqdm
 import os
+import re
+from vinatis_urls import canonicalize_urls
+from scraper_metrics import ScraperMetrics, setup_logging
+from browser_session import CookieConsent
+from pacing import AdaptivePacer, RateBudget
+import argparse
 
-# Configuration du logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('scraping.log'),
-        logging.StreamHandler()
-    ]
-)
+# Configuration du logging (non bloquant, via une file) et des métriques du run
+log_listener = setup_logging('scraping.log')
+metrics = ScraperMetrics()
+# Consentement cookies partagé par tous les drivers de la session
+cookie_consent = CookieConsent(metrics=metrics)
+# Rythme adaptatif (latence serveur + budget global de requêtes)
+pacer = AdaptivePacer(budget=RateBudget(per_minute=30), metrics=metrics)
+
+# Éléments dont la présence indique que la page est exploitable
+PRODUCT_LIST_CSS = ".product-list, .product-grid, .product-items, .product-card"
+PRODUCT_PAGE_CSS = ".product-details, .product-info, .product-main-info"
 
 def setup_driver():
     """Configure le driver Selenium avec les options appropriées"""
@@ -60,14 +66,18 @@ def setup_driver():
         
         # Création du driver avec undetected_chromedriver
         driver = uc.Chrome(options=options)
-        driver.implicitly_wait(15)
+        # Pas d'attente implicite : les attentes sont pilotées par pacer.wait_ready
+        driver.implicitly_wait(0)
         
         # Configuration de la taille de la fenêtre
         driver.set_window_size(1920, 1080)
         
         # Ajout de cookies pour simuler une session utilisateur
-        driver.get("https://www.vinatis.com")
-        time.sleep(random.uniform(2, 4))
+        pacer.fetch(driver, "https://www.vinatis.com")
+        pacer.wait_ready(driver)
+        
+        # Réutilisation du consentement cookies d'une session précédente
+        cookie_consent.restore(driver)
         
         # Exécution de JavaScript pour masquer les traces d'automatisation
         driver.execute_script("""
@@ -86,9 +96,14 @@ def setup_driver():
         raise
     return driver
 
+def accept_cookies(driver):
+    """Accepte le bandeau cookies une seule fois par session (voir browser_session.CookieConsent)"""
+    return cookie_consent.ensure(driver)
+
 class VinatisScraper:
-    def __init__(self):
+    def __init__(self, simulate_scroll=False):
         self.driver = None
+        self.simulate_scroll = simulate_scroll
         self.base_url = "https://www.vinatis.com"
         self.data = []
         self.visited_urls = set()
@@ -101,49 +116,12 @@ class VinatisScraper:
         }
 
     def accept_cookies(self):
-        """Accepte les cookies sur le site, essaie plusieurs sélecteurs."""
-        selectors = [
-            (By.ID, "onetrust-accept-btn-handler"),
-            (By.CSS_SELECTOR, "#onetrust-button-group #onetrust-accept-btn-handler"),
-            (By.CSS_SELECTOR, ".ot-sdk-container button#onetrust-accept-btn-handler"),
-            (By.XPATH, "//button[contains(@id, 'onetrust-accept-btn-handler')]"),
-            (By.XPATH, "//button[contains(text(), 'Accepter') or contains(text(), 'Tout accepter')]"),
-            (By.CSS_SELECTOR, ".ot-sdk-container .ot-sdk-row button")
-        ]
-        
-        # Attendre que la page soit complètement chargée
-        time.sleep(random.uniform(3, 5))
-        
-        accepted = False
-        for by, value in selectors:
-            try:
-                logging.info(f"Recherche du bouton cookies avec {by}={value}")
-                
-                # Attendre que le bouton soit cliquable
-                cookie_button = WebDriverWait(self.driver, 30).until(
-                    EC.element_to_be_clickable((by, value))
-                )
-                
-                # Simuler un comportement humain avant de cliquer
-                self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", cookie_button)
-                time.sleep(random.uniform(0.5, 1.5))
-                
-                # Cliquer avec JavaScript pour éviter la détection
-                self.driver.execute_script("arguments[0].click();", cookie_button)
-                
-                time.sleep(random.uniform(2, 4))
-                logging.info("Bouton cookies cliqué avec succès.")
-                accepted = True
-                break
-                
-            except Exception as e:
-                logging.info(f"Bouton cookies non trouvé avec {by}={value}: {e}")
-                
-        if not accepted:
-            # Sauvegarde la page pour inspection
-            with open('cookies_debug.html', 'w', encoding='utf-8') as f:
-                f.write(self.driver.page_source)
-            logging.warning("Aucun bouton cookies trouvé. Page sauvegardée sous cookies_debug.html.")
+        """Accepte les cookies sur le site (détection faite une seule fois par session)."""
+        first_check = not cookie_consent.checked
+        if not cookie_consent.ensure(self.driver) and first_check and cookie_consent.checked:
+            # Dernière tentative sans bandeau accepté : sauvegarde la page pour inspection
+            path = metrics.sample_dump('cookies_debug', lambda: self.driver.page_source, force=True)
+            logging.warning(f"Aucun bouton cookies trouvé. Page sauvegardée sous {path}.")
 
     def get_product_links(self, category_url, max_pages=5):
         """Récupère les liens des produits d'une catégorie"""
@@ -155,29 +133,20 @@ class VinatisScraper:
                 url = f"{category_url}?page={page}"
                 logging.info(f"Analyse de la page {page} de la catégorie {category_url}")
                 
-                # Chargement de la page avec un comportement plus humain
-                self.driver.get(url)
-                accept_cookies(self.driver)
-                time.sleep(random.uniform(4, 6))
-                
-                # Simulation du défilement de la page
-                self.simulate_human_scroll()
+                # Chargement de la page au rythme du pacer
+                pacer.fetch(self.driver, url)
+                with metrics.stage('cookies'):
+                    accept_cookies(self.driver)
                 
-                # Attendre que la page soit complètement chargée
-                WebDriverWait(self.driver, 30).until(
-                    EC.presence_of_element_located((By.TAG_NAME, "body"))
-                )
+                # Simulation du défilement de la page (optionnelle)
+                if self.simulate_scroll:
+                    with metrics.stage('scroll'):
+                        self.simulate_human_scroll()
                 
-                # Attendre que le contenu dynamique soit chargé
-                try:
-                    WebDriverWait(self.driver, 20).until(
-                        EC.presence_of_element_located((By.CSS_SELECTOR, ".product-list, .product-grid, .product-items, .product-card"))
-                    )
-                except TimeoutException:
+                # Attendre que le contenu dynamique soit chargé et le réseau inactif
+                if not pacer.wait_ready(self.driver, PRODUCT_LIST_CSS, timeout=20):
                     logging.warning("Le contenu des produits n'a pas été trouvé dans le délai imparti")
                 
-                time.sleep(random.uniform(3, 5))
-                
                 # Vérifier si la page existe
                 if "Page non trouvée" in self.driver.page_source:
                     logging.info("Page non trouvée, fin de la pagination")
@@ -199,41 +168,42 @@ class VinatisScraper:
                 ]
                 
                 product_elements = []
-                for selector in selectors:
-                    try:
-                        # Attendre que les éléments soient présents
-                        elements = WebDriverWait(self.driver, 10).until(
-                            EC.presence_of_all_elements_located((By.CSS_SELECTOR, selector))
-                        )
-                        if elements:
-                            product_elements = elements
-                            logging.info(f"Produits trouvés avec le sélecteur: {selector}")
-                            break
-                    except Exception as e:
-                        logging.info(f"Sélecteur {selector} non trouvé: {str(e)}")
+                with metrics.stage('parse'):
+                    for selector in selectors:
+                        try:
+                            # La page est prête : pas d'attente par sélecteur
+                            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+                            if elements:
+                                product_elements = elements
+                                metrics.event('selector_hit', selector=selector, page=page)
+                                break
+                        except Exception as e:
+                            metrics.incr('parse.selector_miss')
+                            logging.debug(f"Sélecteur {selector} non trouvé: {str(e)}")
                 
                 logging.info(f"Nombre de produits trouvés sur la page {page}: {len(product_elements)}")
                 
                 if not product_elements:
                     # Sauvegarder la page pour inspection
-                    with open(f'debug/page_debug_{page}.html', 'w', encoding='utf-8') as f:
-                        f.write(self.driver.page_source)
-                    logging.info(f"Aucun produit trouvé sur la page {page}, page sauvegardée pour inspection")
+                    path = metrics.sample_dump(f'page_debug_{page}', lambda: self.driver.page_source, force=True)
+                    logging.info(f"Aucun produit trouvé sur la page {page}, page sauvegardée sous {path}")
                     break
                 
                 # Récupérer les liens des produits
                 for element in product_elements:
                     try:
-                        # Faire défiler jusqu'à l'élément
-                        self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center'});", element)
-                        time.sleep(random.uniform(0.1, 0.3))
+                        if self.simulate_scroll:
+                            # Faire défiler jusqu'à l'élément
+                            self.driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", element)
                         
                         href = element.get_attribute('href')
                         if href and '/vin-' in href and href not in self.visited_urls:
                             product_links.add(href)
                             self.visited_urls.add(href)
-                            logging.info(f"Nouveau lien trouvé: {href}")
+                            metrics.incr('links.found')
+                            logging.debug(f"Nouveau lien trouvé: {href}")
                     except Exception as e:
+                        metrics.incr('links.errors')
                         logging.error(f"Erreur lors de la récupération du lien: {str(e)}")
                 
                 page += 1
@@ -245,30 +215,22 @@ class VinatisScraper:
         return product_links
 
     def simulate_human_scroll(self):
-        """Simule un défilement humain de la page"""
+        """Simule un défilement humain de la page (par hauteurs d'écran, pour le chargement paresseux)"""
         try:
-            # Obtenir la hauteur totale de la page
-            total_height = self.driver.execute_script("return document.body.scrollHeight")
+            # Obtenir la hauteur totale de la page et celle de la fenêtre
+            total_height, step = self.driver.execute_script(
+                "return [document.body.scrollHeight, window.innerHeight];"
+            )
             
-            # Défiler progressivement
+            # Défiler d'un écran à la fois
             current_position = 0
-            scroll_step = random.randint(100, 300)
-            
             while current_position < total_height:
-                # Défiler d'une distance aléatoire
-                current_position += scroll_step
+                current_position += int(step * random.uniform(0.7, 1.0))
                 self.driver.execute_script(f"window.scrollTo(0, {current_position});")
-                
-                # Attendre un temps aléatoire entre chaque défilement
-                time.sleep(random.uniform(0.1, 0.3))
-                
-                # Parfois, faire une pause plus longue
-                if random.random() < 0.1:
-                    time.sleep(random.uniform(0.5, 1.5))
+                time.sleep(random.uniform(0.05, 0.15))
             
             # Remonter en haut de la page
             self.driver.execute_script("window.scrollTo(0, 0);")
-            time.sleep(random.uniform(1, 2))
             
         except Exception as e:
             logging.error(f"Erreur lors du défilement de la page: {str(e)}")
@@ -276,28 +238,18 @@ class VinatisScraper:
     def scrape_wine_page(self, url):
         """Scrape les informations d'une page de vin"""
         try:
-            self.driver.get(url)
-            accept_cookies(self.driver)
-            time.sleep(5)  # Attente initiale pour le chargement de la page
-            
-            # Attendre que la page soit complètement chargée
-            WebDriverWait(self.driver, 30).until(
-                EC.presence_of_element_located((By.TAG_NAME, "body"))
-            )
+            pacer.fetch(self.driver, url)
+            with metrics.stage('cookies'):
+                accept_cookies(self.driver)
             
-            # Attendre que le contenu du produit soit chargé
-            try:
-                WebDriverWait(self.driver, 20).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, ".product-details, .product-info, .product-main-info"))
-                )
-            except TimeoutException:
+            # Attendre que le contenu du produit soit chargé et le réseau inactif
+            if not pacer.wait_ready(self.driver, PRODUCT_PAGE_CSS, timeout=20):
                 logging.warning("Le contenu du produit n'a pas été trouvé dans le délai imparti")
-            
-            time.sleep(random.uniform(3, 5))
 
-            # Log de la page source pour le débogage
-            logging.info(f"Page source de {url}: {self.driver.page_source[:500]}...")
+            # Page source conservée pour le débogage sur un échantillon de pages seulement
+            metrics.sample_dump(f"product_{len(self.data)}", lambda: self.driver.page_source)
 
+            parse_start = time.perf_counter()
             wine_data = {
                 'url': url,
                 'nom': self.get_text_safe('.product-title, [data-testid="product-title"], .product-main-info h1'),
@@ -314,33 +266,38 @@ class VinatisScraper:
                 'date_scraping': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             }
             
-            # Log des données récupérées
-            logging.info(f"Données récupérées pour {url}: {json.dumps(wine_data, ensure_ascii=False)}")
+            metrics.observe('parse', time.perf_counter() - parse_start)
+            
+            # Log des données récupérées (sérialisées seulement en DEBUG)
+            metrics.event('record', url=url, data=wine_data)
+            metrics.incr('products.scraped')
             
             self.data.append(wine_data)
             return wine_data
 
         except Exception as e:
+            metrics.incr('products.errors')
             logging.error(f"Erreur lors du scraping de {url}: {str(e)}")
             return None
 
     def get_text_safe(self, selector):
         """Récupère le texte d'un élément de manière sécurisée"""
         try:
-            # Essayer d'abord avec WebDriverWait
-            element = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.CSS_SELECTOR, selector))
-            )
-            text = element.text.strip()
+            # La page est déjà prête (pacer.wait_ready) : lecture directe, sans attente
+            elements = self.driver.find_elements(By.CSS_SELECTOR, selector)
+            if not elements:
+                raise NoSuchElementException(selector)
+            text = elements[0].text.strip()
             if text:
-                logging.info(f"Texte trouvé pour {selector}: {text}")
                 return text
             return None
         except (NoSuchElementException, TimeoutException):
-            logging.info(f"Élément non trouvé pour le sélecteur: {selector}")
+            metrics.incr('parse.field_missing')
+            logging.debug(f"Élément non trouvé pour le sélecteur: {selector}")
             return None
         except StaleElementReferenceException:
-            logging.info(f"Élément périmé pour le sélecteur: {selector}")
+            metrics.incr('parse.field_stale')
+            logging.debug(f"Élément périmé pour le sélecteur: {selector}")
             return None
         except Exception as e:
             logging.error(f"Erreur inattendue pour le sélecteur {selector}: {str(e)}")
@@ -375,7 +332,6 @@ class VinatisScraper:
         for i, url in enumerate(product_links, 1):
             logging.info(f"Scraping du produit {i}/{len(product_links)}")
             self.scrape_wine_page(url)
-            time.sleep(random.uniform(1, 3))
 
     def close(self):
         """Ferme le driver"""
@@ -384,152 +340,151 @@ class VinatisScraper:
 
 def get_product_links(driver, page):
     url = f"https://www.vinatis.com/?type%5B%5D=Vin&tri=7&page={page}"
-    print(f"\nTentative d'accès à l'URL: {url}")
+    logging.debug(f"Tentative d'accès à l'URL: {url}")
     
     max_retries = 3
     for attempt in range(max_retries):
         try:
-            driver.get(url)
-            accept_cookies(driver)
-            # Attendre plus longtemps pour le chargement
-            time.sleep(random.uniform(3, 5))
-            
-            # Vérifier si nous sommes sur la bonne page
-            current_url = driver.current_url
-            print(f"URL actuelle: {current_url}")
-            
-            # Afficher le titre de la page
-            print(f"Titre de la page: {driver.title}")
-            
-            # Sauvegarder le HTML pour debug
-            with open(f"debug/page_{page}.html", "w", encoding="utf-8") as f:
-                f.write(driver.page_source)
-            print(f"HTML sauvegardé dans debug/page_{page}.html")
-            
-            soup = BeautifulSoup(driver.page_source, "html.parser")
-            
-            # Vérifier si nous avons des produits
-            products = soup.select("div.product-container")
-            print(f"Nombre de produits trouvés: {len(products)}")
+            pacer.fetch(driver, url)
+            with metrics.stage('cookies'):
+                accept_cookies(driver)
+            # Attendre que la liste de produits soit chargée
+            pacer.wait_ready(driver, "a.product-thumbnail")
             
-            # Chercher les liens
-            links = soup.select("a.product-thumbnail")
-            print(f"Nombre de liens trouvés: {len(links)}")
+            with metrics.stage('parse'):
+                page_source = driver.page_source
+                soup = BeautifulSoup(page_source, "html.parser")
+                # Vérifier si nous avons des produits et chercher les liens
+                products = soup.select("div.product-container")
+                links = soup.select("a.product-thumbnail")
+            metrics.event('listing', page=page, attempt=attempt + 1, products=len(products), links=len(links))
             
             if not links:
-                print("Aucun lien trouvé. Contenu de la page:")
-                print(soup.prettify()[:1000])  # Afficher les 1000 premiers caractères
+                # Sauvegarder le HTML pour debug (toujours conservé quand la page est vide)
+                path = metrics.sample_dump(f"page_{page}_attempt_{attempt + 1}", page_source, force=True)
+                metrics.incr('listing.empty')
+                logging.warning(f"Aucun lien trouvé sur la page {page} (tentative {attempt + 1}), HTML : {path}")
                 if attempt < max_retries - 1:
-                    print(f"Tentative {attempt + 1} échouée, nouvelle tentative...")
-                    time.sleep(random.uniform(5, 10))
+                    pacer.backoff(attempt)
                     continue
             else:
-                return ["https://www.vinatis.com" + link["href"] for link in links if link.get("href")]
+                # Dump échantillonné des pages qui fonctionnent, pour comparaison
+                metrics.sample_dump(f"page_{page}", page_source)
+                metrics.incr('links.found', len(links))
+                hrefs = [link["href"] for link in links if link.get("href")]
+                return canonicalize_urls(hrefs).dropna().tolist()
                 
         except Exception as e:
-            print(f"Erreur lors de la tentative {attempt + 1}: {str(e)}")
+            metrics.incr('listing.errors')
+            logging.warning(f"Erreur lors de la tentative {attempt + 1} sur la page {page}: {str(e)}")
             if attempt < max_retries - 1:
-                print("Nouvelle tentative...")
-                time.sleep(random.uniform(5, 10))
+                pacer.backoff(attempt)
             else:
-                print("Toutes les tentatives ont échoué")
+                logging.error(f"Toutes les tentatives ont échoué pour la page {page}")
                 return []
     
     return []
 
 def get_product_info(driver, product_url):
     try:
-        print(f"\nRécupération des infos pour: {product_url}")
-        driver.get(product_url)
-        accept_cookies(driver)
-        time.sleep(random.uniform(2, 4))  # Attente aléatoire
-        
-        soup = BeautifulSoup(driver.page_source, "html.parser")
-        
-        # Extraction du nom
-        name_tag = soup.find("h1", class_="product-main-name")
-        name = name_tag.get_text(strip=True) if name_tag else None
-        print(f"Nom trouvé: {name}")
-        
-        # Extraction de l'image
-        img_tag = soup.select_one("img#bigpic")
-        image_url = img_tag["src"] if img_tag and img_tag.get("src") else None
-        print(f"URL image trouvée: {image_url}")
+        pacer.fetch(driver, product_url)
+        with metrics.stage('cookies'):
+            accept_cookies(driver)
+        pacer.wait_ready(driver, "h1.product-main-name")
         
-        # Extraction de l'ID
-        product_id = None
-        if image_url:
-            import re
-            match = re.search(r"/(\d+)-thickbox_", image_url)
-            if match:
-                product_id = match.group(1)
-        print(f"ID trouvé: {product_id}")
+        with metrics.stage('parse'):
+            soup = BeautifulSoup(driver.page_source, "html.parser")
+            
+            # Extraction du nom
+            name_tag = soup.find("h1", class_="product-main-name")
+            name = name_tag.get_text(strip=True) if name_tag else None
+            
+            # Extraction de l'image
+            img_tag = soup.select_one("img#bigpic")
+            image_url = img_tag["src"] if img_tag and img_tag.get("src") else None
+            
+            # Extraction de l'ID
+            product_id = None
+            if image_url:
+                match = re.search(r"/(\d+)-thickbox_", image_url)
+                if match:
+                    product_id = match.group(1)
         
-        return {
+        info = {
             "name": name,
             "id": product_id,
             "image_url": image_url,
             "url": product_url
         }
+        metrics.event('product', **info)
+        return info
     except Exception as e:
-        print(f"Erreur lors de la récupération des infos pour {product_url}: {str(e)}")
+        metrics.incr('products.errors')
+        logging.error(f"Erreur lors de la récupération des infos pour {product_url}: {str(e)}")
         return {"name": None, "id": None, "image_url": None, "url": product_url}
 
-def scrape_all_products(n_pages=2, pause=1.0):
+def scrape_all_products(n_pages=2, pause=1.0, max_products=None):
+    """Scrape les pages de listing puis chaque fiche produit.
+
+    `pause` est le délai de politesse minimal entre deux pages ; le délai réel est
+    ajusté par le pacer selon la latence du serveur. `max_products` arrête le run
+    après N produits (utile pour le mode benchmark).
+    """
+    pacer.min_delay = pause
     driver = setup_driver()
     
     try:
         all_data = []
         for page in tqdm(range(1, n_pages + 1), desc="Scraping Vinatis"):
-            print(f"\nTraitement de la page {page}/{n_pages}")
             links = get_product_links(driver, page)
-            print(f"Nombre de liens trouvés sur la page {page}: {len(links)}")
+            logging.info(f"Page {page}/{n_pages} : {len(links)} liens trouvés")
             
             for link in links:
+                if max_products is not None and len(all_data) >= max_products:
+                    break
                 info = get_product_info(driver, link)
                 if info["id"] and info["name"]:
                     all_data.append(info)
-                    print(f"Produit ajouté: {info['name']}")
-                time.sleep(random.uniform(pause, pause * 2))
+                    metrics.incr('products.scraped')
+                else:
+                    metrics.incr('products.incomplete')
+            if max_products is not None and len(all_data) >= max_products:
+                break
             
             # Sauvegarde intermédiaire tous les 10 pages
             if page % 10 == 0:
                 df = pd.DataFrame(all_data)
                 df.to_csv(f"vinatis_products_page_{page}.csv", index=False)
-                print(f"\nSauvegarde intermédiaire effectuée à la page {page}")
+                logging.info(f"Sauvegarde intermédiaire effectuée à la page {page}")
         
         return pd.DataFrame(all_data)
     except Exception as e:
-        print(f"Erreur lors du scraping: {str(e)}")
+        logging.error(f"Erreur lors du scraping: {str(e)}")
         return pd.DataFrame(all_data)
     finally:
         try:
             driver.quit()
         except:
             pass
+        metrics.event('cookies_report', level=logging.INFO, **cookie_consent.report())
+        metrics.log_summary('scraping_metrics.json')
 
 def main():
     scraper = VinatisScraper()
     try:
         logging.info("Démarrage du scraper Vinatis")
-        scraper.setup_driver()
-        logging.info("Driver configuré avec succès")
-        
-        # Accéder à la page d'accueil
-        scraper.driver.get(scraper.base_url)
-        logging.info("Page d'accueil chargée")
+        scraper.driver = setup_driver()
         
-        # Accepter les cookies
+        # Accepter les cookies (le driver est déjà sur la page d'accueil)
         scraper.accept_cookies()
         logging.info("Gestion des cookies terminée")
         
-        # Attendre un peu après l'acceptation des cookies
-        time.sleep(5)
-        
         # Test avec une seule catégorie pour le débogage
         category = 'rouge'
         logging.info(f"Début du scraping de la catégorie {category}")
         scraper.scrape_category(category, max_pages=2, max_products=10)
+        metrics.event('cookies_report', level=logging.INFO, **cookie_consent.report())
+        metrics.log_summary('scraping_metrics.json')
         
         # Vérifier si des données ont été collectées
         if scraper.data:
@@ -546,28 +501,45 @@ def main():
         scraper.close()
         logging.info("Scraper fermé")
 
+def benchmark(n_products=30, n_pages=1, pause=1.0):
+    """Scrape N produits et retourne le débit atteignable (produits/heure) avec le détail par étape"""
+    start = time.perf_counter()
+    df = scrape_all_products(n_pages=n_pages, pause=pause, max_products=n_products)
+    elapsed = time.perf_counter() - start
+    summary = metrics.summary()
+    result = {
+        'products': len(df),
+        'elapsed_s': round(elapsed, 1),
+        'products_per_hour': round(3600 * len(df) / elapsed, 1) if elapsed else 0.0,
+        'server_latency_s': round(pacer.latency or 0.0, 3),
+        'politeness_delay_s': round(pacer.delay, 3),
+        'stages': {name: stats['total_s'] for name, stats in summary['stages'].items()},
+    }
+    with open('scraping_benchmark.json', 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
 if __name__ == "__main__":
-    print("Démarrage du scraping de Vinatis...")
-    df = scrape_all_products(n_pages=2)
+    parser = argparse.ArgumentParser(description="Scraping des produits Vinatis")
+    parser.add_argument('--pages', type=int, default=2, help="Nombre de pages de listing")
+    parser.add_argument('--pause', type=float, default=1.0, help="Délai de politesse minimal (s)")
+    parser.add_argument('--rate', type=float, default=30, help="Budget global de requêtes par minute")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Mode benchmark : scrape N produits et affiche le débit")
+    args = parser.parse_args()
+    pacer.budget = RateBudget(per_minute=args.rate)
     
-    # Sauvegarde finale
-    if not df.empty:
-        df.to_csv("vinatis_all_products.csv", index=False)
-        print(f"\nScraping terminé. {len(df)} produits trouvés. Données enregistrées dans vinatis_all_products.csv")
+    if args.benchmark:
+        result = benchmark(n_products=args.benchmark, n_pages=args.pages, pause=args.pause)
+        print(f"\n{result['products']} produits en {result['elapsed_s']} s : "
+              f"{result['products_per_hour']} produits/heure (détail dans scraping_benchmark.json)")
     else:
-        print("\nAucun produit trouvé. Le fichier n'a pas été créé.")
-
-def accept_cookies(driver):
-    try:
-        # Essayez de trouver un bouton avec un texte courant pour accepter les cookies
-        # Adaptez le sélecteur si besoin selon le HTML réel du bandeau
-        buttons = driver.find_elements("xpath", "//button")
-        for btn in buttons:
-            txt = btn.text.strip().lower()
-            if "accepter" in txt or "tout accepter" in txt or "j'accepte" in txt:
-                btn.click()
-                print("Bandeau cookies accepté.")
-                time.sleep(1)
-                break
-    except Exception as e:
-        print(f"Pas de bandeau cookies détecté ou erreur : {e}") 
\ No newline at end of file
+        print("Démarrage du scraping de Vinatis...")
+        df = scrape_all_products(n_pages=args.pages, pause=args.pause)
+        
+        # Sauvegarde finale
+        if not df.empty:
+            df.to_csv("vinatis_all_products.csv", index=False)
+            print(f"\nScraping terminé. {len(df)} produits trouvés. Données enregistrées dans vinatis_all_products.csv")
+        else:
+            print("\nAucun produit trouvé. Le fichier n'a pas été créé.")
+    log_listener.stop()
@@ -0,0 +1,88 @@
+"""Construction et normalisation des URLs vinatis (images et fiches produits).
+
+Les fonctions travaillent sur des Series pandas. Slugs et URLs d'images passent par
+les opérations vectorisées `.str`, appliquées aux seules valeurs distinctes.
+
+La normalisation des URLs (canonicalize_urls) n'est pas vectorisée : c'est une boucle
+Python sur canonicalize_url, valeur par valeur. Sur des URLs presque toutes distinctes,
+les passes `.str` (ou leur application aux valeurs distinctes) ne font pas mieux ; la
+boucle égale l'ancien apply sur des chemins relatifs et le bat de 1,7 à 2x sur des URLs
+déjà absolues, le cas de la base réelle (voir benchmarks/bench_urls.py).
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+BASE_URL = "https://www.vinatis.com/"
+DEFAULT_IMAGE = BASE_URL + "1-detail_default/default-wine.png"
+HTTP_VINATIS = re.compile(r'^http://(www\.)?vinatis\.com/')
+
+
+def _to_object(values):
+    """Repasse en Series 'object' avec NaN pour les valeurs manquantes (comme l'ancien apply)"""
+    return pd.Series(values.to_numpy(dtype=object, na_value=np.nan), index=values.index, name=values.name)
+
+
+def _on_uniques(values, func):
+    """Applique une transformation vectorisée aux seules valeurs distinctes puis la rediffuse"""
+    codes, uniques = pd.factorize(pd.Series(values), use_na_sentinel=True)
+    transformed = func(pd.Series(uniques, dtype='string')).to_numpy(dtype=object, na_value=np.nan)
+    result = np.append(transformed, np.nan)[codes]  # le code -1 pointe vers le NaN ajouté
+    return pd.Series(result, index=pd.Series(values).index, dtype='string')
+
+
+def fold_accents(values):
+    """Supprime les accents d'une Series de chaînes (é -> e, œ -> oe...)"""
+    values = values.astype('string')
+    values = values.str.replace('œ', 'oe', regex=False).str.replace('Œ', 'OE', regex=False)
+    values = values.str.replace('æ', 'ae', regex=False).str.replace('Æ', 'AE', regex=False)
+    return values.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+
+
+def slugify(values):
+    """Transforme une Series de noms en slugs d'URL ('Île de Beauté 2024' -> 'ile-de-beaute-2024')"""
+    def _slug(uniques):
+        slugs = fold_accents(uniques).str.lower()
+        slugs = slugs.str.replace(r'[^a-z0-9]+', '-', regex=True)
+        return slugs.str.strip('-')
+    # Les noms se répètent beaucoup (millésimes, pages) : on ne slugifie que les valeurs distinctes
+    return _on_uniques(values, _slug)
+
+
+def build_image_urls(ids, names, size='detail_default'):
+    """Construit les URLs d'images vinatis à partir des ids et des noms des vins"""
+    ids = pd.Series(ids)
+    names = pd.Series(names, index=ids.index)
+    ids = pd.to_numeric(ids, errors='coerce').astype('Int64').astype('string')
+    urls = BASE_URL + ids + '-' + size + '/' + slugify(names) + '.png'
+    return _to_object(urls.where(ids.notna() & names.notna()))
+
+
+def canonicalize_urls(values, base=BASE_URL):
+    """Rend absolues et homogènes des URLs vinatis (chemins relatifs, '//', espaces) ; NaN si vide.
+
+    Boucle sur canonicalize_url : même coût par URL, sans passes `.str` intermédiaires.
+    """
+    values = pd.Series(values)
+    urls = [canonicalize_url(url, base) or np.nan for url in values.to_numpy(dtype=object)]
+    return pd.Series(urls, index=values.index, name=values.name, dtype=object)
+
+
+def canonicalize_url(url, base=BASE_URL):
+    """Normalise une URL vinatis (retourne None si l'URL est vide)"""
+    if not isinstance(url, str):
+        if url is None or pd.isna(url):
+            return None
+        url = str(url)
+    url = url.strip()
+    # Cas courant : URL déjà absolue, rien d'autre à tester
+    if url.startswith('https://'):
+        return url
+    if url in ('', 'nan', 'None'):
+        return None
+    if url.startswith('//'):
+        return 'https:' + url
+    if url.startswith('http'):
+        return HTTP_VINATIS.sub(base, url)
+    return base + url.lstrip('/')
@@ -0,0 +1,144 @@
+"""Fiches vins pré-rendues : le markdown de chaque fiche est calculé une fois par version des données.
+
+Au lieu de nettoyer les accords, tester chaque champ et appeler `st.write` champ par
+champ à chaque rerun, l'application relit une fiche prête (un seul `st.markdown`).
+Les fiches sont stockées dans un seul buffer UTF-8 + tableau d'offsets, pour ne pas
+garder une chaîne Python par vin.
+"""
+import numpy as np
+import pandas as pd
+
+BIO_BADGE = ('<span style="background-color: #4CAF50; color: white; padding: 5px 10px; '
+             'border-radius: 15px;">Vin Bio</span>')
+
+
+def _present(values):
+    return values.notna() & (values != 'nan') & (values != '')
+
+
+def _escape(values):
+    # Les fiches sont affichées avec unsafe_allow_html (pour le badge bio)
+    return values.str.replace('<', '&lt;', regex=False).str.replace('>', '&gt;', regex=False)
+
+
+def _line(df, column, label, suffix=''):
+    """Ligne « **label:** valeur » pour chaque vin, vide si le champ manque"""
+    if column not in df.columns:
+        return pd.Series('', index=df.index)
+    values = df[column].astype(str)
+    return pd.Series(np.where(_present(df[column]), '\n\n**' + label + ':** ' + _escape(values) + suffix, ''),
+                     index=df.index)
+
+
+def format_prices(prix):
+    """12.5 -> '12,50 €'"""
+    text = pd.Series(prix).map('{:.2f}'.format).str.replace('.', ',', regex=False) + ' €'
+    return text.where(pd.Series(prix).notna(), 'Prix non communiqué')
+
+
+def render_cards(df):
+    """Markdown de la fiche de chaque vin (Series alignée sur df)"""
+    if 'accords' in df.columns:
+        df = df.assign(accords=df['accords'].astype(str).str.replace(r"[\[\]']", '', regex=True))
+    bio = df['bio'].astype(str) == '1' if 'bio' in df.columns else pd.Series(False, index=df.index)
+    cards = '### ' + _escape(df['nom'].astype(str)) + ' - ' + format_prices(df['prix'])
+    cards += _line(df, 'pays', 'Pays') + _line(df, 'region', 'Région') + _line(df, 'couleur', 'Couleur')
+    cards += _line(df, 'deg_alcool', "Degré d'alcool", '%')
+    cards += np.where(bio, '\n\n' + BIO_BADGE, '')
+    cards += _line(df, 'accords', 'Accords mets et vins')
+    return cards + _line(df, 'desc', 'Description')
+
+
+class StringColumn:
+    """Colonne de chaînes dans un buffer UTF-8 + offsets (relisible depuis un fichier mappé en mémoire)"""
+
+    def __init__(self, blob, offsets, missing=None):
+        self.blob = blob
+        self.offsets = offsets
+        self.missing = missing
+
+    @classmethod
+    def from_values(cls, values):
+        """Depuis une Series ; les valeurs manquantes (None/NaN) sont relues comme None"""
+        missing = values.isna().to_numpy()
+        encoded = values.fillna('').astype(str).str.encode('utf-8')
+        offsets = np.concatenate([[0], np.cumsum(encoded.str.len().to_numpy(dtype=np.int64))])
+        blob = np.frombuffer(b''.join(encoded.tolist()), dtype=np.uint8)
+        return cls(blob, offsets, missing if missing.any() else None)
+
+    def to_arrays(self):
+        arrays = {'blob': self.blob, 'offsets': self.offsets}
+        if self.missing is not None:
+            arrays['missing'] = self.missing
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        return cls(arrays['blob'], arrays['offsets'], arrays.get('missing'))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if self.missing is not None and self.missing[i]:
+            return None
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode('utf-8')
+
+    def equals(self, value):
+        """Masque des lignes égales à `value` (comparaison limitée aux chaînes de même longueur)"""
+        encoded = value.encode('utf-8')
+        mask = np.zeros(len(self), dtype=bool)
+        for i in np.flatnonzero(np.diff(self.offsets) == len(encoded)):
+            mask[i] = bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]) == encoded
+        return mask
+
+    def nbytes(self):
+        return self.blob.nbytes + self.offsets.nbytes
+
+
+class CardTable:
+    """Table compacte des fiches : id -> (nom, image, bio, markdown)"""
+
+    def __init__(self, df, version=None):
+        self.version = version
+        markdown = render_cards(df).str.encode('utf-8')
+        lengths = markdown.str.len().to_numpy(dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.blob = b''.join(markdown.tolist())
+        self.names = df['nom'].astype(str).to_numpy(dtype=object)
+        visuel = df['visuel'] if 'visuel' in df.columns else pd.Series(np.nan, index=df.index)
+        self.images = visuel.where(_present(visuel)).to_numpy(dtype=object, na_value=None)
+        self.bio = (df['bio'].astype(str) == '1').to_numpy() if 'bio' in df.columns else np.zeros(len(df), bool)
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_arrays(self):
+        """Tableaux de la table (fiches, images, badge bio), pour un catalogue partagé entre processus"""
+        images = StringColumn.from_values(pd.Series(self.images, dtype=object))
+        arrays = {'blob': np.frombuffer(self.blob, dtype=np.uint8), 'offsets': self.offsets, 'bio': self.bio}
+        arrays.update({f'images_{k}': v for k, v in images.to_arrays().items()})
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays, names, version=None):
+        """Table relue depuis to_arrays() ; `names` est la colonne des noms (StringColumn) du catalogue"""
+        table = cls.__new__(cls)
+        table.version = version
+        table.blob, table.offsets, table.bio = arrays['blob'], arrays['offsets'], arrays['bio']
+        table.names = names
+        table.images = StringColumn.from_arrays({k[len('images_'):]: v for k, v in arrays.items()
+                                                 if k.startswith('images_')})
+        return table
+
+    def markdown(self, wine_id):
+        return bytes(self.blob[self.offsets[wine_id]:self.offsets[wine_id + 1]]).decode('utf-8')
+
+    def cards(self, ids):
+        """Fiches prêtes à afficher pour une liste d'ids"""
+        return [{'id': int(i), 'nom': self.names[i], 'visuel': self.images[i], 'bio': bool(self.bio[i]),
+                 'markdown': self.markdown(i)}
+                for i in ids if 0 <= int(i) < len(self.names)]
+
+    def nbytes(self):
+        return len(self.blob) + self.offsets.nbytes + self.bio.nbytes
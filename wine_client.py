@@ -0,0 +1,182 @@
+"""Clients du catalogue utilisés par les pages Streamlit.
+
+- HttpClient : interroge le service wine_service.py (BOUTEILLIA_API_URL)
+- LocalClient : même interface, catalogue chargé dans le processus (développement, benchmarks)
+
+Les deux renvoient les mêmes objets JSON (dicts et listes). Les dépendances lourdes
+(requests, pandas via catalogue) ne sont importées qu'à la création du client : importer
+ce module ne coûte presque rien au démarrage des pages.
+"""
+import os
+
+
+class HttpClient:
+    """Client léger du service HTTP : une session requests (connexions réutilisées)"""
+
+    def __init__(self, base_url, timeout=5):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        import requests
+        self.session = requests.Session()
+
+    def _get(self, path, params=None):
+        response = self.session.get(self.base_url + path, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def stats(self):
+        return self._get('/stats')
+
+    def filters(self):
+        return self._get('/filters')
+
+    def aggregates(self):
+        return self._get('/aggregates')
+
+    @staticmethod
+    def _filter_params(filters):
+        params = {k: v for k, v in filters.items() if v not in (None, '', (), [], False)}
+        if params.get('bio'):
+            params['bio'] = '1'
+        return params
+
+    def search(self, filters, offset=0, limit=None, collapse=False):
+        params = self._filter_params(filters)
+        params['offset'] = offset
+        if limit is not None:
+            params['limit'] = limit
+        if collapse:
+            params['collapse'] = '1'
+        return self._get('/search', params)
+
+    def facets(self, filters):
+        return self._get('/facets', self._filter_params(filters))
+
+    def suggest(self, query, k=10):
+        return self._get('/suggest', {'q': query, 'k': k})['wines']
+
+    def wine(self, wine_id):
+        return self._get(f'/wine/{int(wine_id)}')
+
+    def wines(self, ids):
+        if not len(ids):
+            return []
+        return self._get('/wines', {'ids': ','.join(str(int(i)) for i in ids)})['wines']
+
+    def cards(self, ids):
+        if not len(ids):
+            return []
+        return self._get('/cards', {'ids': ','.join(str(int(i)) for i in ids)})['cards']
+
+    def recommend(self, wine_id, collapse=False):
+        return self._get(f'/recommend/{int(wine_id)}', {'collapse': '1'} if collapse else None)['wines']
+
+    def recommend_ids(self, wine_id, collapse=False):
+        return self._get(f'/recommend/{int(wine_id)}', {'collapse': '1'} if collapse else None)['ids']
+
+    def nearest_ids(self, wine_id, k=4, couleur=None, bio=False, prix_min=None, prix_max=None):
+        params = {'k': k, 'couleur': couleur, 'bio': int(bool(bio)), 'prix_min': prix_min, 'prix_max': prix_max}
+        return self._get(f'/nearest/{int(wine_id)}', {n: v for n, v in params.items() if v is not None})['ids']
+
+    def similar_ids(self, wine_id, k=4, alpha=0.5):
+        return self._get(f'/similar/{int(wine_id)}', {'k': k, 'alpha': alpha})['ids']
+
+    def price_history(self, wine_id):
+        return self._get(f'/history/{int(wine_id)}')
+
+    def random_id(self):
+        return self._get('/random')['id']
+
+    def data_version(self):
+        return self._get('/health')['version']
+
+    def snapshot(self):
+        # Le service fige lui-même le catalogue pour chaque requête
+        return self
+
+
+class LocalClient:
+    """Même interface que HttpClient, sans passer par le réseau"""
+
+    def __init__(self, catalogue, store=None):
+        self.catalogue = catalogue
+        self.store = store
+
+    def snapshot(self):
+        """Client figé sur le catalogue courant du store, pour toute la durée d'un rerun"""
+        if self.store is None:
+            return self
+        return LocalClient(self.store.get(), self.store)
+
+    def stats(self):
+        return self.catalogue.stats()
+
+    def filters(self):
+        return self.catalogue.filters()
+
+    def aggregates(self):
+        return self.catalogue.aggregates
+
+    def search(self, filters, offset=0, limit=None, collapse=False):
+        return self.catalogue.search_payload(filters, offset, limit, collapse)
+
+    def facets(self, filters):
+        return self.catalogue.facet_counts(**filters)
+
+    def suggest(self, query, k=10):
+        return self.catalogue.rows(self.catalogue.text_search(query, k))
+
+    def wine(self, wine_id):
+        return self.catalogue.wine(int(wine_id))
+
+    def wines(self, ids):
+        return self.catalogue.rows(ids)
+
+    def cards(self, ids):
+        return self.catalogue.cards(ids)
+
+    def recommend(self, wine_id, collapse=False):
+        return self.catalogue.recommend_payload(int(wine_id), collapse)['wines']
+
+    def recommend_ids(self, wine_id, collapse=False):
+        return self.catalogue.recommend(int(wine_id), collapse)
+
+    def nearest_ids(self, wine_id, k=4, couleur=None, bio=False, prix_min=None, prix_max=None):
+        return self.catalogue.nearest(int(wine_id), k, couleur, bio, prix_min, prix_max)
+
+    def similar_ids(self, wine_id, k=4, alpha=0.5):
+        return self.catalogue.similar(int(wine_id), k, alpha)
+
+    def price_history(self, wine_id):
+        return self.catalogue.price_history_payload(int(wine_id))
+
+    def random_id(self):
+        return self.catalogue.random_id()
+
+    def data_version(self):
+        return self.catalogue.version if self.catalogue is not None else None
+
+
+def get_client(api_url=None, data_path=None):
+    """Client HTTP si BOUTEILLIA_API_URL (ou `api_url`) est défini, sinon catalogue embarqué.
+
+    Avec BOUTEILLIA_SHARED_DIR, le catalogue embarqué est celui publié en mémoire partagée
+    par shared_catalogue.py (une seule copie pour toutes les répliques de l'application).
+    Avec BOUTEILLIA_SQLITE, il est interrogé dans la base écrite par sql_catalogue.py.
+    """
+    api_url = api_url or os.environ.get('BOUTEILLIA_API_URL')
+    if api_url:
+        return HttpClient(api_url)
+    shared_dir = os.environ.get('BOUTEILLIA_SHARED_DIR')
+    if shared_dir:
+        from shared_catalogue import SharedCatalogueStore
+        store = SharedCatalogueStore(shared_dir).start()
+        return LocalClient(store.get(), store)
+    sqlite_path = os.environ.get('BOUTEILLIA_SQLITE')
+    if sqlite_path:
+        from sql_catalogue import SqlCatalogueStore
+        store = SqlCatalogueStore(sqlite_path).start()
+        return LocalClient(store.get(), store)
+    from catalogue import CATALOGUE_FILE, CatalogueStore
+    store = CatalogueStore(data_path or CATALOGUE_FILE).start()
+    return LocalClient(store.get(), store)
@@ -0,0 +1,22 @@
+"""Téléchargement des visuels de vins, sans dépendance à Streamlit.
+
+Partagé par les pages (app.py, SITEVINS/app.py) et par les benchmarks, qui le
+chronomètrent contre un serveur d'images local.
+"""
+from io import BytesIO
+
+import requests
+from PIL import Image
+
+from vinatis_urls import canonicalize_url
+
+
+def fetch_image(url, session=None, timeout=5):
+    """Télécharge une image : retourne (image PIL ou None, code HTTP ou None, octets reçus)"""
+    url = canonicalize_url(url)
+    if url is None:
+        return None, None, 0
+    response = (session or requests).get(url, timeout=timeout)
+    if response.status_code != 200:
+        return None, response.status_code, len(response.content)
+    return Image.open(BytesIO(response.content)), 200, len(response.content)
@@ -0,0 +1,299 @@
+"""Service HTTP/JSON local du catalogue des vins (recherche, fiches, recommandations).
+
+Un seul processus garde le catalogue en mémoire ; les pages Streamlit (app.py,
+SITEVINS/app.py) l'interrogent via wine_client.HttpClient. Quand le pipeline publie
+une nouvelle version de la base (manifeste), le catalogue est reconstruit en
+arrière-plan puis substitué ; les réponses en cache sont indexées par version.
+
+Le port est ouvert avant la fin du chargement du catalogue : /health répond tout
+de suite (vivacité), /ready et les routes de données répondent 503 tant que le
+premier chargement n'est pas terminé (sonde de disponibilité).
+
+Routes (GET uniquement) :
+    /health                      état du service
+    /ready                       200 quand le catalogue est chargé, 503 sinon
+    /stats                       chiffres de la page d'accueil
+    /filters                     valeurs des filtres de recherche
+    /search?texte=..&pays=..&couleur=..&nom=..&bio=1&prix_min=..&prix_max=..&accords=..&offset=..&limit=..
+                                 (&collapse=1 : un seul vin par groupe de quasi-doublons, voir near_duplicates)
+    /facets?<filtres de /search> nombre de vins correspondants, total et par valeur de facette
+    /aggregates                  comptages par facette, quantiles et histogramme des prix, couleur x pays
+    /suggest?q=..&k=10           top-k de la recherche plein texte
+    /wine/{id}                   fiche d'un vin
+    /wines?ids=1,2,3             fiches d'une liste de vins (page de résultats)
+    /cards?ids=1,2,3             fiches pré-rendues (markdown) et version des données
+    /recommend/{id}?collapse=1   vins recommandés (collapse : sans quasi-doublons ni autre millésime du vin)
+    /similar/{id}?k=4&alpha=0.5  vins aux textes proches, score mêlé aux variables du modèle
+    /nearest/{id}?k=4&couleur=&bio=&prix_min=&prix_max=
+                                 vins les plus proches qui respectent les contraintes
+    /history/{id}                évolution du prix et de la disponibilité d'un vin d'une collecte à l'autre
+                                 (jamais mise en cache : l'historique grandit sans changer de version)
+    /random                      id d'un vin au hasard (jamais mis en cache)
+
+Usage : python wine_service.py --port 8502 --data base_vin_final.csv
+        python wine_service.py --port 8503 --shared-dir /dev/shm/bouteillia   (catalogue publié par shared_catalogue.py)
+        python wine_service.py --port 8504 --sqlite base_vin.sqlite           (base écrite par sql_catalogue.py)
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from catalogue import CATALOGUE_FILE, CatalogueStore
+from search_cache import SEARCH_CACHE
+from text_similarity import DEFAULT_ALPHA
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error',
+           503: 'Service Unavailable'}
+
+
+class ResponseCache:
+    """Cache LRU borné des réponses JSON déjà sérialisées, indexé par la requête normalisée"""
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # Les réponses sont calculées dans les threads de l'executor
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        with self._lock:
+            self.entries[key] = body
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+def _flag(query, name):
+    return query.get(name, [None])[0] in ('1', 'true', 'True')
+
+
+def parse_filters(query):
+    """Convertit les paramètres de /search et /facets en arguments de Catalogue.search"""
+    def first(name):
+        values = query.get(name)
+        return values[0] if values else None
+
+    def number(name):
+        value = first(name)
+        return float(value) if value not in (None, '') else None
+
+    return {
+        'nom': first('nom'),
+        'texte': first('texte'),
+        'pays': first('pays'),
+        'couleur': first('couleur'),
+        'bio': _flag(query, 'bio'),
+        'prix_min': number('prix_min'),
+        'prix_max': number('prix_max'),
+        'accords': tuple(query.get('accords', [])),
+    }
+
+
+def _json_default(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if hasattr(value, 'item'):  # scalaires numpy
+        return value.item()
+    return str(value)
+
+
+class WineService:
+    """Routage des requêtes vers le catalogue partagé, avec cache des réponses"""
+
+    def __init__(self, store, cache_size=2048, workers=4):
+        self.store = store
+        self.cache = ResponseCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.started = time.time()
+
+    def route(self, path, query, catalogue):
+        """Retourne (statut, objet JSON, cacheable) ; `catalogue` est figé pour toute la requête (None si pas encore chargé)"""
+        parts = [p for p in path.split('/') if p]
+        if parts == ['health']:
+            return 200, {'status': 'ok' if catalogue is not None else 'loading',
+                         'wines': len(catalogue) if catalogue is not None else 0,
+                         'version': catalogue.version if catalogue is not None else None,
+                         'store': self.store.status(), 'uptime_s': round(time.time() - self.started, 1),
+                         'cache': {'entries': len(self.cache.entries), 'hits': self.cache.hits,
+                                   'misses': self.cache.misses},
+                         'search_cache': SEARCH_CACHE.stats()}, False
+        if parts == ['ready']:
+            if catalogue is None:
+                return 503, {'ready': False, 'store': self.store.status()}, False
+            return 200, {'ready': True, 'version': catalogue.version, 'wines': len(catalogue)}, False
+        if catalogue is None:
+            return 503, {'error': "Catalogue en cours de chargement"}, False
+        if parts == ['stats']:
+            return 200, catalogue.stats(), True
+        if parts == ['filters']:
+            return 200, catalogue.filters(), True
+        if parts == ['aggregates']:
+            return 200, catalogue.aggregates, True
+        if parts == ['facets']:
+            return 200, catalogue.facet_counts(**parse_filters(query)), True
+        if parts == ['random']:
+            return 200, {'id': catalogue.random_id()}, False
+        if parts in (['wines'], ['cards']):
+            ids = [int(i) for v in query.get('ids', []) for i in v.split(',') if i]
+            if parts == ['cards']:
+                return 200, catalogue.cards_payload(ids), True
+            return 200, {'wines': catalogue.rows(ids)}, True
+        if parts == ['suggest']:
+            k = int(query.get('k', ['10'])[0])
+            ids = catalogue.text_search(query.get('q', [''])[0], k)
+            return 200, {'ids': ids.tolist(), 'wines': catalogue.rows(ids)}, True
+        if parts == ['search']:
+            offset = int(query.get('offset', ['0'])[0])
+            limit = query.get('limit', [None])[0]
+            payload = catalogue.search_payload(parse_filters(query), offset, int(limit) if limit else None,
+                                               _flag(query, 'collapse'))
+            return 200, payload, True
+        if len(parts) == 2 and parts[0] in ('wine', 'recommend') and parts[1].isdigit():
+            wine_id = int(parts[1])
+            if parts[0] == 'wine':
+                wine = catalogue.wine(wine_id)
+                return (200, wine, True) if wine else (404, {'error': f"Vin {wine_id} introuvable"}, False)
+            return 200, catalogue.recommend_payload(wine_id, _flag(query, 'collapse')), True
+        if len(parts) == 2 and parts[0] == 'history' and parts[1].isdigit():
+            return 200, catalogue.price_history_payload(int(parts[1])), False
+        if len(parts) == 2 and parts[0] == 'similar' and parts[1].isdigit():
+            k = int(query.get('k', ['4'])[0])
+            alpha = float(query['alpha'][0]) if query.get('alpha') else DEFAULT_ALPHA
+            return 200, catalogue.similar_payload(int(parts[1]), k, alpha), True
+        if len(parts) == 2 and parts[0] == 'nearest' and parts[1].isdigit():
+            k = int(query.get('k', ['4'])[0])
+            filters = parse_filters(query)
+            constraints = {name: filters[name] for name in ('couleur', 'bio', 'prix_min', 'prix_max')}
+            return 200, catalogue.nearest_payload(int(parts[1]), k, **constraints), True
+        return 404, {'error': f"Route inconnue : {path}"}, False
+
+    def respond(self, target):
+        """Calcule (ou relit en cache) la réponse sérialisée d'une requête GET"""
+        url = urlsplit(target)
+        query = parse_qs(url.query)
+        catalogue = self.store.get()
+        if catalogue is None:
+            status, payload, _ = self.route(url.path, query, None)
+            return status, json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        # Clé normalisée : l'ordre des paramètres et des accords ne change pas la réponse ;
+        # la version des données en fait partie, les entrées d'une ancienne base ne resservent pas
+        key = catalogue.version + url.path + '?' + urlencode(sorted((k, v) for k, vs in query.items() for v in vs))
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, body
+        try:
+            status, payload, cacheable = self.route(url.path, query, catalogue)
+        except ValueError as e:
+            return 400, json.dumps({'error': str(e)}).encode()
+        body = json.dumps(payload, ensure_ascii=False, default=_json_default).encode('utf-8')
+        if status == 200 and cacheable:
+            self.cache.put(key, body)
+        return status, body
+
+    async def handle_connection(self, reader, writer):
+        """Traite les requêtes d'une connexion (keep-alive HTTP/1.1)"""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+                if method != 'GET':
+                    status, body = 405, b'{"error": "GET uniquement"}'
+                else:
+                    try:
+                        # Le calcul (pandas) tourne dans un thread pour ne pas bloquer la boucle
+                        status, body = await loop.run_in_executor(self.executor, self.respond, target)
+                    except Exception as e:
+                        logging.exception(f"Erreur sur {target}")
+                        status, body = 500, json.dumps({'error': str(e)}).encode()
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionResetError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logging.info(f"Service vins à l'écoute sur http://{host}:{port} "
+                     f"({'catalogue chargé' if self.store.ready else 'chargement du catalogue en cours'})")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Service HTTP/JSON du catalogue BouteillIA")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--data', default=CATALOGUE_FILE)
+    parser.add_argument('--cache-size', type=int, default=2048)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--reload-s', type=float, default=30.0,
+                        help="Intervalle de contrôle du manifeste des données (0 : jamais)")
+    parser.add_argument('--shared-dir', default=None,
+                        help="Se rattacher au catalogue publié en mémoire partagée au lieu de lire --data")
+    parser.add_argument('--sqlite', default=None,
+                        help="Interroger la base SQLite écrite par sql_catalogue.py au lieu de lire --data")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    # Chargement du catalogue en arrière-plan : le port s'ouvre sans l'attendre (voir /ready)
+    if args.shared_dir:
+        from shared_catalogue import SharedCatalogueStore
+        store = SharedCatalogueStore(args.shared_dir, poll_s=args.reload_s, preload=False).start()
+    elif args.sqlite:
+        from sql_catalogue import SqlCatalogueStore
+        store = SqlCatalogueStore(args.sqlite, poll_s=args.reload_s, preload=False).start()
+    else:
+        store = CatalogueStore(args.data, poll_s=args.reload_s, preload=False).start()
+    service = WineService(store, cache_size=args.cache_size, workers=args.workers)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()